@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+benchmark_intraday_scheduler.py
+Throughput (filas/s) de la ingesta 1-min contra el servidor local de agregados
+(fase_C_ingesta_tiks/fake_polygon_server.py, en un subproceso con latencia simulada):
+
+  shards     (anterior) como tools/launch_intraday_smallcaps.py: N subprocesos de
+             ingest_ohlcv_intraday_minute.py, uno por shard CSV, cada uno con su sesion y su
+             --rate-limit por pagina
+  scheduler  intraday_scheduler.py: un proceso, pool HTTP compartido, --max-rps global
+
+Despues: paridad fichero a fichero de ambos arboles, una corrida interrumpida (stop) + resume por
+watermarks (solo se piden los meses pendientes) y un re-run que no hace ninguna peticion.
+
+Uso:
+  python scripts/fase_B_ingesta_Daily_minut/benchmark_intraday_scheduler.py --tickers 24 --months 12
+"""
+import argparse, asyncio, datetime as dt, os, subprocess, sys, tempfile, time
+from pathlib import Path
+
+import polars as pl
+
+HERE = Path(__file__).resolve().parent
+FAKE = HERE.parent / "fase_C_ingesta_tiks" / "fake_polygon_server.py"
+
+from intraday_scheduler import WATERMARKS_FILE, IntradayScheduler, load_watermarks
+
+def log(msg: str):
+    print(f"[{dt.datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
+
+SHARD = """
+import sys, ingest_ohlcv_intraday_minute as ing
+ing.BASE_URL = sys.argv[1]
+sys.argv = ["ingest_ohlcv_intraday_minute.py"] + sys.argv[2:]
+ing.main()
+"""
+
+def run_shards(api_base: str, tickers, outdir: Path, d0: str, d1: str, shards: int, rate_limit: float) -> float:
+    """Un subproceso del ingestor por shard (lo que hacia launch_intraday_smallcaps.py start)"""
+    tmp = outdir.parent / "shards"
+    tmp.mkdir(exist_ok=True)
+    env = dict(os.environ, POLYGON_API_KEY="x", PYTHONPATH=os.pathsep.join(
+        [str(HERE)] + ([os.environ["PYTHONPATH"]] if os.environ.get("PYTHONPATH") else [])))
+    t0 = time.perf_counter()
+    procs = []
+    for i in range(shards):
+        csv = tmp / f"tickers_shard_{i:02d}.csv"
+        pl.DataFrame({"ticker": tickers[i::shards]}).write_csv(csv)
+        procs.append(subprocess.Popen(
+            [sys.executable, "-c", SHARD, api_base, "--tickers-csv", str(csv), "--outdir", str(outdir),
+             "--from", d0, "--to", d1, "--rate-limit", str(rate_limit), "--max-tickers-per-process", "0"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env))
+    for p in procs:
+        p.wait()
+    return time.perf_counter() - t0
+
+def run_scheduler(api_base: str, tickers, outdir: Path, workdir: Path, d0: dt.date, d1: dt.date,
+                  concurrency: int, max_rps: float, stop_after: float = 0.0) -> dict:
+    sched = IntradayScheduler(outdir, workdir, "x", d0, d1, concurrency, max_rps, api_base, status_every=1.0)
+
+    async def go():
+        if stop_after:
+            asyncio.get_running_loop().call_later(stop_after, sched.request_stop)
+        return await sched.run(tickers)
+    return asyncio.run(go())
+
+def read_all(root: Path) -> dict:
+    return {p.relative_to(root).as_posix(): pl.read_parquet(p) for p in sorted(root.rglob("minute.parquet"))}
+
+def main():
+    ap = argparse.ArgumentParser(description="Throughput shards vs scheduler en un proceso (servidor local)")
+    ap.add_argument("--tickers", type=int, default=24)
+    ap.add_argument("--months", type=int, default=12)
+    ap.add_argument("--bars-per-day", type=int, default=400)
+    ap.add_argument("--latency-ms", type=float, default=30.0)
+    ap.add_argument("--shards", type=int, default=4)
+    ap.add_argument("--rate-limit", type=float, default=0.125, help="[shards] segundos entre paginas")
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--max-rps", type=float, default=80.0)
+    ap.add_argument("--port", type=int, default=8766)
+    args = ap.parse_args()
+
+    d0 = dt.date(2024, 1, 1)
+    d1 = (dt.date(2024 + args.months // 12, args.months % 12 + 1, 1) - dt.timedelta(days=1))
+    tickers = [f"T{i:03d}" for i in range(args.tickers)]
+    api_base = f"http://127.0.0.1:{args.port}"
+    srv = subprocess.Popen([sys.executable, str(FAKE), "--port", str(args.port), "--latency-ms", str(args.latency_ms),
+                            "--bars-per-day", str(args.bars_per_day)], stdout=subprocess.DEVNULL)
+    time.sleep(1.5)
+    ok = True
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            t_old = run_shards(api_base, tickers, tmp / "old", d0.isoformat(), d1.isoformat(), args.shards,
+                               args.rate_limit)
+            old = read_all(tmp / "old")
+            rows = sum(df.height for df in old.values())
+            log(f"shards    ({args.shards} procesos, {args.rate_limit}s/pagina): {rows:,} filas en {t_old:6.2f}s "
+                f"-> {rows / t_old:10,.0f} filas/s")
+
+            st = run_scheduler(api_base, tickers, tmp / "new", tmp / "run", d0, d1, args.concurrency, args.max_rps)
+            new = read_all(tmp / "new")
+            same = old.keys() == new.keys() and all(old[k].equals(new[k]) for k in old)
+            ok &= same
+            log(f"scheduler (1 proceso, {args.concurrency} en vuelo, {args.max_rps} req/s): {st['rows']:,} filas en "
+                f"{st['elapsed_s']:6.2f}s -> {st['rows_per_s']:10,.0f} filas/s | x{t_old / st['elapsed_s']:.1f} | "
+                f"{st['requests']} peticiones | paridad {'OK' if same else 'FAIL'} ({len(new)} ficheros)")
+
+            # stop a mitad + resume por watermarks
+            part = run_scheduler(api_base, tickers, tmp / "resume", tmp / "run2", d0, d1, args.concurrency,
+                                 args.max_rps, stop_after=st["elapsed_s"] / 3)
+            wm = load_watermarks(tmp / "resume")
+            rest = run_scheduler(api_base, tickers, tmp / "resume", tmp / "run2", d0, d1, args.concurrency, args.max_rps)
+            res = read_all(tmp / "resume")
+            same = old.keys() == res.keys() and all(old[k].equals(res[k]) for k in old)
+            ok &= same and part["state"] == "stopped"
+            log(f"stop + resume: 1a corrida {part['state']} con {part['months']} meses ({len(wm)} tickers con "
+                f"watermark), resume {rest['months']} meses / {rest['requests']} peticiones | paridad "
+                f"{'OK' if same else 'FAIL'}")
+
+            again = run_scheduler(api_base, tickers, tmp / "new", tmp / "run", d0, d1, args.concurrency, args.max_rps)
+            ok &= again["requests"] == 0 and again["tickers_skipped"] == len(tickers)
+            log(f"re-run: {again['requests']} peticiones, {again['tickers_skipped']}/{len(tickers)} tickers al dia "
+                f"({WATERMARKS_FILE})")
+    finally:
+        srv.terminate()
+    if not ok:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+benchmark_minute_typed.py
+Paridad + benchmark del esquema tipado del almacen 1-min (minute_schema.py):
+
+  1. normalize_page: strftime a cadenas (anterior) vs aritmetica entera sobre t (date Date,
+     minute Datetime[ms], et_minute Int16). Paridad: mismas fechas/minutos formateados.
+  2. et_minute contra la tz database (convert_time_zone America/New_York), 2004-2025 cada 7 min.
+  3. Lectores: arbol 1-min sintetico con cadenas (make_tree de benchmark_daily_agg.py), migrado con
+     tools/migrate_minute_typed.py; daily_agg.daily_plan y la lectura de un dia de
+     build_dynamic_universe antes/despues de migrar. Paridad exacta de resultados.
+
+Uso:
+  python scripts/fase_B_ingesta_Daily_minut/benchmark_minute_typed.py --tickers 40 --months 24
+"""
+import argparse, datetime as dt, sys, tempfile, time
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+HERE = Path(__file__).resolve().parent
+sys.path[:0] = [str(HERE / "tools"), str(HERE.parent / "fase_C_ingesta_tiks")]
+
+from benchmark_daily_agg import make_tree
+from build_dynamic_universe import load_minute_for_day, month_paths_for_day
+from daily_agg import daily_plan, list_tickers
+from ingest_ohlcv_intraday_minute import normalize_page
+from migrate_minute_typed import list_minute_files, migrate_file
+from minute_schema import typed_columns
+
+def log(msg: str):
+    print(f"[{dt.datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
+
+def legacy_normalize_page(results: list, ticker: str) -> pl.DataFrame:
+    """normalize_page anterior: date/minute con strftime por fila"""
+    df = pl.from_dicts(results)
+    picks = {}
+    for col, typ in [("t", pl.Int64), ("o", pl.Float64), ("h", pl.Float64),
+                     ("l", pl.Float64), ("c", pl.Float64), ("v", pl.Float64),
+                     ("n", pl.Int64), ("vw", pl.Float64)]:
+        picks[col] = (df[col].cast(typ) if col in df.columns else pl.Series(name=col, values=[], dtype=typ))
+    out = pl.DataFrame(picks)
+    ts = pl.from_epoch(pl.col("t")/1000, time_unit="s")
+    return out.with_columns([
+        ts.dt.strftime("%Y-%m-%d").alias("date"),
+        ts.dt.strftime("%Y-%m-%d %H:%M").alias("minute"),
+        pl.lit(ticker).alias("ticker")
+    ]).select(["ticker","date","minute","t","o","h","l","c","v","n","vw"])
+
+def timed(fn, repeat: int = 1):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        el = time.perf_counter() - t0
+        best = el if best is None else min(best, el)
+    return out, best
+
+def bench_normalize(repeat: int) -> bool:
+    rng = np.random.default_rng(7)
+    t = np.sort(rng.integers(1_100_000_000_000, 1_760_000_000_000, 50_000)) // 60_000 * 60_000
+    c = rng.lognormal(1, 0.5, t.size)
+    results = pl.DataFrame({"t": t, "o": c, "h": c, "l": c, "c": c, "v": rng.lognormal(7, 1, t.size),
+                            "n": rng.integers(1, 50, t.size), "vw": c}).to_dicts()
+    old, t_old = timed(lambda: legacy_normalize_page(results, "TEST"), repeat)
+    new, t_new = timed(lambda: normalize_page(results, "TEST"), repeat)
+    _, t_noet = timed(lambda: normalize_page(results, "TEST", et_minute=False), repeat)
+    ok = (old["date"].equals(new["date"].dt.strftime("%Y-%m-%d"))
+          and old["minute"].equals(new["minute"].dt.strftime("%Y-%m-%d %H:%M")))
+    log(f"normalize_page (50k filas) paridad: {'OK' if ok else 'FAIL'} | strftime {t_old * 1e3:6.1f}ms | "
+        f"tipado {t_new * 1e3:6.1f}ms (sin et_minute {t_noet * 1e3:6.1f}ms)")
+    return ok
+
+def check_et_minute() -> bool:
+    ts = pl.datetime_range(dt.datetime(2004, 1, 1), dt.datetime(2026, 1, 1), "7m", eager=True, time_unit="ms")
+    df = pl.DataFrame({"t": ts.dt.epoch("ms")})
+    ours, t_ours = timed(lambda: df.select(typed_columns()[2]).to_series())
+    def reference():
+        et = ts.dt.replace_time_zone("UTC").dt.convert_time_zone("America/New_York")
+        return (et.dt.hour().cast(pl.Int32) * 60 + et.dt.minute()).cast(pl.Int16)
+    ref_min, t_ref = timed(reference)
+    ok = ours.equals(ref_min, check_names=False)
+    log(f"et_minute vs tz database ({df.height:,} instantes 2004-2025) paridad: {'OK' if ok else 'FAIL'} | "
+        f"aritmetico {t_ours * 1e3:.0f}ms | convert_time_zone {t_ref * 1e3:.0f}ms")
+    return ok
+
+def bench_readers(n_tickers: int, n_months: int, repeat: int) -> bool:
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        rows = make_tree(root, n_tickers, n_months)
+        tickers = list_tickers(root)
+        day = dt.date(2020 + (n_months - 1) // 12, (n_months - 1) % 12 + 1, 15)
+        while day.weekday() >= 5:
+            day -= dt.timedelta(days=1)
+        aggs = ["o", "h", "l", "c", "v", "n", "dollar_vw", "session_rows"]
+        run_daily = lambda: daily_plan(root, tickers, aggs).collect()
+        run_range = lambda: daily_plan(root, tickers, aggs, day, day + dt.timedelta(days=7)).collect()
+        run_day = lambda: load_minute_for_day(month_paths_for_day(root, day), day).sort(["ticker", "t"])
+        daily_old, t_daily_old = timed(run_daily, repeat)
+        day_old, t_day_old = timed(run_day, repeat)
+        range_old, t_range_old = timed(run_range, repeat)
+
+        files = list_minute_files(root)
+        status, t_mig = timed(lambda: [migrate_file(p, True, False) for p in files])
+        ok_mig = all(s == "migrated" for s in status)
+        log(f"Migracion: {len(files):,} ficheros, {rows:,} filas en {t_mig:.2f}s "
+            f"({'OK' if ok_mig else 'ERRORES'})")
+
+        daily_new, t_daily_new = timed(run_daily, repeat)
+        day_new, t_day_new = timed(run_day, repeat)
+        range_new, t_range_new = timed(run_range, repeat)
+        ok_daily = daily_old.equals(daily_new) and range_old.equals(range_new)
+        ok_day = day_old.drop("minute").equals(day_new.select(day_old.columns).drop("minute"))
+        log(f"daily_plan ({n_tickers} tickers x {n_months} meses) paridad: {'OK' if ok_daily else 'FAIL'} | "
+            f"cadenas {t_daily_old:.2f}s | tipado {t_daily_new:.2f}s | x{t_daily_old / t_daily_new:.1f} | "
+            f"1 semana: cadenas {t_range_old * 1e3:.0f}ms | tipado {t_range_new * 1e3:.0f}ms | "
+            f"x{t_range_old / t_range_new:.1f}")
+        log(f"load_minute_for_day({day}) paridad: {'OK' if ok_day else 'FAIL'} ({day_new.height:,} filas) | "
+            f"cadenas {t_day_old * 1e3:.0f}ms | tipado {t_day_new * 1e3:.0f}ms | x{t_day_old / t_day_new:.1f}")
+        return ok_mig and ok_daily and ok_day
+
+def main():
+    ap = argparse.ArgumentParser(description="Paridad + benchmark del esquema tipado 1-min")
+    ap.add_argument("--tickers", type=int, default=40)
+    ap.add_argument("--months", type=int, default=24)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    ok = bench_normalize(args.repeat)
+    ok &= check_et_minute()
+    ok &= bench_readers(args.tickers, args.months, args.repeat)
+    if not ok:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+benchmark_minute_writer.py
+Paridad + bytes escritos de la escritura por anio/mes de ingest_ohlcv_intraday_minute.py:
+
+  por pagina  (anterior) cada pagina de 50k filas lee+concatena+dedup+reescribe el minute.parquet de
+              cada mes que toca, con gc.collect() por pagina
+  MonthWriter (actual)   buffer por mes, una escritura al cruzar al mes siguiente; merge solo si el
+              fichero del mes ya existe, sin reescritura si el contenido no cambia
+
+Escenarios sobre un ticker sintetico (barras 1m ordenadas asc, paginas de PAGE_LIMIT filas):
+  rango  : una sola descarga de todo el rango (paginas que cruzan meses)
+  mensual: una descarga por mes, como main()
+  re-run : repetir la descarga del rango sobre los ficheros ya escritos (todo merge)
+
+Bytes escritos = wchar de /proc/self/io (todo lo que el proceso pasa a write(); incluye los .tmp).
+Paridad: mismos ficheros y mismo contenido que el camino anterior.
+
+Uso:
+  python scripts/fase_B_ingesta_Daily_minut/benchmark_minute_writer.py --years 20 --bars-per-day 400
+"""
+import argparse, datetime as dt, gc, tempfile, time
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+from ingest_ohlcv_intraday_minute import PAGE_LIMIT, MonthWriter, normalize_page
+
+def log(msg: str):
+    print(f"[{dt.datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
+
+def legacy_write_page_by_month(df: pl.DataFrame, outdir: Path, ticker: str) -> int:
+    """Camino anterior (write_page_by_month): read + concat + unique + rewrite por pagina y mes"""
+    if df.is_empty():
+        return 0
+    df = df.with_columns(pl.col("date").dt.strftime("%Y-%m").alias("ym"))   # date ya tipado
+    files = 0
+    for ym, part in df.group_by("ym"):
+        year, month = ym[0].split("-")
+        pdir = outdir / ticker / f"year={year}" / f"month={month}"
+        pdir.mkdir(parents=True, exist_ok=True)
+        outp = pdir / "minute.parquet"
+        part = part.drop("ym").sort(["date","minute"])
+        if outp.exists():
+            old = pl.read_parquet(outp)
+            merged = pl.concat([old, part], how="vertical_relaxed")\
+                       .unique(subset=["minute"], keep="last")\
+                       .sort(["date","minute"])
+            merged.write_parquet(outp, compression="zstd", compression_level=2, statistics=False)
+        else:
+            part.write_parquet(outp, compression="zstd", compression_level=2, statistics=False)
+        files += 1
+    return files
+
+def legacy_sink(pages, outdir: Path, ticker: str):
+    for df in pages:
+        legacy_write_page_by_month(df, outdir, ticker)
+        gc.collect()
+
+def buffered_sink(pages, outdir: Path, ticker: str):
+    w = MonthWriter(outdir, ticker)
+    for df in pages:
+        w.add(df)
+    w.close()
+
+def make_bars(years: int, bars_per_day: int, seed: int = 5) -> pl.DataFrame:
+    """Resultados /v2/aggs sinteticos (t, o, h, l, c, v, n, vw) en dias habiles, 04:00-20:00 ET aprox."""
+    rng = np.random.default_rng(seed)
+    d0 = dt.date(2025 - years, 1, 1)
+    days = [d0 + dt.timedelta(days=i) for i in range((dt.date(2025, 1, 1) - d0).days)]
+    epoch = dt.datetime(1970, 1, 1)
+    ts = []
+    for d in days:
+        if d.weekday() >= 5:
+            continue
+        base = int((dt.datetime(d.year, d.month, d.day, 9) - epoch).total_seconds() * 1000)
+        mins = np.sort(rng.choice(960, size=min(bars_per_day, 960), replace=False))
+        ts.append(base + mins.astype(np.int64) * 60_000)
+    t = np.concatenate(ts)
+    c = 2.0 * np.exp(np.cumsum(rng.normal(0, 0.002, t.size)))
+    return pl.DataFrame({"t": t, "o": c, "h": c * 1.001, "l": c * 0.999, "c": c,
+                         "v": rng.lognormal(7, 1, t.size).round(), "n": rng.integers(1, 50, t.size),
+                         "vw": c})
+
+def paginate(bars: pl.DataFrame, ticker: str):
+    return [normalize_page(bars.slice(i, PAGE_LIMIT).to_dicts(), ticker) for i in range(0, bars.height, PAGE_LIMIT)]
+
+def wchar() -> int:
+    try:
+        with open("/proc/self/io") as f:
+            return next(int(l.split()[1]) for l in f if l.startswith("wchar"))
+    except OSError:
+        return 0
+
+def measured(fn):
+    w0, t0 = wchar(), time.perf_counter()
+    fn()
+    return wchar() - w0, time.perf_counter() - t0
+
+def read_all(root: Path) -> dict:
+    return {p.relative_to(root).as_posix(): pl.read_parquet(p) for p in sorted(root.rglob("minute.parquet"))}
+
+def main():
+    ap = argparse.ArgumentParser(description="Paridad + bytes escritos del writer mensual de barras 1m")
+    ap.add_argument("--years", type=int, default=20)
+    ap.add_argument("--bars-per-day", type=int, default=400)
+    args = ap.parse_args()
+
+    ticker = "TEST"
+    bars = make_bars(args.years, args.bars_per_day)
+    pages = paginate(bars, ticker)
+    ym = bars.select(pl.from_epoch(pl.col("t"), time_unit="ms").dt.strftime("%Y-%m").alias("ym"))["ym"]
+    monthly = [paginate(bars.filter(ym == m), ticker) for m in ym.unique(maintain_order=True)]
+    log(f"Ticker sintetico: {bars.height:,} barras, {len(pages)} paginas de {PAGE_LIMIT:,} (rango), "
+        f"{len(monthly)} meses")
+
+    scenarios = [
+        ("rango", lambda sink, root: sink(pages, root, ticker), None),
+        ("mensual", lambda sink, root: [sink(p, root, ticker) for p in monthly], None),
+        ("re-run", lambda sink, root: sink(pages, root, ticker), lambda sink, root: sink(pages, root, ticker)),
+    ]
+    ok_all = True
+    for name, run, setup in scenarios:
+        res = {}
+        for label, sink in [("por pagina", legacy_sink), ("MonthWriter", buffered_sink)]:
+            with tempfile.TemporaryDirectory() as tmp:
+                root = Path(tmp)
+                if setup:
+                    setup(sink, root)
+                nbytes, secs = measured(lambda: run(sink, root))
+                res[label] = (nbytes, secs, read_all(root))
+        (b_old, t_old, f_old), (b_new, t_new, f_new) = res["por pagina"], res["MonthWriter"]
+        ok = f_old.keys() == f_new.keys() and all(f_old[k].equals(f_new[k]) for k in f_old)
+        ok_all &= ok
+        log(f"{name:8s} paridad: {'OK' if ok else 'FAIL'} ({len(f_new)} meses) | escrito por pagina "
+            f"{b_old / 2**20:8.1f} MiB {t_old:6.2f}s | MonthWriter {b_new / 2**20:8.1f} MiB {t_new:6.2f}s | "
+            + (f"bytes x{b_old / b_new:.1f}" if b_new else "sin reescrituras"))
+    if not ok_all:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
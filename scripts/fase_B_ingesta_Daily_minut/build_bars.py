@@ -331,9 +331,10 @@ def read_agg1m_fallback(agg1m_root: Path, ticker: str, date_from: str, date_to:
     if not dfs:
         return pl.DataFrame({"sip_ts": [], "price": [], "size": []})
 
+    # dia UTC de t (epoch ms) por aritmetica entera, comparado como Date (sin strftime por fila)
+    day = (pl.col("sip_ts") // 86_400_000).cast(pl.Int32).cast(pl.Date)
     trades = pl.concat(dfs, how="vertical_relaxed").filter(
-        (pl.from_epoch(pl.col("sip_ts") / 1000, time_unit="ms").dt.strftime("%Y-%m-%d") >= date_from) &
-        (pl.from_epoch(pl.col("sip_ts") / 1000, time_unit="ms").dt.strftime("%Y-%m-%d") <= date_to)
+        day.is_between(dt.date.fromisoformat(date_from), dt.date.fromisoformat(date_to))
     ).sort("sip_ts")
 
     return trades
@@ -4,9 +4,12 @@
 ingest_ohlcv_intraday_minute.py  (version STREAMING + MENSUAL + ZSTD + RL ADAPTATIVO)
 
 - Descarga OHLCV 1-min de Polygon paginando con cursor.
-- Escribe cada pagina directamente a disco por anio/mes (sin acumular en RAM).
+- Escribe por anio/mes con buffer: cada mes se escribe una vez al cruzar al mes siguiente
+  (MonthWriter; las paginas vienen en orden ascendente).
 - Usa requests.Session() con pool=3 (TLS estable) y SIN hilos internos.
-- Idempotente: mergea y deduplica por 'minute'.
+- Idempotente: si el mes ya existe en disco, mergea y deduplica por 'minute'.
+- Esquema tipado (minute_schema.py): date Date, minute Datetime[ms], et_minute Int16 (opcional),
+  calculados con aritmetica entera sobre t. Particiones antiguas: tools/migrate_minute_typed.py.
 - NUEVO: Descarga MENSUAL para reducir JSON gigante y pico de RAM.
 - NUEVO: Compresion ZSTD con level=2 para archivos mas pequenos.
 - NUEVO: Rate-limit ADAPTATIVO que se ajusta segun errores/exitos.
@@ -30,6 +33,8 @@ import polars as pl
 from dotenv import load_dotenv
 import certifi
 
+from minute_schema import ET_MINUTE_COL, MINUTE_COLUMNS, MINUTE_SCHEMA, empty_frame, to_typed, typed_columns
+
 # stdout/stderr UTF-8
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", errors="replace")
 sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8", errors="replace")
@@ -95,54 +100,88 @@ def http_get_json(session: requests.Session, url: str, params: Dict[str, Any], h
             time.sleep(sl)
     raise RuntimeError(f"Failed after {RETRY_MAX} attempts: {last_error}")
 
-def normalize_page(results: list, ticker: str) -> pl.DataFrame:
+def normalize_page(results: list, ticker: str, et_minute: bool = True) -> pl.DataFrame:
+    """Pagina /v2/aggs -> esquema tipado de minute_schema (date Date, minute Datetime, et_minute Int16)"""
     if not results:
-        return pl.DataFrame({"ticker":[], "date":[], "minute":[], "t":[], "o":[], "h":[], "l":[], "c":[], "v":[], "n":[], "vw":[]})
+        return empty_frame(et_minute)
     df = pl.from_dicts(results)
     # columnas esperadas de /v2/aggs: t, o, h, l, c, v, n, vw
     picks = {}
-    for col, typ in [("t", pl.Int64), ("o", pl.Float64), ("h", pl.Float64),
-                     ("l", pl.Float64), ("c", pl.Float64), ("v", pl.Float64),
-                     ("n", pl.Int64), ("vw", pl.Float64)]:
+    for col in ["t", "o", "h", "l", "c", "v", "n", "vw"]:
+        typ = MINUTE_SCHEMA[col]
         picks[col] = (df[col].cast(typ) if col in df.columns else pl.Series(name=col, values=[], dtype=typ))
     out = pl.DataFrame(picks)
     if out.height == 0:
-        return pl.DataFrame({"ticker":[], "date":[], "minute":[], "t":[], "o":[], "h":[], "l":[], "c":[], "v":[], "n":[], "vw":[]})
-    ts = pl.from_epoch(pl.col("t")/1000, time_unit="s")
-    out = out.with_columns([
-        ts.dt.strftime("%Y-%m-%d").alias("date"),
-        ts.dt.strftime("%Y-%m-%d %H:%M").alias("minute"),
-        pl.lit(ticker).alias("ticker")
-    ]).select(["ticker","date","minute","t","o","h","l","c","v","n","vw"])
-    return out
-
-def write_page_by_month(df: pl.DataFrame, outdir: Path, ticker: str) -> int:
-    """Escribe una pagina normalizada, particionando por anio/mes, merge idempotente."""
-    if df.is_empty():
-        return 0
-    df = df.with_columns(pl.col("date").str.slice(0,7).alias("ym"))
-    files = 0
-    for ym, part in df.group_by("ym"):
-        year, month = ym[0].split("-")
-        pdir = outdir / ticker / f"year={year}" / f"month={month}"
-        pdir.mkdir(parents=True, exist_ok=True)
-        outp = pdir / "minute.parquet"
-        part = part.drop("ym").sort(["date","minute"])
-        if outp.exists():
-            old = pl.read_parquet(outp)
-            merged = pl.concat([old, part], how="vertical_relaxed")\
-                       .unique(subset=["minute"], keep="last")\
-                       .sort(["date","minute"])
-            merged.write_parquet(outp, compression="zstd", compression_level=2, statistics=False)
-            del old, merged
-        else:
-            part.write_parquet(outp, compression="zstd", compression_level=2, statistics=False)
-        files += 1
-        del part
-    return files
+        return empty_frame(et_minute)
+    # date/minute por aritmetica entera sobre t (antes strftime por fila a cadenas)
+    cols = MINUTE_COLUMNS + ([ET_MINUTE_COL] if et_minute else [])
+    return out.with_columns(typed_columns(et_minute) + [pl.lit(ticker).alias("ticker")]).select(cols)
+
+def _write_month(df: pl.DataFrame, outp: Path) -> int:
+    """tmp + os.replace; devuelve bytes escritos"""
+    outp.parent.mkdir(parents=True, exist_ok=True)
+    tmp = outp.with_name(outp.name + ".tmp")
+    df.write_parquet(tmp, compression="zstd", compression_level=2, statistics=True)
+    os.replace(tmp, outp)
+    return outp.stat().st_size
+
+class MonthWriter:
+    """
+    Escritura por anio/mes con buffer: las paginas llegan ordenadas (sort=asc), asi que se acumulan
+    en RAM hasta que una pagina cruza al mes siguiente y entonces el mes se escribe UNA vez.
+    Antes cada pagina leia+concatenaba+reescribia el minute.parquet del mes (un mes partido en
+    varias paginas se reescribia varias veces).
+
+    Merge idempotente (dedup por 'minute', keep=last) solo si el fichero del mes ya existe
+    (re-descarga / extension de un mes); si el resultado es identico al fichero, no se reescribe.
+    Un fichero existente con date/minute en cadena se pasa al esquema tipado al mergear.
+    """
+
+    def __init__(self, outdir: Path, ticker: str, et_minute: bool = True):
+        self.outdir = outdir
+        self.ticker = ticker
+        self.et_minute = et_minute
+        self.ym: Optional[int] = None
+        self.parts: list = []
+        self.files = 0
+        self.bytes_written = 0
+
+    def add(self, df: pl.DataFrame) -> None:
+        if df.is_empty():
+            return
+        df = df.with_columns((pl.col("date").dt.year() * 100 + pl.col("date").dt.month()).alias("ym"))
+        for (ym,), part in sorted(df.group_by("ym"), key=lambda kv: kv[0]):
+            if ym != self.ym:
+                self.flush()
+                self.ym = ym
+            self.parts.append(part.drop("ym"))
+
+    def flush(self) -> None:
+        if self.ym is None or not self.parts:
+            self.ym, self.parts = None, []
+            return
+        outp = self.outdir / self.ticker / f"year={self.ym // 100}" / f"month={self.ym % 100:02d}" / "minute.parquet"
+        frames = self.parts
+        old = pl.read_parquet(outp) if outp.exists() else None
+        if old is not None:
+            new = to_typed(old, self.et_minute)
+            if ET_MINUTE_COL in new.columns and not self.et_minute:
+                frames = [to_typed(f) for f in frames]
+            frames = [new] + frames
+        merged = pl.concat(frames, how="vertical_relaxed")
+        if len(frames) > 1:
+            merged = merged.unique(subset=["minute"], keep="last")
+        merged = merged.sort(["date", "minute"])
+        if old is None or not merged.equals(old):
+            self.bytes_written += _write_month(merged, outp)
+            self.files += 1
+        self.ym, self.parts = None, []
+
+    def close(self) -> None:
+        self.flush()
 
 def fetch_and_stream_write(session: requests.Session, api_key: str, ticker: str, from_date: str, to_date: str,
-                           rate_limit_s_ref: Optional[float], outdir: Path) -> str:
+                           rate_limit_s_ref: Optional[float], outdir: Path, et_minute: bool = True) -> str:
     url = f"{BASE_URL}/v2/aggs/ticker/{ticker}/range/1/minute/{from_date}/{to_date}"
     headers = {"Authorization": f"Bearer {api_key}", "Accept": "application/json"}
     params = {"adjusted": str(ADJUSTED).lower(), "sort": "asc", "limit": PAGE_LIMIT}
@@ -150,7 +189,7 @@ def fetch_and_stream_write(session: requests.Session, api_key: str, ticker: str,
     cursor = None
     pages = 0
     rows_total = 0
-    files_total = 0
+    writer = MonthWriter(outdir, ticker, et_minute)
     # rate-limit adaptativo (compartido por llamada)
     cur_rl = rate_limit_s_ref if rate_limit_s_ref and rate_limit_s_ref > 0 else None
     ok_streak, err_streak = 0, 0
@@ -169,6 +208,7 @@ def fetch_and_stream_write(session: requests.Session, api_key: str, ticker: str,
             err_streak += 1; ok_streak = 0
             if cur_rl:
                 cur_rl = min(MAX_RL, cur_rl + 0.04)
+            writer.close()   # lo ya descargado queda en disco (merge idempotente al reintentar)
             # re-propaga para que quede registrado en results
             raise
 
@@ -176,22 +216,18 @@ def fetch_and_stream_write(session: requests.Session, api_key: str, ticker: str,
         pages += 1
         rows_total += len(results)
 
-        # normaliza y escribe esta pagina directamente
-        df_page = normalize_page(results, ticker)
-        files_total += write_page_by_month(df_page, outdir, ticker)
-
-        # Extraer cursor ANTES de deletear data
+        # normaliza y acumula; el writer escribe cada mes al cruzar al siguiente
+        writer.add(normalize_page(results, ticker, et_minute))
         cursor = parse_next_cursor(data.get("next_url")) if data else None
-
-        del df_page, results, data
-        gc.collect()
+        del results, data
 
         if not cursor:
             break
         if cur_rl and cur_rl > 0:
             time.sleep(cur_rl)
 
-    return f"{ticker}: {rows_total:,} rows, {files_total} files ({pages} pages) [1m]"
+    writer.close()
+    return f"{ticker}: {rows_total:,} rows, {writer.files} files ({pages} pages) [1m]"
 
 def main():
     ap = argparse.ArgumentParser(description="Descarga OHLCV 1-min (streaming por pagina, sin acumulacion en RAM)")
@@ -204,6 +240,7 @@ def main():
                     help="Max. tickers que procesara este proceso antes de salir (libera RAM). 0=sin limite")
     # (Compatibilidad) Aceptamos --max-workers pero lo ignoramos adrede:
     ap.add_argument("--max-workers", type=int, default=1, help="(IGNORADO) Paralelismo lo maneja el launcher.")
+    ap.add_argument("--no-et-minute", action="store_true", help="No escribir la columna et_minute (minuto ET, Int16)")
     args = ap.parse_args()
 
     api_key = os.getenv("POLYGON_API_KEY")
@@ -252,7 +289,7 @@ def main():
                 res = fetch_and_stream_write(
                     session, api_key, t,
                     start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"),
-                    rate_limit, outdir
+                    rate_limit, outdir, et_minute=not args.no_et_minute
                 )
                 # recolecta contadores para el resumen por ticker
                 # "TICKER: X rows, Y files (Z pages) [1m]"
@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+intraday_scheduler.py  (sustituye a tools/launch_intraday_smallcaps.py y tools/batch_intraday_wrapper.py)
+
+Descarga OHLCV 1-min de muchos tickers en UN proceso, con el mismo layout y esquema que
+ingest_ohlcv_intraday_minute.py ({outdir}/{TICKER}/year=YYYY/month=MM/minute.parquet):
+
+- asyncio + aiohttp: --concurrency tickers en vuelo sobre un unico pool HTTP keep-alive.
+- Presupuesto global de peticiones (--max-rps) con el TokenBucket de polygon_async.py (fase_C):
+  un 429 reduce la tasa y pausa el bucket; se recupera con cada respuesta OK. Sin sleeps por pagina.
+- Memoria acotada por worker: cada ticker avanza mes a mes (paginas sort=asc) y solo tiene en RAM
+  la pagina en curso + el buffer del mes (MonthWriter). Decode y escritura fuera del event loop.
+- Watermarks por ticker en {outdir}/_watermarks.json: {ticker: {"from": "YYYY-MM-DD", "through":
+  "YYYY-MM-DD", "month": "YYYY-MM"}} = tramo contiguo ya escrito y ultimo mes completado. Resume
+  real: cada ticker solo pide los meses fuera del tramo (no "existe la carpeta del ticker"); un mes
+  que quedo parcial (--to a mitad de mes) se vuelve a pedir y MonthWriter mergea.
+- Estado en vivo: {workdir}/status.json (reescrito cada --status-every s; tmp + os.replace) y,
+  opcional, GET http://127.0.0.1:{--status-port}/status con el mismo JSON.
+- stop: SIGTERM al pid de status.json; los workers terminan el mes en curso y se guardan watermarks.
+
+Uso:
+  export POLYGON_API_KEY=xxx
+  python intraday_scheduler.py start \
+    --tickers-csv processed/universe/cs_xnas_xnys_under2b_2025-10-21.csv \
+    --outdir raw/polygon/ohlcv_intraday_1m \
+    --from 2004-01-01 --to 2025-10-21 \
+    --workdir runs/intraday_1m_2025-10-21 \
+    --concurrency 16 --max-rps 80
+  python intraday_scheduler.py status --workdir runs/intraday_1m_2025-10-21
+  python intraday_scheduler.py stop   --workdir runs/intraday_1m_2025-10-21
+
+Contra el servidor local: --api-base http://127.0.0.1:8765 (fase_C_ingesta_tiks/fake_polygon_server.py).
+"""
+from __future__ import annotations
+import argparse, asyncio, json, os, signal, ssl, sys, time, datetime as dt
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+import certifi
+import orjson
+import polars as pl
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "fase_C_ingesta_tiks"))
+from polygon_async import TokenBucket
+
+from ingest_ohlcv_intraday_minute import ADJUSTED, BASE_URL, PAGE_LIMIT, MonthWriter, normalize_page, parse_next_cursor
+
+WATERMARKS_FILE = "_watermarks.json"
+STATUS_FILE = "status.json"
+TIMEOUT = aiohttp.ClientTimeout(sock_connect=10, sock_read=60)
+MAX_RETRIES = 8
+
+def log(msg: str) -> None:
+    print(f"[{dt.datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
+
+def month_spans(date_from: dt.date, date_to: dt.date) -> List[Tuple[dt.date, dt.date]]:
+    """[(primer dia, ultimo dia)] de cada mes de [date_from, date_to], recortado al rango"""
+    out, (y, m) = [], (date_from.year, date_from.month)
+    while (y, m) <= (date_to.year, date_to.month):
+        nxt = dt.date(y + 1, 1, 1) if m == 12 else dt.date(y, m + 1, 1)
+        out.append((max(dt.date(y, m, 1), date_from), min(nxt - dt.timedelta(days=1), date_to)))
+        y, m = nxt.year, nxt.month
+    return out
+
+def load_watermarks(outdir: Path) -> Dict[str, dict]:
+    p = outdir / WATERMARKS_FILE
+    return json.loads(p.read_text(encoding="utf-8")) if p.exists() else {}
+
+def write_json(path: Path, obj: dict) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
+    os.replace(tmp, path)
+
+def pending_spans(spans: List[Tuple[dt.date, dt.date]], wm: Optional[dict]) -> List[Tuple[dt.date, dt.date]]:
+    """Meses aun no cubiertos por el tramo del watermark (el ultimo se repite si quedo parcial)"""
+    if not wm:
+        return spans
+    lo, hi = dt.date.fromisoformat(wm["from"]), dt.date.fromisoformat(wm["through"])
+    return [(a, b) for a, b in spans if not (lo <= a and b <= hi)]
+
+def extend_watermark(wm: Optional[dict], a: dt.date, b: dt.date) -> Optional[dict]:
+    """Une [a, b] (escrito en esta corrida, contiguo) al tramo del watermark; None si no lo toca"""
+    if wm is None:
+        return {"from": a.isoformat(), "through": b.isoformat(), "month": f"{b:%Y-%m}"}
+    lo, hi = dt.date.fromisoformat(wm["from"]), dt.date.fromisoformat(wm["through"])
+    if a > hi + dt.timedelta(days=1) or b < lo - dt.timedelta(days=1):
+        return None   # hueco: backfill anterior al tramo que aun no lo alcanza
+    hi = max(hi, b)
+    return {"from": min(lo, a).isoformat(), "through": hi.isoformat(), "month": f"{hi:%Y-%m}"}
+
+class IntradayScheduler:
+    def __init__(self, outdir: Path, workdir: Path, api_key: str, date_from: dt.date, date_to: dt.date,
+                 concurrency: int, max_rps: float, api_base: str = BASE_URL, et_minute: bool = True,
+                 status_every: float = 5.0, status_port: int = 0):
+        self.outdir = outdir
+        self.workdir = workdir
+        self.api_key = api_key
+        self.spans = month_spans(date_from, date_to)
+        self.date_from, self.date_to = date_from, date_to
+        self.concurrency = concurrency
+        self.api_base = api_base.rstrip("/")
+        self.et_minute = et_minute
+        self.status_every = status_every
+        self.status_port = status_port
+        self.bucket = TokenBucket(max_rps)
+        self.watermarks = load_watermarks(outdir)
+        self.stopping = False
+        self.started = time.time()
+        self.stats = {"requests": 0, "pages": 0, "rows": 0, "months": 0, "files": 0, "bytes_written": 0,
+                      "tickers_done": 0, "tickers_skipped": 0, "tickers_error": 0}
+        self.active: Dict[str, str] = {}     # ticker -> mes en curso
+        self.errors: Dict[str, str] = {}
+        self.n_tickers = 0
+
+    # ---------- HTTP ----------
+    async def fetch_page(self, session: aiohttp.ClientSession, url: str, params: dict, label: str) -> dict:
+        for attempt in range(MAX_RETRIES):
+            if attempt and self.stopping:
+                raise RuntimeError(f"{label}: stop durante reintentos")   # el mes queda pendiente
+            await self.bucket.acquire()
+            self.stats["requests"] += 1
+            try:
+                async with session.get(url, params=params) as r:
+                    if r.status == 429:
+                        ra = r.headers.get("Retry-After")
+                        self.bucket.on_429(float(ra) if ra and ra.replace(".", "", 1).isdigit() else None)
+                        continue
+                    if r.status >= 500:
+                        sl = min(30.0, 0.5 * 2 ** attempt)
+                        log(f"{label}: HTTP {r.status} -> sleep {sl}s")
+                        await asyncio.sleep(sl); continue
+                    r.raise_for_status()
+                    body = await r.read()
+                    self.bucket.on_success()
+                    return await asyncio.to_thread(orjson.loads, body)
+            except aiohttp.ClientResponseError:
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                sl = min(30.0, 0.5 * 2 ** attempt)
+                log(f"{label}: NET {type(e).__name__} {e} -> sleep {sl}s")
+                await asyncio.sleep(sl)
+        raise RuntimeError(f"{label}: agotados {MAX_RETRIES} reintentos")
+
+    async def ingest_month(self, session: aiohttp.ClientSession, ticker: str, a: dt.date, b: dt.date,
+                           writer: MonthWriter) -> None:
+        url = f"{self.api_base}/v2/aggs/ticker/{ticker}/range/1/minute/{a.isoformat()}/{b.isoformat()}"
+        base = {"adjusted": str(ADJUSTED).lower(), "sort": "asc", "limit": PAGE_LIMIT, "apiKey": self.api_key}
+        label = f"{ticker} {a:%Y-%m}"
+        cursor = None
+        while True:
+            params = dict(base, cursor=cursor) if cursor else base
+            data = await self.fetch_page(session, url, params, label)
+            results = data.get("results") or []
+            self.stats["pages"] += 1
+            self.stats["rows"] += len(results)
+            if results:
+                await asyncio.to_thread(lambda: writer.add(normalize_page(results, ticker, self.et_minute)))
+            cursor = parse_next_cursor(data.get("next_url"))
+            if not cursor:
+                break
+
+    async def ingest_ticker(self, session: aiohttp.ClientSession, ticker: str) -> str:
+        todo = pending_spans(self.spans, self.watermarks.get(ticker))
+        if not todo:
+            return "skip"
+        writer = MonthWriter(self.outdir, ticker, self.et_minute)
+        files0, bytes0 = 0, 0
+        run_from = prev_b = None   # tramo contiguo escrito en esta corrida
+        try:
+            for a, b in todo:
+                if self.stopping:
+                    return "stopped"
+                self.active[ticker] = f"{a:%Y-%m}"
+                await self.ingest_month(session, ticker, a, b, writer)
+                await asyncio.to_thread(writer.flush)
+                if prev_b is None or a > prev_b + dt.timedelta(days=1):
+                    run_from = a
+                prev_b = b
+                wm = extend_watermark(self.watermarks.get(ticker), run_from, b)
+                if wm is not None:
+                    self.watermarks[ticker] = wm
+                self.stats["months"] += 1
+                self.stats["files"] += writer.files - files0
+                self.stats["bytes_written"] += writer.bytes_written - bytes0
+                files0, bytes0 = writer.files, writer.bytes_written
+            return "done"
+        finally:
+            self.active.pop(ticker, None)
+
+    # ---------- estado ----------
+    def status(self) -> dict:
+        el = max(time.time() - self.started, 1e-9)
+        return {
+            "pid": os.getpid(), "state": "stopping" if self.stopping else "running",
+            "started": dt.datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+            "updated": dt.datetime.now().isoformat(timespec="seconds"), "elapsed_s": round(el, 1),
+            "range": [self.date_from.isoformat(), self.date_to.isoformat()], "outdir": str(self.outdir),
+            "tickers_total": self.n_tickers, **self.stats,
+            "rows_per_s": round(self.stats["rows"] / el, 1), "req_per_s": round(self.stats["requests"] / el, 2),
+            "bucket_rate": round(self.bucket.rate, 2), "n_429": self.bucket.n_429,
+            "active": dict(sorted(self.active.items())), "errors": self.errors,
+        }
+
+    def save_state(self, st: dict) -> None:
+        write_json(self.outdir / WATERMARKS_FILE, dict(sorted(self.watermarks.items())))
+        write_json(self.workdir / STATUS_FILE, st)
+
+    async def status_loop(self):
+        while True:
+            await asyncio.sleep(self.status_every)
+            st = self.status()
+            self.save_state(st)
+            log(f"Progreso: {st['tickers_done'] + st['tickers_skipped'] + st['tickers_error']}/{st['tickers_total']} "
+                f"tickers | {st['rows']:,} filas ({st['rows_per_s']:,.0f}/s) | {st['req_per_s']} req/s "
+                f"(bucket {st['bucket_rate']}, 429s: {st['n_429']}) | activos {len(st['active'])}")
+
+    async def status_server(self):
+        from aiohttp import web
+        app = web.Application()
+        app.router.add_get("/status", lambda request: web.json_response(self.status()))
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", self.status_port).start()
+        log(f"Status en http://127.0.0.1:{self.status_port}/status")
+        return runner
+
+    # ---------- bucle principal ----------
+    async def run(self, tickers: List[str]) -> dict:
+        self.n_tickers = len(tickers)
+        self.workdir.mkdir(parents=True, exist_ok=True)
+        self.outdir.mkdir(parents=True, exist_ok=True)
+        queue: asyncio.Queue = asyncio.Queue()
+        for t in tickers:
+            queue.put_nowait(t)
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.request_stop)
+            except (NotImplementedError, RuntimeError):
+                pass   # Windows: Ctrl+C corta con KeyboardInterrupt
+
+        ssl_ctx = ssl.create_default_context(cafile=certifi.where()) if self.api_base.startswith("https") else None
+        connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=60, ssl=ssl_ctx)
+
+        async def worker(session):
+            while not self.stopping:
+                try:
+                    ticker = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    res = await self.ingest_ticker(session, ticker)
+                except Exception as e:
+                    if self.stopping:
+                        res = "stopped"
+                    else:
+                        res = "error"
+                        self.errors[ticker] = str(e)
+                        log(f"{ticker}: ERROR {e}")
+                if res == "done":
+                    self.stats["tickers_done"] += 1
+                elif res == "skip":
+                    self.stats["tickers_skipped"] += 1
+                elif res == "error":
+                    self.stats["tickers_error"] += 1
+
+        reporter = asyncio.create_task(self.status_loop())
+        runner = await self.status_server() if self.status_port else None
+        try:
+            async with aiohttp.ClientSession(connector=connector, timeout=TIMEOUT) as session:
+                await asyncio.gather(*(worker(session) for _ in range(max(1, self.concurrency))))
+        finally:
+            reporter.cancel()
+            if runner is not None:
+                await runner.cleanup()
+            st = self.status()
+            st["state"] = "stopped" if self.stopping else "finished"
+            self.save_state(st)
+        return st
+
+    def request_stop(self):
+        if not self.stopping:
+            log("Stop solicitado: se termina el mes en curso de cada ticker y se guardan watermarks")
+        self.stopping = True
+
+# ---------------------- comandos ----------------------
+def cmd_start(args) -> None:
+    api_key = os.getenv("POLYGON_API_KEY")
+    if not api_key:
+        sys.exit("ERROR: variable POLYGON_API_KEY no establecida")
+    tickers = pl.read_csv(args.tickers_csv)["ticker"].drop_nulls().unique().sort().to_list()
+    sched = IntradayScheduler(
+        Path(args.outdir), Path(args.workdir), api_key,
+        dt.date.fromisoformat(args.date_from), dt.date.fromisoformat(args.date_to),
+        args.concurrency, args.max_rps, args.api_base, not args.no_et_minute,
+        args.status_every, args.status_port,
+    )
+    log(f"Tickers: {len(tickers):,} | {args.date_from} -> {args.date_to} | concurrency={args.concurrency} | "
+        f"max_rps={args.max_rps} | watermarks previos: {len(sched.watermarks):,}")
+    st = asyncio.run(sched.run(tickers))
+    log(f"{st['state'].upper()}: {st['tickers_done']:,} completados, {st['tickers_skipped']:,} ya al dia, "
+        f"{st['tickers_error']:,} con error | {st['rows']:,} filas en {st['elapsed_s']:.0f}s "
+        f"({st['rows_per_s']:,.0f} filas/s, {st['req_per_s']} req/s, 429s: {st['n_429']})")
+    if st["tickers_error"]:
+        sys.exit(1)
+
+def cmd_status(args) -> None:
+    p = Path(args.workdir) / STATUS_FILE
+    if not p.exists():
+        log("No hay status.json (¿ejecutaste start?).")
+        return
+    print(p.read_text(encoding="utf-8"))
+
+def cmd_stop(args) -> None:
+    p = Path(args.workdir) / STATUS_FILE
+    if not p.exists():
+        log("No hay status.json (¿ejecutaste start?).")
+        return
+    st = json.loads(p.read_text(encoding="utf-8"))
+    if st.get("state") not in ("running", "stopping"):
+        log(f"El scheduler no esta en marcha (state={st.get('state')}).")
+        return
+    os.kill(int(st["pid"]), signal.SIGTERM)
+    log(f"SIGTERM enviado a PID {st['pid']}: termina el mes en curso y guarda watermarks.")
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Scheduler intradia 1m en un proceso (pool HTTP + presupuesto global)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    aps = sub.add_parser("start", help="Iniciar / reanudar descarga")
+    aps.add_argument("--tickers-csv", required=True, help="CSV con columna 'ticker'")
+    aps.add_argument("--outdir", required=True, help="raw/polygon/ohlcv_intraday_1m")
+    aps.add_argument("--from", dest="date_from", required=True, help="YYYY-MM-DD")
+    aps.add_argument("--to", dest="date_to", required=True, help="YYYY-MM-DD")
+    aps.add_argument("--workdir", required=True, help="Directorio de corrida (status.json)")
+    aps.add_argument("--concurrency", type=int, default=16, help="Tickers en vuelo (= conexiones del pool)")
+    aps.add_argument("--max-rps", type=float, default=80.0, help="Presupuesto global de peticiones/seg")
+    aps.add_argument("--api-base", default=BASE_URL, help="Base URL (p.ej. fake_polygon_server.py local)")
+    aps.add_argument("--no-et-minute", action="store_true", help="No escribir la columna et_minute")
+    aps.add_argument("--status-every", type=float, default=5.0, help="Segundos entre escrituras de status.json")
+    aps.add_argument("--status-port", type=int, default=0, help="Puerto del endpoint GET /status (0 = sin endpoint)")
+
+    for name, help_ in [("status", "Ver status.json"), ("stop", "Parar (SIGTERM al pid de status.json)")]:
+        sp = sub.add_parser(name, help=help_)
+        sp.add_argument("--workdir", required=True, help="Directorio de corrida")
+    return ap.parse_args()
+
+def main():
+    args = parse_args()
+    {"start": cmd_start, "status": cmd_status, "stop": cmd_stop}[args.cmd](args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+minute_schema.py
+Esquema tipado del almacen 1-min ({outdir}/{TICKER}/year=YYYY/month=MM/minute.parquet).
+
+Antes date/minute eran cadenas (strftime '%Y-%m-%d' / '%Y-%m-%d %H:%M' de cada timestamp) y los
+lectores volvian a parsearlas. Ahora se derivan de t (epoch ms) con aritmetica entera:
+
+  date       Date          dia UTC de t (mismo valor que la cadena anterior)
+  minute     Datetime[ms]  t truncado al minuto (UTC, sin zona; mismo valor que la cadena anterior)
+  et_minute  Int16         opcional: minuto del dia en hora de Nueva York (0..1439; sesion regular
+                           570..959). Offset ET por reglas DST de EEUU (tabla por anio), sin tz database
+
+Usado por ingest_ohlcv_intraday_minute.py (normalize_page / MonthWriter) y
+tools/migrate_minute_typed.py (migracion de particiones con cadenas).
+"""
+from __future__ import annotations
+import datetime as dt
+from typing import Dict, List
+
+import polars as pl
+
+MS_MINUTE = 60_000
+MS_DAY = 86_400_000
+ET_MINUTE_COL = "et_minute"
+
+MINUTE_SCHEMA = {"ticker": pl.Utf8, "date": pl.Date, "minute": pl.Datetime("ms"), "t": pl.Int64,
+                 "o": pl.Float64, "h": pl.Float64, "l": pl.Float64, "c": pl.Float64, "v": pl.Float64,
+                 "n": pl.Int64, "vw": pl.Float64}
+MINUTE_COLUMNS = list(MINUTE_SCHEMA)
+
+def _nth_sunday(year: int, month: int, n: int) -> dt.date:
+    """n-esimo domingo del mes (n=-1: ultimo)"""
+    if n > 0:
+        d = dt.date(year, month, 1)
+        return d + dt.timedelta(days=(6 - d.weekday()) % 7 + 7 * (n - 1))
+    d = (dt.date(year + 1, 1, 1) if month == 12 else dt.date(year, month + 1, 1)) - dt.timedelta(days=1)
+    return d - dt.timedelta(days=(d.weekday() + 1) % 7)
+
+def _epoch_ms(d: dt.date, hour_utc: int) -> int:
+    return ((d - dt.date(1970, 1, 1)).days * 24 + hour_utc) * 3_600_000
+
+def dst_bounds(year: int) -> tuple:
+    """[inicio, fin) del horario de verano de Nueva York en epoch ms UTC (cambio a las 02:00 locales)"""
+    if year >= 2007:
+        start, end = _nth_sunday(year, 3, 2), _nth_sunday(year, 11, 1)
+    else:
+        start, end = _nth_sunday(year, 4, 1), _nth_sunday(year, 10, -1)
+    return _epoch_ms(start, 7), _epoch_ms(end, 6)   # 02:00 EST = 07:00 UTC; 02:00 EDT = 06:00 UTC
+
+_DST: Dict[int, tuple] = {y: dst_bounds(y) for y in range(1970, 2101)}
+
+def et_minute_expr(t: pl.Expr) -> pl.Expr:
+    """Minuto del dia en ET (Int16) a partir de epoch ms UTC"""
+    year = (t // MS_DAY).cast(pl.Int32).cast(pl.Date).dt.year()
+    start = year.replace_strict({y: s for y, (s, _) in _DST.items()}, return_dtype=pl.Int64)
+    end = year.replace_strict({y: e for y, (_, e) in _DST.items()}, return_dtype=pl.Int64)
+    offset = pl.when((t >= start) & (t < end)).then(-4 * 3_600_000).otherwise(-5 * 3_600_000)
+    return (((t + offset) // MS_MINUTE) % 1440).cast(pl.Int16)
+
+def typed_columns(et_minute: bool = True) -> List[pl.Expr]:
+    """date / minute (/ et_minute) derivados de la columna t"""
+    t = pl.col("t")
+    cols = [(t // MS_DAY).cast(pl.Int32).cast(pl.Date).alias("date"),
+            (t - t % MS_MINUTE).cast(pl.Datetime("ms")).alias("minute")]
+    if et_minute:
+        cols.append(et_minute_expr(t).alias(ET_MINUTE_COL))
+    return cols
+
+def empty_frame(et_minute: bool = True) -> pl.DataFrame:
+    schema = dict(MINUTE_SCHEMA)
+    if et_minute:
+        schema[ET_MINUTE_COL] = pl.Int16
+    return pl.DataFrame(schema=schema)
+
+def is_typed(schema) -> bool:
+    return schema.get("date") == pl.Date and isinstance(schema.get("minute"), pl.Datetime)
+
+def to_typed(df: pl.DataFrame, et_minute: bool = True) -> pl.DataFrame:
+    """Particion con date/minute en cadena (o ya tipada) -> esquema tipado; date/minute salen de t"""
+    et = et_minute or ET_MINUTE_COL in df.columns
+    out = df.with_columns(typed_columns(et))
+    cols = [c for c in MINUTE_COLUMNS if c in out.columns] + ([ET_MINUTE_COL] if et else [])
+    extra = [c for c in df.columns if c not in cols]
+    return out.select([pl.col(c).cast(MINUTE_SCHEMA.get(c, pl.Int16)) for c in cols] + extra)
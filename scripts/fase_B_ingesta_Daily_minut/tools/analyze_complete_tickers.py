@@ -30,6 +30,9 @@ from collections import defaultdict, Counter
 import polars as pl
 import json
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from minute_schema import is_typed, to_typed
+
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", errors="replace")
 sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8", errors="replace")
 
@@ -73,6 +76,8 @@ def analyze_ticker_quality(datadir: Path, ticker: str) -> Dict:
 
             try:
                 df = pl.read_parquet(parquet_file)
+                if not is_typed(df.schema):
+                    df = to_typed(df, et_minute=False)   # particion sin migrar (date/minute en cadena)
                 if df.height > 0:
                     all_data.append(df)
                     files_read += 1
@@ -83,7 +88,7 @@ def analyze_ticker_quality(datadir: Path, ticker: str) -> Dict:
         return {"error": "No data found"}
 
     # Combine all data
-    full_df = pl.concat(all_data, how="vertical_relaxed")
+    full_df = pl.concat(all_data, how="diagonal_relaxed")
 
     # Quality metrics
     total_rows = full_df.height
@@ -125,15 +130,13 @@ def analyze_ticker_quality(datadir: Path, ticker: str) -> Dict:
     dates = sorted(full_df["date"].unique().to_list())
     gaps = []
     for i in range(len(dates) - 1):
-        current = dt.datetime.strptime(dates[i], "%Y-%m-%d").date()
-        next_date = dt.datetime.strptime(dates[i + 1], "%Y-%m-%d").date()
-        days_diff = (next_date - current).days
+        days_diff = (dates[i + 1] - dates[i]).days
 
         # If gap > 7 days (more than weekend), consider it a gap
         if days_diff > 7:
             gaps.append({
-                "from": dates[i],
-                "to": dates[i + 1],
+                "from": dates[i].isoformat(),
+                "to": dates[i + 1].isoformat(),
                 "days": days_diff
             })
 
@@ -115,7 +115,7 @@ def scan_ticker_data(datadir: Path, ticker: str) -> Dict[str, any]:
 
                     # Get date range
                     if "date" in df.columns:
-                        dates = df["date"].unique().sort()
+                        dates = df["date"].cast(pl.Date).unique().sort()   # Date o cadena sin migrar
                         file_min = dates.min()
                         file_max = dates.max()
 
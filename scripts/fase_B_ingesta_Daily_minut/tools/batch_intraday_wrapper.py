@@ -7,6 +7,9 @@ batch_intraday_wrapper.py  —  Micro-batches desechables, paralelismo estable.
 - Cada ingestor procesa su CSV secuencialmente y MUERE al terminar -> RAM y sockets se liberan.
 - Compatible con el ingestor "streaming" (sin hilos internos) que te pasé.
 
+NOTA: sustituido por intraday_scheduler.py (un proceso asyncio, presupuesto global de
+peticiones y watermarks por ticker). Se mantiene para corridas antiguas.
+
 Uso:
   export POLYGON_API_KEY=xxx
 
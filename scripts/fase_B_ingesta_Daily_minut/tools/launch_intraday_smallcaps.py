@@ -7,6 +7,9 @@ Launcher para descargar intradía 1m de Polygon con múltiple procesos (workers)
 sharding de tickers, control de ritmo (rate-limit) por worker, logs, PIDs,
 status y stop. Inspirado en 'launch_accelerated_0125s.py'.
 
+NOTA: sustituido por intraday_scheduler.py (un proceso asyncio, presupuesto global de
+peticiones y watermarks por ticker). Se mantiene para corridas antiguas.
+
 Uso típico:
   export POLYGON_API_KEY=xxx
 
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+migrate_minute_typed.py
+
+Migra las particiones 1-min existentes ({datadir}/{TICKER}/year=YYYY/month=MM/minute.parquet) del
+esquema con cadenas (date 'YYYY-MM-DD', minute 'YYYY-MM-DD HH:MM') al esquema tipado de
+minute_schema.py: date Date, minute Datetime[ms] y, salvo --no-et-minute, et_minute Int16.
+
+- date/minute se recalculan desde t (mismos valores que las cadenas) con aritmetica entera.
+- Ficheros ya tipados se saltan (solo se lee el esquema); se puede relanzar tras un corte.
+- Cada fichero: read -> to_typed -> comprobacion (mismas filas y mismo t) -> tmp + os.replace.
+- Hilos (--workers): polars libera el GIL al leer/escribir parquet.
+
+Uso:
+  python tools/migrate_minute_typed.py --datadir raw/polygon/ohlcv_intraday_1m --workers 4
+  python tools/migrate_minute_typed.py --datadir raw/polygon/ohlcv_intraday_1m --dry-run
+"""
+import os
+import sys
+import io
+import argparse
+import datetime as dt
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+import polars as pl
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from minute_schema import is_typed, to_typed
+
+def log(msg: str) -> None:
+    print(f"[{dt.datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
+
+def list_minute_files(datadir: Path, tickers: Optional[List[str]] = None) -> List[Path]:
+    tdirs = [datadir / t for t in tickers] if tickers else \
+        [Path(e.path) for e in os.scandir(datadir) if e.is_dir() and not e.name.startswith("_")]
+    out = []
+    for tdir in tdirs:
+        if tdir.is_dir():
+            out.extend(tdir.glob("year=*/month=*/minute.parquet"))
+    return sorted(out)
+
+def migrate_file(path: Path, et_minute: bool, dry_run: bool) -> str:
+    """'typed' (ya migrado), 'migrated' o 'error: ...'"""
+    try:
+        if is_typed(pl.read_parquet_schema(path)):
+            return "typed"
+        old = pl.read_parquet(path)
+        new = to_typed(old, et_minute)
+        if new.height != old.height or not new["t"].equals(old["t"].cast(pl.Int64)):
+            return "error: filas/t distintos tras convertir"
+        if not dry_run:
+            tmp = path.with_name(path.name + ".tmp")
+            new.write_parquet(tmp, compression="zstd", compression_level=2, statistics=True)
+            os.replace(tmp, path)
+        return "migrated"
+    except Exception as e:
+        return f"error: {e}"
+
+def main():
+    ap = argparse.ArgumentParser(description="Migra minute.parquet (date/minute en cadena) al esquema tipado")
+    ap.add_argument("--datadir", required=True, help="raw/polygon/ohlcv_intraday_1m")
+    ap.add_argument("--tickers-csv", default=None, help="CSV con columna 'ticker' (por defecto todos)")
+    ap.add_argument("--workers", type=int, default=4, help="Hilos de lectura/escritura")
+    ap.add_argument("--no-et-minute", action="store_true", help="No anadir la columna et_minute")
+    ap.add_argument("--dry-run", action="store_true", help="Convertir y comprobar sin escribir")
+    args = ap.parse_args()
+
+    datadir = Path(args.datadir)
+    tickers = pl.read_csv(args.tickers_csv)["ticker"].drop_nulls().unique().to_list() if args.tickers_csv else None
+    files = list_minute_files(datadir, tickers)
+    log(f"Ficheros minute.parquet: {len(files):,} en {datadir}{' (dry-run)' if args.dry_run else ''}")
+
+    counts = {"typed": 0, "migrated": 0, "error": 0}
+    errors = []
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        for i, (path, status) in enumerate(zip(files, pool.map(
+                lambda p: migrate_file(p, not args.no_et_minute, args.dry_run), files)), 1):
+            key = status.split(":")[0]
+            counts[key] += 1
+            if key == "error":
+                errors.append(f"{path}: {status}")
+            if i % 5000 == 0:
+                log(f"Progreso {i:,}/{len(files):,} {counts}")
+
+    for e in errors[:20]:
+        log(f"ERROR {e}")
+    log(f"Migrados: {counts['migrated']:,} | ya tipados: {counts['typed']:,} | errores: {counts['error']:,}")
+    if errors:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    # UTF-8 encoding (solo como script: migrate_file se importa desde benchmark_minute_typed.py)
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", errors="replace")
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8", errors="replace")
+    main()
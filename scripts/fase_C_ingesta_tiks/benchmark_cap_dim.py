@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+benchmark_cap_dim.py
+Paridad + benchmark del join market cap SCD-2 de build_daily_cache.py:
+
+  previo   por ticker: read_parquet de la dimensión entera + normalizar + join por ticker
+           + filtro effective_from <= trading_day < effective_to + sort + unique
+  cap_dim  prepare_cap_dim() una vez (Arrow IPC), CapDim.open() una vez por worker
+           (memory_map) + por ticker slice del índice + join_asof backward
+
+Universo sintético (no hay full-universe aquí): N tickers con su diario y una dimensión
+SCD-2 con periodos trimestrales sin solape (como build_market_cap_dim.py), con huecos al
+inicio (días sin periodo vigente) y tickers ausentes de la dimensión. Paridad: en los días
+que el previo conserva, market_cap_d idéntico; el resto de días, null en cap_dim.
+
+Uso:
+  python benchmark_cap_dim.py --tickers 3000 --days 1250
+"""
+from __future__ import annotations
+import argparse, datetime as dt, tempfile, time
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+from cap_dim import CapDim, prepare_cap_dim
+
+def log(msg: str):
+    print(f"[{dt.datetime.now():%H:%M:%S}] {msg}", flush=True)
+
+def make_universe(n_tickers: int, n_days: int, seed: int = 7):
+    """(daily, dim): diario ticker, trading_day, close_d y SCD-2 ticker, effective_from/to, market_cap"""
+    rng = np.random.default_rng(seed)
+    days = [d for d in pl.date_range(dt.date(2020, 1, 1), dt.date(2035, 1, 1), eager=True) if d.weekday() < 5][:n_days]
+    tickers = [f"T{i:05d}" for i in range(n_tickers)]
+    daily = pl.DataFrame({
+        "ticker": np.repeat(tickers, len(days)),
+        "trading_day": days * n_tickers,
+        "close_d": rng.lognormal(1.0, 0.5, n_tickers * len(days)),
+    })
+    # Periodos trimestrales; el primero empieza tarde en algunos tickers, 5% sin dimensión
+    quarters = pl.date_range(days[0], days[-1], interval="3mo", eager=True).to_list()
+    rows = []
+    for t in tickers:
+        if rng.random() < 0.05:
+            continue
+        q = quarters[rng.integers(0, 3):]
+        for i, start in enumerate(q):
+            end = q[i + 1] if i + 1 < len(q) else None      # último abierto (null)
+            rows.append((t, start, end, float(rng.lognormal(18, 1.5))))
+    dim = pl.DataFrame(rows, schema={"ticker": pl.Utf8, "effective_from": pl.Date,
+                                      "effective_to": pl.Date, "market_cap": pl.Float64}, orient="row")
+    return daily, dim
+
+def legacy_join(daily: pl.DataFrame, cap_parquet: Path) -> pl.DataFrame:
+    dim = pl.read_parquet(cap_parquet).select(["ticker", "effective_from", "effective_to", "market_cap"])
+    dim = dim.with_columns([
+        pl.col("effective_from").cast(pl.Date),
+        pl.col("effective_to").cast(pl.Date).fill_null(pl.date(2099, 12, 31)),
+    ])
+    return (
+        daily.join(dim, on="ticker", how="left")
+        .filter((pl.col("effective_from") <= pl.col("trading_day")) & (pl.col("trading_day") < pl.col("effective_to")))
+        .sort(["ticker", "trading_day", "effective_from"], descending=[False, False, True])
+        .unique(subset=["ticker", "trading_day"], keep="first")
+        .select([*(daily.columns), "market_cap"])
+        .rename({"market_cap": "market_cap_d"})
+    )
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+def main():
+    ap = argparse.ArgumentParser(description="Paridad + benchmark del lookup SCD-2 de market cap")
+    ap.add_argument("--tickers", type=int, default=3000)
+    ap.add_argument("--days", type=int, default=1250)
+    args = ap.parse_args()
+
+    daily, dim = make_universe(args.tickers, args.days)
+    per_ticker = daily.partition_by("ticker", maintain_order=True)
+    log(f"Universo: {len(per_ticker):,} tickers, {daily.height:,} ticker-días, {dim.height:,} periodos SCD-2")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cap_parquet = Path(tmp) / "market_cap_dim.parquet"
+        dim.write_parquet(cap_parquet)
+        ipc = Path(tmp) / "_cap_dim.arrow"
+
+        ref, t_old = timed(lambda: [legacy_join(d, cap_parquet) for d in per_ticker])
+
+        def run_new():
+            prepare_cap_dim(str(cap_parquet), ipc)
+            cap = CapDim.open(ipc)
+            return [cap.lookup(d) for d in per_ticker]
+        new, t_new = timed(run_new)
+        _, t_batch = timed(lambda: CapDim.open(ipc).lookup(daily))
+
+    ref = pl.concat(ref).sort(["ticker", "trading_day"])
+    new = pl.concat(new)
+    covered = new.join(ref.select(["ticker", "trading_day"]), on=["ticker", "trading_day"], how="semi")
+    uncovered = new.join(ref.select(["ticker", "trading_day"]), on=["ticker", "trading_day"], how="anti")
+    ok = (new.height == daily.height and covered.equals(ref)
+          and uncovered["market_cap_d"].null_count() == uncovered.height)
+
+    log(f"Paridad: {'OK' if ok else 'FAIL'} ({ref.height:,} días con periodo vigente; "
+        f"{uncovered.height:,} días sin periodo: antes eliminados, ahora market_cap_d null)")
+    log(f"previo (dimensión releída por ticker) {t_old:6.2f}s | cap_dim (1 lectura + asof por ticker) "
+        f"{t_new:6.2f}s | x{t_old / t_new:.1f}")
+    log(f"cap_dim join_asof by=ticker sobre todo el universo: {t_batch:.2f}s")
+    if not ok:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+benchmark_daily_agg.py
+Paridad + benchmark del motor único 1-min -> diario (daily_agg.py) contra las tres rutas previas:
+
+  legacy_rows   build_daily_ohlcv.py: por cada día, sort + un DataFrame de 1 fila con escalares
+                Python + concat (esperaba un fichero por día, creaba la fecha como pl.lit y o/c como
+                Series: no corría sobre el layout mensual; aquí se le pasa cada día y escalares)
+  legacy_1m     build_daily_ohlcv_from_1m.py: read_parquet de cada mes + concat + sort + group_by
+  legacy_cache  build_daily_cache.py: scan por meses + collect + group_by (close = último en fichero)
+
+Árbol 1-min sintético con el layout real ({TICKER}/year=YYYY/month=MM/minute.parquet, columnas de
+ingest_ohlcv_intraday_minute.py). Paridad: o/h/l/c/n/v/session_rows exactos; sumas float en
+dólares con tolerancia relativa 1e-12 (el orden de suma del group_by puede cambiar).
+
+Uso:
+  python benchmark_daily_agg.py --tickers 40 --months 12
+"""
+from __future__ import annotations
+import argparse, datetime as dt, tempfile, time
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+from build_daily_cache import aggregate_to_daily
+from daily_agg import aggregate_daily, daily_plan, list_tickers, minute_paths, scan_minutes
+
+def log(msg: str):
+    print(f"[{dt.datetime.now():%H:%M:%S}] {msg}", flush=True)
+
+def make_tree(root: Path, n_tickers: int, n_months: int, seed: int = 5) -> int:
+    """Escribe el árbol 1-min sintético; devuelve filas escritas"""
+    rng = np.random.default_rng(seed)
+    rows = 0
+    for i in range(n_tickers):
+        ticker = f"T{i:04d}"
+        for m in range(n_months):
+            y, mo = 2020 + m // 12, m % 12 + 1
+            days = [d for d in pl.date_range(dt.date(y, mo, 1), dt.date(y + mo // 12, mo % 12 + 1, 1),
+                                             eager=True)[:-1] if d.weekday() < 5]
+            # minutos por día variables (días con huecos, como small caps)
+            per_day = rng.integers(60, 391, len(days))
+            t0 = np.repeat([int(dt.datetime(d.year, d.month, d.day, 13, 30).timestamp() * 1000) for d in days], per_day)
+            t = t0 + np.concatenate([np.sort(rng.choice(390, k, replace=False)) for k in per_day]) * 60_000
+            n = len(t)
+            c = 3.0 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+            o = c * np.exp(rng.normal(0, 0.001, n))
+            df = pl.DataFrame({
+                "t": t, "o": o, "h": np.maximum(o, c) * 1.001, "l": np.minimum(o, c) * 0.999, "c": c,
+                "v": rng.integers(100, 50_000, n).astype(np.float64), "n": rng.integers(1, 200, n),
+                "vw": (o + c) / 2,
+            })
+            ts = pl.from_epoch(pl.col("t") / 1000, time_unit="s")
+            df = df.with_columns([
+                ts.dt.strftime("%Y-%m-%d").alias("date"),
+                ts.dt.strftime("%Y-%m-%d %H:%M").alias("minute"),
+                pl.lit(ticker).alias("ticker"),
+            ]).select(["ticker", "date", "minute", "t", "o", "h", "l", "c", "v", "n", "vw"])
+            pdir = root / ticker / f"year={y}" / f"month={mo:02d}"
+            pdir.mkdir(parents=True, exist_ok=True)
+            df.write_parquet(pdir / "minute.parquet", compression="zstd", compression_level=2, statistics=False)
+            rows += n
+    return rows
+
+# ---------- rutas previas ----------
+def legacy_rows(root: Path, ticker: str) -> pl.DataFrame:
+    df_list = []
+    for file in sorted((root / ticker).rglob("minute.parquet")):
+        for (date_str,), df_min in pl.read_parquet(file).group_by("date", maintain_order=True):
+            df_min = df_min.sort("t")
+            daily_row = {
+                "ticker": ticker,
+                # el original ponía pl.lit(date_str).str.to_date() (columna object: fallaba en el sort)
+                "date": dt.date.fromisoformat(date_str),
+                # el original usaba df_min[0]["o"] / df_min[-1]["c"] (Series de 1 elemento -> object)
+                "o": df_min["o"][0], "h": df_min["h"].max(), "l": df_min["l"].min(),
+                "c": df_min["c"][-1], "v": df_min["v"].sum(),
+            }
+            df_list.append(pl.DataFrame([daily_row]))
+    return pl.concat(df_list).sort("date")
+
+def legacy_1m(root: Path, ticker: str) -> pl.DataFrame:
+    df_all = pl.concat([pl.read_parquet(f) for f in (root / ticker).rglob("minute.parquet")])
+    return (
+        df_all.sort(["date", "t"]).group_by("date")
+        .agg([pl.col("o").first(), pl.col("h").max(), pl.col("l").min(), pl.col("c").last(),
+              pl.col("v").sum(), pl.col("n").sum(), (pl.col("v") * pl.col("c")).sum().alias("dollar")])
+        .with_columns([pl.lit(ticker).alias("ticker"), pl.col("date").str.to_date()])
+        .select(["ticker", "date", "o", "h", "l", "c", "v", "n", "dollar"]).sort("date")
+    )
+
+def legacy_cache(root: Path, ticker: str, date_from: dt.date, date_to: dt.date) -> pl.DataFrame:
+    df = (pl.scan_parquet(minute_paths(root, ticker, date_from, date_to))
+          .filter((pl.col("date") >= date_from.strftime("%Y-%m-%d")) & (pl.col("date") <= date_to.strftime("%Y-%m-%d")))
+          .select(["date", "c", "v", "vw", "n"]).collect()
+          .with_columns(pl.lit(ticker).alias("ticker"),
+                        pl.col("date").str.strptime(pl.Date, "%Y-%m-%d").alias("trading_day")))
+    return (
+        df.group_by(["ticker", "trading_day"])
+        .agg([pl.col("c").last().alias("close_d"), pl.col("v").sum().alias("vol_d"),
+              (pl.col("v") * pl.col("vw")).sum().alias("dollar_vol_d"), pl.col("n").count().alias("session_rows")])
+        .with_columns((pl.col("dollar_vol_d") / pl.when(pl.col("vol_d") > 0).then(pl.col("vol_d"))).alias("vwap_d"),
+                      (pl.col("session_rows") < 390).alias("has_gaps"))
+        .select(["ticker", "trading_day", "close_d", "vol_d", "dollar_vol_d", "vwap_d", "session_rows", "has_gaps"])
+        .sort(["ticker", "trading_day"])
+    )
+
+def same(a: pl.DataFrame, b: pl.DataFrame, approx: tuple = ()) -> bool:
+    if a.columns != b.columns or a.height != b.height:
+        return False
+    exact = [c for c in a.columns if c not in approx]
+    if not a.select(exact).equals(b.select(exact)):
+        return False
+    return all(((a[c] - b[c]).abs() <= 1e-12 * b[c].abs()).all() for c in approx)
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+def main():
+    ap = argparse.ArgumentParser(description="Paridad + benchmark del motor 1-min -> diario")
+    ap.add_argument("--tickers", type=int, default=40)
+    ap.add_argument("--months", type=int, default=12)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        n_rows = make_tree(root, args.tickers, args.months)
+        tickers = list_tickers(root)
+        lo, hi = dt.date(2020, 1, 1), dt.date(2099, 12, 31)
+        log(f"Árbol 1-min: {len(tickers)} tickers x {args.months} meses, {n_rows:,} minutos")
+
+        ohlcv = ["o", "h", "l", "c", "v"]
+        new_plan = lambda aggs: daily_plan(root, tickers, aggs).rename({"trading_day": "date"})
+
+        ref_rows, t_rows = timed(lambda: pl.concat([legacy_rows(root, t) for t in tickers]))
+        ref_1m, t_1m = timed(lambda: pl.concat([legacy_1m(root, t) for t in tickers]))
+        ref_cache, t_cache = timed(lambda: pl.concat([legacy_cache(root, t, lo, hi) for t in tickers]))
+
+        new_ohlcv, t_new_ohlcv = timed(lambda: new_plan(ohlcv).collect())
+        new_1m, t_new_1m = timed(lambda: new_plan(ohlcv + ["n", "dollar"]).collect())
+        new_cache, t_new_cache = timed(lambda: aggregate_to_daily(root, tickers, lo, hi).collect())
+        # Un group_by(ticker, día) sobre todos los minutos (aggregate_daily), como referencia
+        _, t_flat = timed(lambda: aggregate_daily(scan_minutes(root, tickers, lo, hi), ohlcv).collect())
+
+        checks = [
+            ("build_daily_ohlcv", same(ref_rows, new_ohlcv), t_rows, t_new_ohlcv),
+            ("build_daily_ohlcv_from_1m", same(ref_1m, new_1m, ("dollar",)), t_1m, t_new_1m),
+            ("build_daily_cache", same(ref_cache, new_cache, ("dollar_vol_d", "vwap_d")), t_cache, t_new_cache),
+        ]
+        ok_all = True
+        for name, ok, t_old, t_new in checks:
+            ok_all &= ok
+            log(f"{name:26s} paridad: {'OK' if ok else 'FAIL'} ({new_ohlcv.height:,} días) | "
+                f"previo {t_old:6.2f}s | motor (1 plan) {t_new:6.2f}s | x{t_old / t_new:.1f}")
+        log(f"group_by(ticker, día) plano sobre todos los minutos (OHLCV): {t_flat:.2f}s")
+    if not ok_all:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
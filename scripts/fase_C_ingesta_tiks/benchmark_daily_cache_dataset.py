@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+benchmark_daily_cache_dataset.py
+Paridad + benchmark de la vista por fecha del cache diario (daily_cache_dataset.py) en la construcción
+del universo (build_dynamic_universe_optimized: load_cache_for_range + cap + precio + info_rich):
+
+  previo   scan de todos los ticker=*/daily.parquet (sin estadísticas) + filtro de fechas
+  _by_date scan sólo de los meses del rango (year/month, estadísticas, ordenado por fecha)
+
+Cache sintético con el schema de build_daily_cache.py (N tickers x Y años de sesiones). Rangos:
+1 semana y el histórico completo. También mide la compactación completa y la de un EOD
+(append de 1 sesión en todos los tickers, como build_daily_cache --incremental).
+
+Uso:
+  python benchmark_daily_cache_dataset.py --tickers 3000 --years 20
+"""
+from __future__ import annotations
+import argparse, datetime as dt, tempfile, time
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+import build_dynamic_universe_optimized as bdu
+from daily_cache_dataset import BY_DATE_DIR, compact
+from market_calendar import sessions
+
+def log(msg: str):
+    print(f"[{dt.datetime.now():%H:%M:%S}] {msg}", flush=True)
+
+def ticker_frame(ticker: str, days: list, rng) -> pl.DataFrame:
+    n = len(days)
+    close = 3.0 * np.exp(np.cumsum(rng.normal(0, 0.04, n)))
+    vol = rng.lognormal(12, 1.2, n)
+    df = pl.DataFrame({"ticker": ticker, "trading_day": days, "close_d": close, "vol_d": vol,
+                       "dollar_vol_d": vol * close, "vwap_d": close * 0.999,
+                       "session_rows": rng.integers(50, 391, n), "market_cap_d": rng.lognormal(18, 1.5, n)})
+    return (
+        df.with_columns(pl.col("close_d").shift(1).alias("close_prev"),
+                        pl.col("vol_d").rolling_mean(window_size=30, min_periods=1).alias("vol_30s_ma"))
+        .with_columns(((pl.col("close_d") / pl.col("close_prev")) - 1.0).alias("pctchg_d"),
+                      (pl.col("close_d") / pl.col("close_prev")).log().alias("return_d"),
+                      (pl.col("vol_d") / pl.col("vol_30s_ma")).alias("rvol30"),
+                      (pl.col("session_rows") < 390).alias("has_gaps"))
+        .select(["ticker", "trading_day", "close_d", "vol_d", "dollar_vol_d", "vwap_d", "pctchg_d",
+                 "return_d", "rvol30", "session_rows", "has_gaps", "market_cap_d"])
+    )
+
+def write_ticker(root: Path, df: pl.DataFrame):
+    tdir = root / f"ticker={df['ticker'][0]}"
+    tdir.mkdir(parents=True, exist_ok=True)
+    df.write_parquet(tdir / "daily.parquet", compression="zstd", compression_level=2, statistics=False)
+    (tdir / "_SUCCESS").touch()
+
+def make_cache(root: Path, n_tickers: int, days: list, seed: int = 11) -> int:
+    """Cache por ticker; cada ticker cotiza desde una sesión aleatoria (listados nuevos)"""
+    rng = np.random.default_rng(seed)
+    rows = 0
+    for i in range(n_tickers):
+        start = int(rng.integers(0, len(days) // 2)) if i % 3 else 0
+        df = ticker_frame(f"T{i:05d}", days[start:], rng)
+        write_ticker(root, df)
+        rows += df.height
+    return rows
+
+def universe(cache_root: Path, date_from: dt.date, date_to: dt.date) -> pl.DataFrame:
+    """Pasos de build_dynamic_universe_optimized.main previos a escribir watchlists (umbrales default)"""
+    th = bdu.load_config(None)["thresholds"]
+    df = bdu.load_cache_for_range(cache_root, date_from, date_to)
+    df = bdu.apply_cap_filter(df, th["cap_max"])
+    df = df.filter((pl.col("close_d") >= th["min_price"]) & (pl.col("close_d") <= th["max_price"]))
+    return bdu.label_info_rich(df, th["rvol"], th["pctchg"], th["dvol"], th["min_price"], th["max_price"])
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+def main():
+    ap = argparse.ArgumentParser(description="Paridad + benchmark de la vista por fecha del cache diario")
+    ap.add_argument("--tickers", type=int, default=3000)
+    ap.add_argument("--years", type=int, default=20)
+    args = ap.parse_args()
+
+    bdu.log = lambda msg: None   # sin logs de la construcción dentro de los tiempos
+    days = sessions(dt.date(2025 - args.years, 1, 1), dt.date(2024, 12, 31))
+    eod_day = dt.date(2025, 1, 2)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        n_rows = make_cache(root, args.tickers, days)
+        log(f"Cache: {args.tickers:,} tickers x {len(days):,} sesiones, {n_rows:,} ticker-días")
+
+        week = (dt.date(2024, 6, 10), dt.date(2024, 6, 14))
+        hist = (days[0], days[-1])
+        before = {}
+        for name, (lo, hi) in [("1 semana", week), (f"{args.years} años", hist)]:
+            before[name] = timed(lambda: universe(root, lo, hi))
+
+        summary, t_full = timed(lambda: compact(root, full=True))
+        log(f"Compactación completa: {t_full:.2f}s {summary}")
+
+        ok_all = True
+        for name, (lo, hi) in [("1 semana", week), (f"{args.years} años", hist)]:
+            ref, t_old = before[name]
+            new, t_new = timed(lambda: universe(root, lo, hi))
+            key = ["ticker", "trading_day"]
+            ok = ref.sort(key).equals(new.sort(key))
+            ok_all &= ok
+            log(f"{name:9s} paridad: {'OK' if ok else 'FAIL'} ({new.height:,} filas) | ticker=* {t_old:6.2f}s | "
+                f"{BY_DATE_DIR} {t_new:6.2f}s | x{t_old / t_new:.1f}")
+
+        # EOD: 1 sesión nueva en todos los tickers, reescribiendo daily.parquet como el append
+        rng = np.random.default_rng(3)
+        for tdir in sorted(root.glob("ticker=*")):
+            df = pl.read_parquet(tdir / "daily.parquet")
+            write_ticker(root, pl.concat([df, ticker_frame(df["ticker"][0], [eod_day], rng)]))
+        summary, t_eod = timed(lambda: compact(root))
+        eod = universe(root, eod_day, eod_day)
+        ok = eod.height == bdu.apply_cap_filter(
+            pl.read_parquet(root / "ticker=*" / "daily.parquet").filter(pl.col("trading_day") == eod_day), 2e9
+        ).filter(pl.col("close_d").is_between(0.5, 20.0)).height
+        ok_all &= ok
+        log(f"Compactación EOD (append 1 sesión): {t_eod:.2f}s {summary} | paridad {'OK' if ok else 'FAIL'}")
+    if not ok_all:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+benchmark_page_decode.py
+Microbenchmark de decodificación de páginas Polygon v3 (trades / quotes):
+
+  legacy   : json.loads (lo que hace requests.Response.json) -> lista de dicts -> pl.from_records
+             -> rename + t_raw/t_unit por max() (camino anterior de to_parquet_trades/quotes)
+  records  : orjson.loads -> lista de dicts -> pl.from_records (decode_page_records, fallback)
+  typed    : pl.read_json con esquema declarado -> columnas tipadas (decode_page, camino por defecto)
+
+Páginas sintéticas de fake_polygon_server.rows_for_day. Antes de medir comprueba paridad de
+valores de typed/records contra legacy (mismas columnas comunes, mismos valores).
+
+Uso:
+  python scripts/fase_C_ingesta_tiks/benchmark_page_decode.py --rows 50000 --repeat 5
+"""
+import argparse, json, time
+from datetime import date, datetime, timedelta
+
+import polars as pl
+
+from fake_polygon_server import rows_for_day
+from polygon_parquet import PAGE_FIELDS, decode_page, decode_page_records, time_unit
+
+def log(msg: str):
+    print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
+
+def legacy_decode(body: bytes, kind: str) -> pl.DataFrame:
+    """Camino anterior: dicts + inferencia de esquema + renombrado (to_parquet_trades/to_parquet_quotes)."""
+    df = pl.from_records(json.loads(body)["results"])
+    mapping = {"sip_timestamp": "t"}
+    if kind == "trades":
+        mapping.update({"price": "p", "size": "s", "conditions": "c"})
+    df = df.rename({k: v for k, v in mapping.items() if k in df.columns})
+    df = df.with_columns(pl.col("t").cast(pl.Int64).alias("t_raw"))
+    return df.with_columns(pl.lit(time_unit(int(df["t_raw"].max()))).alias("t_unit")).drop("t")
+
+def make_page(kind: str, rows: int) -> bytes:
+    days = max(1, rows // 20_000)
+    recs = []
+    d = date(2024, 1, 2)
+    while len(recs) < rows:
+        if d.weekday() < 5:
+            recs.extend(rows_for_day(kind, "BENCH", d, rows // days))
+        d += timedelta(days=1)
+    return json.dumps({"status": "OK", "results": recs[:rows],
+                       "next_url": f"https://api.polygon.io/v3/{kind}/BENCH?cursor=abc"}).encode()
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter(); fn(); best = min(best, time.perf_counter() - t0)
+    return best
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark decodificación de páginas Polygon")
+    ap.add_argument("--rows", type=int, default=50_000, help="filas por página (page limit)")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    for kind in ("trades", "quotes"):
+        body = make_page(kind, args.rows)
+        ref = legacy_decode(body, kind)
+        out_names = {k: out for k, (out, _) in PAGE_FIELDS[kind].items()}
+        for name, fn in (("typed", decode_page), ("records", decode_page_records)):
+            page = fn(body, kind)
+            got = pl.from_arrow(page.table)
+            common = [c for c in got.columns if c in ref.columns and got[c].null_count() < got.height]
+            ok = page.cursor == "abc" and got.height == ref.height and got.select(common).equals(
+                ref.select(common).cast({c: got[c].dtype for c in common}))
+            log(f"{kind:6s} paridad {name:7s} vs legacy: {'OK' if ok else 'FAIL'} "
+                f"({len(common)} columnas comparadas de {len(out_names) + 1})")
+
+        mb = len(body) / 1e6
+        t_leg = best_of(lambda: legacy_decode(body, kind), args.repeat)
+        t_rec = best_of(lambda: decode_page_records(body, kind), args.repeat)
+        t_typ = best_of(lambda: decode_page(body, kind), args.repeat)
+        log(f"{kind:6s} página {args.rows:,} filas ({mb:.1f} MB) | legacy {t_leg*1e3:7.1f} ms | "
+            f"records {t_rec*1e3:7.1f} ms | typed {t_typ*1e3:7.1f} ms | "
+            f"speedup typed x{t_leg / t_typ:.1f} ({args.rows / t_typ / 1e6:.2f} M filas/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+benchmark_topn_ranks.py
+Paridad + benchmark del ranking rolling de runners (topn_ranks.RollingRanks) contra el refiltrado
+por snapshot de build_topn_runners.compute_topn_window (filtro de la ventana sobre el frame
+completo + group_by, una vez por snapshot).
+
+La referencia usa la misma ventana de W sesiones (el original cortaba en asof - W días naturales)
+y el mismo desempate (days desc, last_seen desc, ticker), así que la paridad es exacta fila a fila.
+
+Watchlists sintéticos: N tickers con listados/deslistados y ~5% de días info-rich. Segundo caso:
+los datos terminan --gap sesiones antes del último as-of (snapshots y serie diaria hasta esa fecha).
+
+Uso:
+  python benchmark_topn_ranks.py --tickers 3000 --years 20
+"""
+from __future__ import annotations
+import argparse, datetime as dt, time
+
+import numpy as np
+import polars as pl
+
+from build_topn_runners import month_ends_between, year_ends_between
+from market_calendar import sessions
+from topn_ranks import RANK_COLUMNS, RollingRanks
+
+def log(msg: str):
+    print(f"[{dt.datetime.now():%H:%M:%S}] {msg}", flush=True)
+
+def make_watchlists(n_tickers: int, days: list, seed: int = 13) -> pl.DataFrame:
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i in range(n_tickers):
+        a, b = sorted(rng.integers(0, len(days), 2))
+        d = days[a:b + 1]
+        # ~60% de las sesiones del tramo pasan los filtros de precio/cap
+        keep = rng.random(len(d)) < 0.6
+        frames.append(pl.DataFrame({
+            "ticker": f"T{i:05d}",
+            "date": [x for x, k in zip(d, keep) if k],
+            "info_rich": rng.random(int(keep.sum())) < 0.05,
+        }, schema={"ticker": pl.Utf8, "date": pl.Date, "info_rich": pl.Boolean}))
+    return pl.concat(frames)
+
+def reference_snapshot(df: pl.DataFrame, days: list, asof: dt.date, k: int, win: int) -> pl.DataFrame:
+    """compute_topn_window con ventana de `win` sesiones"""
+    idx = max(i for i, d in enumerate(days) if d <= asof)
+    start = days[idx - win] if idx - win >= 0 else dt.date.min
+    sub = df.filter((pl.col("date") > start) & (pl.col("date") <= asof))
+    if sub.is_empty():
+        return sub.clear()
+    return (
+        sub.group_by("ticker")
+        .agg(pl.col("info_rich").sum().alias("days_info_rich_win"), pl.col("date").max().alias("last_seen"))
+        .sort(["days_info_rich_win", "last_seen", "ticker"], descending=[True, True, False])
+        .with_columns(pl.lit(asof).alias("asof_date"), pl.int_range(1, pl.len() + 1).alias("rank"))
+        .select(RANK_COLUMNS)
+        .head(k)
+    )
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+def main():
+    ap = argparse.ArgumentParser(description="Paridad + benchmark del ranking rolling de runners")
+    ap.add_argument("--tickers", type=int, default=3000)
+    ap.add_argument("--years", type=int, default=20)
+    ap.add_argument("--k", type=int, default=200)
+    ap.add_argument("--win", type=int, default=252)
+    ap.add_argument("--gap", type=int, default=5, help="Sesiones sin datos antes del último as-of (caso 2)")
+    args = ap.parse_args()
+
+    d0, d1 = dt.date(2025 - args.years, 1, 1), dt.date(2024, 12, 31)
+    days = sessions(d0, d1)
+    df = make_watchlists(args.tickers, days)
+    asofs = month_ends_between(d0, d1) + year_ends_between(d0, d1)
+    log(f"Watchlists: {args.tickers:,} tickers x {len(days):,} sesiones, {df.height:,} ticker-días; "
+        f"{len(asofs)} snapshots (mes + año)")
+
+    ref, t_ref = timed(lambda: pl.concat([reference_snapshot(df, days, a, args.k, args.win)
+                                          for a in sorted(set(asofs))]))
+    engine, t_build = timed(lambda: RollingRanks(df, args.win))
+    new, t_snap = timed(lambda: engine.snapshots(asofs, args.k))
+    ok = ref.equals(new.cast(ref.schema))
+    log(f"Snapshots paridad: {'OK' if ok else 'FAIL'} ({new.height:,} filas) | refiltrado por snapshot "
+        f"{t_ref:6.2f}s | una pasada {t_build + t_snap:6.2f}s (conteos {t_build:.2f}s + snapshots {t_snap:.2f}s) "
+        f"| x{t_ref / (t_build + t_snap):.1f}")
+
+    daily, t_daily = timed(lambda: engine.daily(k=args.k))
+    log(f"Serie diaria as-of (top {args.k}): {daily['asof_date'].n_unique():,} sesiones, "
+        f"{daily.height:,} filas en {t_daily:.2f}s")
+
+    # Caso 2: datos hasta `gap` sesiones antes del último as-of (el calendario debe llegar a d1)
+    cut = df.filter(pl.col("date") <= days[-1 - args.gap])
+    tail = [a for a in sorted(set(asofs)) if a > days[-1 - args.win // 2]] + days[-1 - args.gap:]
+    ref_cut = pl.concat([reference_snapshot(cut, days, a, args.k, args.win) for a in sorted(set(tail))])
+    engine_cut = RollingRanks(cut, args.win)
+    new_cut = engine_cut.snapshots(tail, args.k)
+    daily_cut = engine_cut.daily(days[-1 - args.gap], d1, args.k)
+    ref_daily = ref_cut.filter(pl.col("asof_date").is_in(days[-1 - args.gap:]))
+    ok_cut = ref_cut.equals(new_cut.cast(ref_cut.schema)) and ref_daily.equals(daily_cut.cast(ref_daily.schema))
+    log(f"Datos hasta {days[-1 - args.gap]} < último as-of {d1}: paridad {'OK' if ok_cut else 'FAIL'} "
+        f"({new_cut['asof_date'].n_unique()} snapshots, serie diaria {daily_cut['asof_date'].n_unique()} sesiones)")
+    ok &= ok_cut
+    if not ok:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,13 @@
 build_daily_cache.py
 Genera cache diario desde OHLCV 1-min con todas las optimizaciones:
 - RVOL 30 sesiones (rolling por filas, no dias calendario)
-- Join SCD-2 temporal con market cap
+- Join SCD-2 temporal con market cap (dimension leida 1 vez por run, lookup join_asof; cap_dim.py)
 - Idempotencia con MANIFEST.json + _SUCCESS
+- Incremental = append: watermark por ticker en MANIFEST.json, solo se leen los meses 1-min
+  posteriores al watermark y las features se recalculan con las ultimas 30 sesiones como warm-up
+- Completitud con calendario de mercado real (market_calendar.py)
+- Vista por fecha {outdir}/_by_date (year/month, con estadisticas) sincronizada al final de cada run
+  (daily_cache_dataset.py) para las lecturas por rango de fechas
 - ZSTD compression level 2
 - Paralelizacion con 8 workers
 
@@ -17,7 +22,8 @@ Uso:
     --from 2020-01-01 --to 2025-10-21 \
     --parallel 8
 
-  # Incremental (EOD)
+  # Incremental (EOD): append de las sesiones posteriores al watermark de cada ticker
+  # (--from solo aplica a tickers sin cache previo)
   python build_daily_cache.py \
     --intraday-root raw/polygon/ohlcv_intraday_1m \
     --outdir processed/daily_cache \
@@ -25,145 +31,93 @@ Uso:
     --incremental
 """
 from __future__ import annotations
-import argparse, datetime as dt, json, time, hashlib
+import argparse, datetime as dt, json, os, time, hashlib
 from pathlib import Path
-from typing import List, Optional
-from multiprocessing import Pool
+from typing import Dict, List, Optional
+from multiprocessing import get_context
 import polars as pl
 
+from cap_dim import CapDim, init_worker, prepare_cap_dim, worker_dim
+from daily_agg import daily_plan, list_tickers
+from daily_cache_dataset import BY_DATE_DIR, compact
+from market_calendar import last_session, sessions
+
+# Sesiones previas al watermark que se releen como estado de las features rolling (rvol30, close_prev)
+WARMUP_SESSIONS = 30
+
 def log(msg: str):
     print(f"[{dt.datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
 
-def ticker_exists_and_complete(ticker_dir: Path, date_from: dt.date, date_to: dt.date) -> bool:
-    """Check si ticker ya tiene datos completos en el rango (para --incremental)"""
-    if not ticker_dir.exists():
-        return False
-
-    parquet = ticker_dir / "daily.parquet"
-    success = ticker_dir / "_SUCCESS"
+def load_watermarks(outdir: Path) -> Dict[str, dict]:
+    """Watermarks por ticker del MANIFEST.json previo: {ticker: {"last_day": ..., "through": ...}}"""
+    manifest_path = outdir / "MANIFEST.json"
+    if not manifest_path.exists():
+        return {}
+    try:
+        with open(manifest_path) as f:
+            return json.load(f).get("watermarks", {})
+    except (OSError, ValueError) as e:
+        log(f"[WARN] MANIFEST ilegible, sin watermarks: {e}")
+        return {}
 
-    if not (parquet.exists() and success.exists()):
+def ticker_exists_and_complete(ticker_dir: Path, date_to: dt.date, watermark: Optional[dict]) -> bool:
+    """
+    Check si ticker ya esta procesado hasta la ultima sesion de mercado <= date_to (para --incremental)
+    watermark["through"] = ultimo date_to con el que se leyeron sus minutos (el ticker puede no
+    cotizar todas las sesiones: last_day <= through). Un ticker no_data (watermark sin last_day)
+    no tiene daily.parquet: basta con el through.
+    """
+    if not watermark or not watermark.get("through"):
         return False
-
-    # Leer fechas existentes
-    try:
-        df = pl.read_parquet(parquet, columns=["trading_day"])
-        dates_existing = set(df["trading_day"].to_list())
-
-        # Generar fechas esperadas (TODO: usar calendario de mercado real)
-        cur = date_from
-        dates_expected = set()
-        while cur <= date_to:
-            # Simplificacion: excluir fines de semana
-            if cur.weekday() < 5:  # 0-4 = Lun-Vie
-                dates_expected.add(cur)
-            cur += dt.timedelta(days=1)
-
-        # Si tiene todas las fechas esperadas, skip
-        return dates_expected.issubset(dates_existing)
-    except Exception as e:
-        log(f"[WARN] Error checking {ticker_dir.name}: {e}")
+    if watermark.get("last_day") and not (
+            (ticker_dir / "daily.parquet").exists() and (ticker_dir / "_SUCCESS").exists()):
         return False
+    return dt.date.fromisoformat(watermark["through"]) >= last_session(date_to)
 
-def list_tickers_from_intraday(root: Path) -> List[str]:
-    """Lista todos los tickers que tienen datos 1-min"""
-    tickers = []
-    for tdir in root.iterdir():
-        if tdir.is_dir() and not tdir.name.startswith("_"):
-            tickers.append(tdir.name)
-    return sorted(tickers)
-
-def load_1m_for_ticker(root: Path, ticker: str, date_from: dt.date, date_to: dt.date) -> pl.DataFrame:
+def scan_from(date_from: dt.date, watermark: Optional[dict]) -> dt.date:
     """
-    Carga 1-min para 1 ticker en rango, procesando por mes (evita re-lecturas)
+    Inicio de lectura de 1-min en --incremental: un ticker no_data (sin last_day) ya se leyó hasta
+    su through sin minutos, así que sólo se leen los días posteriores (no todo desde --from)
     """
-    tdir = root / ticker
-    if not tdir.exists():
-        return pl.DataFrame()
-
-    # Generar lista de (year, month) en el rango
-    months = []
-    cur = date_from
-    while cur <= date_to:
-        ym = (cur.year, cur.month)
-        if ym not in months:
-            months.append(ym)
-        # Avanzar al siguiente mes
-        if cur.month == 12:
-            cur = dt.date(cur.year + 1, 1, 1)
-        else:
-            cur = dt.date(cur.year, cur.month + 1, 1)
-
-    # Leer todos los meses a la vez (lazy)
-    paths = []
-    for y, m in months:
-        p = tdir / f"year={y}" / f"month={m:02d}" / "minute.parquet"
-        if p.exists():
-            paths.append(p)
-
-    if not paths:
-        return pl.DataFrame()
-
-    # Lazy read + filter por rango de fechas
-    df = (
-        pl.scan_parquet(paths)
-        .filter(
-            (pl.col("date") >= date_from.strftime("%Y-%m-%d")) &
-            (pl.col("date") <= date_to.strftime("%Y-%m-%d"))
-        )
-        .select(["date", "c", "v", "vw", "n"])  # Solo columnas necesarias
-        .collect()
-    )
+    if watermark and watermark.get("through") and not watermark.get("last_day"):
+        return max(date_from, dt.date.fromisoformat(watermark["through"]) + dt.timedelta(days=1))
+    return date_from
 
-    if df.is_empty():
-        return df
+def missing_sessions(daily: pl.DataFrame) -> int:
+    """Sesiones de mercado entre el primer y el ultimo dia del ticker sin fila en el cache"""
+    if daily.is_empty():
+        return 0
+    present = set(daily["trading_day"].to_list())
+    return sum(d not in present for d in sessions(min(present), max(present)))
 
-    # Añadir ticker
-    df = df.with_columns(pl.lit(ticker).alias("ticker"))
+def list_tickers_from_intraday(root: Path) -> List[str]:
+    """Lista todos los tickers que tienen datos 1-min"""
+    return list_tickers(root)
 
-    return df
+CACHE_AGGS = ["c", "v", "dollar_vw", "session_rows"]
 
-def aggregate_to_daily(df_1m: pl.DataFrame) -> pl.DataFrame:
+def aggregate_to_daily(intraday_root: Path, tickers: List[str], date_from: dt.date, date_to: dt.date) -> pl.LazyFrame:
     """
-    Agrega 1-min a diario por ticker-fecha
+    Agrega 1-min a diario por ticker-fecha en un plan lazy (motor daily_agg: un scan por ticker
+    sobre los meses del rango + un group_by por dia)
     Calcula: close_d, vol_d, dollar_vol_d, vwap_d, session_rows, has_gaps
     """
-    if df_1m.is_empty():
-        return pl.DataFrame()
-
-    # Parsear fecha a Date
-    df_1m = df_1m.with_columns(
-        pl.col("date").str.strptime(pl.Date, "%Y-%m-%d").alias("trading_day")
-    )
-
-    # Agregar por ticker-trading_day
-    daily = (
-        df_1m.group_by(["ticker", "trading_day"])
-        .agg([
-            pl.col("c").last().alias("close_d"),
-            pl.col("v").sum().alias("vol_d"),
-            (pl.col("v") * pl.col("vw")).sum().alias("dollar_vol_d_raw"),
-            pl.col("v").sum().alias("vol_sum"),  # Para VWAP
-            pl.col("n").count().alias("session_rows"),  # Nro de barras 1m
-        ])
+    return (
+        daily_plan(intraday_root, tickers, CACHE_AGGS, date_from, date_to)
         .with_columns([
             # VWAP = sum(v*vw) / sum(v) con proteccion divide-by-zero
-            (pl.col("dollar_vol_d_raw") / pl.when(pl.col("vol_sum") > 0).then(pl.col("vol_sum")).otherwise(None)).alias("vwap_d"),
-            # Dollar volume
-            pl.col("dollar_vol_d_raw").alias("dollar_vol_d"),
+            (pl.col("dollar_vw") / pl.when(pl.col("v") > 0).then(pl.col("v")).otherwise(None)).alias("vwap_d"),
             # has_gaps: session_rows < 390 (RTH = Regular Trading Hours)
             # Nota: Si incluyes pre/post-market, ajustar umbral
             (pl.col("session_rows") < 390).alias("has_gaps"),
         ])
         .select([
-            "ticker", "trading_day", "close_d", "vol_d",
-            "dollar_vol_d", "vwap_d", "session_rows", "has_gaps"
+            "ticker", "trading_day",
+            pl.col("c").alias("close_d"), pl.col("v").alias("vol_d"), pl.col("dollar_vw").alias("dollar_vol_d"),
+            "vwap_d", "session_rows", "has_gaps"
         ])
-        .sort(["ticker", "trading_day"])
     )
 
-    return daily
-
 def compute_features(daily: pl.DataFrame) -> pl.DataFrame:
     """
     Calcula features:
@@ -205,91 +159,90 @@ def compute_features(daily: pl.DataFrame) -> pl.DataFrame:
 
 def join_market_cap_temporal(
     daily: pl.DataFrame,
-    cap_parquet: Optional[str]
+    dim: Optional[CapDim]
 ) -> pl.DataFrame:
     """
     Join temporal con SCD-2 (tickers_dim) para market cap por fecha
-    effective_from <= trading_day < effective_to
+    effective_from <= trading_day < effective_to (join_asof backward sobre la dimension ya cargada)
+    Dias sin periodo vigente -> market_cap_d null (antes el filtro del join los eliminaba)
     """
-    if not cap_parquet or not Path(cap_parquet).exists():
-        log(f"[WARN] Cap parquet no encontrado o no especificado, skip market_cap")
-        return daily.with_columns(pl.lit(None).alias("market_cap_d"))
-
-    # Leer dimension SCD-2
-    dim = pl.read_parquet(cap_parquet).select([
-        "ticker", "effective_from", "effective_to", "market_cap"
-    ])
-
-    # Normalizar fechas y cerrar open-ended con fecha futura
-    dim = dim.with_columns([
-        pl.col("effective_from").cast(pl.Date),
-        pl.col("effective_to").cast(pl.Date).fill_null(pl.date(2099, 12, 31))  # Fix: effective_to null
-    ])
-
-    # Left join y filtro temporal
-    joined = (
-        daily.join(dim, on="ticker", how="left")
-        .filter(
-            (pl.col("effective_from") <= pl.col("trading_day")) &
-            (pl.col("trading_day") < pl.col("effective_to"))
-        )
-        # Si hay solapes en SCD-2, quedarse con el registro mas reciente
-        .sort(["ticker", "trading_day", "effective_from"], descending=[False, False, True])
-        .unique(subset=["ticker", "trading_day"], keep="first")
-        .select([*(daily.columns), "market_cap"])
-        .rename({"market_cap": "market_cap_d"})
+    if dim is None:
+        return daily.with_columns(pl.lit(None, dtype=pl.Float64).alias("market_cap_d"))
+    return dim.lookup(daily)
+
+def write_daily(daily: pl.DataFrame, ticker_dir: Path) -> Path:
+    """Escribe daily.parquet (ZSTD, tmp + rename) y _SUCCESS"""
+    ticker_dir.mkdir(parents=True, exist_ok=True)
+    outp = ticker_dir / "daily.parquet"
+    tmp = ticker_dir / "daily.parquet.tmp"
+    daily.write_parquet(
+        tmp,
+        compression="zstd",
+        compression_level=2,
+        statistics=False
     )
+    os.replace(tmp, outp)
+    (ticker_dir / "_SUCCESS").touch()
+    return outp
 
-    return joined
+def build_features(new: pl.DataFrame, warmup: Optional[pl.DataFrame] = None) -> pl.DataFrame:
+    """
+    Features + market cap de las filas `new` (diario agregado). `warmup`: ultimas sesiones ya
+    cacheadas, solo como estado de close_prev / rolling 30 (no se devuelven)
+    """
+    if warmup is not None and not warmup.is_empty():
+        watermark = warmup["trading_day"].max()
+        daily = compute_features(pl.concat([warmup.select(new.columns), new]))
+        daily = daily.filter(pl.col("trading_day") > watermark)
+    else:
+        daily = compute_features(new)
+    return join_market_cap_temporal(daily, worker_dim())
 
 def process_ticker(args) -> dict:
     """
     Procesa 1 ticker: lee 1-min, agrega a diario, calcula features
-    Retorna dict con metadata para MANIFEST
+    incremental con cache previo: solo sesiones posteriores al watermark (ultimo trading_day)
+    Retorna dict con metadata para MANIFEST (last_day/through = watermark)
     """
-    ticker, intraday_root, outdir, date_from, date_to, cap_parquet, incremental = args
+    ticker, intraday_root, outdir, date_from, date_to, incremental = args
 
     ticker_dir = outdir / f"ticker={ticker}"
-
-    # Si incremental y ya existe completo, skip
-    if incremental and ticker_exists_and_complete(ticker_dir, date_from, date_to):
-        return {"ticker": ticker, "status": "skipped", "days": 0}
+    outp = ticker_dir / "daily.parquet"
 
     try:
-        # 1. Cargar 1-min
-        df_1m = load_1m_for_ticker(Path(intraday_root), ticker, date_from, date_to)
-        if df_1m.is_empty():
-            return {"ticker": ticker, "status": "no_data", "days": 0}
-
-        # 2. Agregar a diario
-        daily = aggregate_to_daily(df_1m)
-
-        # 3. Calcular features (rvol30, pctchg, return)
-        daily = compute_features(daily)
-
-        # 4. Join market cap temporal (opcional)
-        if cap_parquet:
-            daily = join_market_cap_temporal(daily, cap_parquet)
+        existing = None
+        if incremental and outp.exists() and (ticker_dir / "_SUCCESS").exists():
+            existing = pl.read_parquet(outp)
+
+        if existing is not None and not existing.is_empty():
+            # Append: 1-min solo de los meses/dias posteriores al watermark
+            watermark = existing["trading_day"].max()
+            new = aggregate_to_daily(Path(intraday_root), [ticker], watermark + dt.timedelta(days=1), date_to).collect()
+            if new.is_empty():
+                return {"ticker": ticker, "status": "skipped", "days": 0,
+                        "last_day": watermark.isoformat(), "through": date_to.isoformat()}
+            appended = build_features(new, existing.tail(WARMUP_SESSIONS))
+            daily = pl.concat([existing, appended.select(existing.columns)], how="vertical_relaxed")
+            status = "appended"
         else:
-            daily = daily.with_columns(pl.lit(None).alias("market_cap_d"))
-
-        # 5. Escribir parquet con ZSTD
-        ticker_dir.mkdir(parents=True, exist_ok=True)
-        outp = ticker_dir / "daily.parquet"
-        daily.write_parquet(
-            outp,
-            compression="zstd",
-            compression_level=2,
-            statistics=False
-        )
+            # 1-2. Cargar 1-min y agregar a diario (un solo plan lazy)
+            new = aggregate_to_daily(Path(intraday_root), [ticker], date_from, date_to).collect()
+            if new.is_empty():
+                return {"ticker": ticker, "status": "no_data", "days": 0, "through": date_to.isoformat()}
+            # 3-4. Features (rvol30, pctchg, return) + market cap temporal (dimension de init_worker)
+            daily = build_features(new)
+            status = "success"
 
-        # 6. Escribir _SUCCESS
-        (ticker_dir / "_SUCCESS").touch()
+        # 5-6. Escribir parquet con ZSTD + _SUCCESS
+        outp = write_daily(daily, ticker_dir)
 
         return {
             "ticker": ticker,
-            "status": "success",
-            "days": len(daily),
+            "status": status,
+            "days": len(new),
+            "last_day": daily["trading_day"].max().isoformat(),
+            "through": date_to.isoformat(),
+            "missing_sessions": missing_sessions(daily),
             "size_bytes": outp.stat().st_size if outp.exists() else 0
         }
 
@@ -297,19 +250,30 @@ def process_ticker(args) -> dict:
         log(f"[ERROR] {ticker}: {e}")
         return {"ticker": ticker, "status": "error", "error": str(e)}
 
-def write_manifest(outdir: Path, metadata: List[dict], args):
-    """Escribe MANIFEST.json con metadata del job"""
+def update_watermarks(watermarks: Dict[str, dict], metadata: List[dict]) -> Dict[str, dict]:
+    """Watermarks previos + los de este job (los tickers no procesados conservan el suyo)"""
+    out = dict(watermarks)
+    for m in metadata:
+        if "through" in m:
+            prev = out.get(m["ticker"], {})
+            out[m["ticker"]] = {"last_day": m.get("last_day", prev.get("last_day")), "through": m["through"]}
+    return dict(sorted(out.items()))
+
+def write_manifest(outdir: Path, metadata: List[dict], args, watermarks: Dict[str, dict]):
+    """Escribe MANIFEST.json con metadata del job + watermarks por ticker"""
     manifest = {
         "timestamp": dt.datetime.now().isoformat(),
         "date_from": args.date_from,
         "date_to": args.date_to,
         "total_tickers": len(metadata),
         "success": sum(1 for m in metadata if m["status"] == "success"),
+        "appended": sum(1 for m in metadata if m["status"] == "appended"),
         "skipped": sum(1 for m in metadata if m["status"] == "skipped"),
         "errors": sum(1 for m in metadata if m["status"] == "error"),
         "total_days": sum(m.get("days", 0) for m in metadata),
         "total_bytes": sum(m.get("size_bytes", 0) for m in metadata),
-        "tickers": metadata
+        "tickers": metadata,
+        "watermarks": watermarks
     }
 
     # Hash parcial (primeros 10 tickers)
@@ -330,7 +294,8 @@ def main():
     ap.add_argument("--to", dest="date_to", required=True)
     ap.add_argument("--cap-filter-parquet", type=str, default=None, help="tickers_dim.parquet (SCD-2)")
     ap.add_argument("--parallel", type=int, default=8, help="Procesos concurrentes")
-    ap.add_argument("--incremental", action="store_true", help="Skip tickers ya completos")
+    ap.add_argument("--incremental", action="store_true", help="Append de sesiones posteriores al watermark")
+    ap.add_argument("--no-compact", action="store_true", help="No sincronizar la vista por fecha (_by_date)")
     args = ap.parse_args()
 
     intraday_root = Path(args.intraday_root)
@@ -351,12 +316,14 @@ def main():
     tickers = list_tickers_from_intraday(intraday_root)
     log(f"Tickers encontrados: {len(tickers)}")
 
+    watermarks = load_watermarks(outdir)
+
     if args.incremental:
-        # Filtrar ya completos
+        # Filtrar ya procesados hasta la ultima sesion <= date_to (watermarks del MANIFEST)
         tickers_pending = [
             t for t in tickers
             if not ticker_exists_and_complete(
-                outdir / f"ticker={t}", date_from, date_to
+                outdir / f"ticker={t}", date_to, watermarks.get(t)
             )
         ]
         log(f"Incremental: {len(tickers) - len(tickers_pending)} ya completos, {len(tickers_pending)} pendientes")
@@ -366,25 +333,43 @@ def main():
         log("No hay tickers para procesar")
         return
 
+    # Dimension SCD-2 de market cap: se lee 1 vez aqui y se comparte como Arrow IPC mapeado en memoria
+    cap_ipc = None
+    if args.cap_filter_parquet and Path(args.cap_filter_parquet).exists():
+        cap_ipc = outdir / "_cap_dim.arrow"
+        n_periods = prepare_cap_dim(args.cap_filter_parquet, cap_ipc)
+        log(f"Dimension market cap: {n_periods:,} periodos -> {cap_ipc}")
+    else:
+        log(f"[WARN] Cap parquet no encontrado o no especificado, skip market_cap")
+
     # Preparar argumentos para workers
     task_args = [
-        (t, str(intraday_root), outdir, date_from, date_to, args.cap_filter_parquet, args.incremental)
+        (t, str(intraday_root), outdir,
+         scan_from(date_from, watermarks.get(t)) if args.incremental else date_from, date_to, args.incremental)
         for t in tickers
     ]
 
     # Procesar en paralelo
     start_time = time.time()
 
-    if args.parallel > 1:
-        with Pool(processes=args.parallel) as pool:
-            results = pool.map(process_ticker, task_args)
-    else:
-        results = [process_ticker(task) for task in task_args]
+    try:
+        if args.parallel > 1:
+            # spawn: el padre ya uso polars (dimension, --incremental) y fork con su pool de hilos se bloquea
+            with get_context("spawn").Pool(processes=args.parallel, initializer=init_worker,
+                                           initargs=(str(cap_ipc) if cap_ipc else None,)) as pool:
+                results = pool.map(process_ticker, task_args)
+        else:
+            init_worker(str(cap_ipc) if cap_ipc else None)
+            results = [process_ticker(task) for task in task_args]
+    finally:
+        init_worker(None)
+        if cap_ipc is not None:
+            cap_ipc.unlink(missing_ok=True)
 
     elapsed = time.time() - start_time
 
     # Resumen
-    success = sum(1 for r in results if r["status"] == "success")
+    success = sum(1 for r in results if r["status"] in ("success", "appended"))
     skipped = sum(1 for r in results if r["status"] == "skipped")
     errors = sum(1 for r in results if r["status"] == "error")
 
@@ -394,7 +379,12 @@ def main():
     log(f"Velocidad: {success/(elapsed/3600):.1f} tickers/hora")
 
     # Escribir MANIFEST
-    write_manifest(outdir, results, args)
+    write_manifest(outdir, results, args, update_watermarks(watermarks, results))
+
+    # Vista por fecha: solo se releen los tickers reescritos en este run
+    if not args.no_compact:
+        summary = compact(outdir)
+        log(f"Vista por fecha {outdir / BY_DATE_DIR}: {summary}")
 
     # _SUCCESS global
     (outdir / "_SUCCESS").touch()
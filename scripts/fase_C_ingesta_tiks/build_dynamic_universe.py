@@ -29,6 +29,8 @@ from pathlib import Path
 from typing import List, Optional
 import polars as pl
 
+from daily_agg import scan_minute_files
+
 def log(msg: str): print(msg, flush=True)
 
 def month_paths_for_day(root: Path, day: dt.date) -> List[Path]:
@@ -42,11 +44,11 @@ def month_paths_for_day(root: Path, day: dt.date) -> List[Path]:
 
 def load_minute_for_day(paths: List[Path], day: dt.date) -> pl.DataFrame:
     if not paths: return pl.DataFrame()
-    df = pl.read_parquet(paths, parallel="auto", use_statistics=True)
-    dstr = day.strftime("%Y-%m-%d")
-    # Asumimos columnas: ticker, date, minute, o,h,l,c,v,vw,n,t
-    df = df.filter(pl.col("date") == dstr)
-    return df
+    # Asumimos columnas: ticker, date, minute, o,h,l,c,v,vw,n,t. Filtro sobre la fecha tipada
+    # (date Date en el esquema nuevo; las particiones con cadenas se parsean en scan_minute_files)
+    df = scan_minute_files(paths).filter(pl.col("trading_day") == day).collect()
+    # aguas abajo (minute_to_daily / compute_features_daily) se trabaja con date 'YYYY-MM-DD'
+    return df.with_columns(pl.lit(day.strftime("%Y-%m-%d")).alias("date")).drop("trading_day")
 
 def minute_to_daily(df: pl.DataFrame) -> pl.DataFrame:
     if df.is_empty():
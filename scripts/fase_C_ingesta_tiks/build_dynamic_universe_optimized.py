@@ -10,6 +10,10 @@ Optimizaciones:
 - Config YAML para umbrales
 - ZSTD compression
 - Lazy reading Polars
+- Rango de fechas desde la vista por fecha del cache (_by_date, solo los meses del rango)
+- Watchlists diarios con un partition_by + pool de hilos; solo se reescriben los dias cuyo
+  contenido cambio (manifest de digests, watchlist_writer.py)
+- Índice info-rich incremental (watchlist_index.py) para los descargadores
 
 Uso:
   # Backfill completo
@@ -31,6 +35,11 @@ from pathlib import Path
 from typing import Optional
 import polars as pl
 
+from daily_cache_dataset import BY_DATE_DIR, compact, has_by_date, scan_by_date, stale_tickers
+from topn_ranks import RollingRanks
+from watchlist_index import INDEX_FILE
+from watchlist_writer import MANIFEST_FILE, write_daily_watchlists
+
 def log(msg: str):
     print(f"[{dt.datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
 
@@ -71,22 +80,35 @@ def load_cache_for_range(cache_root: Path, date_from: dt.date, date_to: dt.date)
     """
     Carga TODOS los tickers desde cache, filtra por rango de fechas (lazy)
     Proyecta solo columnas necesarias (consistencia con schema del cache)
+    Con vista por fecha (_by_date) solo se leen los meses del rango; si no, todos los ticker=*.
+    Si algún ticker=*/daily.parquet cambió desde la última compactación (--no-compact, otra
+    herramienta), se sincroniza la vista antes de leerla
     """
-    paths = list_ticker_caches(cache_root)
-
-    if not paths:
-        log("[ERROR] No se encontraron caches de tickers")
-        return pl.DataFrame()
-
-    log(f"Cargando {len(paths)} tickers desde cache...")
-
-    # Lazy scan + filter por rango + proyeccion columnas exactas
-    df = (
-        pl.scan_parquet(paths)
-        .filter(
+    if has_by_date(cache_root):
+        changed, removed = stale_tickers(cache_root)
+        if changed or removed:
+            log(f"[WARN] Vista por fecha desactualizada ({len(changed)} tickers cambiados, "
+                f"{len(removed)} eliminados): compactando...")
+            log(f"Compactación: {compact(cache_root)}")
+    lf = scan_by_date(cache_root, date_from, date_to)
+    if lf is not None:
+        log(f"Cargando rango desde vista por fecha {cache_root / BY_DATE_DIR}...")
+    else:
+        paths = list_ticker_caches(cache_root)
+
+        if not paths:
+            log("[ERROR] No se encontraron caches de tickers")
+            return pl.DataFrame()
+
+        log(f"Cargando {len(paths)} tickers desde cache...")
+        lf = pl.scan_parquet(paths).filter(
             (pl.col("trading_day") >= date_from) &
             (pl.col("trading_day") <= date_to)
         )
+
+    # Lazy scan + filter por rango + proyeccion columnas exactas
+    df = (
+        lf
         .select([
             "ticker", "trading_day", "close_d", "pctchg_d", "rvol30",
             "vol_d", "dollar_vol_d", "vwap_d", "market_cap_d"
@@ -145,48 +167,24 @@ def label_info_rich(
 
     return labeled
 
-def save_watchlist_daily(df: pl.DataFrame, outdir: Path, day: dt.date):
-    """Guarda watchlist del dia con ZSTD"""
-    if df.is_empty():
-        return
-
-    ddir = outdir / "daily" / f"date={day.strftime('%Y-%m-%d')}"
-    ddir.mkdir(parents=True, exist_ok=True)
-
-    outp = ddir / "watchlist.parquet"
-    df.write_parquet(
-        outp,
-        compression="zstd",
-        compression_level=2,
-        statistics=False
-    )
-
-    log(f"{day}: {df.filter(pl.col('info_rich')).height} tickers info-rich -> {outp}")
-
 def update_topN_12m(outdir: Path, df_all: pl.DataFrame, top_k: int = 200):
     """
     Actualiza topN_12m "corriente" (rolling 12 meses hasta hoy)
     df_all: TODOS los dias procesados hasta ahora
+    Ventana: ultimas 252 sesiones de mercado hasta el ultimo dia (topn_ranks.RollingRanks)
     """
     if df_all.is_empty():
         return
 
-    # Tomar ultimos ~252 dias de mercado por ticker
-    # Simplificacion: tail(252) por ticker ordenado
-    last_252 = (
-        df_all.sort(["ticker", "trading_day"])
-        .group_by("ticker", maintain_order=True)
-        .tail(252)
-    )
-
-    # Ranking por dias info_rich
+    asof = df_all["trading_day"].max()
     ranks = (
-        last_252.group_by("ticker")
-        .agg([
-            pl.col("info_rich").sum().alias("days_info_rich_252"),
-            pl.col("trading_day").max().alias("last_seen"),
+        RollingRanks(df_all, win_sessions=252, date_col="trading_day")
+        .snapshots([asof])
+        .select([
+            "ticker",
+            pl.col("days_info_rich_win").alias("days_info_rich_252"),
+            "last_seen",
         ])
-        .sort(["days_info_rich_252", "last_seen"], descending=[True, True])
     )
 
     hist_path = outdir / "topN_12m.parquet"
@@ -208,6 +206,8 @@ def main():
     ap.add_argument("--from", dest="date_from", required=True)
     ap.add_argument("--to", dest="date_to", required=True)
     ap.add_argument("--config", type=str, default=None, help="configs/universe_config.yaml")
+    ap.add_argument("--write-workers", type=int, default=4, help="Hilos de escritura de watchlists")
+    ap.add_argument("--rewrite-all", action="store_true", help="Reescribir todos los dias (ignorar manifest)")
     args = ap.parse_args()
 
     cache_root = Path(args.daily_cache)
@@ -251,13 +251,17 @@ def main():
         th["min_price"], th["max_price"]
     )
 
-    # Guardar watchlist por dia
+    # Guardar watchlist por dia (un partition_by; solo dias con contenido nuevo)
     days = sorted(df_all["trading_day"].unique().to_list())
     log(f"Generando watchlists para {len(days)} dias...")
 
-    for day in days:
-        df_day = df_all.filter(pl.col("trading_day") == day)
-        save_watchlist_daily(df_day, outdir, day)
+    res = write_daily_watchlists(
+        df_all, outdir / "daily", day_col="trading_day",
+        only_changed=not args.rewrite_all, workers=args.write_workers
+    )
+    # El writer reemplaza los días escritos en el índice info-rich (ticker, día) de los descargadores
+    log(f"Watchlists: {len(res['written'])} dias escritos, {len(res['unchanged'])} sin cambios "
+        f"-> {outdir / 'daily'} (manifest {MANIFEST_FILE}, índice {INDEX_FILE})")
 
     # Actualizar topN_12m "corriente"
     update_topN_12m(outdir, df_all, top_k=200)
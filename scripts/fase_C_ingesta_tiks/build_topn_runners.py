@@ -5,11 +5,13 @@ build_topn_runners.py
 Construye TopN12m (runners recurrentes) para un horizonte largo (p.ej. 5 años).
 
 - Input: processed/universe/info_rich/daily/date=YYYY-MM-DD/watchlist.parquet
-         (columnas mínimas: ticker, date, info_rich)
+         (columnas mínimas: ticker, date|trading_day, info_rich)
 - Output:
   processed/universe/info_rich/topn12m/rolling/month_end/topn_YYYY-MM.parquet
   processed/universe/info_rich/topn12m/annual/topn_YYYY-12-31.parquet
   processed/universe/info_rich/topn12m/topn12m_index.parquet
+  processed/universe/info_rich/topn12m/topn_daily_asof.parquet   (--daily-asof)
+- Ventana de --win-days SESIONES; todos los snapshots salen de una pasada (topn_ranks.py)
 
 Uso:
   python build_topn_runners.py \
@@ -25,6 +27,8 @@ from pathlib import Path
 from typing import List
 import polars as pl
 
+from topn_ranks import RollingRanks
+
 def log(s: str): print(s, flush=True)
 
 def list_daily_paths(root: Path, d0: dt.date, d1: dt.date) -> List[Path]:
@@ -42,6 +46,9 @@ def load_daily_watchlists(paths: List[Path]) -> pl.DataFrame:
     if not paths:
         return pl.DataFrame(schema={"ticker": pl.Utf8, "date": pl.Utf8, "info_rich": pl.Boolean})
     df = pl.read_parquet(paths, use_statistics=True)
+    # build_dynamic_universe_optimized escribe trading_day (Date) en vez de date
+    if "date" not in df.columns and "trading_day" in df.columns:
+        df = df.rename({"trading_day": "date"})
     # Asegurar columnas mínimas
     need = {"ticker","date","info_rich"}
     missing = need - set(df.columns)
@@ -77,28 +84,24 @@ def year_ends_between(d0: dt.date, d1: dt.date) -> List[dt.date]:
     return out
 
 def compute_topn_window(df_daily: pl.DataFrame, asof: dt.date, k: int, win_days: int = 252) -> pl.DataFrame:
-    # filtra ventana [asof - win_days, asof]
-    start = asof - dt.timedelta(days=win_days)
-    sub = df_daily.filter((pl.col("date") > start) & (pl.col("date") <= asof))
-    if sub.is_empty():
-        return pl.DataFrame()
-    # suma de días info_rich y última vez visto
-    ranks = (
-        sub.group_by("ticker")
-           .agg([
-               pl.col("info_rich").sum().alias("days_info_rich_win"),
-               pl.col("date").max().alias("last_seen")
-           ])
-           .sort(["days_info_rich_win","last_seen"], descending=[True, True])
-           .with_columns([
-               pl.lit(asof).alias("asof_date"),
-               pl.int_range(1, pl.len()+1).alias("rank")
-           ])
-           .select(["asof_date","rank","ticker","days_info_rich_win","last_seen"])
-    )
-    if k and k > 0:
-        ranks = ranks.head(k)
-    return ranks
+    # 1 snapshot: ventana de las últimas win_days sesiones <= asof (para varios, RollingRanks.snapshots)
+    ranks = RollingRanks(df_daily, win_days).snapshots([asof], k)
+    return ranks if not ranks.is_empty() else pl.DataFrame()
+
+def write_snapshots(ranks: pl.DataFrame, outdir: Path, snapshot_type: str) -> List[pl.DataFrame]:
+    """Un parquet por asof_date (un partition_by); devuelve filas del índice"""
+    idx_rows = []
+    for (asof,), df_snap in ranks.partition_by("asof_date", as_dict=True, maintain_order=True).items():
+        if snapshot_type == "month_end":
+            outp = outdir / "rolling" / "month_end" / f"topn_{asof:%Y-%m}.parquet"
+        else:
+            outp = outdir / "annual" / f"topn_{asof:%Y}.parquet"
+        df_snap.write_parquet(outp)
+        idx_rows.append(pl.DataFrame({
+            "asof_date":[asof], "snapshot_type":[snapshot_type], "path":[str(outp)]
+        }))
+        log(f"[{snapshot_type}] {asof}: {len(df_snap)} filas -> {outp}")
+    return idx_rows
 
 def main():
     ap = argparse.ArgumentParser()
@@ -109,7 +112,9 @@ def main():
     ap.add_argument("--k", type=int, default=200, help="Top-N a guardar por snapshot")
     ap.add_argument("--snap", choices=["monthly","annual","both"], default="both",
                     help="Snapshots mensuales, anuales, o ambos")
-    ap.add_argument("--win-days", type=int, default=252, help="Tamaño de ventana (≈252 sesiones ~ 12 meses)")
+    ap.add_argument("--win-days", type=int, default=252, help="Tamaño de ventana en sesiones (252 ~ 12 meses)")
+    ap.add_argument("--daily-asof", action="store_true",
+                    help="Escribir también el ranking as-of de cada sesión (top-k) en topn_daily_asof.parquet")
     args = ap.parse_args()
 
     root = Path(args.daily_root)
@@ -126,34 +131,25 @@ def main():
         return
     df = load_daily_watchlists(paths)
 
+    # conteos rolling por ticker en una pasada; los snapshots se extraen de ahí
+    engine = RollingRanks(df, args.win_days)
+
     # índice de snapshots
     idx_rows = []
 
     # 1) Snap mensual (último día de mes)
     if args.snap in ("monthly", "both"):
-        for asof in month_ends_between(d0, d1):
-            ranks = compute_topn_window(df, asof, args.k, args.win_days)
-            if ranks.is_empty(): 
-                continue
-            outp = outdir / "rolling" / "month_end" / f"topn_{asof:%Y-%m}.parquet"
-            ranks.write_parquet(outp)
-            idx_rows.append(pl.DataFrame({
-                "asof_date":[asof], "snapshot_type":["month_end"], "path":[str(outp)]
-            }))
-            log(f"[monthly] {asof}: {len(ranks)} filas -> {outp}")
+        idx_rows += write_snapshots(engine.snapshots(month_ends_between(d0, d1), args.k), outdir, "month_end")
 
     # 2) Snap anual (31-Dic)
     if args.snap in ("annual", "both"):
-        for asof in year_ends_between(d0, d1):
-            ranks = compute_topn_window(df, asof, args.k, args.win_days)
-            if ranks.is_empty(): 
-                continue
-            outp = outdir / "annual" / f"topn_{asof:%Y}.parquet"
-            ranks.write_parquet(outp)
-            idx_rows.append(pl.DataFrame({
-                "asof_date":[asof], "snapshot_type":["year_end"], "path":[str(outp)]
-            }))
-            log(f"[annual]  {asof}: {len(ranks)} filas -> {outp}")
+        idx_rows += write_snapshots(engine.snapshots(year_ends_between(d0, d1), args.k), outdir, "year_end")
+
+    # 3) Serie diaria as-of (selección point-in-time)
+    if args.daily_asof:
+        daily = engine.daily(d0, d1, args.k)
+        daily.write_parquet(outdir / "topn_daily_asof.parquet", compression="zstd", compression_level=2)
+        log(f"[daily]   {daily['asof_date'].n_unique()} sesiones, {len(daily)} filas -> {outdir/'topn_daily_asof.parquet'}")
 
     if idx_rows:
         idx = pl.concat(idx_rows, how="vertical_relaxed")
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+cap_dim.py
+Lookup point-in-time de market cap sobre la dimensión SCD-2 (build_market_cap_dim.py:
+ticker, effective_from, effective_to, market_cap) para build_daily_cache.py.
+
+- prepare_cap_dim(): el proceso padre lee el parquet SCD-2 una sola vez, normaliza fechas
+  (effective_to null -> 2099-12-31), ordena por ticker, effective_from y lo escribe como Arrow IPC.
+- CapDim.open(): cada worker mapea ese IPC en memoria (read_ipc memory_map) una vez, en el
+  initializer del Pool: las páginas se comparten entre procesos, no se copia la dimensión.
+  Índice ticker -> (offset, n): el tramo de un ticker es un slice sin copia.
+- CapDim.lookup(daily): join_asof backward por (ticker, trading_day): el periodo con mayor
+  effective_from <= trading_day, válido si trading_day < effective_to. Sin periodo vigente ->
+  market_cap_d null (el día se conserva; build_dynamic_universe_optimized ya trata null).
+"""
+from __future__ import annotations
+import os
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import polars as pl
+
+DIM_COLUMNS = ["ticker", "effective_from", "effective_to", "market_cap"]
+OPEN_END = pl.date(2099, 12, 31)
+
+def prepare_cap_dim(cap_parquet: str, ipc_path: Path) -> int:
+    """Lee + normaliza + ordena la SCD-2 y la escribe como Arrow IPC (tmp + rename). Devuelve filas."""
+    dim = (
+        pl.scan_parquet(cap_parquet)
+        .select(DIM_COLUMNS)
+        .with_columns([
+            pl.col("ticker").cast(pl.Utf8),
+            pl.col("effective_from").cast(pl.Date),
+            pl.col("effective_to").cast(pl.Date).fill_null(OPEN_END),
+            pl.col("market_cap").cast(pl.Float64),
+        ])
+        .filter(pl.col("effective_from").is_not_null())
+        .sort(["ticker", "effective_from"])
+        .collect()
+    )
+    ipc_path = Path(ipc_path)
+    tmp = ipc_path.with_name(ipc_path.name + ".tmp")
+    dim.write_ipc(tmp, compression="uncompressed")  # sin compresión: mapeable sin copia
+    os.replace(tmp, ipc_path)
+    return dim.height
+
+class CapDim:
+    """Dimensión SCD-2 mapeada en memoria + índice por ticker"""
+
+    def __init__(self, dim: pl.DataFrame):
+        self.dim = dim
+        bounds = (
+            dim.with_row_index("_i")
+            .group_by("ticker", maintain_order=True)
+            .agg(pl.col("_i").first().alias("offset"), pl.len().alias("n"))
+        )
+        self.index: Dict[str, Tuple[int, int]] = {
+            t: (off, n) for t, off, n in bounds.iter_rows()
+        }
+
+    @classmethod
+    def open(cls, ipc_path: Path) -> "CapDim":
+        return cls(pl.read_ipc(ipc_path, memory_map=True))
+
+    def periods(self, ticker: str) -> pl.DataFrame:
+        """Periodos del ticker (slice sin copia; vacío si no está en la dimensión)"""
+        off, n = self.index.get(ticker, (0, 0))
+        return self.dim.slice(off, n)
+
+    def lookup(self, daily: pl.DataFrame) -> pl.DataFrame:
+        """daily (ticker, trading_day, ...) + market_cap_d point-in-time"""
+        tickers = daily["ticker"].unique()
+        if len(tickers) == 1:
+            joined = daily.join_asof(self.periods(tickers[0]).drop("ticker"),
+                                     left_on="trading_day", right_on="effective_from", strategy="backward")
+        else:
+            joined = daily.join_asof(self.dim, left_on="trading_day", right_on="effective_from",
+                                     by="ticker", strategy="backward")
+        return joined.select([
+            *daily.columns,
+            pl.when(pl.col("trading_day") < pl.col("effective_to"))
+            .then(pl.col("market_cap")).alias("market_cap_d"),
+        ])
+
+# Dimensión del worker (init_worker la abre una vez por proceso)
+_WORKER_DIM: Optional[CapDim] = None
+
+def init_worker(ipc_path: Optional[str]):
+    """initializer del Pool: mapea la dimensión una vez por proceso"""
+    global _WORKER_DIM
+    _WORKER_DIM = CapDim.open(Path(ipc_path)) if ipc_path else None
+
+def worker_dim() -> Optional[CapDim]:
+    return _WORKER_DIM
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+daily_agg.py
+Motor único 1-min -> diario (una sola pasada lazy), compartido por:
+
+  - build_daily_cache.py                  close_d, vol_d, dollar_vol_d, vwap_d, session_rows
+  - build_daily_ohlcv.py                  o, h, l, c, v
+  - build_daily_ohlcv_from_1m.py          o, h, l, c, v, n, dollar
+
+Layout 1-min: {intraday_root}/{TICKER}/year=YYYY/month=MM/minute.parquet
+(ticker, date, minute, t, o, h, l, c, v, n, vw [, et_minute]; ver ingest_ohlcv_intraday_minute.py y
+fase_B_ingesta_Daily_minut/minute_schema.py).
+
+- scan_ticker(): un scan_parquet con los meses del ticker (listado con scandir, sólo los meses
+  del rango). trading_day sale de la columna date: en el esquema tipado (date Date) es la propia
+  columna y el filtro de fechas va a las estadísticas del parquet; las particiones antiguas (Utf8
+  'YYYY-MM-DD', pendientes de tools/migrate_minute_typed.py) se parsean. Ficheros a medio migrar
+  se escanean por grupos de esquema (scan_minute_files).
+- daily_plan(): por ticker un group_by(trading_day) con todos los agregados pedidos en la misma
+  pasada, concatenados en un único plan lazy (más rápido que un group_by por (ticker, día) sobre
+  todos los minutos). Apertura/cierre = o/c del minuto con t mínimo/máximo (arg_min/arg_max: no
+  hace falta ordenar los minutos).
+- write_consolidated(): escribe un único parquet a partir de lotes de tickers (cada lote un plan),
+  con memoria acotada a un lote; cada lote se castea al esquema fijo (daily_schema() o el del primer
+  lote), tmp + os.replace (el tmp se borra si falla). Sin filas escribe un parquet vacío con el
+  esquema, para que no sobreviva un consolidado anterior.
+"""
+from __future__ import annotations
+import datetime as dt, os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import polars as pl
+import pyarrow.parquet as pq
+
+MINUTE_FILE = "minute.parquet"
+
+_first = pl.col("t").arg_min()
+_last = pl.col("t").arg_max()
+
+# Agregados disponibles (nombre -> expresión sobre los minutos de un ticker-día)
+DAILY_AGGS: Dict[str, pl.Expr] = {
+    "o": pl.col("o").get(_first),
+    "h": pl.col("h").max(),
+    "l": pl.col("l").min(),
+    "c": pl.col("c").get(_last),
+    "v": pl.col("v").sum(),
+    "n": pl.col("n").sum(),
+    "dollar": (pl.col("v") * pl.col("c")).sum(),        # sum(v*c)
+    "dollar_vw": (pl.col("v") * pl.col("vw")).sum(),    # sum(v*vw)
+    "session_rows": pl.col("n").count(),                # barras 1m
+}
+
+MINUTE_SCHEMA = {"ticker": pl.Utf8, "trading_day": pl.Date, "t": pl.Int64, "o": pl.Float64, "h": pl.Float64,
+                 "l": pl.Float64, "c": pl.Float64, "v": pl.Float64, "n": pl.Int64, "vw": pl.Float64}
+
+def list_tickers(intraday_root: Path) -> List[str]:
+    """Tickers con datos 1-min (ignora directorios auxiliares _*, p.ej. _batch_temp)"""
+    return sorted(e.name for e in os.scandir(intraday_root) if e.is_dir() and not e.name.startswith("_"))
+
+def minute_paths(intraday_root: Path, ticker: str,
+                 date_from: Optional[dt.date] = None, date_to: Optional[dt.date] = None) -> List[Path]:
+    """minute.parquet de un ticker, sólo los meses que solapan [date_from, date_to]"""
+    tdir = Path(intraday_root) / ticker
+    if not tdir.is_dir():
+        return []
+    lo = (date_from.year, date_from.month) if date_from else (0, 0)
+    hi = (date_to.year, date_to.month) if date_to else (9999, 12)
+    out = []
+    for ydir in os.scandir(tdir):
+        if not (ydir.is_dir() and ydir.name.startswith("year=")):
+            continue
+        for mdir in os.scandir(ydir.path):
+            if not (mdir.is_dir() and mdir.name.startswith("month=")):
+                continue
+            try:
+                ym = (int(ydir.name[5:]), int(mdir.name[6:]))
+            except ValueError:
+                continue
+            p = Path(mdir.path) / MINUTE_FILE
+            if lo <= ym <= hi and p.exists():
+                out.append(p)
+    return sorted(out)
+
+def _trading_day(dtype: pl.DataType) -> pl.Expr:
+    if dtype == pl.Utf8:
+        return pl.col("date").str.to_date("%Y-%m-%d")
+    if dtype == pl.Date:
+        return pl.col("date")
+    return pl.col("date").dt.date()
+
+def _typed_legacy(lf: pl.LazyFrame) -> pl.LazyFrame:
+    """date/minute en cadena -> Date/Datetime[ms] (para concatenar con particiones tipadas)"""
+    return lf.with_columns(pl.col("date").str.to_date("%Y-%m-%d"),
+                           pl.col("minute").str.to_datetime("%Y-%m-%d %H:%M", time_unit="ms"))
+
+def scan_minute_files(paths: List[Path]) -> pl.LazyFrame:
+    """
+    scan_parquet de minute.parquet + trading_day. Un scan por esquema de date si hay particiones
+    tipadas y antiguas mezcladas (las antiguas pasan a date Date / minute Datetime).
+    """
+    groups: Dict[pl.DataType, List[Path]] = {}
+    for p in paths:
+        groups.setdefault(pl.read_parquet_schema(p)["date"], []).append(p)
+    if len(groups) == 1:
+        dtype, = groups
+        return pl.scan_parquet(paths).with_columns(_trading_day(dtype).alias("trading_day"))
+    return pl.concat([
+        (_typed_legacy(pl.scan_parquet(ps)) if dtype == pl.Utf8 else pl.scan_parquet(ps))
+        .with_columns(pl.col("date").cast(pl.Date).alias("trading_day"))
+        for dtype, ps in groups.items()
+    ], how="diagonal_relaxed")
+
+def scan_ticker(intraday_root: Path, ticker: str,
+                date_from: Optional[dt.date] = None, date_to: Optional[dt.date] = None) -> Optional[pl.LazyFrame]:
+    """
+    Minutos de 1 ticker en [date_from, date_to]: un scan_parquet sobre sus meses del rango
+    (scan_minute_files), con ticker y trading_day (proyección/predicados se empujan al scan).
+    None si no hay ficheros.
+    """
+    paths = minute_paths(intraday_root, ticker, date_from, date_to)
+    if not paths:
+        return None
+    lf = scan_minute_files(paths).with_columns(pl.lit(ticker).alias("ticker"))
+    if date_from:
+        lf = lf.filter(pl.col("trading_day") >= date_from)
+    if date_to:
+        lf = lf.filter(pl.col("trading_day") <= date_to)
+    return lf
+
+def scan_minutes(intraday_root: Path, tickers: Iterable[str],
+                 date_from: Optional[dt.date] = None, date_to: Optional[dt.date] = None) -> pl.LazyFrame:
+    """Minutos de `tickers` como un único LazyFrame (concat de scan_ticker)"""
+    scans = [lf for t in tickers if (lf := scan_ticker(intraday_root, t, date_from, date_to)) is not None]
+    if not scans:
+        return pl.LazyFrame(schema=MINUTE_SCHEMA)
+    return pl.concat(scans, how="diagonal_relaxed")
+
+def aggregate_daily(minutes: pl.LazyFrame, aggs: Iterable[str]) -> pl.LazyFrame:
+    """Minutos arbitrarios -> ticker, trading_day + agregados DAILY_AGGS, ordenado"""
+    return (
+        minutes.group_by(["ticker", "trading_day"])
+        .agg([DAILY_AGGS[name].alias(name) for name in aggs])
+        .sort(["ticker", "trading_day"])
+    )
+
+def daily_plan(intraday_root: Path, tickers: Iterable[str], aggs: Iterable[str],
+               date_from: Optional[dt.date] = None, date_to: Optional[dt.date] = None) -> pl.LazyFrame:
+    """
+    Diario de `tickers` en un único plan: por ticker, scan de sus meses + group_by(trading_day)
+    (clave Date, sin clave string) y concat en orden de ticker. Salida: ticker, trading_day + aggs,
+    ordenada por ticker, trading_day.
+    """
+    aggs = list(aggs)
+    plans = []
+    for ticker in sorted(tickers):
+        lf = scan_ticker(intraday_root, ticker, date_from, date_to)
+        if lf is None:
+            continue
+        plans.append(
+            lf.group_by("trading_day")
+            .agg([DAILY_AGGS[name].alias(name) for name in aggs])
+            .sort("trading_day")
+            .select([pl.lit(ticker).alias("ticker"), "trading_day", *aggs])
+        )
+    if not plans:
+        return aggregate_daily(pl.LazyFrame(schema=MINUTE_SCHEMA), aggs)
+    return pl.concat(plans)
+
+def daily_schema(aggs: Iterable[str]) -> Dict[str, pl.DataType]:
+    """Esquema de salida de daily_plan/aggregate_daily (ticker, trading_day + aggs)"""
+    return dict(aggregate_daily(pl.LazyFrame(schema=MINUTE_SCHEMA), aggs).collect_schema())
+
+def batches(items: List[str], size: int) -> Iterable[List[str]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def write_consolidated(frames: Iterable[pl.DataFrame], outfile: Path,
+                       schema: Optional[Dict[str, pl.DataType]] = None) -> int:
+    """
+    Un único parquet a partir de lotes (uno o más row groups por lote, en el orden recibido).
+    Cada lote se castea a `schema` (por defecto el del primer lote no vacío): un lote con otro
+    dtype no aborta la escritura. Sin filas se escribe un parquet vacío con `schema` (o, sin
+    esquema conocido, se borra el outfile anterior). Devuelve filas escritas.
+    """
+    outfile = Path(outfile)
+    outfile.parent.mkdir(parents=True, exist_ok=True)
+    tmp = outfile.with_name(outfile.name + ".tmp")
+    writer, rows = None, 0
+    try:
+        for df in frames:
+            if df.is_empty():
+                continue
+            if schema is None:
+                schema = dict(df.schema)
+            table = df.select(list(schema)).cast(schema).to_arrow()
+            if writer is None:
+                writer = pq.ParquetWriter(tmp, table.schema, compression="zstd", compression_level=2)
+            writer.write_table(table)
+            rows += df.height
+        if writer is None and schema is not None:
+            pl.DataFrame(schema=schema).write_parquet(tmp, compression="zstd", compression_level=2)
+    except BaseException:
+        if writer is not None:
+            writer.close()
+        tmp.unlink(missing_ok=True)
+        raise
+    if writer is not None:
+        writer.close()
+    if schema is None:
+        outfile.unlink(missing_ok=True)   # sin lotes ni esquema: no queda un consolidado antiguo
+        return 0
+    os.replace(tmp, outfile)
+    return rows
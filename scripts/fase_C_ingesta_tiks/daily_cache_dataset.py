@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+daily_cache_dataset.py
+Vista por fecha del cache diario (build_daily_cache.py) para lecturas por rango de fechas.
+
+El cache se escribe por ticker ({cache}/ticker=XYZ/daily.parquet, sin estadísticas): una consulta de
+1 semana tenía que abrir los ~10k ficheros. Aquí se materializa además:
+
+  {cache}/_by_date/year=YYYY/month=MM/part-0.parquet    ordenado por trading_day, ticker, con
+                                                         estadísticas y row groups de ~ROW_GROUP_ROWS
+  {cache}/_by_date/_STATE.parquet                        por ticker: mtime/size de daily.parquet,
+                                                         primer/último día, filas y digest de filas
+
+- compact(): sincroniza la vista con los ficheros por ticker. Sólo lee los tickers cuyo daily.parquet
+  cambió (mtime/size). Si las filas hasta el último día compactado no cambiaron (digest), el cambio
+  es un append (build_daily_cache --incremental) y sólo se reescriben los meses de las filas nuevas;
+  si no, se reemplazan todos los meses del ticker. Lectura por lotes de tickers con staging por mes
+  (memoria acotada a un lote); cada mes afectado se reescribe una vez (tmp + os.replace).
+- scan_by_date(): LazyFrame con sólo los meses del rango (el resto de ficheros ni se abre) y el
+  filtro de fechas empujado a los row groups.
+- stale_tickers(): tickers cuyo daily.parquet no coincide con _STATE (escritos con --no-compact u
+  otra herramienta); los lectores (load_cache_for_range) compactan antes de usar la vista.
+
+Uso:
+  python daily_cache_dataset.py --daily-cache processed/daily_cache          # sync incremental
+  python daily_cache_dataset.py --daily-cache processed/daily_cache --full   # reconstruir
+"""
+from __future__ import annotations
+import argparse, datetime as dt, os, shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import polars as pl
+
+BY_DATE_DIR = "_by_date"
+STATE_FILE = "_STATE.parquet"
+STAGING_DIR = "_staging"
+PART_FILE = "part-0.parquet"
+ROW_GROUP_ROWS = 64 * 1024
+TICKER_BATCH = 500
+
+STATE_SCHEMA = {"ticker": pl.Utf8, "mtime_ns": pl.Int64, "size": pl.Int64, "first_day": pl.Date,
+                "last_day": pl.Date, "rows": pl.Int64, "digest": pl.UInt64}
+
+def log(msg: str):
+    print(f"[{dt.datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
+
+def month_path(root: Path, year: int, month: int) -> Path:
+    return root / f"year={year}" / f"month={month:02d}" / PART_FILE
+
+def months_between(first: dt.date, last: dt.date) -> List[Tuple[int, int]]:
+    out, (y, m) = [], (first.year, first.month)
+    while (y, m) <= (last.year, last.month):
+        out.append((y, m))
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return out
+
+def list_month_files(root: Path, date_from: Optional[dt.date] = None,
+                     date_to: Optional[dt.date] = None) -> List[Path]:
+    """part-0.parquet de los meses que solapan [date_from, date_to] (listado de directorios)"""
+    lo = (date_from.year, date_from.month) if date_from else (0, 0)
+    hi = (date_to.year, date_to.month) if date_to else (9999, 12)
+    out = []
+    if not root.is_dir():
+        return out
+    for ydir in os.scandir(root):
+        if not (ydir.is_dir() and ydir.name.startswith("year=")):
+            continue
+        for mdir in os.scandir(ydir.path):
+            if not (mdir.is_dir() and mdir.name.startswith("month=")):
+                continue
+            try:
+                ym = (int(ydir.name[5:]), int(mdir.name[6:]))
+            except ValueError:
+                continue
+            p = Path(mdir.path) / PART_FILE
+            if lo <= ym <= hi and p.exists():
+                out.append(p)
+    return sorted(out)
+
+def ticker_files(cache_root: Path) -> Dict[str, os.stat_result]:
+    """{ticker: stat de daily.parquet} de los ticker=XYZ con _SUCCESS"""
+    out = {}
+    for e in os.scandir(cache_root):
+        if not (e.is_dir() and e.name.startswith("ticker=")):
+            continue
+        p = os.path.join(e.path, "daily.parquet")
+        if os.path.exists(os.path.join(e.path, "_SUCCESS")) and os.path.exists(p):
+            out[e.name[7:]] = os.stat(p)
+    return out
+
+def read_ticker(cache_root: Path, ticker: str) -> pl.DataFrame:
+    df = pl.read_parquet(cache_root / f"ticker={ticker}" / "daily.parquet")
+    # market_cap_d es Null (sin dimensión) en caches antiguos
+    return df.with_columns(pl.col("market_cap_d").cast(pl.Float64)).sort("trading_day")
+
+def digest(df: pl.DataFrame) -> int:
+    """Digest de filas independiente del orden (suma uint64 de hash_rows)"""
+    if df.is_empty():
+        return 0
+    return int(df.hash_rows(seed=0).to_numpy().sum(dtype=np.uint64))
+
+def load_state(root: Path) -> pl.DataFrame:
+    p = root / STATE_FILE
+    return pl.read_parquet(p) if p.exists() else pl.DataFrame(schema=STATE_SCHEMA)
+
+def _diff(state: Dict[str, dict], files: Dict[str, os.stat_result]) -> Tuple[List[str], List[str]]:
+    """(tickers nuevos o con mtime/size distinto al de _STATE, tickers de _STATE ya sin fichero)"""
+    changed = sorted(t for t, st in files.items()
+                     if t not in state or (state[t]["mtime_ns"], state[t]["size"]) != (st.st_mtime_ns, st.st_size))
+    return changed, sorted(set(state) - set(files))
+
+def stale_tickers(cache_root: Path) -> Tuple[List[str], List[str]]:
+    """(cambiados, eliminados) respecto a la vista por fecha: vacíos si la vista está al día"""
+    state = {r["ticker"]: r for r in load_state(Path(cache_root) / BY_DATE_DIR).iter_rows(named=True)}
+    return _diff(state, ticker_files(Path(cache_root)))
+
+def _write(df: pl.DataFrame, path: Path, **kw):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    df.write_parquet(tmp, compression="zstd", compression_level=2, **kw)
+    os.replace(tmp, path)
+
+def compact(cache_root: Path, full: bool = False, batch_size: int = TICKER_BATCH) -> dict:
+    """
+    Sincroniza {cache}/_by_date con los daily.parquet por ticker.
+    Devuelve resumen: tickers leídos / append / reemplazados / eliminados, meses reescritos.
+    """
+    cache_root = Path(cache_root)
+    root = cache_root / BY_DATE_DIR
+    if full and root.exists():
+        shutil.rmtree(root)
+    staging = root / STAGING_DIR
+    if staging.exists():
+        shutil.rmtree(staging)   # staging de una compactación interrumpida
+
+    state = {r["ticker"]: r for r in load_state(root).iter_rows(named=True)}
+    files = ticker_files(cache_root)
+    changed, removed = _diff(state, files)
+
+    # Meses donde hay que quitar TODAS las filas previas del ticker (reemplazo completo / eliminado)
+    drop: Dict[Tuple[int, int], Set[str]] = {}
+    def drop_range(ticker: str, prev: dict):
+        if prev["first_day"] is None:
+            return
+        for ym in months_between(prev["first_day"], prev["last_day"]):
+            drop.setdefault(ym, set()).add(ticker)
+
+    for t in removed:
+        drop_range(t, state.pop(t))
+
+    n_append = n_replace = 0
+    for b, start in enumerate(range(0, len(changed), batch_size)):
+        staged = []
+        for t in changed[start:start + batch_size]:
+            df = read_ticker(cache_root, t)
+            prev = state.get(t)
+            if prev is not None and prev["rows"] > 0:
+                head = df.filter(pl.col("trading_day") <= prev["last_day"])
+                if head.height == prev["rows"] and digest(head) == prev["digest"]:
+                    new_rows = df.filter(pl.col("trading_day") > prev["last_day"])   # append
+                    n_append += 1
+                else:
+                    drop_range(t, prev)
+                    new_rows = df
+                    n_replace += 1
+            else:
+                new_rows = df
+                n_replace += 1
+            staged.append(new_rows)
+            st = files[t]
+            state[t] = {"ticker": t, "mtime_ns": st.st_mtime_ns, "size": st.st_size,
+                        "first_day": df["trading_day"].min(), "last_day": df["trading_day"].max(),
+                        "rows": df.height, "digest": digest(df)}
+        batch = pl.concat(staged, how="vertical_relaxed") if staged else pl.DataFrame()
+        if batch.is_empty():
+            continue
+        batch = batch.with_columns(pl.col("trading_day").dt.year().alias("_y"),
+                                   pl.col("trading_day").dt.month().alias("_m"))
+        for (y, m), part in batch.group_by(["_y", "_m"]):
+            _write(part.drop(["_y", "_m"]), staging / f"year={y}" / f"month={m:02d}" / f"batch-{b:05d}.parquet")
+
+    # Meses afectados: previos sin filas quitadas/reemplazadas + filas nuevas en staging
+    dirty = set(drop)
+    for p in staging.glob("year=*/month=*") if staging.exists() else []:
+        dirty.add((int(p.parent.name[5:]), int(p.name[6:])))
+
+    for (y, m) in sorted(dirty):
+        path = month_path(root, y, m)
+        frames = []
+        if path.exists():
+            old = pl.read_parquet(path)
+            if (y, m) in drop:
+                old = old.filter(~pl.col("ticker").is_in(list(drop[(y, m)])))
+            frames.append(old)
+        sdir = staging / f"year={y}" / f"month={m:02d}"
+        if sdir.exists():
+            new = pl.concat([pl.read_parquet(p) for p in sorted(sdir.glob("*.parquet"))], how="vertical_relaxed")
+            if frames:
+                frames[0] = frames[0].join(new.select(["ticker", "trading_day"]), on=["ticker", "trading_day"], how="anti")
+            frames.append(new)
+        out = pl.concat(frames, how="vertical_relaxed") if frames else pl.DataFrame()
+        if out.is_empty():
+            if path.exists():
+                shutil.rmtree(path.parent)
+            continue
+        _write(out.sort(["trading_day", "ticker"]), path, statistics=True, row_group_size=ROW_GROUP_ROWS)
+
+    if staging.exists():
+        shutil.rmtree(staging)
+    state_df = pl.DataFrame(list(state.values()), schema=STATE_SCHEMA, orient="row").sort("ticker")
+    _write(state_df, root / STATE_FILE)
+
+    return {"tickers_read": len(changed), "appended": n_append, "replaced": n_replace,
+            "removed": len(removed), "months_written": len(dirty)}
+
+def has_by_date(cache_root: Path) -> bool:
+    return (Path(cache_root) / BY_DATE_DIR / STATE_FILE).exists()
+
+def scan_by_date(cache_root: Path, date_from: dt.date, date_to: dt.date) -> Optional[pl.LazyFrame]:
+    """Filas del cache en [date_from, date_to] desde la vista por fecha (None si no existe)"""
+    root = Path(cache_root) / BY_DATE_DIR
+    if not has_by_date(cache_root):
+        return None
+    paths = list_month_files(root, date_from, date_to)
+    if not paths:
+        any_file = next(iter(list_month_files(root)), None)
+        schema = pl.read_parquet_schema(any_file) if any_file else {"ticker": pl.Utf8, "trading_day": pl.Date}
+        return pl.LazyFrame(schema=schema)
+    return (
+        pl.scan_parquet(paths)
+        .filter((pl.col("trading_day") >= date_from) & (pl.col("trading_day") <= date_to))
+    )
+
+def main():
+    ap = argparse.ArgumentParser(description="Compacta el cache diario por ticker en la vista por fecha")
+    ap.add_argument("--daily-cache", required=True, help="processed/daily_cache")
+    ap.add_argument("--full", action="store_true", help="Reconstruir la vista desde cero")
+    ap.add_argument("--batch-size", type=int, default=TICKER_BATCH, help="Tickers por lote de lectura")
+    args = ap.parse_args()
+
+    summary = compact(Path(args.daily_cache), full=args.full, batch_size=args.batch_size)
+    log(f"Compactación {Path(args.daily_cache) / BY_DATE_DIR}: {summary}")
+
+if __name__ == "__main__":
+    main()
@@ -15,18 +15,23 @@ Uso:
     --lookback-years 10 \
     --workers 4 \
     --rate-limit 0.5 \
-    --resume
+    --resume [--task-db raw/polygon/tasks.sqlite]
+
+--task-db: estado por tarea (ticker x timeframe) en SQLite (polygon_taskdb.py); al reanudar sólo se
+ejecutan las pendientes o fallidas.
 """
 
 import os, sys, time, argparse
 from pathlib import Path
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 import polars as pl
 import requests
 import certifi
 
+from polygon_taskdb import TaskDB, plan_id
+
 API_BASE = "https://api.polygon.io"
 TIMEOUT = (10, 60)  # connect, read
 
@@ -97,14 +102,15 @@ def backoff_sleep(k: int, kind: str, base: float) -> float:
 
 def download_financials(session: requests.Session, ticker: str, timeframe: str,
                        limit: int, outdir: Path, api_key: str, rate_limit: float,
-                       resume: bool):
+                       resume: bool) -> Tuple[str, int, Optional[str]]:
     """
     Download financials for one ticker and one timeframe (quarterly or annual).
+    Returns (status ok|skip|error, periods, error) for the task DB.
     """
     timeframe_path = outdir / ticker / timeframe
     if resume and exists_success(timeframe_path):
         log(f"{ticker} {timeframe}: resume skip (_SUCCESS)")
-        return
+        return "skip", 0, None
 
     records: List[dict] = []
     base_sleep = rate_limit
@@ -197,9 +203,11 @@ def download_financials(session: requests.Session, ticker: str, timeframe: str,
         to_parquet_financials(out_parquet, records)
         success_marker(timeframe_path)
         log(f"{ticker} {timeframe}: OK ({len(records)} periods)")
+        return "ok", len(records), None
 
     except Exception as e:
         log(f"{ticker} {timeframe}: ERROR {e}")
+        return "error", 0, str(e)
 
 def parse_args():
     ap = argparse.ArgumentParser(description="Descarga optimizada de financials Polygon")
@@ -211,6 +219,8 @@ def parse_args():
     ap.add_argument("--rate-limit", type=float, default=0.5, help="Segundos entre requests")
     ap.add_argument("--workers", type=int, default=4, help="Procesos concurrentes")
     ap.add_argument("--resume", action="store_true")
+    ap.add_argument("--task-db", default=None, help="SQLite con estado por tarea (polygon_taskdb.py)")
+    ap.add_argument("--max-attempts", type=int, default=None, help="[task-db] no reintentar tareas con >= N intentos")
     return ap.parse_args()
 
 def chunked(lst: List, size: int) -> List[List]:
@@ -222,12 +232,14 @@ def run_batch_worker(args_tuple):
     session = build_session()
     results = []
     for (ticker, timeframe, limit) in batch_tasks:
+        t0 = time.time()
         try:
-            download_financials(session, ticker, timeframe, limit, outdir, api_key, rate_limit, resume)
-            results.append((ticker, timeframe, "ok"))
+            status, periods, err = download_financials(session, ticker, timeframe, limit, outdir, api_key,
+                                                       rate_limit, resume)
         except Exception as e:
             log(f"ERROR in worker: {ticker} {timeframe}: {e}")
-            results.append((ticker, timeframe, f"error: {e}"))
+            status, periods, err = "error", 0, str(e)
+        results.append((ticker, timeframe, status, periods, time.time() - t0, err))
     return results
 
 def main():
@@ -250,6 +262,20 @@ def main():
 
     log(f"Tickers: {len(tickers):,} | Tareas: {len(tasks):,} (timeframes: {args.timeframes})")
 
+    taskdb = None
+    if args.task_db:
+        taskdb = TaskDB(Path(args.task_db))
+        fresh = taskdb.count("financials") == 0
+        # las pendientes se limitan a este plan (tickers x timeframes del run), no a todo el endpoint
+        run_plan = plan_id()
+        taskdb.plan_rows("financials", ((t, tf, "financials", None, None) for t, tf, _ in tasks), run_plan)
+        if fresh and args.resume:
+            log(f"Task DB: {taskdb.import_success('financials', outdir):,} tareas ya completadas en disco")
+        limits = {tf: lim for _, tf, lim in tasks}
+        tasks = [(t, tf, limits[tf])
+                 for t, tf, *_ in taskdb.pending_rows("financials", args.max_attempts, run_plan)]
+        log(f"Task DB {args.task_db}: pendientes {len(tasks):,}")
+
     # Execute in micro-batches
     BATCH = 10  # 10 tasks per micro-batch
     rate_limit = args.rate_limit
@@ -272,7 +298,10 @@ def main():
             done += 1
             try:
                 results = f.result()
-                ok_count = sum(1 for r in results if r[2] == "ok")
+                if taskdb is not None:
+                    taskdb.record("financials", [(t, tf, st, n, None, secs, err)
+                                                 for t, tf, st, n, secs, err in results])
+                ok_count = sum(1 for r in results if r[2] != "error")
                 err_count = len(results) - ok_count
                 total_ok += ok_count
                 total_err += err_count
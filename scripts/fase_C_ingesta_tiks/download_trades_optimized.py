@@ -6,6 +6,12 @@ Descarga trades (ticks) de Polygon con:
 - Modo 1 (months): por meses completos, ideal 12–24 meses de validación
 - Modo 2 (watchlists): sólo días info-rich con expansión de ventana temporal (máxima eficiencia)
 Optimizado: PAGE_LIMIT=50k, keep-alive, ZSTD, _SUCCESS, resume, backoff diferenciando errores.
+Cada página JSON se decodifica directamente a columnas tipadas (esquema fijo t_raw/t_unit/...)
+y se escribe en streaming: cada página se añade como row group a trades.parquet.partial y se renombra
+de forma atómica al terminar (RAM acotada por página, no por mes). Ver polygon_parquet.py.
+Task DB (--task-db raw/polygon/tasks.sqlite): estado/intentos/filas/bytes/latencia por tarea en SQLite
+(polygon_taskdb.py); al reanudar sólo se ejecutan las tareas pendientes o fallidas, sin sondear _SUCCESS
+tarea a tarea. retry_failed_trades.py --task-db reintenta las fallidas.
 
 Uso (months):
   python download_trades_optimized.py \
@@ -32,6 +38,10 @@ Uso (watchlists) - SIN VENTANA (solo día evento):
     --mode watchlists --event-window 0 \
     --page-limit 50000 --rate-limit 0.15 --workers 8 --resume
 
+Motor async (--engine async): un solo proceso con aiohttp (keep-alive), --concurrency peticiones en vuelo
+y un token bucket global --max-rps con backoff adaptativo ante 429 (ver polygon_async.py). Mismo layout
+y _SUCCESS/resume. Para pruebas locales: fake_polygon_server.py + --api-base http://127.0.0.1:8765
+
 event-window:
   - 0: Solo el día del evento E0
   - 1: ±1 día (evento E0 + día anterior + día posterior) [DEFAULT - RECOMENDADO]
@@ -48,6 +58,10 @@ import polars as pl
 import requests
 import certifi
 
+from polygon_parquet import SCHEMAS, Page, StreamingParquetWriter, cleanup_partials, decode_page
+from polygon_taskdb import open_queue, plan_key, task_part
+from watchlist_index import INDEX_FILE, load_info_rich_days, refresh_index
+
 # Cargar variables de entorno desde .env si existe
 try:
     from dotenv import load_dotenv
@@ -95,57 +109,6 @@ def load_tickers(csv_path: Path) -> List[str]:
     col = "ticker" if "ticker" in df.columns else df.columns[0]
     return df[col].unique().to_list()
 
-def load_info_rich_days(watchlist_root: Path, dfrom: date, dto: date, allowed_tickers: Optional[set], event_window: int = 1) -> Dict[str, List[date]]:
-    """
-    Lee todos los watchlist.parquet en [dfrom, dto] y devuelve {ticker: [dates...]} para info_rich True
-
-    Args:
-        watchlist_root: Directorio raíz de watchlists
-        dfrom: Fecha inicio
-        dto: Fecha fin
-        allowed_tickers: Set de tickers permitidos (None = todos)
-        event_window: Días extra antes/después del evento E0 (default=1 para ±1 día)
-
-    Returns:
-        Dict[ticker] = [list of dates] con expansión de ventana aplicada
-
-    Example:
-        Si event_window=1 y detecta E0 en 2020-03-16:
-        - Descarga: [2020-03-15, 2020-03-16, 2020-03-17]
-        Si event_window=0:
-        - Descarga: [2020-03-16] (solo el día del evento)
-    """
-    out: Dict[str, List[date]] = {}
-    today = date.today()
-    # paths tipo: processed/universe/info_rich/daily/date=YYYY-MM-DD/watchlist.parquet
-    for day in (dfrom + timedelta(n) for n in range((dto - dfrom).days + 1)):
-        # Skip future dates (bug fix: avoid API 400 errors for dates > today)
-        if day > today:
-            continue
-        p = watchlist_root / f"date={day.isoformat()}" / "watchlist.parquet"
-        if not p.exists():
-            continue
-        df = pl.read_parquet(p)
-        if "info_rich" not in df.columns:
-            continue
-        sub = df.filter(pl.col("info_rich") == True).select(["ticker"])
-        if allowed_tickers:
-            sub = sub.filter(pl.col("ticker").is_in(list(allowed_tickers)))
-        for t in sub["ticker"].to_list():
-            # EXPANDE LA VENTANA: agrega day-window, day, day+window
-            for offset in range(-event_window, event_window + 1):
-                expanded_day = day + timedelta(days=offset)
-                # Valida que la fecha expandida esté en el rango y no sea futura
-                if expanded_day >= dfrom and expanded_day <= dto and expanded_day <= today:
-                    if expanded_day not in out.get(t, []):
-                        out.setdefault(t, []).append(expanded_day)
-
-    # Ordena fechas por ticker para mejor logging
-    for t in out:
-        out[t] = sorted(out[t])
-
-    return out
-
 def success_marker(path: Path):
     (path / "_SUCCESS").touch(exist_ok=True)
 
@@ -153,7 +116,7 @@ def exists_success(path: Path) -> bool:
     return (path / "_SUCCESS").exists()
 
 def http_get_trades(session: requests.Session, ticker: str, t_from_iso: str, t_to_iso: str,
-                    page_limit: int, api_key: str, cursor: Optional[str] = None) -> dict:
+                    page_limit: int, api_key: str, cursor: Optional[str] = None) -> Page:
     # v3 trades con timestamp range; usa paginación por cursor
     url = f"{API_BASE}/v3/trades/{ticker}"
     params = {
@@ -169,57 +132,12 @@ def http_get_trades(session: requests.Session, ticker: str, t_from_iso: str, t_t
         params["cursor"] = cursor
     r = session.get(url, params=params, headers=headers, timeout=TIMEOUT)
     r.raise_for_status()
-    return r.json()
-
-def to_parquet_trades(out_parquet: Path, records: List[dict]):
-    if not records:
-        # crea parquet vacío con esquema mínimo
-        # CRITICAL FIX: Save timestamp as Int64 (t_raw) not Datetime to avoid "year 52XXX" corruption
-        schema = {
-            "tx": pl.Utf8, "t_raw": pl.Int64, "t_unit": pl.Utf8, "p": pl.Float64, "s": pl.Int64, "c": pl.List(pl.Utf8)
-        }
-        pl.DataFrame(schema=schema).write_parquet(out_parquet, compression="zstd", compression_level=2, statistics=False)
-        return
-    # Campos típicos v3: sip_timestamp (t), price (p), size (s), conditions (c), exchange (x)...
-    df = pl.from_records(records)
-    # Normalización de columnas
-    cols = df.columns
-    mapping = {}
-    if "sip_timestamp" in cols: mapping["sip_timestamp"] = "t"
-    if "price" in cols:         mapping["price"]         = "p"
-    if "size" in cols:          mapping["size"]          = "s"
-    if "conditions" in cols:    mapping["conditions"]    = "c"
-    if mapping:
-        df = df.rename(mapping)
-
-    # CRITICAL FIX: Save timestamp as Int64 + time_unit metadata
-    # Polygon API returns inconsistent scales (ns, us, ms) - detect and save metadata
-    if "t" in df.columns:
-        # Cast to Int64 WITHOUT datetime conversion (preserves raw value)
-        df = df.with_columns([
-            pl.col("t").cast(pl.Int64).alias("t_raw")
-        ])
-
-        # Detect time unit by magnitude (avoid "year 52XXX" corruption)
-        max_ts = int(df["t_raw"].max())
-        if max_ts > 1e17:
-            time_unit = "ns"  # nanoseconds (1e18)
-        elif max_ts > 1e14:
-            time_unit = "us"  # microseconds (1e15)
-        else:
-            time_unit = "ms"  # milliseconds (1e12)
+    # JSON -> columnas tipadas (esquema declarado), sin lista de dicts
+    return decode_page(r.content, "trades")
 
-        # Save time_unit as metadata column
-        df = df.with_columns([
-            pl.lit(time_unit).alias("t_unit")
-        ])
-
-        # Drop original 't' column (keep only t_raw + t_unit)
-        df = df.drop("t")
-
-    # Escribe
-    out_parquet.parent.mkdir(parents=True, exist_ok=True)
-    df.write_parquet(out_parquet, compression="zstd", compression_level=2, statistics=False)
+def trades_writer(out_parquet: Path) -> StreamingParquetWriter:
+    """Escritor página a página (row group por página, .partial + rename atómico)."""
+    return StreamingParquetWriter(out_parquet, SCHEMAS["trades"])
 
 def backoff_sleep(k: int, kind: str, base: float) -> float:
     # Diferencia SSL / memoria / 429
@@ -233,8 +151,9 @@ def backoff_sleep(k: int, kind: str, base: float) -> float:
 
 def download_span(session: requests.Session, ticker: str, span_from: date, span_to: date,
                   outdir: Path, page_limit: int, api_key: str, rate_limit: float,
-                  layout: str, resume: bool):
+                  layout: str, resume: bool) -> Tuple[str, int, int, Optional[str]]:
     """
+    Devuelve (status ok|skip|error, filas, bytes recibidos, error) para la task DB.
     layout:
      - "months": escribe a year=YYYY/month=MM
      - "watchlists": escribe a date=YYYY-MM-DD (día a día)
@@ -245,14 +164,16 @@ def download_span(session: requests.Session, ticker: str, span_from: date, span_
         month_path = outdir / ticker / f"year={y:04d}" / f"month={m:02d}"
         if resume and exists_success(month_path):
             log(f"{ticker} {y}-{m:02d}: resume skip (_SUCCESS)")
-            return
-        records: List[dict] = []
+            return "skip", 0, 0, None
+        cleanup_partials(month_path)
+        writer = trades_writer(month_path / "trades.parquet")
         cursor = None
+        nbytes = 0
         base_sleep = rate_limit
         try:
             while True:
                 try:
-                    data = http_get_trades(session, ticker, span_from.isoformat(), span_to.isoformat(),
+                    page = http_get_trades(session, ticker, span_from.isoformat(), span_to.isoformat(),
                                            page_limit, api_key, cursor)
                 except requests.HTTPError as e:
                     code = e.response.status_code if e.response is not None else 0
@@ -271,27 +192,23 @@ def download_span(session: requests.Session, ticker: str, span_from: date, span_
                     log(f"{ticker} {y}-{m:02d}: NET {e} -> sleep {sl}s")
                     time.sleep(sl); continue
 
-                r = data.get("results", [])
-                if r:
-                    records.extend(r)
-                cursor = data.get("next_url") or data.get("nextUrl") or data.get("next_url".upper())
-                # Polygon suele devolver next_url completo; extrae cursor si procede
-                if cursor and "cursor=" in cursor:
-                    cursor = cursor.split("cursor=")[-1]
-                else:
-                    cursor = data.get("next_page_token") or None
+                writer.write_table(page.table)
+                nbytes += page.nbytes
+                cursor = page.cursor
 
                 time.sleep(rate_limit)
                 if not cursor:
                     break
 
-            out_parquet = month_path / "trades.parquet"
-            to_parquet_trades(out_parquet, records)
+            n = writer.close()
             success_marker(month_path)
-            log(f"{ticker} {y}-{m:02d}: OK ({len(records):,} trades)")
+            log(f"{ticker} {y}-{m:02d}: OK ({n:,} trades, {writer.pages} páginas)")
+            return "ok", n, nbytes, None
 
         except Exception as e:
+            writer.abort()
             log(f"{ticker} {y}-{m:02d}: ERROR {e}")
+            return "error", 0, nbytes, str(e)
 
     else:
         # layout watchlists: un parquet por día (date=YYYY-MM-DD)
@@ -299,14 +216,16 @@ def download_span(session: requests.Session, ticker: str, span_from: date, span_
         day_path = outdir / ticker / f"date={d.isoformat()}"
         if resume and exists_success(day_path):
             log(f"{ticker} {d}: resume skip (_SUCCESS)")
-            return
-        records: List[dict] = []
+            return "skip", 0, 0, None
+        cleanup_partials(day_path)
+        writer = trades_writer(day_path / "trades.parquet")
         cursor = None
+        nbytes = 0
         base_sleep = rate_limit
         try:
             while True:
                 try:
-                    data = http_get_trades(session, ticker, d.isoformat(), (d + timedelta(days=1)).isoformat(),
+                    page = http_get_trades(session, ticker, d.isoformat(), (d + timedelta(days=1)).isoformat(),
                                            page_limit, api_key, cursor)
                 except requests.HTTPError as e:
                     code = e.response.status_code if e.response is not None else 0
@@ -324,27 +243,23 @@ def download_span(session: requests.Session, ticker: str, span_from: date, span_
                     log(f"{ticker} {d}: NET {e} -> sleep {sl}s")
                     time.sleep(sl); continue
 
-                r = data.get("results", [])
-                if r:
-                    records.extend(r)
-
-                cursor = data.get("next_url") or data.get("nextUrl") or data.get("next_url".upper())
-                if cursor and "cursor=" in cursor:
-                    cursor = cursor.split("cursor=")[-1]
-                else:
-                    cursor = data.get("next_page_token") or None
+                writer.write_table(page.table)
+                nbytes += page.nbytes
+                cursor = page.cursor
 
                 time.sleep(rate_limit)
                 if not cursor:
                     break
 
-            out_parquet = day_path / "trades.parquet"
-            to_parquet_trades(out_parquet, records)
+            n = writer.close()
             success_marker(day_path)
-            log(f"{ticker} {d}: OK ({len(records):,} trades)")
+            log(f"{ticker} {d}: OK ({n:,} trades, {writer.pages} páginas)")
+            return "ok", n, nbytes, None
 
         except Exception as e:
+            writer.abort()
             log(f"{ticker} {d}: ERROR {e}")
+            return "error", 0, nbytes, str(e)
 
 def parse_args():
     ap = argparse.ArgumentParser(description="Descarga optimizada de trades Polygon")
@@ -362,7 +277,21 @@ def parse_args():
     ap.add_argument("--rate-limit", type=float, default=0.15)
     ap.add_argument("--workers", type=int, default=8, help="Procesos concurrentes")
     ap.add_argument("--resume", action="store_true")
-    return ap.parse_args()
+    ap.add_argument("--engine", choices=["process","async"], default="process",
+                    help="process: ProcessPool + requests (original) | async: un proceso, aiohttp + token bucket global")
+    ap.add_argument("--max-rps", type=float, default=50.0, help="[async] presupuesto global de peticiones/seg")
+    ap.add_argument("--concurrency", type=int, default=32, help="[async] peticiones en vuelo")
+    ap.add_argument("--api-base", default=None,
+                    help=f"[async] base URL (default {API_BASE}; p.ej. fake_polygon_server.py local)")
+    ap.add_argument("--task-db", default=None,
+                    help="SQLite con estado por tarea (polygon_taskdb.py): sólo se ejecutan las pendientes/fallidas")
+    ap.add_argument("--max-attempts", type=int, default=None, help="[task-db] no reintentar tareas con >= N intentos")
+    ap.add_argument("--replan", action="store_true", help="[task-db] re-planificar aunque el plan no haya cambiado")
+    args = ap.parse_args()
+    if args.api_base is not None and args.engine != "async":
+        ap.error("--api-base sólo lo usa --engine async (el engine process llama siempre a la API real)")
+    args.api_base = args.api_base or API_BASE
+    return args
 
 def chunked(lst: List[str], size: int) -> List[List[str]]:
     return [lst[i:i+size] for i in range(0, len(lst), size)]
@@ -373,12 +302,14 @@ def run_batch_worker(args_tuple):
     session = build_session()
     results = []
     for (t, a, b, layout) in batch_tasks:
+        t0 = time.time()
         try:
-            download_span(session, t, a, b, outdir, page_limit, api_key, rate_limit, layout, resume)
-            results.append((t, a, b, "ok"))
+            status, rows, nbytes, err = download_span(session, t, a, b, outdir, page_limit, api_key,
+                                                      rate_limit, layout, resume)
         except Exception as e:
             log(f"ERROR in worker: {t} {a}: {e}")
-            results.append((t, a, b, f"error: {e}"))
+            status, rows, nbytes, err = "error", 0, 0, str(e)
+        results.append((t, a, b, layout, status, rows, nbytes, time.time() - t0, err))
     return results
 
 def main():
@@ -400,29 +331,57 @@ def main():
     dfrom = datetime.strptime(args.date_from, "%Y-%m-%d").date()
     dto   = datetime.strptime(args.date_to, "%Y-%m-%d").date()
 
-    # Construye tareas (ticker × spans)
-    tasks: List[Tuple[str, date, date, str]] = []
-    if args.mode == "months":
-        if not args.tickers_csv:
-            sys.exit("ERROR: modo 'months' requiere --tickers-csv")
-        spans = month_iter(dfrom, dto)
-        for t in tickers:
-            for (a,b) in spans:
-                tasks.append((t, a, b, "months"))
-    else:
-        # watchlists: sólo días info-rich (con expansión de ventana si event_window > 0)
-        days_by_ticker = load_info_rich_days(Path(args.watchlist_root), dfrom, dto, allowed_tickers, args.event_window)
-        for t, days in days_by_ticker.items():
-            for d in days:
-                tasks.append((t, d, d, "watchlists"))
-
-        # Log con información de expansión
-        if args.event_window > 0:
-            log(f"Tareas (watchlists): {sum(len(v) for v in days_by_ticker.values()):,} días total "
-                f"(eventos E0 expandidos con ventana ±{args.event_window} día{'s' if args.event_window > 1 else ''}) "
-                f"en {len(days_by_ticker)} tickers")
+    def build_tasks() -> List[Tuple[str, date, date, str]]:
+        # Construye tareas (ticker × spans)
+        tasks: List[Tuple[str, date, date, str]] = []
+        if args.mode == "months":
+            if not args.tickers_csv:
+                sys.exit("ERROR: modo 'months' requiere --tickers-csv")
+            spans = month_iter(dfrom, dto)
+            for t in tickers:
+                for (a,b) in spans:
+                    tasks.append((t, a, b, "months"))
         else:
-            log(f"Tareas (watchlists): {sum(len(v) for v in days_by_ticker.values()):,} días info-rich en {len(days_by_ticker)} tickers")
+            # watchlists: sólo días info-rich (con expansión de ventana si event_window > 0),
+            # desde el índice consolidado (watchlist_index.py)
+            days_by_ticker = load_info_rich_days(Path(args.watchlist_root), dfrom, dto, allowed_tickers, args.event_window)
+            for t, days in days_by_ticker.items():
+                for d in days:
+                    tasks.append((t, d, d, "watchlists"))
+
+            # Log con información de expansión
+            if args.event_window > 0:
+                log(f"Tareas (watchlists): {sum(len(v) for v in days_by_ticker.values()):,} días total "
+                    f"(eventos E0 expandidos con ventana ±{args.event_window} día{'s' if args.event_window > 1 else ''}) "
+                    f"en {len(days_by_ticker)} tickers")
+            else:
+                log(f"Tareas (watchlists): {sum(len(v) for v in days_by_ticker.values()):,} días info-rich en {len(days_by_ticker)} tickers")
+        return tasks
+
+    taskdb = None
+    if args.task_db:
+        # Con plan sin cambios (mismos argumentos y entradas) no se reconstruyen las tareas.
+        # El índice info-rich se refresca antes: su mtime cambia si se reescribió algún watchlist
+        if args.mode == "watchlists":
+            refresh_index(Path(args.watchlist_root))
+        key = plan_key("trades", args.mode, dfrom, dto, args.event_window,
+                       Path(args.tickers_csv) if args.tickers_csv else None,
+                       Path(args.watchlist_root) / INDEX_FILE if args.mode == "watchlists" else None)
+        taskdb, tasks = open_queue(Path(args.task_db), "trades", build_tasks, outdir, args.resume,
+                                   args.max_attempts, None if args.replan else key)
+    else:
+        tasks = build_tasks()
+
+    if args.engine == "async":
+        import polygon_async
+        log(f"Tareas: {len(tasks):,} | Engine: async | max_rps={args.max_rps} | concurrency={args.concurrency} | Mode: {args.mode}")
+        started = time.time()
+        ok, skip, err = polygon_async.run(
+            tasks, endpoint="trades", filename="trades.parquet", writer=trades_writer, outdir=outdir,
+            api_key=api_key, page_limit=args.page_limit, max_rps=args.max_rps,
+            concurrency=args.concurrency, resume=args.resume, api_base=args.api_base, taskdb=taskdb)
+        log(f"FIN. Elapsed: {(time.time()-started)/60:.1f} min | Total OK: {ok:,} / SKIP: {skip:,} / Total ERR: {err}")
+        return
 
     # Ejecuta en micro-batches (evitar procesos zombis / fuga RAM)
     BATCH = 20  # 20 tareas por micro-batch; ajusta si ves RAM alta
@@ -450,7 +409,10 @@ def main():
             done += 1
             try:
                 results = f.result()
-                ok_count = sum(1 for r in results if r[3] == "ok")
+                if taskdb is not None:
+                    taskdb.record("trades", [(t, task_part(a, layout), st, rows, nb, secs, err)
+                                           for t, a, b, layout, st, rows, nb, secs, err in results])
+                ok_count = sum(1 for r in results if r[4] != "error")
                 err_count = len(results) - ok_count
                 total_ok += ok_count
                 total_err += err_count
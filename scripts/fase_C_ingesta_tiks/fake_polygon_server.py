@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+fake_polygon_server.py
+Servidor HTTP local que imita /v3/trades/{ticker} y /v3/quotes/{ticker} de Polygon, para probar
+los descargadores sin gastar cuota, y /v2/aggs/ticker/{ticker}/range/1/minute/{from}/{to} (barras 1m
+para ingest_ohlcv_intraday_minute.py / intraday_scheduler.py):
+- Datos sintéticos deterministas por (ticker, día hábil) dentro de [timestamp.gte, timestamp.lt)
+  (aggs: [from, to] inclusivo, --bars-per-day barras por día).
+- Paginación por cursor con next_url (como la API real).
+- Latencia simulada (--latency-ms) y 429 aleatorios (--p429) con Retry-After, y límite real de
+  peticiones/seg (--max-rps) que devuelve 429 si se supera.
+- Al terminar (Ctrl+C) imprime peticiones servidas, 429 emitidos y req/s.
+
+Uso:
+  python scripts/fase_C_ingesta_tiks/fake_polygon_server.py --port 8765 --rows-per-day 20000 \
+    --latency-ms 40 --p429 0.01 --max-rps 100
+  POLYGON_API_KEY=x python scripts/fase_C_ingesta_tiks/download_trades_optimized.py ... \
+    --engine async --api-base http://127.0.0.1:8765
+"""
+import argparse, json, random, threading, time, zlib
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+def log(msg: str):
+    print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
+
+def business_days(t_from: str, t_to: str):
+    d = datetime.fromisoformat(t_from.replace("Z", "+00:00")).date()
+    end = datetime.fromisoformat(t_to.replace("Z", "+00:00")).date()
+    while d < end:
+        if d.weekday() < 5:
+            yield d
+        d += timedelta(days=1)
+
+def rows_for_day(kind: str, ticker: str, day: date, n: int):
+    """Filas deterministas (misma semilla por ticker/día) con sip_timestamp en ns."""
+    rng = random.Random(zlib.crc32(f"{kind}|{ticker}|{day}".encode()))
+    t0 = int(datetime(day.year, day.month, day.day, 13, 30, tzinfo=timezone.utc).timestamp()) * 1_000_000_000
+    step = 23_400 * 1_000_000_000 // max(n, 1)
+    px = 1.0 + rng.random() * 9.0
+    out = []
+    for i in range(n):
+        px = max(0.01, round(px + rng.choice((-0.01, 0.0, 0.01)), 2))
+        ts = t0 + i * step
+        if kind == "trades":
+            out.append({"conditions": [rng.choice((12, 37, 41))], "exchange": rng.choice((4, 11, 12)),
+                        "id": str(i), "participant_timestamp": ts - 1000, "price": px,
+                        "sequence_number": i + 1, "sip_timestamp": ts, "size": rng.randint(1, 5000),
+                        "tape": 3})
+        else:
+            out.append({"ask_exchange": 12, "ask_price": round(px + 0.01, 2), "ask_size": rng.randint(1, 50),
+                        "bid_exchange": 11, "bid_price": px, "bid_size": rng.randint(1, 50),
+                        "participant_timestamp": ts - 1000, "sequence_number": i + 1,
+                        "sip_timestamp": ts, "tape": 3})
+    return out
+
+def bars_for_day(ticker: str, day: date, n: int):
+    """Barras 1m deterministas de /v2/aggs (t en ms) entre 04:00 y 20:00 ET aprox."""
+    rng = random.Random(zlib.crc32(f"aggs|{ticker}|{day}".encode()))
+    t0 = int(datetime(day.year, day.month, day.day, 8, 0, tzinfo=timezone.utc).timestamp()) * 1000
+    px = 1.0 + rng.random() * 9.0
+    out = []
+    for m in sorted(rng.sample(range(960), min(n, 960))):
+        o = px
+        px = max(0.01, round(px + rng.choice((-0.01, 0.0, 0.01)), 2))
+        v = rng.randint(100, 50_000)
+        out.append({"v": v, "vw": round((o + px) / 2, 4), "o": o, "c": px, "h": max(o, px) + 0.01,
+                    "l": max(0.01, min(o, px) - 0.01), "t": t0 + m * 60_000, "n": rng.randint(1, 200)})
+    return out
+
+class FakePolygon(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, rows_per_day: int, latency_ms: float, p429: float, max_rps: float,
+                 bars_per_day: int = 390):
+        super().__init__(addr, Handler)
+        self.rows_per_day = rows_per_day
+        self.bars_per_day = bars_per_day
+        self.latency = latency_ms / 1000.0
+        self.p429 = p429
+        self.max_rps = max_rps
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "429": 0, "rows": 0}
+        self.window = []  # timestamps del último segundo (límite max_rps)
+        self.started = time.time()
+        self._cache = {}
+
+    def day_rows(self, kind, ticker, day):
+        key = (kind, ticker, day)
+        with self.lock:
+            if key not in self._cache:
+                self._cache[key] = rows_for_day(kind, ticker, day, self.rows_per_day)
+            return self._cache[key]
+
+    def over_limit(self) -> bool:
+        now = time.time()
+        with self.lock:
+            self.stats["requests"] += 1
+            self.window = [t for t in self.window if now - t < 1.0]
+            self.window.append(now)
+            limited = (self.max_rps and len(self.window) > self.max_rps) or random.random() < self.p429
+            if limited:
+                self.stats["429"] += 1
+            return limited
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, code: int, obj: dict, headers: dict = None):
+        body = json.dumps(obj).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        srv: FakePolygon = self.server
+        u = urlparse(self.path)
+        parts = u.path.strip("/").split("/")
+        if len(parts) == 9 and parts[:2] == ["v2", "aggs"]:
+            return self.do_aggs(parts[3], parts[7], parts[8], {k: v[0] for k, v in parse_qs(u.query).items()})
+        if len(parts) != 3 or parts[0] != "v3" or parts[1] not in ("trades", "quotes"):
+            return self.send_json(404, {"status": "NOT_FOUND"})
+        kind, ticker = parts[1], parts[2]
+        q = {k: v[0] for k, v in parse_qs(u.query).items()}
+        if srv.latency:
+            time.sleep(srv.latency)
+        if srv.over_limit():
+            return self.send_json(429, {"status": "ERROR", "error": "rate limit"}, {"Retry-After": "1"})
+
+        limit = int(q.get("limit", 50_000))
+        offset = int(q.get("cursor", 0))
+        rows = [r for d in business_days(q["timestamp.gte"], q["timestamp.lt"])
+                for r in srv.day_rows(kind, ticker, d)]
+        page = rows[offset:offset + limit]
+        with srv.lock:
+            srv.stats["rows"] += len(page)
+        resp = {"status": "OK", "request_id": f"fake-{srv.stats['requests']}", "results": page}
+        if offset + limit < len(rows):
+            host = self.headers.get("Host", "127.0.0.1")
+            nq = {k: v for k, v in q.items() if k not in ("cursor", "apiKey")}
+            nq["cursor"] = offset + limit
+            resp["next_url"] = f"http://{host}/v3/{kind}/{ticker}?{urlencode(nq)}"
+        self.send_json(200, resp)
+
+    def do_aggs(self, ticker: str, d_from: str, d_to: str, q: dict):
+        srv: FakePolygon = self.server
+        if srv.latency:
+            time.sleep(srv.latency)
+        if srv.over_limit():
+            return self.send_json(429, {"status": "ERROR", "error": "rate limit"}, {"Retry-After": "1"})
+        limit = int(q.get("limit", 50_000))
+        offset = int(q.get("cursor", 0))
+        end = (date.fromisoformat(d_to) + timedelta(days=1)).isoformat()
+        rows = [r for d in business_days(d_from, end) for r in bars_for_day(ticker, d, srv.bars_per_day)]
+        page = rows[offset:offset + limit]
+        with srv.lock:
+            srv.stats["rows"] += len(page)
+        resp = {"ticker": ticker, "status": "OK", "queryCount": len(page), "resultsCount": len(page),
+                "adjusted": True, "request_id": f"fake-{srv.stats['requests']}", "results": page}
+        if offset + limit < len(rows):
+            host = self.headers.get("Host", "127.0.0.1")
+            resp["next_url"] = (f"http://{host}/v2/aggs/ticker/{ticker}/range/1/minute/{d_from}/{d_to}"
+                                f"?cursor={offset + limit}")
+        self.send_json(200, resp)
+
+def start_server(port: int = 8765, rows_per_day: int = 20_000, latency_ms: float = 0.0,
+                 p429: float = 0.0, max_rps: float = 0.0, bars_per_day: int = 390) -> FakePolygon:
+    """Arranca el servidor en un hilo daemon y lo devuelve (srv.shutdown() para pararlo)."""
+    srv = FakePolygon(("127.0.0.1", port), rows_per_day, latency_ms, p429, max_rps, bars_per_day)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+def main():
+    ap = argparse.ArgumentParser(description="Fake Polygon v3 trades/quotes server")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--rows-per-day", type=int, default=20_000)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--p429", type=float, default=0.0, help="probabilidad de 429 aleatorio por petición")
+    ap.add_argument("--max-rps", type=float, default=0.0, help="límite req/s (0 = sin límite)")
+    ap.add_argument("--bars-per-day", type=int, default=390, help="barras 1m por día en /v2/aggs")
+    args = ap.parse_args()
+
+    srv = start_server(args.port, args.rows_per_day, args.latency_ms, args.p429, args.max_rps, args.bars_per_day)
+    log(f"Fake Polygon en http://127.0.0.1:{args.port} (rows/día={args.rows_per_day}, "
+        f"barras 1m/día={args.bars_per_day}, "
+        f"latencia={args.latency_ms}ms, p429={args.p429}, max_rps={args.max_rps or 'inf'})")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        srv.shutdown()
+        el = time.time() - srv.started
+        log(f"Peticiones: {srv.stats['requests']:,} | 429: {srv.stats['429']:,} | filas: {srv.stats['rows']:,} | "
+            f"{srv.stats['requests'] / max(el, 1e-9):.1f} req/s")
+
+if __name__ == "__main__":
+    main()
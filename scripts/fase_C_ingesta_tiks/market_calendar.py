@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+market_calendar.py
+Calendario de sesiones NYSE/Nasdaq (días hábiles de mercado, sin dependencias externas).
+
+Festivos por regla (desde 1990):
+- Año Nuevo (observado: domingo -> lunes; si cae en sábado no se cierra el viernes anterior)
+- Martin Luther King (3er lunes de enero, desde 1998)
+- Presidents Day (3er lunes de febrero)
+- Viernes Santo (Pascua - 2)
+- Memorial Day (último lunes de mayo)
+- Juneteenth (19 junio observado, desde 2022)
+- Independence Day (4 julio observado)
+- Labor Day (1er lunes de septiembre)
+- Thanksgiving (4º jueves de noviembre)
+- Navidad (25 diciembre observado)
+Cierres especiales: 11-14 sep 2001, funerales de estado (1994, 2004, 2007, 2018, 2025),
+huracán Sandy (29-30 oct 2012).
+
+Uso:
+  sessions(date_from, date_to)          -> lista de sesiones en [from, to]
+  is_session(d) / last_session(d)       -> d es sesión / última sesión <= d
+"""
+from __future__ import annotations
+import datetime as dt
+from functools import lru_cache
+from typing import FrozenSet, List
+
+SPECIAL_CLOSURES = {
+    dt.date(1994, 4, 27),                          # Nixon
+    dt.date(2001, 9, 11), dt.date(2001, 9, 12), dt.date(2001, 9, 13), dt.date(2001, 9, 14),
+    dt.date(2004, 6, 11),                          # Reagan
+    dt.date(2007, 1, 2),                           # Ford
+    dt.date(2012, 10, 29), dt.date(2012, 10, 30),  # Sandy
+    dt.date(2018, 12, 5),                          # G.H.W. Bush
+    dt.date(2025, 1, 9),                           # Carter
+}
+
+def _easter(year: int) -> dt.date:
+    """Domingo de Pascua (calendario gregoriano, algoritmo anónimo)"""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return dt.date(year, month, day + 1)
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> dt.date:
+    """n-ésimo `weekday` (0=lunes) del mes; n=-1 -> el último"""
+    if n > 0:
+        first = dt.date(year, month, 1)
+        return first + dt.timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = dt.date(year + month // 12, month % 12 + 1, 1) - dt.timedelta(days=1)
+    return last - dt.timedelta(days=(last.weekday() - weekday) % 7)
+
+def _observed(d: dt.date) -> dt.date:
+    """Festivo en sábado -> viernes, en domingo -> lunes"""
+    if d.weekday() == 5:
+        return d - dt.timedelta(days=1)
+    if d.weekday() == 6:
+        return d + dt.timedelta(days=1)
+    return d
+
+@lru_cache(maxsize=None)
+def holidays(year: int) -> FrozenSet[dt.date]:
+    """Días de semana sin sesión en `year` (festivos observados + cierres especiales)"""
+    days = {
+        _nth_weekday(year, 2, 0, 3),                   # Presidents Day
+        _easter(year) - dt.timedelta(days=2),          # Viernes Santo
+        _nth_weekday(year, 5, 0, -1),                  # Memorial Day
+        _observed(dt.date(year, 7, 4)),
+        _nth_weekday(year, 9, 0, 1),                   # Labor Day
+        _nth_weekday(year, 11, 3, 4),                  # Thanksgiving
+        _observed(dt.date(year, 12, 25)),
+    }
+    new_year = dt.date(year, 1, 1)
+    if new_year.weekday() != 5:                        # sábado: no se observa el 31-dic
+        days.add(_observed(new_year))
+    if year >= 1998:
+        days.add(_nth_weekday(year, 1, 0, 3))          # Martin Luther King
+    if year >= 2022:
+        days.add(_observed(dt.date(year, 6, 19)))      # Juneteenth
+    days |= {d for d in SPECIAL_CLOSURES if d.year == year}
+    return frozenset(days)
+
+def is_session(d: dt.date) -> bool:
+    return d.weekday() < 5 and d not in holidays(d.year)
+
+def sessions(date_from: dt.date, date_to: dt.date) -> List[dt.date]:
+    """Sesiones de mercado en [date_from, date_to]"""
+    out, cur = [], date_from
+    while cur <= date_to:
+        if is_session(cur):
+            out.append(cur)
+        cur += dt.timedelta(days=1)
+    return out
+
+def last_session(d: dt.date) -> dt.date:
+    """Última sesión <= d"""
+    while not is_session(d):
+        d -= dt.timedelta(days=1)
+    return d
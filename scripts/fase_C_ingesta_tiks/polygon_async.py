@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+polygon_async.py
+Motor de descarga asíncrono para los endpoints paginados v3 de Polygon (trades / quotes),
+usado por download_trades_optimized.py y download_quotes_optimized.py con --engine async.
+
+- Un solo proceso, muchas peticiones en vuelo (--concurrency) sobre un pool HTTP keep-alive (aiohttp).
+- Un token bucket global (--max-rps) compartido por todas las peticiones: el presupuesto del plan
+  se respeta en conjunto, no por proceso, y no hay sleep fijo tras cada página.
+- Backoff adaptativo: un 429 reduce la tasa a la mitad y pausa el bucket (Retry-After si viene);
+  cada respuesta OK la recupera de forma aditiva hasta --max-rps.
+- Escritura en streaming (polygon_parquet.py): cada página es un row group de <fichero>.partial,
+  rename atómico al terminar; la RAM no crece con el tamaño del mes.
+- Con taskdb (--task-db) registra estado, filas, bytes y segundos de cada tarea al terminarla.
+- Mismo layout de salida y resume que el motor por procesos:
+    months     -> {outdir}/{ticker}/year=YYYY/month=MM/{filename} + _SUCCESS
+    watchlists -> {outdir}/{ticker}/date=YYYY-MM-DD/{filename}    + _SUCCESS
+
+Se puede probar contra fake_polygon_server.py con --api-base http://127.0.0.1:8765.
+"""
+import asyncio, ssl, time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+import aiohttp
+import certifi
+
+from polygon_parquet import Page, StreamingParquetWriter, cleanup_partials, decode_page
+from polygon_taskdb import TaskDB, task_part
+
+TIMEOUT = aiohttp.ClientTimeout(sock_connect=10, sock_read=60)
+MAX_RETRIES = 8
+
+def log(msg: str):
+    print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
+
+class TokenBucket:
+    """
+    Token bucket global: `rate` peticiones/seg con ráfaga `burst`.
+    AIMD: on_429 divide la tasa (mín. min_rate) y bloquea el bucket `retry_after` segundos;
+    on_success la sube un 2% de max_rate por respuesta hasta max_rate.
+    """
+    def __init__(self, max_rate: float, burst: Optional[float] = None, min_rate: float = 0.5):
+        self.max_rate = float(max_rate)
+        self.rate = float(max_rate)
+        self.min_rate = min_rate
+        self.burst = float(burst if burst else max(1.0, max_rate))
+        self.tokens = self.burst
+        self.stamp = time.monotonic()
+        self.blocked_until = 0.0
+        self.n_429 = 0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+                self.stamp = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self.tokens) / self.rate)
+
+    def on_429(self, retry_after: Optional[float] = None):
+        self.n_429 += 1
+        self.rate = max(self.min_rate, self.rate / 2.0)
+        self.tokens = 0.0
+        pause = retry_after if retry_after is not None else 1.0
+        self.blocked_until = max(self.blocked_until, time.monotonic() + pause)
+        # la pausa no acumula tokens: al acabar se vuelve a la tasa nueva, sin ráfaga
+        self.stamp = self.blocked_until
+
+    def on_success(self):
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + 0.02 * self.max_rate)
+
+def span_target(outdir: Path, ticker: str, span_from: date, span_to: date, layout: str):
+    """(directorio de salida, iso_from, iso_to exclusivo, etiqueta) de una tarea."""
+    if layout == "months":
+        path = outdir / ticker / f"year={span_from.year:04d}" / f"month={span_from.month:02d}"
+        return path, span_from.isoformat(), span_to.isoformat(), f"{ticker} {span_from.year}-{span_from.month:02d}"
+    path = outdir / ticker / f"date={span_from.isoformat()}"
+    return path, span_from.isoformat(), (span_from + timedelta(days=1)).isoformat(), f"{ticker} {span_from}"
+
+class AsyncPolygonDownloader:
+    def __init__(self, endpoint: str, filename: str, writer: Callable[[Path], StreamingParquetWriter],
+                 outdir: Path, api_key: str, page_limit: int, max_rps: float, concurrency: int,
+                 resume: bool, api_base: str, taskdb: Optional[TaskDB] = None):
+        self.endpoint = endpoint          # "trades" | "quotes"
+        self.filename = filename          # "trades.parquet" | "quotes.parquet"
+        self.writer = writer              # trades_writer / quotes_writer (escritura página a página)
+        self.outdir = outdir
+        self.api_key = api_key
+        self.page_limit = page_limit
+        self.concurrency = concurrency
+        self.resume = resume
+        self.api_base = api_base.rstrip("/")
+        self.taskdb = taskdb              # polygon_taskdb.TaskDB opcional: estado por tarea
+        self.bucket = TokenBucket(max_rps)
+        self.requests = 0
+
+    async def fetch_page(self, session: aiohttp.ClientSession, ticker: str, t_from: str, t_to: str,
+                         cursor: Optional[str], label: str) -> Page:
+        url = f"{self.api_base}/v3/{self.endpoint}/{ticker}"
+        params = {
+            "limit": self.page_limit,
+            "sort": "asc",
+            "timestamp.gte": f"{t_from}T00:00:00Z",
+            "timestamp.lt":  f"{t_to}T00:00:00Z",
+            "apiKey": self.api_key,
+        }
+        if cursor:
+            params["cursor"] = cursor
+        for attempt in range(MAX_RETRIES):
+            await self.bucket.acquire()
+            self.requests += 1
+            try:
+                async with session.get(url, params=params) as r:
+                    if r.status == 429:
+                        ra = r.headers.get("Retry-After")
+                        self.bucket.on_429(float(ra) if ra and ra.replace(".", "", 1).isdigit() else None)
+                        log(f"{label}: 429 Too Many Requests -> rate {self.bucket.rate:.1f} req/s")
+                        continue
+                    if r.status >= 500:
+                        sl = min(30.0, 0.5 * 2 ** attempt)
+                        log(f"{label}: HTTP {r.status} -> sleep {sl}s")
+                        await asyncio.sleep(sl); continue
+                    r.raise_for_status()
+                    body = await r.read()
+                    self.bucket.on_success()
+                    # JSON -> columnas tipadas fuera del event loop
+                    return await asyncio.to_thread(decode_page, body, self.endpoint)
+            except aiohttp.ClientResponseError:
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                sl = min(30.0, 0.5 * 2 ** attempt)
+                log(f"{label}: NET {type(e).__name__} {e} -> sleep {sl}s")
+                await asyncio.sleep(sl)
+        raise RuntimeError(f"{label}: agotados {MAX_RETRIES} reintentos")
+
+    async def download_span(self, session: aiohttp.ClientSession, ticker: str, span_from: date,
+                            span_to: date, layout: str) -> Tuple[str, int, int]:
+        path, t_from, t_to, label = span_target(self.outdir, ticker, span_from, span_to, layout)
+        if self.resume and (path / "_SUCCESS").exists():
+            return "skip", 0, 0
+        cleanup_partials(path)
+        writer = self.writer(path / self.filename)
+        cursor = None
+        nbytes = 0
+        try:
+            while True:
+                page = await self.fetch_page(session, ticker, t_from, t_to, cursor, label)
+                if page.table.num_rows:
+                    # Row group (CPU/disco) fuera del event loop
+                    await asyncio.to_thread(writer.write_table, page.table)
+                nbytes += page.nbytes
+                cursor = page.cursor
+                if not cursor:
+                    break
+            n = await asyncio.to_thread(writer.close)
+        except BaseException:
+            writer.abort()
+            raise
+        (path / "_SUCCESS").touch(exist_ok=True)
+        log(f"{label}: OK ({n:,} {self.endpoint}, {writer.pages} páginas)")
+        return "ok", n, nbytes
+
+    async def run(self, tasks: List[Tuple[str, date, date, str]]) -> Tuple[int, int, int]:
+        queue: asyncio.Queue = asyncio.Queue()
+        for t in tasks:
+            queue.put_nowait(t)
+        counts = {"ok": 0, "skip": 0, "error": 0}
+        done = 0
+        started = time.time()
+
+        ssl_ctx = ssl.create_default_context(cafile=certifi.where()) if self.api_base.startswith("https") else None
+        connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=60, ssl=ssl_ctx)
+
+        async def worker(session):
+            nonlocal done
+            while True:
+                try:
+                    ticker, a, b, layout = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                t0 = time.time()
+                rows = nbytes = 0
+                err = None
+                try:
+                    status, rows, nbytes = await self.download_span(session, ticker, a, b, layout)
+                except Exception as e:
+                    status, err = "error", str(e)
+                    log(f"{ticker} {a}: ERROR {e}")
+                if self.taskdb is not None:
+                    self.taskdb.record(self.endpoint, [(ticker, task_part(a, layout), status, rows, nbytes,
+                                                        time.time() - t0, err)])
+                counts[status] += 1
+                done += 1
+                if done % 100 == 0 or done == len(tasks):
+                    el = max(time.time() - started, 1e-9)
+                    log(f"Progreso: {done}/{len(tasks)} ({done/len(tasks)*100:.1f}%) | OK: {counts['ok']:,}, "
+                        f"SKIP: {counts['skip']:,}, ERR: {counts['error']} | {self.requests/el:.1f} req/s "
+                        f"(bucket {self.bucket.rate:.1f}, 429s: {self.bucket.n_429})")
+
+        async with aiohttp.ClientSession(connector=connector, timeout=TIMEOUT) as session:
+            await asyncio.gather(*(worker(session) for _ in range(max(1, self.concurrency))))
+        return counts["ok"], counts["skip"], counts["error"]
+
+def run(tasks, **kwargs) -> Tuple[int, int, int]:
+    """Ejecuta las tareas (ticker, span_from, span_to, layout) con el motor async. Devuelve (ok, skip, err)."""
+    if not tasks:
+        return 0, 0, 0
+    return asyncio.run(AsyncPolygonDownloader(**kwargs).run(tasks))
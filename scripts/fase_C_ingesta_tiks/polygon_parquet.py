@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+polygon_parquet.py
+Decodificación y escritura en streaming de las descargas paginadas de Polygon (trades / quotes),
+compartida por download_trades_optimized.py, download_quotes_optimized.py y polygon_async.py.
+
+Decodificación (decode_page): el cuerpo JSON de cada página se parsea directamente a columnas
+tipadas con un esquema declarado (pl.read_json con schema), sin pasar por una lista de dicts ni
+re-inferir tipos. Esquema de salida fijo (SCHEMAS):
+  trades: t_raw Int64, t_unit Utf8, p Float64, s Int64, c List[Int64], exchange, id, ...
+  quotes: t_raw Int64, t_unit Utf8, bid_*/ask_* (precio, tamaño, exchange), conditions, ...
+Si el parser tipado falla (p.ej. Polygon cambia el tipo de un campo) se cae a orjson (o json) +
+pl.from_records para esa página. Los tamaños fraccionarios no se truncan: esa página queda en
+Float64 y el escritor ensancha el esquema del fichero.
+
+Escritura (StreamingParquetWriter): cada página se añade como row group a <fichero>.partial en
+cuanto llega. Al terminar: rename atómico a <fichero> (el llamador marca _SUCCESS).
+Si la tarea falla se borra el .partial; los .partial huérfanos de un crash se limpian al
+reintentar la tarea. El pico de RAM queda acotado por el tamaño de página, no por el mes.
+
+Benchmark de decodificación: benchmark_page_decode.py
+"""
+import io, os
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional
+
+import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+try:  # sólo lo usa el camino lento (decode_page_records); sin orjson se usa json de la stdlib
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+PARTIAL_SUFFIX = ".partial"
+
+# Campo Polygon v3 -> (columna de salida, tipo). Campos no declarados se ignoran.
+PAGE_FIELDS: Dict[str, Dict[str, tuple]] = {
+    "trades": {
+        "sip_timestamp":         ("t_raw", pl.Int64),
+        "price":                 ("p", pl.Float64),
+        "size":                  ("s", pl.Int64),
+        "conditions":            ("c", pl.List(pl.Int64)),
+        "exchange":              ("exchange", pl.Int64),
+        "id":                    ("id", pl.Utf8),
+        "participant_timestamp": ("participant_timestamp", pl.Int64),
+        "sequence_number":       ("sequence_number", pl.Int64),
+        "tape":                  ("tape", pl.Int64),
+        "trf_id":                ("trf_id", pl.Int64),
+        "trf_timestamp":         ("trf_timestamp", pl.Int64),
+        "correction":            ("correction", pl.Int64),
+    },
+    "quotes": {
+        "sip_timestamp":         ("t_raw", pl.Int64),
+        "bid_price":             ("bid_price", pl.Float64),
+        "bid_size":              ("bid_size", pl.Int64),
+        "bid_exchange":          ("bid_exchange", pl.Int64),
+        "ask_price":             ("ask_price", pl.Float64),
+        "ask_size":              ("ask_size", pl.Int64),
+        "ask_exchange":          ("ask_exchange", pl.Int64),
+        "conditions":            ("conditions", pl.List(pl.Int64)),
+        "indicators":            ("indicators", pl.List(pl.Int64)),
+        "participant_timestamp": ("participant_timestamp", pl.Int64),
+        "sequence_number":       ("sequence_number", pl.Int64),
+        "tape":                  ("tape", pl.Int64),
+        "trf_timestamp":         ("trf_timestamp", pl.Int64),
+    },
+}
+# Tamaños: se leen como Float64 y se pasan a Int64 sólo si son enteros (no truncar fracciones)
+SIZE_FIELDS = {"size", "bid_size", "ask_size"}
+
+def _output_dtypes(fields: Dict[str, tuple]) -> Dict[str, pl.DataType]:
+    cols = {}
+    for out, dtype in fields.values():
+        cols[out] = dtype
+        if out == "t_raw":
+            cols["t_unit"] = pl.Utf8
+    return cols
+
+def _envelope_schema(fields: Dict[str, tuple]) -> dict:
+    rows = pl.Struct({k: (pl.Float64 if k in SIZE_FIELDS else dtype) for k, (_, dtype) in fields.items()})
+    return {"results": pl.List(rows), "next_url": pl.Utf8, "nextUrl": pl.Utf8, "next_page_token": pl.Utf8}
+
+OUTPUT_DTYPES = {kind: _output_dtypes(f) for kind, f in PAGE_FIELDS.items()}
+SCHEMAS = {kind: pl.DataFrame(schema=d).to_arrow().schema for kind, d in OUTPUT_DTYPES.items()}
+_ENVELOPES = {kind: _envelope_schema(f) for kind, f in PAGE_FIELDS.items()}
+
+class Page(NamedTuple):
+    table: pa.Table          # filas de la página con el esquema SCHEMAS[kind]
+    cursor: Optional[str]    # cursor de la siguiente página (None = última)
+    nbytes: int = 0          # bytes del cuerpo JSON recibido
+
+def next_cursor(data: dict) -> Optional[str]:
+    """Cursor de la siguiente página (next_url o next_page_token), como http_get_trades/http_get_quotes."""
+    cursor = data.get("next_url") or data.get("nextUrl") or data.get("next_url".upper())
+    if cursor and "cursor=" in cursor:
+        return cursor.split("cursor=")[-1]
+    return data.get("next_page_token") or None
+
+def time_unit(max_ts: int) -> str:
+    """Unidad del timestamp por magnitud (Polygon mezcla ns/us/ms; evita fechas 'year 52XXX')."""
+    if max_ts > 1e17:
+        return "ns"  # nanoseconds (1e18)
+    if max_ts > 1e14:
+        return "us"  # microseconds (1e15)
+    return "ms"      # milliseconds (1e12)
+
+def normalize_page(df: pl.DataFrame, kind: str) -> pa.Table:
+    """Renombra al esquema de salida, añade t_unit (por página) y ordena columnas como SCHEMAS[kind]."""
+    fields = PAGE_FIELDS[kind]
+    df = df.select([pl.col(k).alias(out) for k, (out, _) in fields.items() if k in df.columns])
+    sizes = [fields[k][0] for k in SIZE_FIELDS & fields.keys() if fields[k][0] in df.columns]
+    ints = [c for c in sizes if df[c].dtype.is_float() and bool((df[c] % 1 == 0).all())]
+    if ints:
+        df = df.with_columns([pl.col(c).cast(pl.Int64) for c in ints])
+    if "t_raw" in df.columns and df.height:
+        df = df.with_columns(pl.col("t_raw").cast(pl.Int64),
+                             pl.lit(time_unit(int(df["t_raw"].max()))).alias("t_unit"))
+    missing = [pl.lit(None, dtype=dt).alias(c) for c, dt in OUTPUT_DTYPES[kind].items() if c not in df.columns]
+    if missing:
+        df = df.with_columns(missing)
+    return df.select(list(OUTPUT_DTYPES[kind])).to_arrow()
+
+def decode_page(body: bytes, kind: str) -> Page:
+    """Parsea el JSON de una página v3 directamente a columnas tipadas (ver PAGE_FIELDS)."""
+    try:
+        env = pl.read_json(io.BytesIO(body), schema=_ENVELOPES[kind])
+    except Exception:
+        return decode_page_records(body, kind)
+    n = len(body)
+    cursor = next_cursor({k: env[k][0] for k in ("next_url", "nextUrl", "next_page_token")})
+    rows = env["results"][0]
+    if rows is None or len(rows) == 0:
+        return Page(SCHEMAS[kind].empty_table(), cursor, n)
+    return Page(normalize_page(rows.struct.unnest(), kind), cursor, n)
+
+def decode_page_records(body: bytes, kind: str) -> Page:
+    """Camino lento/robusto: orjson/json -> lista de dicts -> pl.from_records (inferencia de tipos)."""
+    data = json_loads(body)
+    rows = data.get("results") or []
+    if not rows:
+        return Page(SCHEMAS[kind].empty_table(), next_cursor(data), len(body))
+    return Page(normalize_page(pl.from_records(rows, infer_schema_length=None), kind), next_cursor(data), len(body))
+
+def partial_path(path: Path) -> Path:
+    return path.with_name(path.name + PARTIAL_SUFFIX)
+
+def cleanup_partials(task_dir: Path) -> int:
+    """Borra .partial huérfanos (crash previo) en el directorio de una tarea. Devuelve cuántos."""
+    n = 0
+    if task_dir.exists():
+        for p in task_dir.glob(f"*{PARTIAL_SUFFIX}"):
+            p.unlink(missing_ok=True); n += 1
+    return n
+
+def conform(table: pa.Table, schema: pa.Schema) -> Optional[pa.Table]:
+    """
+    Ajusta una página al esquema del fichero (orden, columnas ausentes = null, casts seguros).
+    Devuelve None si la página trae columnas nuevas con datos o tipos no convertibles.
+    """
+    for name in table.column_names:
+        if name not in schema.names and table[name].null_count < table.num_rows:
+            return None
+    cols = []
+    for field in schema:
+        if field.name in table.column_names:
+            col = table[field.name]
+            if col.type != field.type:
+                try:
+                    col = col.cast(field.type)
+                except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                    return None
+            cols.append(col)
+        else:
+            cols.append(pa.nulls(table.num_rows, field.type))
+    return pa.Table.from_arrays(cols, schema=schema)
+
+class StreamingParquetWriter:
+    """
+    Uso:
+        w = StreamingParquetWriter(out_parquet, SCHEMAS["trades"])
+        try:
+            for page in pages: w.write_table(page.table)
+            rows = w.close()          # rename atómico .partial -> out_parquet
+        except Exception:
+            w.abort(); raise          # borra el .partial
+
+    Sin filas, close() escribe un parquet vacío con `schema`.
+    """
+    def __init__(self, out_parquet: Path, schema: pa.Schema):
+        self.out = Path(out_parquet)
+        self.tmp = partial_path(self.out)
+        self.schema = schema
+        self.writer: Optional[pq.ParquetWriter] = None
+        self.rows = 0
+        self.pages = 0
+
+    def _open(self, schema: pa.Schema):
+        self.out.parent.mkdir(parents=True, exist_ok=True)
+        self.schema = schema
+        self.writer = pq.ParquetWriter(self.tmp, schema, compression="zstd", compression_level=2,
+                                       write_statistics=False)
+
+    def _widen(self, table: pa.Table):
+        """Caso raro: una página trae columnas/tipos nuevos. Reescribe el .partial con el esquema unificado."""
+        self.writer.close()
+        done = pq.read_table(self.tmp)
+        schema = pa.unify_schemas([done.schema, table.schema], promote_options="permissive")
+        self.tmp.unlink()
+        self._open(schema)
+        self.writer.write_table(conform(done, schema))
+
+    def write_table(self, table: pa.Table):
+        if table.num_rows == 0:
+            return
+        if self.writer is None:
+            self._open(self.schema)
+        page = conform(table, self.schema)
+        if page is None:
+            self._widen(table)
+            page = conform(table, self.schema)
+        self.writer.write_table(page)   # un row group por página
+        self.rows += page.num_rows
+        self.pages += 1
+
+    def close(self) -> int:
+        if self.writer is None:
+            self.out.parent.mkdir(parents=True, exist_ok=True)
+            pq.write_table(self.schema.empty_table(), self.tmp, compression="zstd", write_statistics=False)
+        else:
+            self.writer.close()
+            self.writer = None
+        os.replace(self.tmp, self.out)
+        return self.rows
+
+    def abort(self):
+        if self.writer is not None:
+            try:
+                self.writer.close()
+            except Exception:
+                pass
+            self.writer = None
+        self.tmp.unlink(missing_ok=True)
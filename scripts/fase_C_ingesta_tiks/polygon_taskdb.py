@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+polygon_taskdb.py
+Cola de trabajo persistente (SQLite) para los descargadores de Polygon: trades, quotes y financials.
+
+Sustituye el resume por sondeo de _SUCCESS tarea a tarea y el grep de errores en logs:
+- Una fila por tarea (endpoint, ticker, part) con estado pending | done | error, intentos,
+  filas, bytes recibidos, segundos y último error.
+    part = "YYYY-MM" (months) | "YYYY-MM-DD" (watchlists) | "quarterly"/"annual" (financials)
+- plan(): alta de todas las tareas del run; las ya conocidas conservan su estado pero quedan
+  etiquetadas con el plan del run (columna plan) y su layout/span actuales. pending() sólo devuelve
+  tareas del plan en curso: las que quedaron de otro plan (otro modo, rango o lista de tickers) no
+  se descargan.
+  Si el plan_key del run (argumentos + mtime de las entradas + outdir) coincide con el último plan
+  del endpoint, no se re-planifica: al reanudar sólo se leen las pendientes (índice por plan/estado).
+- record(): actualiza resultados en una transacción por lote (el proceso padre escribe;
+  los workers sólo devuelven resultados).
+- import_success(): la primera vez que se usa la DB sobre un outdir ya descargado, marca como
+  done las tareas con _SUCCESS en disco (un único recorrido del árbol, no un stat por tarea).
+- retry_failed_trades.py --task-db consulta failed() en vez de leer un fichero de missing.
+
+Uso (consulta):
+  python scripts/fase_C_ingesta_tiks/polygon_taskdb.py --db raw/polygon/tasks.sqlite summary
+  python scripts/fase_C_ingesta_tiks/polygon_taskdb.py --db raw/polygon/tasks.sqlite failed \
+    --endpoint trades --out missing_ticker_days.txt
+"""
+import argparse, hashlib, os, sqlite3, time
+from datetime import date, datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    endpoint   TEXT NOT NULL,
+    ticker     TEXT NOT NULL,
+    part       TEXT NOT NULL,
+    layout     TEXT NOT NULL,
+    span_from  TEXT,
+    span_to    TEXT,
+    state      TEXT NOT NULL DEFAULT 'pending',
+    attempts   INTEGER NOT NULL DEFAULT 0,
+    rows       INTEGER,
+    bytes      INTEGER,
+    seconds    REAL,
+    error      TEXT,
+    updated_at TEXT,
+    plan       TEXT,
+    PRIMARY KEY (endpoint, ticker, part)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS tasks_state ON tasks (endpoint, state);
+CREATE TABLE IF NOT EXISTS plans (
+    endpoint   TEXT PRIMARY KEY,
+    plan_key   TEXT NOT NULL,
+    n_tasks    INTEGER NOT NULL,
+    created_at TEXT
+);
+"""
+# Aparte del SCHEMA: en DBs anteriores la columna plan se añade antes de indexarla
+PLAN_INDEX = "CREATE INDEX IF NOT EXISTS tasks_plan ON tasks (endpoint, plan, state)"
+
+# Resultado de una tarea: (ticker, part, status ok|skip|error, rows, bytes, seconds, error)
+Result = Tuple[str, str, str, int, int, float, Optional[str]]
+
+def log(msg: str):
+    print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
+
+def task_part(span_from: date, layout: str) -> str:
+    """Partición de una tarea (ticker, span_from, span_to, layout), igual que su directorio de salida."""
+    return f"{span_from.year:04d}-{span_from.month:02d}" if layout == "months" else span_from.isoformat()
+
+class TaskDB:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.con = sqlite3.connect(self.path, timeout=60)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute("PRAGMA synchronous=NORMAL")
+        self.con.execute("PRAGMA cache_size=-262144")  # 256 MB
+        self.con.executescript(SCHEMA)
+        if "plan" not in {r[1] for r in self.con.execute("PRAGMA table_info(tasks)")}:
+            # DB sin planes por tarea: se añade la columna y se fuerza re-planificar en el próximo run
+            with self.con:
+                self.con.execute("ALTER TABLE tasks ADD COLUMN plan TEXT")
+                self.con.execute("DELETE FROM plans")
+        self.con.execute(PLAN_INDEX)
+
+    def close(self):
+        self.con.close()
+
+    def count(self, endpoint: str) -> int:
+        return self.con.execute("SELECT COUNT(*) FROM tasks WHERE endpoint=?", (endpoint,)).fetchone()[0]
+
+    def plan(self, endpoint: str, tasks: Iterable[Tuple[str, date, date, str]], plan: Optional[str] = None) -> int:
+        """Registra tareas de descarga (ticker, span_from, span_to, layout) del plan `plan`. Devuelve cuántas son nuevas."""
+        def rows():
+            for t, a, b, layout in tasks:
+                part = task_part(a, layout)
+                a_iso = part if layout != "months" else a.isoformat()
+                yield t, part, layout, a_iso, (a_iso if b == a else b.isoformat())
+        return self.plan_rows(endpoint, rows(), plan)
+
+    def plan_rows(self, endpoint: str, rows: Iterable[Tuple[str, str, str, Optional[str], Optional[str]]],
+                  plan: Optional[str] = None) -> int:
+        """
+        Registra tareas genéricas (ticker, part, layout, span_from, span_to), p.ej. financials.
+        Las ya existentes conservan estado e intentos; pasan al plan `plan` con el layout/span nuevos.
+        Devuelve cuántas son nuevas.
+        """
+        n0 = self.count(endpoint)
+        with self.con:
+            self.con.executemany(
+                "INSERT INTO tasks (endpoint, ticker, part, layout, span_from, span_to, plan) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (endpoint, ticker, part) DO UPDATE SET "
+                "layout=excluded.layout, span_from=excluded.span_from, span_to=excluded.span_to, "
+                "plan=excluded.plan", ((endpoint,) + tuple(r) + (plan,) for r in rows))
+        return self.count(endpoint) - n0
+
+    def pending_rows(self, endpoint: str, max_attempts: Optional[int] = None,
+                     plan: Optional[str] = None) -> List[Tuple[str, str, str, str, str]]:
+        """
+        Tareas no terminadas: pending y error (si max_attempts, sólo las que no lo han agotado).
+        Con `plan`, sólo las del plan indicado (las de planes anteriores no se tocan).
+        """
+        sql = ("SELECT ticker, part, layout, span_from, span_to FROM tasks "
+               "WHERE endpoint=? AND state IN ('pending', 'error')")
+        params: tuple = (endpoint,)
+        if plan is not None:
+            sql += " AND plan=?"
+            params += (plan,)
+        if max_attempts:
+            sql += " AND attempts<?"
+            params += (max_attempts,)
+        return self.con.execute(sql, params).fetchall()
+
+    def last_plan(self, endpoint: str) -> Optional[str]:
+        row = self.con.execute("SELECT plan_key FROM plans WHERE endpoint=?", (endpoint,)).fetchone()
+        return row[0] if row else None
+
+    def set_plan(self, endpoint: str, plan_key: str, n_tasks: int):
+        with self.con:
+            self.con.execute("INSERT OR REPLACE INTO plans VALUES (?, ?, ?, ?)",
+                             (endpoint, plan_key, n_tasks, datetime.now().isoformat(timespec="seconds")))
+
+    def pending(self, endpoint: str, max_attempts: Optional[int] = None,
+                plan: Optional[str] = None) -> List[Tuple[str, date, date, str]]:
+        """Como pending_rows pero en el formato de tarea de los descargadores (ticker, span_from, span_to, layout)."""
+        days: Dict[str, date] = {}
+        def d(s: str) -> date:
+            if s not in days:
+                days[s] = date.fromisoformat(s)
+            return days[s]
+        return [(t, d(a), d(b), layout) for t, _, layout, a, b in self.pending_rows(endpoint, max_attempts, plan)]
+
+    def record(self, endpoint: str, results: Iterable[Result]):
+        """Actualiza el estado de un lote de tareas en una sola transacción."""
+        now = datetime.now().isoformat(timespec="seconds")
+        rows = []
+        for ticker, part, status, n_rows, n_bytes, secs, err in results:
+            state = "error" if status == "error" else "done"
+            rows.append((state, 0 if status == "skip" else 1, n_rows, n_bytes, secs, err, now,
+                         endpoint, ticker, part))
+        with self.con:
+            self.con.executemany(
+                "UPDATE tasks SET state=?, attempts=attempts+?, rows=?, bytes=?, seconds=?, error=?, "
+                "updated_at=? WHERE endpoint=? AND ticker=? AND part=?", rows)
+
+    def import_success(self, endpoint: str, outdir: Path) -> int:
+        """Marca done las tareas planificadas cuyo directorio ya tiene _SUCCESS (un solo recorrido de outdir)."""
+        done = []
+        for root, dirs, files in os.walk(outdir):
+            if "_SUCCESS" not in files:
+                continue
+            rel = Path(root).relative_to(outdir).parts
+            if len(rel) == 3 and rel[1].startswith("year=") and rel[2].startswith("month="):
+                done.append((rel[0], f"{rel[1][5:]}-{rel[2][6:]}"))
+            elif len(rel) == 2:
+                done.append((rel[0], rel[1][5:] if rel[1].startswith("date=") else rel[1]))
+        before = self.con.total_changes
+        with self.con:
+            self.con.executemany(
+                "UPDATE tasks SET state='done', error=NULL WHERE endpoint=? AND ticker=? AND part=? AND state!='done'",
+                ((endpoint, t, p) for t, p in done))
+        return self.con.total_changes - before
+
+    def failed(self, endpoint: str, layout: Optional[str] = None) -> List[Tuple[str, str, int, Optional[str]]]:
+        """(ticker, part, attempts, error) de las tareas en estado error."""
+        sql = "SELECT ticker, part, attempts, error FROM tasks WHERE endpoint=? AND state='error'"
+        params: tuple = (endpoint,)
+        if layout:
+            sql += " AND layout=?"
+            params += (layout,)
+        return self.con.execute(sql + " ORDER BY ticker, part", params).fetchall()
+
+    def summary(self) -> List[Tuple[str, str, int, int, int, float]]:
+        """(endpoint, state, tareas, filas, bytes, segundos) agregados."""
+        return self.con.execute(
+            "SELECT endpoint, state, COUNT(*), COALESCE(SUM(rows),0), COALESCE(SUM(bytes),0), "
+            "COALESCE(SUM(seconds),0) FROM tasks GROUP BY endpoint, state ORDER BY endpoint, state").fetchall()
+
+def plan_key(*parts) -> str:
+    """Clave de un plan: argumentos del run + mtime de ficheros/directorios de entrada (si existen)."""
+    out = []
+    for x in parts:
+        out.append(str(x))
+        if isinstance(x, Path) and x.exists():
+            out.append(str(x.stat().st_mtime_ns))
+    return "|".join(out)
+
+def plan_id(key: Optional[str] = None) -> str:
+    """Etiqueta corta del plan guardada en cada tarea: hash del plan_key, o única por run si no hay key."""
+    if key is None:
+        key = f"run|{os.getpid()}|{time.time_ns()}"
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+
+def open_queue(db_path: Path, endpoint: str, tasks: Callable[[], List[Tuple[str, date, date, str]]],
+               outdir: Path, resume: bool, max_attempts: Optional[int] = None,
+               key: Optional[str] = None) -> Tuple[TaskDB, List[Tuple[str, date, date, str]]]:
+    """
+    Planifica las tareas en la DB y devuelve (db, tareas pendientes). `tasks` es una función que
+    construye la lista completa: sólo se llama si el plan `key` cambió desde el último run (o sin key).
+    Si el endpoint es nuevo en la DB y --resume, importa antes los _SUCCESS existentes en outdir.
+    Las pendientes son sólo las del plan de este run: tareas sin terminar de planes anteriores
+    (otro modo, rango, tickers u outdir) se quedan en la DB pero no se descargan.
+    """
+    t0 = time.time()
+    db = TaskDB(db_path)
+    pending = None
+    if key is not None:
+        key = f"{key}|{Path(outdir).resolve()}"
+    run_plan = plan_id(key)
+    if key is not None and db.last_plan(endpoint) == key:
+        log(f"Task DB: plan sin cambios ({key}), se reanuda sin re-planificar")
+    else:
+        fresh = db.count(endpoint) == 0
+        planned = tasks()
+        new = db.plan(endpoint, planned, run_plan)
+        log(f"Task DB: {len(planned):,} tareas planificadas ({new:,} nuevas)")
+        if fresh and resume:
+            log(f"Task DB: importando _SUCCESS existentes de {outdir} ...")
+            log(f"Task DB: {db.import_success(endpoint, outdir):,} tareas ya completadas en disco")
+        elif fresh:
+            pending = planned  # DB recién creada: todo está pendiente, no hace falta releerlo
+        # sin key (--replan) también se guarda: el siguiente run con key vuelve a planificar
+        db.set_plan(endpoint, key if key is not None else run_plan, len(planned))
+    if pending is None:
+        pending = db.pending(endpoint, max_attempts, run_plan)
+    log(f"Task DB {db_path}: pendientes {len(pending):,} | {time.time() - t0:.1f}s")
+    return db, pending
+
+def main():
+    ap = argparse.ArgumentParser(description="Consulta de la cola de descargas Polygon (SQLite)")
+    ap.add_argument("--db", required=True)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("summary", help="tareas/filas/bytes/segundos por endpoint y estado")
+    f = sub.add_parser("failed", help="lista tareas en error (ticker,part)")
+    f.add_argument("--endpoint", default="trades")
+    f.add_argument("--layout", default=None)
+    f.add_argument("--out", default=None, help="fichero ticker,part (formato --missing-file de retry_failed_trades)")
+    args = ap.parse_args()
+
+    db = TaskDB(Path(args.db))
+    if args.cmd == "summary":
+        for ep, state, n, rows, nbytes, secs in db.summary():
+            log(f"{ep:10s} {state:8s} tareas={n:>10,} filas={rows:>14,} MB={nbytes / 1e6:>10,.1f} "
+                f"s={secs:>10,.1f}")
+    else:
+        failed = db.failed(args.endpoint, args.layout)
+        for t, part, attempts, err in failed[:20]:
+            log(f"{t} {part}: intentos={attempts} | {err}")
+        log(f"Total en error ({args.endpoint}): {len(failed):,}")
+        if args.out:
+            Path(args.out).write_text("".join(f"{t},{part}\n" for t, part, _, _ in failed))
+            log(f"Escrito {args.out}")
+    db.close()
+
+if __name__ == "__main__":
+    main()
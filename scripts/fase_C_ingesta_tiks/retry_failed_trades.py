@@ -11,6 +11,10 @@ Usage:
         --outdir raw/polygon/trades \
         --workers 4 \
         --rate-limit 0.15
+
+    # With the task DB written by download_trades_optimized.py --task-db, failed ticker-days come
+    # from a query (watchlist tasks in state error) and retry results are recorded back into it.
+    python retry_failed_trades.py --task-db raw/polygon/tasks.sqlite --outdir raw/polygon/trades
 """
 
 import argparse
@@ -23,6 +27,8 @@ from typing import List, Tuple, Dict
 import polars as pl
 import requests
 
+from polygon_taskdb import TaskDB
+
 def log(msg: str):
     print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {msg}", flush=True)
 
@@ -185,6 +191,14 @@ def download_ticker_day_split(ticker: str, day: date, outdir: Path,
         log(f"{ticker} {day}: FATAL ERROR {e}")
         return (ticker, day.isoformat(), f"error_{e}")
 
+def task_result(ticker: str, date_str: str, status: str, seconds: float):
+    """Map a download_ticker_day_split status to a TaskDB.record row."""
+    if status.startswith("ok_"):
+        return (ticker, date_str, "ok", int(status.split("_")[1]), None, seconds, None)
+    if status == "skip_exists":
+        return (ticker, date_str, "skip", 0, None, seconds, None)
+    return (ticker, date_str, "error", 0, None, seconds, status)
+
 def retry_worker(args_tuple):
     """Worker function for multiprocessing"""
     tasks, outdir, page_limit, api_key, rate_limit = args_tuple
@@ -192,15 +206,18 @@ def retry_worker(args_tuple):
 
     for ticker, date_str in tasks:
         day = date.fromisoformat(date_str)
+        t0 = time.time()
         result = download_ticker_day_split(ticker, day, outdir,
                                           page_limit, api_key, rate_limit)
-        results.append(result)
+        results.append(result + (time.time() - t0,))
 
     return results
 
 def main():
     parser = argparse.ArgumentParser(description="Retry failed ticker-days with range splitting")
-    parser.add_argument("--missing-file", required=True, help="File with missing ticker-days (ticker,date per line)")
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--missing-file", help="File with missing ticker-days (ticker,date per line)")
+    src.add_argument("--task-db", help="SQLite task DB (polygon_taskdb.py): retry trades watchlist tasks in state error")
     parser.add_argument("--outdir", required=True, help="Output directory for trades")
     parser.add_argument("--workers", type=int, default=4, help="Number of parallel workers")
     parser.add_argument("--rate-limit", type=float, default=0.15, help="Rate limit between requests (seconds)")
@@ -214,16 +231,23 @@ def main():
         raise ValueError("POLYGON_API_KEY environment variable not set")
 
     # Load missing ticker-days
+    taskdb = None
     missing_tasks = []
-    with open(args.missing_file, 'r') as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith('#'):
-                continue
-            ticker, date_str = line.split(',')
-            missing_tasks.append((ticker, date_str))
-
-    log(f"Loaded {len(missing_tasks):,} missing ticker-days from {args.missing_file}")
+    if args.task_db:
+        taskdb = TaskDB(Path(args.task_db))
+        missing_tasks = [(ticker, part) for ticker, part, _, _ in taskdb.failed("trades", layout="watchlists")]
+        source = args.task_db
+    else:
+        with open(args.missing_file, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                ticker, date_str = line.split(',')
+                missing_tasks.append((ticker, date_str))
+        source = args.missing_file
+
+    log(f"Loaded {len(missing_tasks):,} missing ticker-days from {source}")
     log(f"Config: workers={args.workers}, rate_limit={args.rate_limit}s, page_limit={args.page_limit:,}")
     log(f"Strategy: 6-hour range splitting per day (4 ranges: 00-06, 06-12, 12-18, 18-24)")
 
@@ -252,8 +276,10 @@ def main():
             done += 1
             try:
                 results = f.result()
-                ok_count = sum(1 for _, _, status in results if status.startswith("ok"))
-                skip_count = sum(1 for _, _, status in results if status == "skip_exists")
+                if taskdb is not None:
+                    taskdb.record("trades", [task_result(*r) for r in results])
+                ok_count = sum(1 for _, _, status, _ in results if status.startswith("ok"))
+                skip_count = sum(1 for _, _, status, _ in results if status == "skip_exists")
                 err_count = len(results) - ok_count - skip_count
 
                 total_ok += ok_count
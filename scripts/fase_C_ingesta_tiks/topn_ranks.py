@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+topn_ranks.py
+Ranking rolling de runners (días info-rich en las últimas W sesiones) en una sola pasada.
+
+En vez de filtrar el frame completo y re-agrupar por cada snapshot (compute_topn_window) o hacer un
+tail(252) por ticker (update_topN_12m):
+
+1. Índice de sesiones: calendario de mercado (market_calendar.py) + fechas presentes en los datos.
+   La ventana es de W SESIONES (no días naturales). Si se pide un as-of posterior al último día de
+   datos, el calendario se extiende hasta él (las sesiones sin datos también cuentan en la ventana).
+2. Una pasada ordenada por (ticker, sesión): cum = suma acumulada de info_rich por ticker.
+3. Valor as-of en la sesión s (última sesión <= fecha as-of):
+     days_info_rich_win = cum(<= s) - cum(<= s - W)     (dos join_asof backward por ticker)
+     last_seen          = último día del ticker <= s    (entra si last_seen está en la ventana)
+   Cualquier conjunto de snapshots se extrae de golpe (rejilla tickers x snapshots, por bloques
+   para acotar memoria); rank por snapshot con desempate days desc, last_seen desc, ticker.
+
+API:
+  RollingRanks(df, win_sessions=252, date_col="date")      df: ticker, date_col, info_rich
+  .snapshots([fechas], k=200)   -> asof_date, rank, ticker, days_info_rich_win, last_seen
+  .daily(date_from, date_to, k) -> serie diaria as-of (una fila por sesión y ticker del top-k)
+"""
+from __future__ import annotations
+import datetime as dt
+from typing import Iterable, Optional
+
+import polars as pl
+
+from market_calendar import sessions
+
+RANK_COLUMNS = ["asof_date", "rank", "ticker", "days_info_rich_win", "last_seen"]
+GRID_ROWS = 4_000_000   # filas máx. de la rejilla tickers x snapshots por bloque
+
+def session_index(days: pl.Series) -> pl.DataFrame:
+    """(date, session_idx): sesiones de mercado en [min, max] de `days` + días presentes en los datos"""
+    lo, hi = days.min(), days.max()
+    all_days = sorted(set(sessions(lo, hi)) | set(days.unique().to_list()))
+    return pl.DataFrame({"date": all_days, "session_idx": range(len(all_days))},
+                        schema={"date": pl.Date, "session_idx": pl.Int32})
+
+class RollingRanks:
+    """Conteos rolling de días info-rich por ticker sobre W sesiones, consultables as-of"""
+
+    def __init__(self, df: pl.DataFrame, win_sessions: int = 252, date_col: str = "date"):
+        self.win = win_sessions
+        base = df.select([
+            pl.col("ticker").cast(pl.Utf8),
+            pl.col(date_col).cast(pl.Date).alias("date"),
+            pl.col("info_rich").cast(pl.Boolean).fill_null(False),
+        ])
+        self.calendar = session_index(base["date"]) if not base.is_empty() else \
+            pl.DataFrame(schema={"date": pl.Date, "session_idx": pl.Int32})
+        self.last_day = base["date"].max()
+        # tid: id entero del ticker en orden lexicográfico (claves de join/sort enteras, no string)
+        base = base.with_columns(pl.col("ticker").rank("dense").cast(pl.UInt32).alias("tid"))
+        self.tickers = base.select(["tid", "ticker"]).unique("tid").sort("tid")
+        # Una fila por (ticker, sesión) con la suma acumulada de info_rich del ticker. Duplicados
+        # (ticker, día): orden con info_rich al final y se queda la última fila de cada tramo (any);
+        # evita un group_by con clave string sobre todo el frame
+        self.cum = (
+            base.join(self.calendar, on="date")
+            .sort(["tid", "session_idx", "info_rich"])
+            .filter((pl.col("tid") != pl.col("tid").shift(-1)).fill_null(True)
+                    | (pl.col("session_idx") != pl.col("session_idx").shift(-1)).fill_null(True))
+            .with_columns(pl.col("info_rich").cast(pl.UInt32).cum_sum().over("tid").alias("cum"))
+            .select(["tid", "session_idx", pl.col("session_idx").alias("seen_idx"),
+                     pl.col("date").alias("last_seen"), "cum"])
+        )
+
+    def extend_calendar(self, until: dt.date):
+        """Añade al calendario las sesiones de mercado posteriores al último día hasta `until`
+        (se añaden al final: los session_idx ya asignados en cum no cambian)"""
+        if self.calendar.is_empty():
+            return
+        last = self.calendar["date"][-1]
+        extra = sessions(last + dt.timedelta(days=1), until) if until > last else []
+        if extra:
+            n = self.calendar.height
+            self.calendar = pl.concat([self.calendar, pl.DataFrame(
+                {"date": extra, "session_idx": range(n, n + len(extra))},
+                schema={"date": pl.Date, "session_idx": pl.Int32})])
+
+    def asof_sessions(self, asof_dates: Iterable[dt.date]) -> pl.DataFrame:
+        """(asof_date, session_idx) con la última sesión <= asof_date (sin sesión previa -> fuera)"""
+        asof = pl.DataFrame({"asof_date": sorted(set(asof_dates))}, schema={"asof_date": pl.Date})
+        if not asof.is_empty():
+            self.extend_calendar(asof["asof_date"][-1])
+        return (
+            asof.join_asof(self.calendar, left_on="asof_date", right_on="date", strategy="backward")
+            .drop_nulls("session_idx")
+            .select(["asof_date", "session_idx"])
+        )
+
+    def _snapshot_block(self, snaps: pl.DataFrame, k: Optional[int]) -> pl.DataFrame:
+        grid = (
+            self.tickers.select("tid").join(snaps, how="cross")
+            .with_columns((pl.col("session_idx") - self.win).alias("lo_idx"))
+            .sort("session_idx")
+        )
+        hi = grid.join_asof(self.cum, on="session_idx", by="tid", strategy="backward")
+        lo = (
+            grid.sort("lo_idx")
+            .join_asof(self.cum.select(["tid", pl.col("session_idx").alias("lo_idx"), pl.col("cum").alias("cum_lo")]),
+                       on="lo_idx", by="tid", strategy="backward")
+            .select(["tid", "asof_date", "cum_lo"])
+        )
+        ranks = (
+            hi.filter(pl.col("seen_idx") > pl.col("lo_idx"))   # visto dentro de la ventana
+            .join(lo, on=["tid", "asof_date"], how="left")
+            .with_columns((pl.col("cum") - pl.col("cum_lo").fill_null(0)).alias("days_info_rich_win"))
+            .sort(["asof_date", "days_info_rich_win", "last_seen", "tid"],
+                  descending=[False, True, True, False])
+            .with_columns(pl.int_range(1, pl.len() + 1).over("asof_date").alias("rank"))
+        )
+        if k and k > 0:
+            ranks = ranks.filter(pl.col("rank") <= k)
+        return ranks.join(self.tickers, on="tid", how="left").select(RANK_COLUMNS)
+
+    def snapshots(self, asof_dates: Iterable[dt.date], k: Optional[int] = None) -> pl.DataFrame:
+        """Ranking as-of de todos los `asof_dates` (top-k por snapshot; k None/0 -> todos)"""
+        snaps = self.asof_sessions(asof_dates)
+        if snaps.is_empty() or self.tickers.is_empty():
+            return pl.DataFrame(schema={"asof_date": pl.Date, "rank": pl.Int64, "ticker": pl.Utf8,
+                                        "days_info_rich_win": pl.UInt32, "last_seen": pl.Date})
+        step = max(1, GRID_ROWS // self.tickers.height)
+        blocks = [self._snapshot_block(snaps.slice(i, step), k) for i in range(0, snaps.height, step)]
+        return pl.concat(blocks)
+
+    def daily(self, date_from: Optional[dt.date] = None, date_to: Optional[dt.date] = None,
+              k: Optional[int] = None) -> pl.DataFrame:
+        """
+        Serie diaria as-of: ranking en cada sesión de [date_from, date_to] (selección point-in-time).
+        Sin date_to termina en el último día de datos; con date_to posterior cubre también esas sesiones.
+        """
+        date_to = date_to or self.last_day
+        if date_to:
+            self.extend_calendar(date_to)
+        days = self.calendar["date"]
+        if date_from:
+            days = days.filter(days >= date_from)
+        if date_to:
+            days = days.filter(days <= date_to)
+        return self.snapshots(days.to_list(), k)
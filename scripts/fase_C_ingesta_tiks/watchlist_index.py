@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+watchlist_index.py
+Índice consolidado de días info-rich para los descargadores en modo watchlists
+(download_trades_optimized.py, download_quotes_optimized.py).
+
+En vez de abrir date=YYYY-MM-DD/watchlist.parquet día a día (~7.000 ficheros en 20 años) y
+expandir ventanas con búsquedas lineales en listas, se mantiene dentro de la raíz de watchlists:
+
+  {watchlist_root}/_info_rich_index.parquet       (ticker, trading_day) con info_rich=True, ordenado
+  {watchlist_root}/_info_rich_index_days.parquet  trading_day de cada watchlist ya indexado, con
+                                                  mtime_ns y size del watchlist.parquet indexado
+
+- build_dynamic_universe_optimized.py lo actualiza al escribir (update_index con el frame del día,
+  sin releer disco). Se reemplazan sólo los días reescritos.
+- refresh_index(): al cargar, indexa los date=... que aún no estén en el índice o cuyo watchlist
+  cambió (mtime_ns/size distintos: reescrito por otra herramienta). Lista el directorio y hace un
+  stat por día; no abre los días sin cambios.
+- info_rich_tasks(): una consulta lazy sobre el índice: filtro de rango/tickers + expansión de
+  ventana ±N días (int_ranges + explode) + unique. Misma semántica que el bucle anterior:
+  el día evento debe estar en [dfrom, min(dto, hoy)] y los días expandidos también.
+
+Uso (reconstrucción completa del índice):
+  python scripts/fase_C_ingesta_tiks/watchlist_index.py --watchlist-root processed/universe/info_rich/daily
+"""
+import argparse, os
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import polars as pl
+
+INDEX_FILE = "_info_rich_index.parquet"
+DAYS_FILE = "_info_rich_index_days.parquet"
+DAYS_SCHEMA = {"trading_day": pl.Date, "mtime_ns": pl.Int64, "size": pl.Int64}
+
+def log(msg: str):
+    print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
+
+def watchlist_days(watchlist_root: Path) -> List[date]:
+    """Días con date=YYYY-MM-DD/watchlist.parquet (un listado de directorio, sin abrir ficheros)."""
+    out = []
+    if not watchlist_root.exists():
+        return out
+    for e in os.scandir(watchlist_root):
+        if e.is_dir() and e.name.startswith("date="):
+            try:
+                out.append(date.fromisoformat(e.name[5:]))
+            except ValueError:
+                continue
+    return sorted(out)
+
+def watchlist_stats(watchlist_root: Path, days: Iterable[date]) -> pl.DataFrame:
+    """(trading_day, mtime_ns, size) del watchlist.parquet de cada día (nulos si no existe)."""
+    rows = []
+    for d in days:
+        try:
+            st = os.stat(watchlist_root / f"date={d.isoformat()}" / "watchlist.parquet")
+            rows.append((d, st.st_mtime_ns, st.st_size))
+        except OSError:
+            rows.append((d, None, None))
+    return pl.DataFrame(rows, schema=DAYS_SCHEMA, orient="row")
+
+def read_watchlists(watchlist_root: Path, days: Iterable[date]) -> pl.DataFrame:
+    """(ticker, trading_day) info_rich de los watchlists de `days` (scans lazy, collect_all en paralelo)."""
+    paths = [watchlist_root / f"date={d.isoformat()}" / "watchlist.parquet" for d in days]
+    paths = [p for p in paths if p.exists()]
+    frames = []
+    for p in paths:
+        # El schema de cada día puede variar (pilot50, versiones antiguas): se proyecta por fichero
+        lf = pl.scan_parquet(p)
+        if "info_rich" not in lf.collect_schema().names():
+            continue
+        day = date.fromisoformat(p.parent.name[5:])
+        frames.append(lf.filter(pl.col("info_rich") == True)
+                      .select(pl.col("ticker").cast(pl.Utf8), pl.lit(day).alias("trading_day")))
+    if not frames:
+        return pl.DataFrame(schema={"ticker": pl.Utf8, "trading_day": pl.Date})
+    return pl.concat(pl.collect_all(frames))
+
+def _write_atomic(df: pl.DataFrame, path: Path):
+    tmp = path.with_name(path.name + ".tmp")
+    df.write_parquet(tmp, compression="zstd", compression_level=2)
+    os.replace(tmp, path)
+
+def update_index(watchlist_root: Path, days: Iterable[date], frame: Optional[pl.DataFrame] = None) -> Tuple[int, int]:
+    """
+    Reemplaza en el índice los días `days`. `frame` (ticker, trading_day, info_rich) evita releer los
+    watchlists cuando el llamador acaba de escribirlos. Devuelve (días en índice, filas en índice).
+    """
+    days = sorted(set(days))
+    days_df = watchlist_stats(watchlist_root, days)   # antes de leer: un cambio posterior se reindexa
+    if frame is None:
+        new = read_watchlists(watchlist_root, days)
+    else:
+        new = (frame.filter(pl.col("info_rich") == True)
+               .select(pl.col("ticker").cast(pl.Utf8), pl.col("trading_day").cast(pl.Date)))
+
+    idx_path, days_path = watchlist_root / INDEX_FILE, watchlist_root / DAYS_FILE
+    if idx_path.exists() and days_path.exists():
+        old = pl.read_parquet(idx_path).join(days_df, on="trading_day", how="anti")
+        old_days = read_days(days_path).join(days_df, on="trading_day", how="anti")
+    else:
+        old = new.clear()
+        old_days = days_df.clear()
+    index = pl.concat([old, new]).unique().sort(["ticker", "trading_day"])
+    covered = pl.concat([old_days, days_df]).sort("trading_day")
+    watchlist_root.mkdir(parents=True, exist_ok=True)
+    _write_atomic(index, idx_path)
+    _write_atomic(covered, days_path)
+    return covered.height, index.height
+
+def read_days(days_path: Path) -> pl.DataFrame:
+    """Días indexados; un fichero de versiones anteriores (sin mtime_ns/size) se lee con stats nulos."""
+    df = pl.read_parquet(days_path)
+    return df.select([pl.col(c).cast(t) if c in df.columns else pl.lit(None, dtype=t).alias(c)
+                      for c, t in DAYS_SCHEMA.items()])
+
+def refresh_index(watchlist_root: Path) -> int:
+    """
+    Indexa los días presentes en disco que faltan en el índice o cuyo watchlist cambió desde que se
+    indexó (mtime_ns/size). Devuelve cuántos días se (re)indexaron.
+    """
+    on_disk = watchlist_stats(watchlist_root, watchlist_days(watchlist_root))
+    days_path = watchlist_root / DAYS_FILE
+    if days_path.exists() and (watchlist_root / INDEX_FILE).exists():
+        known = {d: (m, s) for d, m, s in read_days(days_path).iter_rows()}
+    else:
+        known = {}
+    stale = [d for d, m, s in on_disk.iter_rows() if known.get(d, (0, 0)) != (m, s)]
+    if stale:
+        n_new = sum(1 for d in stale if d not in known)
+        n_days, n_rows = update_index(watchlist_root, stale)
+        log(f"Índice info-rich: +{n_new:,} días nuevos, {len(stale) - n_new:,} reindexados "
+            f"({n_days:,} días, {n_rows:,} ticker-días)")
+    return len(stale)
+
+def info_rich_tasks(watchlist_root: Path, dfrom: date, dto: date, allowed_tickers: Optional[set],
+                    event_window: int = 0, today: Optional[date] = None) -> pl.DataFrame:
+    """
+    (ticker, day) a descargar: eventos info-rich en [dfrom, min(dto, hoy)] expandidos ±event_window
+    días naturales y recortados al mismo rango. Ordenado por ticker, day.
+    """
+    refresh_index(watchlist_root)
+    idx_path = watchlist_root / INDEX_FILE
+    if not idx_path.exists():
+        return pl.DataFrame(schema={"ticker": pl.Utf8, "day": pl.Date})
+    hi = min(dto, today or date.today())
+    lf = pl.scan_parquet(idx_path).filter(pl.col("trading_day").is_between(dfrom, hi))
+    if allowed_tickers:
+        lf = lf.filter(pl.col("ticker").is_in(pl.Series(list(allowed_tickers), dtype=pl.Utf8)))
+    if event_window > 0:
+        lf = (lf.with_columns(pl.int_ranges(-event_window, event_window + 1).alias("offset"))
+                .explode("offset")
+                .with_columns((pl.col("trading_day") + pl.duration(days=pl.col("offset"))).alias("trading_day"))
+                .filter(pl.col("trading_day").is_between(dfrom, hi)))
+    return (lf.select("ticker", pl.col("trading_day").alias("day"))
+              .unique()
+              .sort(["ticker", "day"])
+              .collect())
+
+def load_info_rich_days(watchlist_root: Path, dfrom: date, dto: date, allowed_tickers: Optional[set],
+                        event_window: int = 0) -> Dict[str, List[date]]:
+    """{ticker: [días ordenados]} a partir de info_rich_tasks (formato que usan los descargadores)."""
+    tasks = info_rich_tasks(watchlist_root, dfrom, dto, allowed_tickers, event_window)
+    out: Dict[str, List[date]] = {}
+    for t, days in tasks.group_by("ticker", maintain_order=True).agg("day").iter_rows():
+        out[t] = days
+    return out
+
+def main():
+    ap = argparse.ArgumentParser(description="Reconstruye el índice info-rich de una raíz de watchlists")
+    ap.add_argument("--watchlist-root", default="processed/universe/info_rich/daily")
+    args = ap.parse_args()
+    root = Path(args.watchlist_root)
+    days = watchlist_days(root)
+    log(f"Indexando {len(days):,} watchlists en {root} ...")
+    n_days, n_rows = update_index(root, days)
+    log(f"Índice: {n_days:,} días, {n_rows:,} ticker-días info-rich -> {root / INDEX_FILE}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+watchlist_writer.py
+Escritura vectorizada de watchlists diarios: {watchlist_root}/date=YYYY-MM-DD/watchlist.parquet
+(el layout que leen watchlist_index.py y los descargadores en modo watchlists).
+
+Usado por build_dynamic_universe_optimized.py y create_partitioned_watchlist_pilot50.py.
+
+- Un único partition_by(día) en vez de filtrar el frame completo por cada día (O(días x filas)).
+- Digest de contenido por día en una pasada (hash_rows + suma uint64 por día, independiente del
+  orden de filas), guardado en {watchlist_root}/_watchlists_manifest.parquet (day, rows, digest,
+  columns). Con only_changed sólo se escriben los días cuyo contenido cambió desde el último run
+  (o cuyo fichero falta); el resto ni se particiona.
+- Escrituras en un pool de hilos (write_parquet libera el GIL), cada una tmp + os.replace.
+- Los días escritos se reemplazan en el índice info-rich (watchlist_index.update_index) con el
+  propio frame, sin releer disco: ningún llamador tiene que acordarse de actualizarlo.
+"""
+from __future__ import annotations
+import datetime as dt, os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+import polars as pl
+
+from watchlist_index import update_index, watchlist_days
+
+MANIFEST_FILE = "_watchlists_manifest.parquet"
+WATCHLIST_FILE = "watchlist.parquet"
+MANIFEST_SCHEMA = {"day": pl.Date, "rows": pl.UInt32, "digest": pl.UInt64, "columns": pl.Utf8}
+
+def _row_hashes(df: pl.DataFrame) -> pl.Series:
+    """hash_rows; columnas anidadas (p.ej. event_types list[str] del pilot50) se hashean como JSON"""
+    nested = [c for c, t in df.schema.items() if t.is_nested()]
+    if nested:
+        df = df.with_columns(pl.struct(pl.col(c)).struct.json_encode().alias(c) for c in nested)
+    return df.hash_rows(seed=0)
+
+def day_digests(df: pl.DataFrame, day_col: str) -> pl.DataFrame:
+    """(day, rows, digest, columns) de cada día de `df`, en una sola pasada"""
+    return (
+        df.select(pl.col(day_col).alias("day"), _row_hashes(df).alias("_h"))
+        .group_by("day")
+        .agg(pl.len().cast(pl.UInt32).alias("rows"), pl.col("_h").sum().alias("digest"))
+        .with_columns(pl.lit(",".join(f"{c}:{t}" for c, t in df.schema.items())).alias("columns"))
+        .select(list(MANIFEST_SCHEMA))
+        .sort("day")
+    )
+
+def load_manifest(watchlist_root: Path) -> pl.DataFrame:
+    p = Path(watchlist_root) / MANIFEST_FILE
+    return pl.read_parquet(p) if p.exists() else pl.DataFrame(schema=MANIFEST_SCHEMA)
+
+def _write_day(df: pl.DataFrame, path: Path, statistics: bool) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    df.write_parquet(tmp, compression="zstd", compression_level=2, statistics=statistics)
+    os.replace(tmp, path)
+    return path
+
+def write_daily_watchlists(
+    df: pl.DataFrame,
+    watchlist_root: Path,
+    day_col: str = "trading_day",
+    only_changed: bool = True,
+    workers: int = 4,
+    statistics: bool = False
+) -> Dict[str, List[dt.date]]:
+    """
+    Escribe un watchlist por día de `df` (todas sus columnas) y actualiza el manifest y el índice
+    info-rich de los días escritos (sin columna info_rich, esos días quedan sin días info-rich).
+    Días fuera de `df` no se tocan.
+
+    Returns:
+    --------
+    {"written": días escritos, "unchanged": días sin cambios (no reescritos)}
+    """
+    watchlist_root = Path(watchlist_root)
+    if df.is_empty():
+        return {"written": [], "unchanged": []}
+    digests = day_digests(df, day_col)
+
+    to_write = digests
+    if only_changed:
+        prev = load_manifest(watchlist_root)
+        on_disk = pl.Series("day", watchlist_days(watchlist_root), dtype=pl.Date)
+        same = (
+            digests.join(prev, on=["day", "rows", "digest", "columns"], how="semi")
+            .filter(pl.col("day").is_in(on_disk))
+        )
+        to_write = digests.join(same.select("day"), on="day", how="anti")
+    days = to_write["day"].to_list()
+
+    if days:
+        part = df if len(days) == digests.height else df.filter(pl.col(day_col).is_in(to_write["day"]))
+        groups = part.partition_by(day_col, as_dict=True, maintain_order=True)
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            list(pool.map(
+                lambda kv: _write_day(kv[1], watchlist_root / f"date={kv[0][0].isoformat()}" / WATCHLIST_FILE,
+                                      statistics),
+                groups.items()
+            ))
+        if "ticker" in part.columns:
+            rich = pl.col("info_rich") if "info_rich" in part.columns else pl.lit(False)
+            update_index(watchlist_root, days,
+                         frame=part.select("ticker", pl.col(day_col).alias("trading_day"), rich.alias("info_rich")))
+
+    # Manifest: entradas previas de otros días + las de este df
+    manifest = pl.concat([load_manifest(watchlist_root).join(digests.select("day"), on="day", how="anti"), digests])
+    _write_day(manifest.sort("day"), watchlist_root / MANIFEST_FILE, statistics=True)
+
+    written = set(days)
+    return {"written": days, "unchanged": [d for d in digests["day"].to_list() if d not in written]}
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+_batching.py
+Modo de ejecución --group-by ticker compartido por los scripts de fase D
+(build_bars_from_trades, triple_barrier_labeling, make_sample_weights, build_ml_daser).
+
+En modo "day" (por defecto) cada (ticker, día) es una tarea del ProcessPoolExecutor.
+En modo "ticker" cada tarea es un ticker (o un bloque de --chunk-days días de un ticker):
+el worker lee todos sus ficheros con un solo scan_parquet, procesa los días en memoria
+y devuelve un mensaje por día, de modo que el coste de pickling / despacho / apertura
+se paga por grupo y no por fichero.
+"""
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+import polars as pl
+
+FILE_COL = "__file"
+
+def log(msg): print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
+
+def add_group_args(ap):
+    ap.add_argument("--group-by", choices=["day","ticker"], default="day",
+                    help="day: una tarea por (ticker, día) | ticker: una tarea por ticker/bloque de días")
+    ap.add_argument("--chunk-days", type=int, default=250,
+                    help="con --group-by ticker: máx. días por tarea (0 = ticker completo)")
+
+def group_by_ticker(items, chunk_days: int = 250):
+    """
+    Agrupa items (ticker, day, ...) en [(ticker, [items ordenados por día]), ...],
+    partiendo cada ticker en bloques de chunk_days días (0 = sin límite).
+    """
+    by_ticker = defaultdict(list)
+    for it in items:
+        by_ticker[it[0]].append(it)
+    groups = []
+    for ticker in sorted(by_ticker):
+        days = sorted(by_ticker[ticker], key=lambda it: it[1])
+        size = chunk_days if chunk_days and chunk_days > 0 else len(days)
+        for k in range(0, len(days), size):
+            groups.append((ticker, days[k:k + size]))
+    return groups
+
+def read_many(paths) -> dict:
+    """
+    Lee varios parquet con un único scan_parquet y devuelve {str(path): DataFrame}.
+    Los ficheros sin filas no aparecen en el resultado (ver frame_of).
+    Si los esquemas difieren (p.ej. formato legacy 't' vs 't_raw/t_unit') se cae a
+    lectura fichero a fichero para ese grupo; un fichero ilegible queda como excepción
+    y sólo falla su día.
+    """
+    paths = [str(p) for p in paths]
+    if not paths: return {}
+    try:
+        df = pl.scan_parquet(paths, include_file_paths=FILE_COL).collect()
+    except Exception:
+        out = {}
+        for p in paths:
+            try: out[p] = pl.read_parquet(p)
+            except Exception as e: out[p] = e
+        return out
+    parts = df.partition_by(FILE_COL, as_dict=True, include_key=False, maintain_order=True)
+    return {(k[0] if isinstance(k, tuple) else k): v for k, v in parts.items()}
+
+def frame_of(frames: dict, path):
+    """DataFrame de `path` leído por read_many (None si no tenía filas); relanza su error de lectura."""
+    df = frames.get(str(path))
+    if isinstance(df, Exception): raise df
+    return df
+
+def run_groups(group_worker, tasks, parallel: int, every: int = 20):
+    """
+    Ejecuta group_worker(task) -> list[str] ("TICKER DAY: OK|SKIP|ERROR ...") sobre un
+    ProcessPoolExecutor. Reporta progreso por grupos y los errores de cada grupo.
+    Devuelve (ok, skip, err) en número de días.
+    """
+    ok = skip = err = 0
+    days_total = sum(len(t[1]) for t in tasks)
+    log(f"Grupos: {len(tasks):,} | días: {days_total:,} | paralelismo={parallel}")
+    t0 = time.time()
+    done = 0
+    with ProcessPoolExecutor(max_workers=parallel) as ex:
+        futs = {ex.submit(group_worker, t): t for t in tasks}
+        for f in as_completed(futs):
+            ticker, days = futs[f][0], futs[f][1]
+            try:
+                msgs = f.result()
+            except Exception as e:  # fallo del grupo entero (p.ej. worker muerto)
+                msgs = [f"{ticker} {it[1]}: ERROR {e}" for it in days]
+            g_err = [m for m in msgs if "ERROR" in m]
+            ok += sum(1 for m in msgs if m.endswith(": OK"))
+            skip += sum(1 for m in msgs if m.endswith(": SKIP"))
+            err += len(g_err)
+            done += 1
+            if g_err:
+                log(f"[{ticker}] {len(g_err)}/{len(msgs)} días con error")
+                for m in g_err[:5]: log(f"  {m}")
+            if done % every == 0 or done == len(tasks):
+                el = time.time() - t0
+                log(f"Progreso: {done}/{len(tasks)} grupos | días ok={ok} skip={skip} err={err} | "
+                    f"{(ok + skip + err) / max(el, 1e-9):.1f} días/s")
+    return ok, skip, err
@@ -12,15 +12,19 @@ Uso:
     --trades-root raw/polygon/trades \
     --outdir processed/bars \
     --bar-type dollar_imbalance --target-usd 300000 \
-    --ema-window 50 --parallel 8 --resume
+    --ema-window 50 --parallel 8 --resume [--engine numpy|loop] [--group-by ticker]
 
 ACTUALIZADO 2025-10-27: Soporte para NUEVO formato timestamps (t_raw + t_unit)
+ACTUALIZADO: motor vectorizado (--engine numpy, por defecto). El motor "loop" (iter_rows)
+se mantiene como referencia; ambos producen barras idénticas byte a byte.
 """
 import os, sys, argparse, time
 from pathlib import Path
 from datetime import datetime
 from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
 import polars as pl
+from _batching import add_group_args, frame_of, group_by_ticker, read_many, run_groups
 
 def log(msg): print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
 
@@ -37,19 +41,19 @@ def list_day_paths(trades_root: Path):
 def success_marker(path: Path): (path / "_SUCCESS").touch(exist_ok=True)
 def has_success(path: Path) -> bool: return (path / "_SUCCESS").exists()
 
-def build_bars_one_day(in_file: Path, out_dir: Path, bar_type: str,
-                       target_usd: float, target_vol: int, ema_window: int):
-    df = pl.read_parquet(in_file)
-    if df.is_empty():
-        out_dir.mkdir(parents=True, exist_ok=True)
-        pl.DataFrame(schema={"t":pl.Datetime, "o":pl.Float64, "h":pl.Float64,
-                             "l":pl.Float64, "c":pl.Float64, "v":pl.Int64,
-                             "n":pl.Int64, "dollar":pl.Float64,
-                             "imbalance_score":pl.Float64}).write_parquet(
-            out_dir / f"{bar_type}.parquet", compression="zstd", compression_level=2, statistics=False
-        )
-        success_marker(out_dir); return
+BAR_SCHEMA = {"t_open": pl.Datetime("us"), "t_close": pl.Datetime("us"),
+              "o": pl.Float64, "h": pl.Float64, "l": pl.Float64, "c": pl.Float64,
+              "v": pl.Int64, "n": pl.Int64, "dollar": pl.Float64,
+              "imbalance_score": pl.Float64}
 
+def write_bars(bars: pl.DataFrame, out_dir: Path, bar_type: str):
+    out_dir.mkdir(parents=True, exist_ok=True)
+    bars.write_parquet(out_dir / f"{bar_type}.parquet",
+                       compression="zstd", compression_level=2, statistics=False)
+    success_marker(out_dir)
+
+def prepare_trades(df: pl.DataFrame, in_file: Path = None) -> pl.DataFrame:
+    """Normaliza timestamps (t_raw/t_unit o t legacy) y ordena por t."""
     # ========================================================================
     # TIMESTAMP FORMAT HANDLING (2025-10-27 UPDATE)
     # ========================================================================
@@ -82,8 +86,11 @@ def build_bars_one_day(in_file: Path, out_dir: Path, bar_type: str,
     if not need.issubset(df.columns):
         raise ValueError(f"Missing required columns in {in_file}: {need - set(df.columns)}")
 
-    df = df.sort("t")
+    return df.sort("t")
 
+def bars_loop(df: pl.DataFrame, bar_type: str, target_usd: float, target_vol: int,
+              ema_window: int) -> pl.DataFrame:
+    """Motor de referencia: recorre trade a trade (iter_rows). df ya pasado por prepare_trades."""
     # Tick-rule (signo por comparación con precio previo). +1 uptick, -1 downtick, 0 igual
     df = df.with_columns([
         (pl.col("p") - pl.col("p").shift(1)).alias("dp"),
@@ -156,22 +163,142 @@ def build_bars_one_day(in_file: Path, out_dir: Path, bar_type: str,
         t_close = df.select(pl.col("t").last()).item()
         flush_bar()
 
-    out_dir.mkdir(parents=True, exist_ok=True)
-    pl.from_dicts(bars).write_parquet(out_dir / f"{bar_type}.parquet",
-                                      compression="zstd", compression_level=2, statistics=False)
-    success_marker(out_dir)
+    return pl.from_dicts(bars)
+
+def ewma_thresholds(n: int, target: float, ema_window: int) -> np.ndarray:
+    """
+    Secuencia del umbral EWMA por trade (misma aritmética que el motor loop).
+    ewma parte de target y converge a un punto fijo en pocas iteraciones; a partir
+    de ahí se rellena el resto sin iterar.
+    """
+    alpha = 2.0 / (ema_window + 1.0) if ema_window and ema_window > 1 else 1.0
+    thr = np.empty(n, dtype=np.float64)
+    ewma = target
+    for i in range(n):
+        prev = ewma
+        ewma = alpha * target + (1 - alpha) * ewma
+        thr[i] = ewma
+        if ewma == prev:
+            thr[i:] = ewma
+            break
+    return thr
+
+def bar_boundaries(metric: np.ndarray, thr: np.ndarray, pad: int = 64) -> np.ndarray:
+    """
+    Índices (inclusive) del último trade de cada barra cerrada por umbral.
+    El corte de cada barra se estima con searchsorted sobre la suma acumulada global y
+    se confirma con una suma acumulada local (secuencial, como el acumulador del loop),
+    así que el trabajo total es O(n) en NumPy con un paso Python por barra, no por trade.
+    """
+    n = metric.shape[0]
+    cum = np.cumsum(metric)
+    ends = []
+    start = 0
+    while start < n:
+        base = cum[start - 1] if start > 0 else 0.0
+        guess = int(np.searchsorted(cum, base + thr[start], side="left"))
+        stop = min(n, max(guess + pad, start + pad))
+        end = -1
+        while True:
+            local = np.cumsum(metric[start:stop])
+            hit = np.flatnonzero(local >= thr[start:stop])
+            if hit.size:
+                end = start + int(hit[0]); break
+            if stop == n: break
+            stop = min(n, start + 2 * (stop - start))
+        if end < 0: break
+        ends.append(end)
+        start = end + 1
+    return np.asarray(ends, dtype=np.int64)
+
+def bars_numpy(df: pl.DataFrame, bar_type: str, target_usd: float, target_vol: int,
+               ema_window: int) -> pl.DataFrame:
+    """Motor vectorizado: límites de barra como arrays de índices + reducciones por segmento."""
+    n = df.height
+    t = df["t"].cast(pl.Datetime("us")).to_numpy()
+    p = df["p"].cast(pl.Float64).to_numpy()
+    s = df["s"].cast(pl.Int64).to_numpy()
+    d = p * s
+
+    # Tick-rule: +1 uptick, -1 downtick, 0 igual (primer trade = 0)
+    sign = np.zeros(n, dtype=np.int64)
+    sign[1:] = np.where(p[1:] > p[:-1], 1, np.where(p[1:] < p[:-1], -1, 0))
+
+    target = target_usd if bar_type.startswith("dollar") else float(target_vol)
+    metric = d if bar_type.startswith("dollar") else s.astype(np.float64)
+    ends = bar_boundaries(metric, ewma_thresholds(n, target, ema_window))
+    if ends.size == 0 or ends[-1] != n - 1:
+        ends = np.append(ends, n - 1)  # cierra resto
+    starts = np.concatenate(([0], ends[:-1] + 1))
+
+    # dollar: suma secuencial por barra (np.add.reduceat usa suma por pares y no coincide bit a bit)
+    dollar = np.array([np.cumsum(d[a:b + 1])[-1] for a, b in zip(starts, ends)], dtype=np.float64)
+    cnt = (ends - starts + 1).astype(np.int64)
+    imb = np.add.reduceat(sign, starts).astype(np.float64)
+
+    return pl.DataFrame({
+        "t_open": t[starts], "t_close": t[ends],
+        "o": p[starts], "h": np.maximum.reduceat(p, starts),
+        "l": np.minimum.reduceat(p, starts), "c": p[ends],
+        "v": np.add.reduceat(s, starts), "n": cnt,
+        "dollar": dollar,
+        "imbalance_score": imb / np.maximum(1, cnt),
+    }, schema=BAR_SCHEMA)
+
+ENGINES = {"loop": bars_loop, "numpy": bars_numpy}
+
+def build_bars_one_day(in_file: Path, out_dir: Path, bar_type: str,
+                       target_usd: float, target_vol: int, ema_window: int,
+                       engine: str = "numpy"):
+    df = pl.read_parquet(in_file)
+    build_bars_frame(df, in_file, out_dir, bar_type, target_usd, target_vol, ema_window, engine)
+
+def build_bars_frame(df: pl.DataFrame, in_file: Path, out_dir: Path, bar_type: str,
+                     target_usd: float, target_vol: int, ema_window: int,
+                     engine: str = "numpy"):
+    """Igual que build_bars_one_day pero sobre trades ya leídos (df None/vacío = día sin trades)."""
+    if df is None or df.is_empty():
+        out_dir.mkdir(parents=True, exist_ok=True)
+        pl.DataFrame(schema={"t":pl.Datetime, "o":pl.Float64, "h":pl.Float64,
+                             "l":pl.Float64, "c":pl.Float64, "v":pl.Int64,
+                             "n":pl.Int64, "dollar":pl.Float64,
+                             "imbalance_score":pl.Float64}).write_parquet(
+            out_dir / f"{bar_type}.parquet", compression="zstd", compression_level=2, statistics=False
+        )
+        success_marker(out_dir); return
+
+    df = prepare_trades(df, in_file)
+    bars = ENGINES[engine](df, bar_type, target_usd, target_vol, ema_window)
+    write_bars(bars, out_dir, bar_type)
 
 def worker(task):
-    ticker, day, in_file, outdir, bar_type, target_usd, target_vol, ema_window, resume = task
+    ticker, day, in_file, outdir, bar_type, target_usd, target_vol, ema_window, engine, resume = task
     out_dir = outdir / ticker / f"date={day}"
     if resume and (out_dir / "_SUCCESS").exists():
         return f"{ticker} {day}: SKIP"
     try:
-        build_bars_one_day(in_file, out_dir, bar_type, target_usd, target_vol, ema_window)
+        build_bars_one_day(in_file, out_dir, bar_type, target_usd, target_vol, ema_window, engine)
         return f"{ticker} {day}: OK"
     except Exception as e:
         return f"{ticker} {day}: ERROR {e}"
 
+def group_worker(task):
+    ticker, items, outdir, bar_type, target_usd, target_vol, ema_window, engine, resume = task
+    msgs, todo = [], []
+    for _, day, in_file in items:
+        out_dir = outdir / ticker / f"date={day}"
+        if resume and has_success(out_dir): msgs.append(f"{ticker} {day}: SKIP")
+        else: todo.append((day, in_file, out_dir))
+    frames = read_many([f for _, f, _ in todo])
+    for day, in_file, out_dir in todo:
+        try:
+            build_bars_frame(frame_of(frames, in_file), in_file, out_dir, bar_type,
+                             target_usd, target_vol, ema_window, engine)
+            msgs.append(f"{ticker} {day}: OK")
+        except Exception as e:
+            msgs.append(f"{ticker} {day}: ERROR {e}")
+    return msgs
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--trades-root", required=True)
@@ -180,17 +307,29 @@ def main():
     ap.add_argument("--target-usd", type=float, default=300000.0)
     ap.add_argument("--target-vol", type=int, default=100000)
     ap.add_argument("--ema-window", type=int, default=50)
+    ap.add_argument("--engine", choices=sorted(ENGINES), default="numpy",
+                    help="numpy: vectorizado (defecto) | loop: referencia trade a trade")
     ap.add_argument("--parallel", type=int, default=8)
     ap.add_argument("--resume", action="store_true")
+    add_group_args(ap)
     args = ap.parse_args()
 
     trades_root = Path(args.trades_root)
     outdir = Path(args.outdir)
+    if args.group_by == "ticker":
+        t0 = time.time()
+        groups = [(ticker, items, outdir, args.bar_type, args.target_usd, args.target_vol,
+                   args.ema_window, args.engine, args.resume)
+                  for ticker, items in group_by_ticker(list_day_paths(trades_root), args.chunk_days)]
+        log(f"Modo group-by ticker | tipo={args.bar_type} | engine={args.engine}")
+        run_groups(group_worker, groups, args.parallel)
+        log(f"FIN en {(time.time()-t0)/60:.1f} min")
+        return
     tasks = []
     for ticker, day, parquet in list_day_paths(trades_root):
         tasks.append((ticker, day, parquet, outdir, args.bar_type,
-                      args.target_usd, args.target_vol, args.ema_window, args.resume))
-    log(f"Tareas: {len(tasks):,} | paralelismo={args.parallel} | tipo={args.bar_type}")
+                      args.target_usd, args.target_vol, args.ema_window, args.engine, args.resume))
+    log(f"Tareas: {len(tasks):,} | paralelismo={args.parallel} | tipo={args.bar_type} | engine={args.engine}")
     t0 = time.time()
     done = 0
     with ProcessPoolExecutor(max_workers=args.parallel) as ex:
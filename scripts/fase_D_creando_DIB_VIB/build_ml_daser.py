@@ -25,7 +25,7 @@ Uso típico:
     --weights-root processed/weights \
     --outdir processed/datasets \
     --bar-file dollar_imbalance.parquet \
-    --parallel 8 --resume \
+    --parallel 8 --resume [--group-by ticker --chunk-days 250] \
     --split walk_forward --folds 5 --purge-bars 50
 """
 import argparse, json, math, os, sys, time
@@ -34,6 +34,7 @@ from datetime import datetime
 from typing import List, Tuple
 from concurrent.futures import ProcessPoolExecutor, as_completed
 import polars as pl
+from _batching import add_group_args, frame_of, group_by_ticker, read_many, run_groups
 
 def log(m): print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {m}", flush=True)
 
@@ -113,7 +114,12 @@ def make_features_from_bars(bars: pl.DataFrame) -> pl.DataFrame:
 def build_day_dataset(bars_path: Path, labels_path: Path, weights_path: Path) -> pl.DataFrame:
     bars = pl.read_parquet(bars_path)
     labels = pl.read_parquet(labels_path)
-    if bars.is_empty() or labels.is_empty():
+    w = pl.read_parquet(weights_path) if weights_path.exists() else None
+    return assemble_day_dataset(bars, labels, w)
+
+def assemble_day_dataset(bars: pl.DataFrame, labels: pl.DataFrame, w: pl.DataFrame = None) -> pl.DataFrame:
+    """Igual que build_day_dataset pero sobre frames ya leídos (w None = sin pesos)."""
+    if bars is None or labels is None or bars.is_empty() or labels.is_empty():
         return pl.DataFrame()
 
     feats = make_features_from_bars(bars)
@@ -122,10 +128,8 @@ def build_day_dataset(bars_path: Path, labels_path: Path, weights_path: Path) ->
     df = labels.join(feats, left_on="anchor_ts", right_on="t_close", how="inner")
 
     # Añade pesos si existen
-    if weights_path.exists():
-        w = pl.read_parquet(weights_path)
-        if not w.is_empty():
-            df = df.join(w, on="anchor_ts", how="left")
+    if w is not None and not w.is_empty():
+        df = df.join(w, on="anchor_ts", how="left")
     if "weight" not in df.columns:
         df = df.with_columns(pl.lit(1.0).alias("weight"))
 
@@ -144,16 +148,37 @@ def worker(task):
     out = daily_outdir / ticker / f"date={day}" / "dataset.parquet"
     if resume and out.exists(): return f"{ticker} {day}: SKIP"
     try:
-        ds = build_day_dataset(bar_path, label_path, weight_path)
-        out.parent.mkdir(parents=True, exist_ok=True)
-        if ds.is_empty():
-            pl.DataFrame(schema={"anchor_ts":pl.Datetime,"label":pl.Int8,"weight":pl.Float64}).write_parquet(out)
-        else:
-            ds.write_parquet(out, compression="zstd", compression_level=2)
+        write_day_dataset(build_day_dataset(bar_path, label_path, weight_path), out)
         return f"{ticker} {day}: OK"
     except Exception as e:
         return f"{ticker} {day}: ERROR {e}"
 
+def write_day_dataset(ds: pl.DataFrame, out: Path):
+    out.parent.mkdir(parents=True, exist_ok=True)
+    if ds.is_empty():
+        pl.DataFrame(schema={"anchor_ts":pl.Datetime,"label":pl.Int8,"weight":pl.Float64}).write_parquet(out)
+    else:
+        ds.write_parquet(out, compression="zstd", compression_level=2)
+
+def group_worker(task):
+    ticker, items, daily_outdir, resume = task
+    msgs, todo = [], []
+    for _, day, bar_path, label_path, weight_path in items:
+        out = daily_outdir / ticker / f"date={day}" / "dataset.parquet"
+        if resume and out.exists(): msgs.append(f"{ticker} {day}: SKIP")
+        else: todo.append((day, bar_path, label_path, weight_path, out))
+    bars = read_many([b for _, b, _, _, _ in todo])
+    labels = read_many([l for _, _, l, _, _ in todo])
+    weights = read_many([w for _, _, _, w, _ in todo if w.exists()])
+    for day, bar_path, label_path, weight_path, out in todo:
+        try:
+            w = frame_of(weights, weight_path)
+            write_day_dataset(assemble_day_dataset(frame_of(bars, bar_path), frame_of(labels, label_path), w), out)
+            msgs.append(f"{ticker} {day}: OK")
+        except Exception as e:
+            msgs.append(f"{ticker} {day}: ERROR {e}")
+    return msgs
+
 # --------------------------
 # Agregado global + splits
 # --------------------------
@@ -168,7 +193,8 @@ def concat_daily_to_global(daily_root: Path, out_path: Path) -> Tuple[int,int]:
         pl.DataFrame().write_parquet(out_path)
         return 0, 0
     dfs = [pl.read_parquet(f) for f in files]
-    df = pl.concat(dfs, how="vertical_relaxed")
+    # diagonal: los días vacíos sólo traen anchor_ts/label/weight
+    df = pl.concat(dfs, how="diagonal_relaxed")
     # Campos mínimos asegurados
     base_cols = ["anchor_ts","label","weight"]
     for c in base_cols:
@@ -217,6 +243,7 @@ def main():
                     help="Nombre del parquet de barras dentro de cada date=YYYY-MM-DD/")
     ap.add_argument("--parallel", type=int, default=8)
     ap.add_argument("--resume", action="store_true")
+    add_group_args(ap)
 
     # Split
     ap.add_argument("--split", choices=["none","walk_forward"], default="walk_forward")
@@ -245,15 +272,21 @@ def main():
             continue
         tasks.append((tkr, day, bar_path, labels_path, weight_path, daily_outdir, args.bar_file, args.resume))
 
-    log(f"Tareas diarias: {len(tasks):,} | paralelismo={args.parallel}")
+    log(f"Tareas diarias: {len(tasks):,} | paralelismo={args.parallel} | group-by={args.group_by}")
     t0 = time.time()
     done=0; err=0
-    with ProcessPoolExecutor(max_workers=args.parallel) as ex:
-        futs = [ex.submit(worker, t) for t in tasks]
-        for f in as_completed(futs):
-            msg = f.result(); done += 1
-            if "ERROR" in msg: err += 1; log(msg)
-            if done % 200 == 0: log(f"Progreso: {done}/{len(tasks)}")
+    if args.group_by == "ticker":
+        groups = [(tkr, [t[:5] for t in items], daily_outdir, args.resume)
+                  for tkr, items in group_by_ticker(tasks, args.chunk_days)]
+        ok, skip, err = run_groups(group_worker, groups, args.parallel)
+        done = ok + skip + err
+    else:
+        with ProcessPoolExecutor(max_workers=args.parallel) as ex:
+            futs = [ex.submit(worker, t) for t in tasks]
+            for f in as_completed(futs):
+                msg = f.result(); done += 1
+                if "ERROR" in msg: err += 1; log(msg)
+                if done % 200 == 0: log(f"Progreso: {done}/{len(tasks)}")
 
     log(f"Daily datasets OK: {done-err}, errores: {err}. Tiempo {(time.time()-t0)/60:.1f} min")
 
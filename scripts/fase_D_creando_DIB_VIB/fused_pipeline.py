@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+fused_pipeline.py
+Pipeline fase D fusionado: trades -> barras -> labels -> pesos -> dataset, en memoria por (ticker, día).
+Reutiliza las funciones de build_bars_from_trades, triple_barrier_labeling, make_sample_weights y
+build_ml_daser (misma semántica), pero sin escribir/releer parquet intermedios: cada día se
+decodifica una vez y sólo se comprime el dataset final.
+
+Entrada:
+  raw/polygon/trades/{ticker}/date=YYYY-MM-DD/trades.parquet
+Salida:
+  processed/datasets/daily/{ticker}/date=YYYY-MM-DD/dataset.parquet
+  processed/datasets/global/dataset.parquet, splits/{train,valid}.parquet, meta.json
+  [--persist-intermediate] processed/datasets/_intermediate/{bars,labels,weights}/... (mismo layout
+  que los scripts individuales, para depurar)
+
+Uso:
+  python scripts/fase_D_creando_DIB_VIB/fused_pipeline.py \
+    --trades-root raw/polygon/trades \
+    --outdir processed/datasets \
+    --bar-type dollar_imbalance --target-usd 300000 --ema-window 50 \
+    --pt-mul 3.0 --sl-mul 2.0 --t1-bars 120 --vol-est ema --vol-window 50 \
+    --uniqueness --abs-ret-weight \
+    --parallel 8 --resume [--persist-intermediate] [--split walk_forward --folds 5 --purge-bars 50]
+"""
+import argparse, json, time
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import polars as pl
+
+from build_bars_from_trades import (ENGINES as BAR_ENGINES, build_bars_frame, list_day_paths, prepare_trades,
+                                    write_bars)
+from triple_barrier_labeling import ENGINES as LABEL_ENGINES, label_frame, prepare_bars
+from make_sample_weights import compute_weights, write_weights
+from build_ml_daser import (assemble_day_dataset, concat_daily_to_global, walk_forward_split,
+                            write_day_dataset)
+
+STAGES = ["read", "bars", "labels", "weights", "dataset", "write"]
+
+def log(msg): print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
+
+def run_day(in_file: Path, out: Path, cfg: dict, inter_root: Path = None, ticker: str = "", day: str = ""):
+    """Procesa un ticker-día completo en memoria. Devuelve {etapa: segundos}."""
+    timings = dict.fromkeys(STAGES, 0.0)
+    clock = time.perf_counter()
+
+    def lap(stage):
+        nonlocal clock
+        now = time.perf_counter()
+        timings[stage] += now - clock
+        clock = now
+
+    trades = pl.read_parquet(in_file)
+    lap("read")
+
+    bars = labels = weights = None
+    if not trades.is_empty():
+        bars = BAR_ENGINES[cfg["bar_engine"]](prepare_trades(trades, in_file), cfg["bar_type"],
+                                              cfg["target_usd"], cfg["target_vol"], cfg["ema_window"])
+        lap("bars")
+        labels = LABEL_ENGINES[cfg["label_engine"]](prepare_bars(bars, cfg["vol_est"], cfg["vol_window"], in_file),
+                                                    cfg["pt_mul"], cfg["sl_mul"], cfg["t1_bars"])
+        lap("labels")
+        weights = compute_weights(labels, cfg["uniqueness"], cfg["abs_ret"], cfg["half_life"],
+                                  cfg["uniqueness_mode"])
+        lap("weights")
+    ds = assemble_day_dataset(bars, labels, weights)
+    lap("dataset")
+
+    write_day_dataset(ds, out)
+    if inter_root is not None and bars is None:
+        # Día sin trades: los mismos ficheros vacíos (con esquema) que escriben los scripts individuales
+        build_bars_frame(None, in_file, inter_root / "bars" / ticker / f"date={day}", cfg["bar_type"],
+                         cfg["target_usd"], cfg["target_vol"], cfg["ema_window"])
+        label_frame(None, in_file, inter_root / "labels" / ticker / f"date={day}" / "labels.parquet",
+                    cfg["pt_mul"], cfg["sl_mul"], cfg["t1_bars"], cfg["vol_est"], cfg["vol_window"])
+        write_weights(pl.DataFrame(), inter_root / "weights" / ticker / f"date={day}" / "weights.parquet",
+                      cfg["uniqueness"], cfg["abs_ret"], cfg["half_life"], cfg["uniqueness_mode"])
+    elif inter_root is not None:
+        write_bars(bars, inter_root / "bars" / ticker / f"date={day}", cfg["bar_type"])
+        for name, df in (("labels", labels), ("weights", weights)):
+            f = inter_root / name / ticker / f"date={day}" / f"{name}.parquet"
+            f.parent.mkdir(parents=True, exist_ok=True)
+            df.write_parquet(f, compression="zstd", compression_level=2)
+    lap("write")
+    return timings
+
+def worker(task):
+    ticker, day, in_file, daily_outdir, cfg, inter_root, resume = task
+    out = daily_outdir / ticker / f"date={day}" / "dataset.parquet"
+    if resume and out.exists(): return f"{ticker} {day}: SKIP", None
+    try:
+        return f"{ticker} {day}: OK", run_day(in_file, out, cfg, inter_root, ticker, day)
+    except Exception as e:
+        return f"{ticker} {day}: ERROR {e}", None
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--trades-root", required=True)
+    ap.add_argument("--outdir", required=True)
+    # Barras (build_bars_from_trades)
+    ap.add_argument("--bar-type", choices=["dollar_imbalance","volume_imbalance"], default="dollar_imbalance")
+    ap.add_argument("--target-usd", type=float, default=300000.0)
+    ap.add_argument("--target-vol", type=int, default=100000)
+    ap.add_argument("--ema-window", type=int, default=50)
+    ap.add_argument("--bar-engine", choices=sorted(BAR_ENGINES), default="numpy")
+    # Labels (triple_barrier_labeling)
+    ap.add_argument("--pt-mul", type=float, default=3.0)
+    ap.add_argument("--sl-mul", type=float, default=2.0)
+    ap.add_argument("--t1-bars", type=int, default=120)
+    ap.add_argument("--vol-est", choices=["ema","sma"], default="ema")
+    ap.add_argument("--vol-window", type=int, default=50)
+    ap.add_argument("--label-engine", choices=sorted(LABEL_ENGINES), default="numpy")
+    # Pesos (make_sample_weights)
+    ap.add_argument("--uniqueness", action="store_true")
+    ap.add_argument("--uniqueness-mode", choices=["avg","anchor"], default="avg")
+    ap.add_argument("--abs-ret-weight", action="store_true")
+    ap.add_argument("--time-decay-half_life", type=int, default=90)
+    # Ejecución / dataset (build_ml_daser)
+    ap.add_argument("--parallel", type=int, default=8)
+    ap.add_argument("--resume", action="store_true")
+    ap.add_argument("--persist-intermediate", action="store_true",
+                    help="escribe también barras/labels/pesos en <outdir>/_intermediate (depuración)")
+    ap.add_argument("--split", choices=["none","walk_forward"], default="walk_forward")
+    ap.add_argument("--folds", type=int, default=5)
+    ap.add_argument("--purge-bars", type=int, default=50)
+    args = ap.parse_args()
+
+    outdir = Path(args.outdir)
+    daily_outdir = outdir / "daily"
+    inter_root = outdir / "_intermediate" if args.persist_intermediate else None
+    cfg = {
+        "bar_type": args.bar_type, "target_usd": args.target_usd, "target_vol": args.target_vol,
+        "ema_window": args.ema_window, "bar_engine": args.bar_engine,
+        "pt_mul": args.pt_mul, "sl_mul": args.sl_mul, "t1_bars": args.t1_bars,
+        "vol_est": args.vol_est, "vol_window": args.vol_window, "label_engine": args.label_engine,
+        "uniqueness": args.uniqueness, "uniqueness_mode": args.uniqueness_mode,
+        "abs_ret": args.abs_ret_weight, "half_life": args.time_decay_half_life,
+    }
+    tasks = [(t, d, f, daily_outdir, cfg, inter_root, args.resume)
+             for t, d, f in list_day_paths(Path(args.trades_root))]
+
+    log(f"Tareas: {len(tasks):,} | paralelismo={args.parallel} | tipo={args.bar_type} | "
+        f"persist-intermediate={args.persist_intermediate}")
+    t0 = time.time()
+    totals = dict.fromkeys(STAGES, 0.0)
+    done = err = 0
+    with ProcessPoolExecutor(max_workers=args.parallel) as ex:
+        futs = [ex.submit(worker, t) for t in tasks]
+        for f in as_completed(futs):
+            msg, timings = f.result(); done += 1
+            if timings:
+                for k, v in timings.items(): totals[k] += v
+            if "ERROR" in msg: err += 1; log(msg)
+            if done % 200 == 0: log(f"Progreso: {done}/{len(tasks)}")
+    log(f"Daily datasets OK: {done-err}, errores: {err}. Tiempo {(time.time()-t0)/60:.1f} min")
+
+    # Tiempos por etapa (suma de CPU-tiempo de los workers)
+    busy = sum(totals.values())
+    for k in STAGES:
+        log(f"  {k:8s}: {totals[k]:9.2f} s  ({totals[k] / max(busy, 1e-9):5.1%})")
+
+    global_path = outdir / "global" / "dataset.parquet"
+    files_cnt, rows_cnt = concat_daily_to_global(daily_outdir, global_path)
+    log(f"Global dataset: archivos={files_cnt}, filas={rows_cnt} -> {global_path}")
+
+    train_rows = valid_rows = 0
+    if args.split == "walk_forward":
+        train, valid = walk_forward_split(pl.read_parquet(global_path), args.folds, args.purge_bars)
+        splits_outdir = outdir / "splits"
+        splits_outdir.mkdir(parents=True, exist_ok=True)
+        train.write_parquet(splits_outdir / "train.parquet", compression="zstd", compression_level=2)
+        valid.write_parquet(splits_outdir / "valid.parquet", compression="zstd", compression_level=2)
+        train_rows, valid_rows = train.height, valid.height
+        log(f"Split walk-forward: folds={args.folds}, purge={args.purge_bars} -> "
+            f"train={train_rows}, valid={valid_rows}")
+
+    meta = {
+        "created_at": datetime.utcnow().isoformat(),
+        "pipeline": "fused",
+        "trades_root": args.trades_root,
+        "outdir": str(outdir),
+        "config": cfg,
+        "tasks": len(tasks),
+        "daily_files": files_cnt,
+        "global_rows": rows_cnt,
+        "split": args.split,
+        "folds": args.folds,
+        "purge_bars": args.purge_bars,
+        "train_rows": train_rows,
+        "valid_rows": valid_rows,
+        "stage_seconds": {k: round(v, 3) for k, v in totals.items()},
+        "label_column": "label",
+        "weight_column": "weight",
+        "time_index": "anchor_ts"
+    }
+    (outdir / "meta.json").write_text(json.dumps(meta, indent=2))
+    log(f"Meta escrito en {outdir / 'meta.json'}")
+
+if __name__ == "__main__":
+    main()
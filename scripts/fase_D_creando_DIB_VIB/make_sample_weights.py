@@ -12,12 +12,18 @@ Uso:
     --labels-root processed/labels \
     --outdir processed/weights \
     --uniqueness true --abs-ret-weight true \
-    --time-decay-half_life 90 --parallel 8 --resume
+    --time-decay-half_life 90 --parallel 8 --resume [--uniqueness-mode avg|anchor] [--group-by ticker]
+
+Unicidad (López de Prado, AFML cap. 4): c_t = nº de labels cuyo intervalo [anchor_ts, t1]
+cubre t; unicidad media u_i = media de 1/c_t sobre t en [anchor_ts_i, t1_i]. Se calcula con
+barrido sobre intervalos ordenados (searchsorted + sumas prefijas), O(n log n).
 """
 import argparse, time, math
 from datetime import datetime
 from pathlib import Path
+import numpy as np
 import polars as pl
+from _batching import add_group_args, frame_of, group_by_ticker, read_many, run_groups
 from concurrent.futures import ProcessPoolExecutor, as_completed
 
 def log(msg): print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
@@ -32,8 +38,40 @@ def list_label_files(labels_root: Path):
             if f.exists():
                 yield ticker, day, f
 
+def _as_int(x) -> np.ndarray:
+    if isinstance(x, pl.Series):
+        x = x.to_physical().to_numpy() if x.dtype.is_temporal() else x.to_numpy()
+    x = np.asarray(x)
+    return x.view(np.int64) if x.dtype.kind == "M" else x.astype(np.int64, copy=False)
+
+def label_concurrency(anchors, t1s, at=None) -> np.ndarray:
+    """
+    Nº de intervalos [anchors_j, t1s_j] que contienen cada instante de `at`
+    (por defecto los propios anchors). Barrido con searchsorted: O((n + m) log n).
+    """
+    a = _as_int(anchors); b = _as_int(t1s)
+    at = a if at is None else _as_int(at)
+    started = np.searchsorted(np.sort(a), at, side="right")   # a_j <= t
+    ended = np.searchsorted(np.sort(b), at, side="left")      # b_j <  t
+    return started - ended
+
+def average_uniqueness(anchors, t1s) -> np.ndarray:
+    """
+    Unicidad media por label: media de 1/c_t sobre los instantes t del grid de eventos
+    (anchors ∪ t1) dentro de [anchor_i, t1_i]. Sumas prefijas de 1/c_t, O(n log n).
+    """
+    a = _as_int(anchors); b = _as_int(t1s)
+    if a.size == 0: return np.zeros(0, dtype=np.float64)
+    grid = np.unique(np.concatenate((a, b)))
+    conc = label_concurrency(a, b, at=grid)
+    inv = 1.0 / np.maximum(1, conc)
+    prefix = np.concatenate(([0.0], np.cumsum(inv)))
+    lo = np.searchsorted(grid, a, side="left")
+    hi = np.searchsorted(grid, b, side="right")
+    return (prefix[hi] - prefix[lo]) / np.maximum(1, hi - lo)
+
 def compute_weights(df: pl.DataFrame, use_uniqueness: bool, abs_ret: bool,
-                    half_life_days: int) -> pl.DataFrame:
+                    half_life_days: int, uniqueness_mode: str = "avg") -> pl.DataFrame:
     if df.is_empty():
         return pl.DataFrame({"anchor_ts": [], "weight": []})
 
@@ -41,23 +79,18 @@ def compute_weights(df: pl.DataFrame, use_uniqueness: bool, abs_ret: bool,
     # Base weight: |ret| o 1
     base = df["ret_at_outcome"].abs() if abs_ret else pl.Series([1.0]*df.height)
 
-    # Unicidad temporal: prox con conteo de eventos que cubren cada anchor_ts (ventanas [anchor,t1])
-    # Aproximación: para cada i, concurrency = nº de ventanas que incluyen anchor_ts[i]
+    # Unicidad temporal sobre ventanas [anchor_ts, t1]:
+    #   avg    -> unicidad media de López de Prado (media de 1/c_t en la ventana del label)
+    #   anchor -> 1 / nº de ventanas que incluyen anchor_ts[i] (aproximación anterior)
     anchors = df["anchor_ts"]
     t1s = df["t1"]
-    # Convert to python lists for speed in small batches
-    a = anchors.to_list(); b = t1s.to_list()
-    n = len(a)
-    conc = []
-    for i in range(n):
-        ai = a[i]; cnt = 0
-        for j in range(n):
-            if a[j] <= ai <= b[j]:
-                cnt += 1
-        conc.append(max(1, cnt))
-    conc_s = pl.Series(conc)
-
-    w = base / conc_s if use_uniqueness else base
+    n = df.height
+    if not use_uniqueness:
+        w = base
+    elif uniqueness_mode == "anchor":
+        w = base / pl.Series(np.maximum(1, label_concurrency(anchors, t1s)))
+    else:
+        w = base * pl.Series(average_uniqueness(anchors, t1s))
 
     # Time decay (por días): decay = 0.5 ** (age_days / half_life)
     if half_life_days and half_life_days > 0:
@@ -70,31 +103,64 @@ def compute_weights(df: pl.DataFrame, use_uniqueness: bool, abs_ret: bool,
     return pl.DataFrame({"anchor_ts": anchors, "weight": w})
 
 def worker(task):
-    ticker, day, fpath, outdir, use_uni, abs_ret, half_life, resume = task
+    ticker, day, fpath, outdir, use_uni, abs_ret, half_life, uni_mode, resume = task
     out = outdir / ticker / f"date={day}" / "weights.parquet"
     if resume and out.exists(): return f"{ticker} {day}: SKIP"
     try:
-        df = pl.read_parquet(fpath)
-        out.parent.mkdir(parents=True, exist_ok=True)
-        compute_weights(df, use_uni, abs_ret, half_life).write_parquet(out, compression="zstd", compression_level=2)
+        write_weights(pl.read_parquet(fpath), out, use_uni, abs_ret, half_life, uni_mode)
         return f"{ticker} {day}: OK"
     except Exception as e:
         return f"{ticker} {day}: ERROR {e}"
 
+def write_weights(df: pl.DataFrame, out: Path, use_uni: bool, abs_ret: bool, half_life: int,
+                  uni_mode: str = "avg"):
+    out.parent.mkdir(parents=True, exist_ok=True)
+    compute_weights(df, use_uni, abs_ret, half_life, uni_mode).write_parquet(out, compression="zstd", compression_level=2)
+
+def group_worker(task):
+    ticker, items, outdir, use_uni, abs_ret, half_life, uni_mode, resume = task
+    msgs, todo = [], []
+    for _, day, fpath in items:
+        out = outdir / ticker / f"date={day}" / "weights.parquet"
+        if resume and out.exists(): msgs.append(f"{ticker} {day}: SKIP")
+        else: todo.append((day, fpath, out))
+    frames = read_many([f for _, f, _ in todo])
+    for day, fpath, out in todo:
+        try:
+            df = frame_of(frames, fpath)
+            write_weights(pl.DataFrame() if df is None else df, out, use_uni, abs_ret, half_life, uni_mode)
+            msgs.append(f"{ticker} {day}: OK")
+        except Exception as e:
+            msgs.append(f"{ticker} {day}: ERROR {e}")
+    return msgs
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--labels-root", required=True)
     ap.add_argument("--outdir", required=True)
     ap.add_argument("--uniqueness", action="store_true")
+    ap.add_argument("--uniqueness-mode", choices=["avg","anchor"], default="avg",
+                    help="avg: unicidad media AFML (defecto) | anchor: 1/concurrencia en anchor_ts")
     ap.add_argument("--abs-ret-weight", action="store_true")
     ap.add_argument("--time-decay-half_life", type=int, default=90)
     ap.add_argument("--parallel", type=int, default=8)
     ap.add_argument("--resume", action="store_true")
+    add_group_args(ap)
     args = ap.parse_args()
 
     labels_root = Path(args.labels_root)
     outdir = Path(args.outdir)
-    tasks = [(t, d, f, outdir, args.uniqueness, args.abs_ret_weight, args.time_decay_half_life, args.resume)
+    if args.group_by == "ticker":
+        t0 = time.time()
+        groups = [(ticker, items, outdir, args.uniqueness, args.abs_ret_weight,
+                   args.time_decay_half_life, args.uniqueness_mode, args.resume)
+                  for ticker, items in group_by_ticker(list_label_files(labels_root), args.chunk_days)]
+        log("Modo group-by ticker")
+        run_groups(group_worker, groups, args.parallel)
+        log(f"FIN en {(time.time()-t0)/60:.1f} min")
+        return
+    tasks = [(t, d, f, outdir, args.uniqueness, args.abs_ret_weight, args.time_decay_half_life,
+              args.uniqueness_mode, args.resume)
              for (t, d, f) in list_label_files(labels_root)]
 
     log(f"Tareas: {len(tasks):,} | paralelismo={args.parallel}")
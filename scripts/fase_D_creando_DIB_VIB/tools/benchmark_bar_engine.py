@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+benchmark_bar_engine.py
+Paridad + throughput (ticks/seg) de los motores de barras de build_bars_from_trades.py.
+
+1. Paridad: genera un set de fixtures sintéticos (t_raw/t_unit ns/us/ms, precios con
+   empates, tamaños variados) o usa ficheros reales con --trades-root, construye barras
+   con --engine loop y --engine numpy y compara los parquet escritos byte a byte.
+2. Throughput: mide ticks/seg de cada motor sobre un día sintético de --ticks trades.
+
+Uso:
+  python scripts/fase_D_creando_DIB_VIB/tools/benchmark_bar_engine.py \
+    --ticks 1000000 --repeat 3 [--trades-root raw/polygon/trades --sample 50]
+"""
+import argparse, random, sys, tempfile, time
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+import polars as pl
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from build_bars_from_trades import ENGINES, build_bars_one_day, list_day_paths, prepare_trades
+
+def log(msg): print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
+
+def synthetic_trades(n: int, seed: int, t_unit: str = "ns") -> pl.DataFrame:
+    """Día sintético tipo small-cap: random walk en ticks de 0.01 y tamaños log-normales."""
+    rng = np.random.default_rng(seed)
+    scale = {"ns": 1_000_000_000, "us": 1_000_000, "ms": 1_000}[t_unit]
+    t0 = 1_583_760_600 * scale  # 2020-03-09 13:30 UTC
+    t_raw = t0 + np.sort(rng.integers(0, 23_400 * scale, n))
+    p = np.round(np.maximum(0.01, 2.0 + np.cumsum(rng.choice([-1, 0, 1], n)) * 0.01), 2)
+    s = np.maximum(1, rng.lognormal(5.0, 1.2, n)).astype(np.int64)
+    return pl.DataFrame({"t_raw": t_raw, "t_unit": [t_unit] * n, "p": p, "s": s})
+
+def parity(files, tmp: Path, configs) -> int:
+    fails = 0
+    for i, f in enumerate(files):
+        for bar_type, target_usd, target_vol, ema_window in configs:
+            outs = {}
+            for engine in ENGINES:
+                out_dir = tmp / engine / str(i)
+                build_bars_one_day(f, out_dir, bar_type, target_usd, target_vol, ema_window, engine)
+                outs[engine] = (out_dir / f"{bar_type}.parquet").read_bytes()
+            if len(set(outs.values())) != 1:
+                fails += 1
+                log(f"[DIFF] {f} {bar_type} usd={target_usd} vol={target_vol} ema={ema_window}")
+    return fails
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--ticks", type=int, default=1_000_000, help="trades del día sintético de throughput")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--trades-root", default=None, help="opcional: fixtures reales raw/polygon/trades")
+    ap.add_argument("--sample", type=int, default=50)
+    ap.add_argument("--skip-loop", action="store_true", help="no medir el motor loop (lento en días grandes)")
+    args = ap.parse_args()
+
+    configs = [("dollar_imbalance", 300000.0, 100000, 50),
+               ("dollar_imbalance", 25000.0, 100000, 1),
+               ("volume_imbalance", 300000.0, 20000, 50)]
+
+    with tempfile.TemporaryDirectory() as td:
+        tmp = Path(td)
+        # ---- Paridad
+        if args.trades_root:
+            files = [f for _, _, f in list_day_paths(Path(args.trades_root))]
+            random.seed(42)
+            files = random.sample(files, min(args.sample, len(files)))
+        else:
+            files = []
+            for k, (n, unit) in enumerate([(1, "ns"), (37, "ms"), (5_000, "us"), (50_000, "ns")]):
+                f = tmp / "fixtures" / f"trades_{k}.parquet"
+                f.parent.mkdir(parents=True, exist_ok=True)
+                synthetic_trades(n, seed=k, t_unit=unit).write_parquet(f)
+                files.append(f)
+        fails = parity(files, tmp, configs)
+        log(f"Paridad loop vs numpy: {len(files) * len(configs) - fails}/{len(files) * len(configs)} idénticos")
+
+        # ---- Throughput
+        df = prepare_trades(synthetic_trades(args.ticks, seed=123))
+        for engine, fn in ENGINES.items():
+            if engine == "loop" and args.skip_loop: continue
+            best = float("inf")
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                bars = fn(df, "dollar_imbalance", 300000.0, 100000, 50)
+                best = min(best, time.perf_counter() - t0)
+            log(f"{engine:6s}: {args.ticks / best:,.0f} ticks/seg | {best:.3f}s | barras={bars.height:,}")
+
+    sys.exit(1 if fails else 0)
+
+if __name__ == "__main__":
+    main()
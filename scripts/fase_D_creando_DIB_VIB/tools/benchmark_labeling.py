@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+benchmark_labeling.py
+Paridad + tiempo de los motores de triple_barrier_labeling.py (loop vs numpy).
+
+1. Paridad: etiqueta días sintéticos (o una muestra real con --bars-root) con ambos motores
+   y varias combinaciones pt/sl/t1/vol-est, comparando los parquet escritos byte a byte.
+2. Benchmark: día sintético de --bars barras con t1=--t1-bars.
+
+Uso:
+  python scripts/fase_D_creando_DIB_VIB/tools/benchmark_labeling.py \
+    --bars 5000 --t1-bars 120 --repeat 3 [--bars-root processed/bars --sample 50]
+"""
+import argparse, random, sys, tempfile, time
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+import polars as pl
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from triple_barrier_labeling import ENGINES, label_day, list_bar_files, prepare_bars
+
+def log(msg): print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
+
+def synthetic_bars(n: int, seed: int) -> pl.DataFrame:
+    """Barras sintéticas: random walk multiplicativo con mechas aleatorias."""
+    rng = np.random.default_rng(seed)
+    c = 3.0 * np.exp(np.cumsum(rng.normal(0, 0.004, n)))
+    o = np.concatenate(([c[0]], c[:-1]))
+    wick = np.abs(rng.normal(0, 0.003, n))
+    t_close = 1_583_760_600_000_000 + np.cumsum(rng.integers(1, 20_000_000, n))
+    return pl.DataFrame({
+        "t_open": (t_close - 1).astype("datetime64[us]"), "t_close": t_close.astype("datetime64[us]"),
+        "o": o, "h": np.maximum(o, c) * (1 + wick), "l": np.minimum(o, c) * (1 - wick), "c": c,
+        "v": rng.integers(100, 10_000, n), "n": rng.integers(1, 100, n),
+        "dollar": rng.random(n) * 3e5, "imbalance_score": rng.uniform(-1, 1, n),
+    })
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--bars", type=int, default=5000, help="barras del día sintético del benchmark")
+    ap.add_argument("--t1-bars", type=int, default=120)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--bars-root", default=None, help="opcional: fixtures reales processed/bars")
+    ap.add_argument("--sample", type=int, default=50)
+    args = ap.parse_args()
+
+    configs = [(3.0, 2.0, 120, "ema", 50), (1.0, 1.0, 10, "sma", 20), (0.5, 3.0, 1, "ema", 1)]
+
+    with tempfile.TemporaryDirectory() as td:
+        tmp = Path(td)
+        # ---- Paridad
+        if args.bars_root:
+            files = [f for _, _, f in list_bar_files(Path(args.bars_root))]
+            random.seed(42)
+            files = random.sample(files, min(args.sample, len(files)))
+        else:
+            files = []
+            for k, n in enumerate([1, 2, 130, 3000]):
+                f = tmp / "fixtures" / f"bars_{k}.parquet"
+                f.parent.mkdir(parents=True, exist_ok=True)
+                synthetic_bars(n, seed=k).write_parquet(f)
+                files.append(f)
+        fails = 0
+        for i, f in enumerate(files):
+            for pt, sl, t1, vol_est, vol_win in configs:
+                outs = {}
+                for engine in ENGINES:
+                    out = tmp / engine / f"{i}.parquet"
+                    label_day(f, out, pt, sl, t1, vol_est, vol_win, engine)
+                    outs[engine] = out.read_bytes()
+                if len(set(outs.values())) != 1:
+                    fails += 1
+                    log(f"[DIFF] {f} pt={pt} sl={sl} t1={t1} vol={vol_est}/{vol_win}")
+        total = len(files) * len(configs)
+        log(f"Paridad loop vs numpy: {total - fails}/{total} idénticos")
+
+        # ---- Benchmark
+        df = prepare_bars(synthetic_bars(args.bars, seed=123), "ema", 50)
+        for engine, fn in ENGINES.items():
+            best = float("inf")
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                labels = fn(df, 3.0, 2.0, args.t1_bars)
+                best = min(best, time.perf_counter() - t0)
+            log(f"{engine:6s}: {best * 1000:,.1f} ms | {args.bars / best:,.0f} barras/seg | "
+                f"labels={labels.height:,} (pt={int(labels['pt_hit'].sum())}, sl={int(labels['sl_hit'].sum())})")
+
+    sys.exit(1 if fails else 0)
+
+if __name__ == "__main__":
+    main()
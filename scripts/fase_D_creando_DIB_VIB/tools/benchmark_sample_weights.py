@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+benchmark_sample_weights.py
+Escalado y exactitud de la concurrencia / unicidad media de make_sample_weights.py.
+
+1. Exactitud (n pequeño): compara label_concurrency con el doble bucle original
+   (a_j <= a_i <= b_j) y average_uniqueness con la matriz indicadora de AFML cap. 4.
+2. Escalado: tiempos de 1k a 1M labels; el ratio t(n)/(n log n) debe mantenerse ~constante.
+
+Uso:
+  python scripts/fase_D_creando_DIB_VIB/tools/benchmark_sample_weights.py --max-n 1000000
+"""
+import argparse, math, sys, time
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from make_sample_weights import average_uniqueness, label_concurrency
+
+def log(msg): print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
+
+def synthetic_labels(n: int, seed: int, max_span: int = 120):
+    """anchors = barras consecutivas (con empates), t1 = anchor + hasta max_span barras."""
+    rng = np.random.default_rng(seed)
+    bars = np.cumsum(rng.integers(0, 3, n + max_span)).astype(np.int64)
+    i = np.sort(rng.integers(0, n, n))
+    return bars[i], bars[i + rng.integers(0, max_span + 1, n)]
+
+def reference(a, b):
+    """Implementación cuadrática de referencia (doble bucle + matriz indicadora)."""
+    n = len(a)
+    conc = np.array([sum(1 for j in range(n) if a[j] <= a[i] <= b[j]) for i in range(n)])
+    grid = np.unique(np.concatenate((a, b)))
+    ind = (a[None, :] <= grid[:, None]) & (grid[:, None] <= b[None, :])   # t x labels
+    c_t = ind.sum(axis=1)
+    uniq = np.array([(1.0 / c_t[ind[:, i]]).mean() for i in range(n)])
+    return conc, uniq
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--max-n", type=int, default=1_000_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    # ---- Exactitud
+    fails = 0
+    for seed, n in enumerate([1, 2, 50, 400]):
+        a, b = synthetic_labels(n, seed)
+        conc_ref, uniq_ref = reference(a, b)
+        if not np.array_equal(label_concurrency(a, b), conc_ref): fails += 1; log(f"[DIFF] concurrency n={n}")
+        if not np.allclose(average_uniqueness(a, b), uniq_ref, rtol=1e-12): fails += 1; log(f"[DIFF] uniqueness n={n}")
+    log(f"Exactitud vs referencia cuadrática: {'OK' if not fails else f'{fails} fallos'}")
+
+    # ---- Escalado
+    n = 1_000
+    while n <= args.max_n:
+        a, b = synthetic_labels(n, seed=7)
+        best = float("inf")
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            label_concurrency(a, b); average_uniqueness(a, b)
+            best = min(best, time.perf_counter() - t0)
+        log(f"n={n:>9,}: {best * 1000:9.2f} ms | ns/(n log2 n) = {best * 1e9 / (n * math.log2(n)):6.2f}")
+        n *= 10
+
+    sys.exit(1 if fails else 0)
+
+if __name__ == "__main__":
+    main()
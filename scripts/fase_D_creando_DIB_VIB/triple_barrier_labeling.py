@@ -12,12 +12,18 @@ Uso:
     --bars-root processed/bars \
     --outdir processed/labels \
     --pt-mul 3.0 --sl-mul 2.0 --t1-bars 120 \
-    --vol-est ema --vol-window 50 --parallel 8 --resume
+    --vol-est ema --vol-window 50 --parallel 8 --resume [--engine numpy|loop] [--group-by ticker]
+
+Motores: "numpy" (defecto) calcula el primer toque de PT/SL para todas las anclas a la vez
+(sparse table de máximos/mínimos + búsqueda por saltos, O(n log t1)); "loop" es la
+implementación original barra a barra, mantenida como referencia de paridad.
 """
 import argparse, time
 from datetime import datetime
 from pathlib import Path
+import numpy as np
 import polars as pl
+from _batching import add_group_args, frame_of, group_by_ticker, read_many, run_groups
 from concurrent.futures import ProcessPoolExecutor, as_completed
 
 def log(msg): print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {msg}", flush=True)
@@ -42,16 +48,12 @@ def ema(series: pl.Series, span: int) -> pl.Series:
         out.append(v)
     return pl.Series(out)
 
-def label_day(in_file: Path, out_file: Path, pt_mul: float, sl_mul: float,
-              t1_bars: int, vol_est: str, vol_window: int):
-    df = pl.read_parquet(in_file)
-    if df.is_empty():
-        out_file.parent.mkdir(parents=True, exist_ok=True)
-        pl.DataFrame(schema={"anchor_ts":pl.Datetime,"t1":pl.Datetime,"pt_hit":pl.Boolean,
-                             "sl_hit":pl.Boolean,"label":pl.Int8,"ret_at_outcome":pl.Float64,
-                             "vol_at_anchor":pl.Float64}).write_parquet(out_file, compression="zstd", compression_level=2)
-        return
+LABEL_SCHEMA = {"anchor_ts": pl.Datetime("us"), "t1": pl.Datetime("us"), "pt_hit": pl.Boolean,
+                "sl_hit": pl.Boolean, "label": pl.Int64, "ret_at_outcome": pl.Float64,
+                "vol_at_anchor": pl.Float64}
 
+def prepare_bars(df: pl.DataFrame, vol_est: str, vol_window: int, in_file: Path = None) -> pl.DataFrame:
+    """Ordena por t_close y añade r (log-retorno) y vol (estimador elegido)."""
     # Usamos c (close) y t_close como timestamp de barra.
     df = df.sort("t_close")
     if not {"t_close","c","h","l"}.issubset(set(df.columns)):
@@ -64,8 +66,10 @@ def label_day(in_file: Path, out_file: Path, pt_mul: float, sl_mul: float,
         vol = ema(df["r"].abs().fill_null(0), vol_window).fill_null(strategy="forward")
     else:
         vol = df["r"].abs().rolling_mean(vol_window, min_periods=1)
-    df = df.with_columns(pl.Series(name="vol", values=vol).fill_null(0.0))
+    return df.with_columns(pl.Series(name="vol", values=vol).fill_null(0.0))
 
+def labels_loop(df: pl.DataFrame, pt_mul: float, sl_mul: float, t1_bars: int) -> pl.DataFrame:
+    """Motor de referencia: para cada ancla recorre hasta t1_bars barras hacia delante."""
     rows = df.to_dicts()
     labels = []
 
@@ -104,19 +108,122 @@ def label_day(in_file: Path, out_file: Path, pt_mul: float, sl_mul: float,
             "ret_at_outcome": ret_out,
             "vol_at_anchor": float(vol0),
         })
+    return pl.from_dicts(labels)
+
+def sparse_table(x: np.ndarray, op) -> list:
+    """table[k][i] = op(x[i : i + 2**k]) (op = np.maximum / np.minimum)."""
+    table = [x]
+    k = 1
+    while (1 << k) <= x.shape[0]:
+        prev = table[-1]
+        half = 1 << (k - 1)
+        table.append(op(prev[:-half], prev[half:]))
+        k += 1
+    return table
+
+def first_touch(table: list, start: np.ndarray, last: np.ndarray, level: np.ndarray,
+                above: bool) -> np.ndarray:
+    """
+    Para cada ancla, primer índice j en [start, last] con x[j] >= level (above) o
+    x[j] <= level (below); -1 si no hay toque. Búsqueda por saltos de 2**k sobre
+    la sparse table: avanza mientras el bloque entero no toca la barrera.
+    """
+    pos = start.copy()
+    for k in range(len(table) - 1, -1, -1):
+        step = 1 << k
+        ok = pos + step - 1 <= last
+        idx = np.flatnonzero(ok)
+        if idx.size == 0: continue
+        block = table[k][pos[idx]]
+        miss = block < level[idx] if above else block > level[idx]
+        pos[idx[miss]] += step
+    x = table[0]
+    valid = pos <= last
+    hit = np.zeros(pos.shape[0], dtype=bool)
+    hit[valid] = x[pos[valid]] >= level[valid] if above else x[pos[valid]] <= level[valid]
+    return np.where(hit, pos, -1)
+
+def labels_numpy(df: pl.DataFrame, pt_mul: float, sl_mul: float, t1_bars: int) -> pl.DataFrame:
+    """Motor vectorizado: primer toque de PT y SL para todas las anclas con arrays."""
+    n = df.height
+    t = df["t_close"].cast(pl.Datetime("us")).to_numpy()
+    c = df["c"].cast(pl.Float64).to_numpy()
+    # NaN nunca toca barrera (mismas comparaciones falsas que el loop)
+    h = np.nan_to_num(df["h"].cast(pl.Float64).to_numpy(), nan=-np.inf)
+    l = np.nan_to_num(df["l"].cast(pl.Float64).to_numpy(), nan=np.inf)
+
+    vol0 = np.fmax(1e-8, df["vol"].cast(pl.Float64).to_numpy())
+    pt = c * (1 + pt_mul * vol0)
+    sl = c * (1 - sl_mul * vol0)
+
+    i = np.arange(n, dtype=np.int64)
+    j_last = np.minimum(n - 1, i + t1_bars)
+    j_pt = first_touch(sparse_table(h, np.maximum), i + 1, j_last, pt, above=True)
+    j_sl = first_touch(sparse_table(l, np.minimum), i + 1, j_last, sl, above=False)
+
+    # En la misma barra PT tiene prioridad (el loop comprueba high antes que low)
+    pt_hit = (j_pt >= 0) & ((j_sl < 0) | (j_pt <= j_sl))
+    sl_hit = (j_sl >= 0) & ~pt_hit
+    j_out = np.where(pt_hit, j_pt, np.where(sl_hit, j_sl, j_last))
+
+    return pl.DataFrame({
+        "anchor_ts": t,
+        "t1": t[j_out],
+        "pt_hit": pt_hit,
+        "sl_hit": sl_hit,
+        "label": np.where(pt_hit, 1, np.where(sl_hit, -1, 0)),
+        "ret_at_outcome": c[j_out] / c - 1.0,
+        "vol_at_anchor": vol0,
+    }, schema=LABEL_SCHEMA)
+
+ENGINES = {"loop": labels_loop, "numpy": labels_numpy}
+
+def label_day(in_file: Path, out_file: Path, pt_mul: float, sl_mul: float,
+              t1_bars: int, vol_est: str, vol_window: int, engine: str = "numpy"):
+    df = pl.read_parquet(in_file)
+    label_frame(df, in_file, out_file, pt_mul, sl_mul, t1_bars, vol_est, vol_window, engine)
+
+def label_frame(df: pl.DataFrame, in_file: Path, out_file: Path, pt_mul: float, sl_mul: float,
+                t1_bars: int, vol_est: str, vol_window: int, engine: str = "numpy"):
+    """Igual que label_day pero sobre barras ya leídas (df None/vacío = día sin barras)."""
+    if df is None or df.is_empty():
+        out_file.parent.mkdir(parents=True, exist_ok=True)
+        pl.DataFrame(schema={"anchor_ts":pl.Datetime,"t1":pl.Datetime,"pt_hit":pl.Boolean,
+                             "sl_hit":pl.Boolean,"label":pl.Int8,"ret_at_outcome":pl.Float64,
+                             "vol_at_anchor":pl.Float64}).write_parquet(out_file, compression="zstd", compression_level=2)
+        return
+
+    df = prepare_bars(df, vol_est, vol_window, in_file)
+    labels = ENGINES[engine](df, pt_mul, sl_mul, t1_bars)
 
     out_file.parent.mkdir(parents=True, exist_ok=True)
-    pl.from_dicts(labels).write_parquet(out_file, compression="zstd", compression_level=2)
+    labels.write_parquet(out_file, compression="zstd", compression_level=2)
 
 def worker(task):
-    ticker, day, fpath, outdir, pt, sl, t1, vol_est, vol_win, resume = task
+    ticker, day, fpath, outdir, pt, sl, t1, vol_est, vol_win, engine, resume = task
     out = outdir / ticker / f"date={day}" / "labels.parquet"
     if resume and out.exists(): return f"{ticker} {day}: SKIP"
     try:
-        label_day(fpath, out, pt, sl, t1, vol_est, vol_win); return f"{ticker} {day}: OK"
+        label_day(fpath, out, pt, sl, t1, vol_est, vol_win, engine); return f"{ticker} {day}: OK"
     except Exception as e:
         return f"{ticker} {day}: ERROR {e}"
 
+def group_worker(task):
+    ticker, items, outdir, pt, sl, t1, vol_est, vol_win, engine, resume = task
+    msgs, todo = [], []
+    for _, day, fpath in items:
+        out = outdir / ticker / f"date={day}" / "labels.parquet"
+        if resume and out.exists(): msgs.append(f"{ticker} {day}: SKIP")
+        else: todo.append((day, fpath, out))
+    frames = read_many([f for _, f, _ in todo])
+    for day, fpath, out in todo:
+        try:
+            label_frame(frame_of(frames, fpath), fpath, out, pt, sl, t1, vol_est, vol_win, engine)
+            msgs.append(f"{ticker} {day}: OK")
+        except Exception as e:
+            msgs.append(f"{ticker} {day}: ERROR {e}")
+    return msgs
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--bars-root", required=True)
@@ -126,18 +233,30 @@ def main():
     ap.add_argument("--t1-bars", type=int, default=120)
     ap.add_argument("--vol-est", choices=["ema","sma"], default="ema")
     ap.add_argument("--vol-window", type=int, default=50)
+    ap.add_argument("--engine", choices=sorted(ENGINES), default="numpy",
+                    help="numpy: primer toque vectorizado (defecto) | loop: referencia barra a barra")
     ap.add_argument("--parallel", type=int, default=8)
     ap.add_argument("--resume", action="store_true")
+    add_group_args(ap)
     args = ap.parse_args()
 
     bars_root = Path(args.bars_root)
     outdir = Path(args.outdir)
+    if args.group_by == "ticker":
+        t0 = time.time()
+        groups = [(ticker, items, outdir, args.pt_mul, args.sl_mul, args.t1_bars,
+                   args.vol_est, args.vol_window, args.engine, args.resume)
+                  for ticker, items in group_by_ticker(list_bar_files(bars_root), args.chunk_days)]
+        log(f"Modo group-by ticker | engine={args.engine}")
+        run_groups(group_worker, groups, args.parallel)
+        log(f"FIN en {(time.time()-t0)/60:.1f} min")
+        return
     tasks = []
     for ticker, day, f in list_bar_files(bars_root):
         tasks.append((ticker, day, f, outdir, args.pt_mul, args.sl_mul,
-                      args.t1_bars, args.vol_est, args.vol_window, args.resume))
+                      args.t1_bars, args.vol_est, args.vol_window, args.engine, args.resume))
 
-    log(f"Tareas: {len(tasks):,} | paralelismo={args.parallel}")
+    log(f"Tareas: {len(tasks):,} | paralelismo={args.parallel} | engine={args.engine}")
     t0 = time.time()
     with ProcessPoolExecutor(max_workers=args.parallel) as ex:
         futs = [ex.submit(worker, t) for t in tasks]
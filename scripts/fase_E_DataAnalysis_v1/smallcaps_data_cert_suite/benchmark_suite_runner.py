@@ -0,0 +1,123 @@
+"""
+benchmark_suite_runner.py
+Paridad + tiempos del runner de la suite sobre un árbol sintético con todos los árboles que leen
+A01-A11 (trades, bars + _SUCCESS, labels, weights, datasets daily/splits, events, universe, filings):
+
+  anterior : un `python checks/aXX.py` por check, en serie (cada uno recorre sus árboles)
+  runner   : run_all_checks.py (inventario compartido + pool de procesos, --workers N)
+
+Paridad: mismo status y mismas métricas por check (sin elapsed_s).
+
+Uso:
+  python benchmark_suite_runner.py --tickers 60 --days 40 --workers 4
+"""
+import argparse, json, os, pathlib, subprocess, sys, tempfile, time
+import numpy as np
+import polars as pl
+
+HERE = pathlib.Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE))
+from run_all_checks import suite
+
+def write(path: pathlib.Path, df: pl.DataFrame):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    df.write_parquet(path)
+
+def make_tree(root: pathlib.Path, n_tickers: int, n_days: int, seed: int = 3):
+    rng = np.random.default_rng(seed)
+    tickers = [f"T{k:03d}" for k in range(n_tickers)]
+    days = [f"2024-{1 + j // 28:02d}-{1 + j % 28:02d}" for j in range(n_days)]
+    for ticker in tickers:
+        for day in days:
+            n = int(rng.integers(50, 400))
+            p = np.round(2 + rng.random(n), 4)
+            s = rng.integers(1, 500, n)
+            t = 1_704_100_000_000_000 + np.sort(rng.integers(0, 10**10, n))
+            tdir = root / f"raw/polygon/trades/{ticker}/date={day}"
+            write(tdir / "trades.parquet", pl.DataFrame({"t_raw": t * 1000, "t_unit": "ns", "p": p, "s": s}))
+            (tdir / "_SUCCESS").touch()
+            ends = np.append(np.sort(rng.choice(np.arange(1, n - 1), 5, replace=False)), n - 1)
+            starts = np.concatenate(([0], ends[:-1] + 1))
+            bars = pl.DataFrame({"t_open": t[starts], "t_close": t[ends], "o": p[starts], "h": p[starts],
+                                 "l": p[starts], "c": p[ends], "v": np.add.reduceat(s, starts),
+                                 "n": ends - starts + 1, "dollar": np.add.reduceat(p * s, starts),
+                                 "imbalance_score": 0.0})
+            bdir = root / f"processed/bars/{ticker}/date={day}"
+            write(bdir / "dollar_imbalance.parquet", bars)
+            (bdir / "_SUCCESS").touch()
+            k = bars.height
+            lab = int(rng.integers(-1, 2))
+            write(root / f"processed/labels/{ticker}/date={day}/labels.parquet",
+                  pl.DataFrame({"anchor_ts": t[ends], "t1": t[ends] + 5, "pt_hit": [lab == 1] * k,
+                                "sl_hit": [lab == -1] * k, "label": [lab] * k, "ret_at_outcome": 0.01,
+                                "vol_at_anchor": 0.02}))
+            w = rng.random(k)
+            write(root / f"processed/weights/{ticker}/date={day}/weights.parquet",
+                  pl.DataFrame({"anchor_ts": t[ends], "weight": w / w.sum()}))
+            write(root / f"processed/datasets/daily/{ticker}/date={day}/dataset.parquet",
+                  pl.DataFrame({"anchor_ts": t[ends], "label": [lab] * k, "weight": w / w.sum(),
+                                "c": p[ends], "n": ends - starts + 1}))
+            write(root / f"processed/events/{ticker}/date={day}/events.parquet",
+                  pl.DataFrame({"event_type": ["E1"] * k, "anchor_ts": t[ends], "start_ts": t[starts],
+                                "end_ts": t[ends] + 1, "score": 1.0, "source": "bench"}))
+            write(root / f"processed/universe/daily_cache/{ticker}/date={day}/daily.parquet",
+                  pl.DataFrame({"close": [3.0], "volume": [1e6], "rvol": [2.0], "pct_chg": [0.2],
+                                "shares_out": [1e7], "float_est": [5e6], "exchange": ["NASDAQ"]}))
+        write(root / f"processed/reference/filings/{ticker}/filings.parquet",
+              pl.DataFrame({"date": days[:3], "form": ["S-3", "424B", "10-K"]}))
+    for day in days:
+        write(root / f"processed/universe/dynamic/date={day}/watchlist.parquet",
+              pl.DataFrame({"ticker": tickers[: max(1, n_tickers // 3)]}))
+    anchors = np.arange(1000)
+    write(root / "processed/datasets/splits/train.parquet", pl.DataFrame({"anchor_ts": anchors[:800]}))
+    write(root / "processed/datasets/splits/valid.parquet", pl.DataFrame({"anchor_ts": anchors[860:]}))
+
+def strip(obj: dict) -> dict:
+    return {k: v for k, v in obj.items() if k not in ("elapsed_s", "scanned", "rechecked", "reused")}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tickers", type=int, default=60)
+    ap.add_argument("--days", type=int, default=40)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = pathlib.Path(tmp) / "data"
+        make_tree(root, args.tickers, args.days)
+        n_files = sum(1 for _ in root.rglob("*"))
+        print(f"Árbol: {args.tickers} tickers x {args.days} días, {n_files:,} entradas", flush=True)
+
+        old_dir, new_dir = pathlib.Path(tmp) / "old", pathlib.Path(tmp) / "new"
+        t0 = time.perf_counter()
+        old_times = {}
+        for module, report, extra in suite(str(old_dir)):
+            t1 = time.perf_counter()
+            subprocess.run([sys.executable, f"checks/{module}.py", "--root", str(root),
+                            "--out", str(old_dir / report), *extra],
+                           cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            old_times[module] = time.perf_counter() - t1
+        t_old = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, "run_all_checks.py", "--root", str(root), "--reports", str(new_dir),
+                        "--workers", str(args.workers)], cwd=HERE, stdout=subprocess.DEVNULL)
+        t_new = time.perf_counter() - t0
+
+        run = json.loads((new_dir / "_suite_run.json").read_text(encoding="utf-8"))
+        ok = (new_dir / "SUMMARY.md").exists()
+        for c in run["checks"]:
+            old = json.loads((old_dir / c["report"]).read_text(encoding="utf-8"))
+            new = json.loads((new_dir / c["report"]).read_text(encoding="utf-8"))
+            same = strip(old) == strip(new)
+            ok &= same
+            print(f"  {c['check']:28s} {new['status']:5s} {'=' if same else 'DISTINTO'} | "
+                  f"anterior {old_times[c['check']]:6.2f}s | runner {c['elapsed_s']:6.2f}s", flush=True)
+        print(f"Paridad: {'OK' if ok else 'FAIL'} | anterior (subprocesos en serie) {t_old:.1f}s | "
+              f"runner {t_new:.1f}s (inventario {run['inventory_s']:.1f}s, {run['inventory_files']:,} ficheros, "
+              f"{args.workers} workers) | x{t_old / t_new:.1f}")
+        if not ok:
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
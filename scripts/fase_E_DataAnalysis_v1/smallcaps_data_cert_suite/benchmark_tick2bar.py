@@ -0,0 +1,140 @@
+"""
+benchmark_tick2bar.py
+Paridad + tiempos de checks/a03_tick2bar_conservation.py sobre un árbol sintético
+(raw/polygon/trades con layout t_raw/t_unit y algunos días legacy con t; processed/bars con v/dollar):
+
+  anterior : bucle serie, read_parquet completo de cada trades.parquet (con la columna t corregida a
+             p/s: el original seleccionaba t y fallaba en todos los días con t_raw/t_unit)
+  a03      : población completa, proyección v/dollar - p/s, pool de procesos
+  a03 incr : relanzado con --state sin cambios / con el 2% de días tocados (mtime) / idem con --hash
+
+Se inyectan días con barras descuadradas y días sin trades; paridad = mismas violaciones que las
+esperadas y que el camino anterior.
+
+Uso:
+  python benchmark_tick2bar.py --tickers 40 --days 60 --trades-per-day 20000 --workers 4
+"""
+import argparse, json, os, pathlib, random, subprocess, sys, tempfile, time
+import numpy as np
+import polars as pl
+
+HERE = pathlib.Path(__file__).resolve().parent
+A03 = HERE / "checks" / "a03_tick2bar_conservation.py"
+
+def make_tree(root: pathlib.Path, n_tickers: int, n_days: int, n_trades: int, seed: int = 11):
+    """Escribe trades + barras; devuelve {(ticker, date): motivo esperado} de los días que deben fallar"""
+    rng = np.random.default_rng(seed)
+    expected = {}
+    for k in range(n_tickers):
+        ticker = f"T{k:03d}"
+        for j in range(n_days):
+            date = f"2024-{1 + j // 28:02d}-{1 + j % 28:02d}"
+            n = int(rng.integers(n_trades // 2, n_trades * 3 // 2))
+            p = np.round(2.0 * np.exp(np.cumsum(rng.normal(0, 0.001, n))), 4)
+            s = rng.integers(1, 2000, n)
+            t_raw = 1_704_100_000_000_000_000 + j * 86_400_000_000_000 + np.sort(rng.integers(0, 6 * 3_600_000_000_000, n))
+            trades = pl.DataFrame({"t_raw": t_raw, "t_unit": "ns", "p": p, "s": s,
+                                   "c": [[12, 37]] * n, "exchange": rng.integers(1, 20, n),
+                                   "id": [f"{i:x}" for i in range(n)], "sequence_number": np.arange(n),
+                                   "participant_timestamp": t_raw - 1000})
+            if j % 17 == 5:   # legacy: t Datetime en vez de t_raw/t_unit
+                trades = trades.with_columns(pl.col("t_raw").cast(pl.Datetime("ns")).alias("t")).drop("t_raw", "t_unit")
+            tdir = root / f"raw/polygon/trades/{ticker}/date={date}"
+            bdir = root / f"processed/bars/{ticker}/date={date}"
+            tdir.mkdir(parents=True)
+            bdir.mkdir(parents=True)
+            d = p * s
+            starts = np.concatenate(([0], np.sort(rng.choice(np.arange(1, n), size=n // 300, replace=False))))
+            v, dollar = np.add.reduceat(s, starts), np.add.reduceat(d, starts)
+            if (k + j) % 97 == 3:   # barras descuadradas un 1% en volumen y dólar
+                v[-1] -= v.sum() // 100
+                dollar[-1] -= dollar.sum() / 100
+                expected[(ticker, date)] = "tol"
+            pl.DataFrame({"o": p[starts], "c": p[starts], "v": v, "n": np.diff(np.append(starts, n)),
+                          "dollar": dollar}).write_parquet(bdir / "dollar_imbalance.parquet", compression="zstd")
+            if (k * n_days + j) % 131 == 7:
+                expected[(ticker, date)] = "missing trades"
+                continue
+            trades.write_parquet(tdir / "trades.parquet", compression="zstd")
+    return expected
+
+def legacy(root: pathlib.Path, tol: float) -> dict:
+    """Bucle anterior (todos los días, sin muestreo) con read_parquet completo"""
+    out = {}
+    for p in root.glob("processed/bars/*/date=*/dollar_imbalance.parquet"):
+        ticker, date = p.parts[-3], p.parts[-2].split("=")[1]
+        trades_file = root / f"raw/polygon/trades/{ticker}/date={date}/trades.parquet"
+        if not trades_file.exists():
+            out[(ticker, date)] = "missing trades"
+            continue
+        dfb = pl.read_parquet(p).select(["v", "dollar"])
+        dft = pl.read_parquet(trades_file).select(["p", "s"])
+        sum_s, sum_ps = dft["s"].sum(), (dft["p"] * dft["s"]).sum()
+        ev = abs(dfb["v"].sum() - sum_s) / max(1, sum_s)
+        ed = abs(dfb["dollar"].sum() - sum_ps) / max(1.0, sum_ps)
+        if ev > tol or ed > tol:
+            out[(ticker, date)] = "tol"
+    return out
+
+def run_a03(root: pathlib.Path, out: pathlib.Path, *extra):
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, str(A03), "--root", str(root), "--out", str(out), *extra],
+                   cwd=A03.parent, stdout=subprocess.DEVNULL, check=False)
+    el = time.perf_counter() - t0
+    rep = json.loads(out.read_text(encoding="utf-8"))
+    found = {(v["ticker"], v["date"]): v.get("reason", "tol") for v in rep["violations"]}
+    return rep, found, el
+
+def log(msg: str):
+    print(msg, flush=True)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tickers", type=int, default=40)
+    ap.add_argument("--days", type=int, default=60)
+    ap.add_argument("--trades-per-day", type=int, default=20000)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--tol", type=float, default=0.001)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = pathlib.Path(tmp)
+        expected = make_tree(root, args.tickers, args.days, args.trades_per_day)
+        n = args.tickers * args.days
+        size = sum(f.stat().st_size for f in root.rglob("*.parquet"))
+        log(f"Árbol: {n:,} ticker-días, {size / 2**20:,.0f} MiB, {len(expected)} violaciones inyectadas")
+
+        t0 = time.perf_counter()
+        old = legacy(root, args.tol)
+        t_old = time.perf_counter() - t0
+        common = ["--tol", str(args.tol), "--workers", str(args.workers)]
+        rep, new, t_new = run_a03(root, root / "a03.json", *common)
+        state = root / "a03_state.parquet"
+        _, _, t_first = run_a03(root, root / "a03.json", *common, "--state", str(state))
+        rep_inc, inc, t_inc = run_a03(root, root / "a03.json", *common, "--state", str(state))
+
+        touched = random.Random(3).sample(sorted(root.glob("raw/polygon/trades/*/date=*/trades.parquet")), max(1, n // 50))
+        for f in touched:
+            os.utime(f)
+        rep_touch, touch, t_touch = run_a03(root, root / "a03.json", *common, "--state", str(state))
+        _, _, _ = run_a03(root, root / "a03.json", *common, "--state", str(state), "--hash")   # guarda hashes
+        for f in touched:
+            os.utime(f)
+        rep_hash, hashed, t_hash = run_a03(root, root / "a03.json", *common, "--state", str(state), "--hash")
+
+        ok = old == expected and all(x == expected for x in (new, inc, touch, hashed)) \
+            and rep["checked"] == n and rep_inc["scanned"] == 0 \
+            and rep_touch["scanned"] == len(touched) and rep_hash["scanned"] == 0
+        log(f"Paridad: {'OK' if ok else 'FAIL'} ({len(new)} violaciones, {rep['missing_trades']} sin trades)")
+        log(f"anterior (serie, read completo) : {t_old:7.2f}s | {n / t_old:8.0f} días/s")
+        log(f"a03 completo ({args.workers} workers)      : {t_new:7.2f}s | {n / t_new:8.0f} días/s | x{t_old / t_new:.1f}")
+        log(f"a03 --state 1ª corrida          : {t_first:7.2f}s")
+        log(f"a03 --state sin cambios         : {t_inc:7.2f}s | escaneados {rep_inc['scanned']}")
+        log(f"a03 --state {len(touched)} días tocados      : {t_touch:7.2f}s | escaneados {rep_touch['scanned']}")
+        log(f"a03 --state --hash, mismos días : {t_hash:7.2f}s | escaneados {rep_hash['scanned']} "
+            f"(sumas reutilizadas por hash)")
+        if not ok:
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Inventario de ficheros compartido por los checks (una pasada por árbol en vez de un rglob por check).
+
+Cada fila: sub (árbol inventariado), rel (ruta relativa a --root, '/'), name, ticker, date (clave de
+partición {ticker}/date=YYYY-MM-DD/), size, mtime (ns). Los directorios date=* vacíos quedan como una
+fila con name "" (a01 los cuenta como días sin ficheros).
+
+- run_all_checks.py lo construye una vez (Inventory.scan), lo guarda en {reports}/_inventory.parquet y
+  cada worker del pool lo carga una vez.
+- Un check lanzado suelto usa Inventory(root) vacío: files()/day_dirs() escanean el árbol pedido la
+  primera vez; exists()/stat() sobre árboles no escaneados van directos al sistema de ficheros.
+"""
+import os, pathlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from _utils import try_import_polars
+
+INVENTORY_DIRS = [
+    "raw/polygon/trades",
+    "processed/bars",
+    "processed/labels",
+    "processed/weights",
+    "processed/datasets",
+    "processed/events",
+    "processed/universe/dynamic",
+    "processed/universe/daily_cache",
+    "processed/reference/filings",
+]
+
+def _walk(root: str, sub: str) -> list:
+    """[(rel, name, ticker, date, size, mtime)] de todo lo que cuelga de root/sub (os.scandir)"""
+    out, stack = [], [os.path.join(root, sub)]
+    while stack:
+        d = stack.pop()
+        try:
+            entries = list(os.scandir(d))
+        except OSError:
+            continue
+        rel_dir = os.path.relpath(d, root).replace(os.sep, "/")
+        parts = rel_dir.split("/")
+        is_day = parts[-1].startswith("date=")
+        date = parts[-1][5:] if is_day else None
+        ticker = parts[-2] if is_day and len(parts) > 1 else None
+        n_files = 0
+        for e in entries:
+            if e.is_dir(follow_symlinks=False):
+                stack.append(e.path)
+            else:
+                st = e.stat()
+                out.append((f"{rel_dir}/{e.name}", e.name, ticker, date, st.st_size, st.st_mtime_ns))
+                n_files += 1
+        if is_day and n_files == 0:
+            out.append((f"{rel_dir}/", "", ticker, date, None, None))
+    return out
+
+class Inventory:
+    COLUMNS = ["sub", "rel", "name", "ticker", "date", "size", "mtime"]
+
+    def __init__(self, root, records: dict = None):
+        self.root = pathlib.Path(os.path.abspath(root))
+        self._subs = {}      # sub -> [(rel, name, ticker, date, size, mtime)]
+        self._index = {}     # rel -> (size, mtime), solo de árboles escaneados
+        self._dirs = None    # directorios de los árboles escaneados (para is_dir)
+        for sub, rows in (records or {}).items():
+            self._add(sub, rows)
+
+    def _add(self, sub: str, rows: list):
+        self._subs[sub] = rows
+        self._dirs = None
+        for rel, name, _, _, size, mtime in rows:
+            if name:
+                self._index[rel] = (size, mtime)
+
+    def _rows(self, sub: str) -> list:
+        """Filas de root/sub; si sub cuelga de un árbol ya escaneado se filtra sin volver a escanear"""
+        if sub in self._subs:
+            return self._subs[sub]
+        for s in self._subs:
+            if sub.startswith(s + "/"):
+                return [r for r in self._subs[s] if r[0].startswith(sub + "/")]
+        self._add(sub, _walk(str(self.root), sub))
+        return self._subs[sub]
+
+    def _scanned(self, rel: str) -> bool:
+        return any(rel.startswith(sub + "/") for sub in self._subs)
+
+    def _rel(self, path) -> str:
+        return os.path.relpath(os.path.abspath(path), self.root).replace(os.sep, "/")
+
+    @classmethod
+    def scan(cls, root, subs=INVENTORY_DIRS, workers: int = 8) -> "Inventory":
+        """Escanea varios árboles en paralelo (hilos: os.scandir/stat sueltan el GIL)"""
+        root = os.path.abspath(root)
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+            rows = list(ex.map(lambda s: _walk(root, s), subs))
+        return cls(root, dict(zip(subs, rows)))
+
+    def files(self, sub: str, name: str) -> list:
+        """Equivale a sorted((root/sub).rglob(name)) para un nombre exacto"""
+        return sorted(self.root / r[0] for r in self._rows(sub) if r[1] == name)
+
+    def all_files(self, sub: str, suffix: str = "") -> list:
+        return sorted(self.root / r[0] for r in self._rows(sub) if r[1] and r[1].endswith(suffix))
+
+    def day_dirs(self, sub: str) -> dict:
+        """{directorio date=* relativo a root: set(nombres de fichero)}"""
+        out = {}
+        for rel, name, _, date, _, _ in self._rows(sub):
+            if date is not None:
+                names = out.setdefault(rel.rsplit("/", 1)[0], set())
+                if name:
+                    names.add(name)
+        return out
+
+    def stat(self, path):
+        """(size, mtime_ns) o (None, None) si no existe"""
+        rel = self._rel(path)
+        if self._scanned(rel):
+            return self._index.get(rel, (None, None))
+        try:
+            st = os.stat(self.root / rel)
+            return st.st_size, st.st_mtime_ns
+        except OSError:
+            return None, None
+
+    def exists(self, path) -> bool:
+        return self.stat(path)[0] is not None
+
+    def is_dir(self, path) -> bool:
+        rel = self._rel(path)
+        if not self._scanned(rel):
+            return (self.root / rel).is_dir()
+        if self._dirs is None:
+            self._dirs = set()
+            for rows in self._subs.values():
+                for r in rows:
+                    d = r[0]   # directorio vacío: "…/date=X/" -> también se añade date=X
+                    while "/" in d:
+                        d = d.rsplit("/", 1)[0]
+                        if d in self._dirs:
+                            break
+                        self._dirs.add(d)
+        return rel in self._dirs
+
+    def n_files(self) -> int:
+        return len(self._index)
+
+    def save(self, path):
+        """Parquet con una fila por fichero (+ una fila centinela por árbol, para árboles vacíos)"""
+        pl = try_import_polars()
+        rows = [(sub, f"{sub}/", None, None, None, None, None) for sub in self._subs]
+        rows += [(sub, *r) for sub, rs in self._subs.items() for r in rs]
+        df = pl.DataFrame(rows, schema={"sub": pl.Utf8, "rel": pl.Utf8, "name": pl.Utf8, "ticker": pl.Utf8,
+                                        "date": pl.Utf8, "size": pl.Int64, "mtime": pl.Int64}, orient="row")
+        tmp = pathlib.Path(str(path) + ".tmp")
+        tmp.parent.mkdir(parents=True, exist_ok=True)
+        df.write_parquet(tmp, compression="zstd")
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, root, path) -> "Inventory":
+        pl = try_import_polars()
+        records = defaultdict(list)
+        for sub, *r in pl.read_parquet(path).select(cls.COLUMNS).iter_rows():
+            if r[1] is None:   # centinela
+                records.setdefault(sub, [])
+            else:
+                records[sub].append(tuple(r))
+        return cls(root, records)
@@ -1,15 +1,18 @@
 import argparse, pathlib, re
 from _utils import save_json, fail_or_pass
+from _inventory import Inventory
 
-def main():
+def parse_args(argv=None):
     ap = argparse.ArgumentParser()
     ap.add_argument("--root", required=True, help="Proyecto raíz (ej. D:/04_TRADING_SMALLCAPS)")
     ap.add_argument("--out", required=True, help="Archivo JSON de salida")
     ap.add_argument("--min_date", default="2020-01-03")
     ap.add_argument("--max_date", default="2025-10-21")
-    args = ap.parse_args()
+    return ap.parse_args(argv)
 
+def run(args, inv=None):
     root = pathlib.Path(args.root)
+    inv = inv or Inventory(root)
     metrics = {"root": str(root), "checks": []}
 
     expected_per_day = {
@@ -25,18 +28,16 @@ def main():
     all_days = set()
 
     for sub, files in expected_per_day.items():
-        subroot = root / sub
         found = 0
         missing = 0
         per_day_counts = {}
-        for day_dir in subroot.rglob("date=*"):
-            m = date_pat.search(str(day_dir))
-            if not m: 
+        for day_dir, present in inv.day_dirs(sub).items():
+            m = date_pat.search(day_dir)
+            if not m:
                 continue
             day = m.group(1)
             all_days.add(day)
             expected = set(files)
-            present = set([p.name for p in day_dir.glob("*") if p.is_file()])
             miss = sorted(list(expected - present))
             per_day_counts[day] = {"present": sorted(list(present & expected)), "missing": miss}
             if miss:
@@ -56,7 +57,12 @@ def main():
         "min_requested": args.min_date, "max_requested": args.max_date,
         "observed_total_days": len(all_days)
     }
-    fail_or_pass(args.out, metrics, total_ok)
+    return metrics, total_ok
+
+def main():
+    args = parse_args()
+    metrics, ok = run(args)
+    fail_or_pass(args.out, metrics, ok)
 
 if __name__ == "__main__":
     main()
@@ -1,5 +1,6 @@
-import argparse, pathlib
+import argparse
 from _utils import try_import_polars, fail_or_pass
+from _inventory import Inventory
 
 SCHEMAS = {
   "trades": {"path": "raw/polygon/trades", "file": "trades.parquet",
@@ -14,10 +15,9 @@ SCHEMAS = {
               "required": {"anchor_ts":"i64","label":"i64","weight":"f64","c":"f64","n":"i64"}}
 }
 
-def check_dir(pl, base, sub, filename, required):
-    base = pathlib.Path(base) / sub
+def check_dir(pl, inv, sub, filename, required):
     n_files = 0; null_viol = 0; type_viol = 0; sample = []
-    for p in base.rglob(filename):
+    for p in inv.files(sub, filename):
         n_files += 1
         try:
             df = pl.read_parquet(p)
@@ -35,21 +35,28 @@ def check_dir(pl, base, sub, filename, required):
         if n_files > 2000: break
     return dict(n_files=n_files, null_viol=null_viol, type_viol=type_viol, sample=sample)
 
-def main():
+def parse_args(argv=None):
     ap = argparse.ArgumentParser()
     ap.add_argument("--root", required=True)
     ap.add_argument("--out", required=True)
-    args = ap.parse_args()
+    return ap.parse_args(argv)
 
+def run(args, inv=None):
     pl = try_import_polars()
+    inv = inv or Inventory(args.root)
     metrics = {"root": args.root, "results": {}}
     ok = True
 
     for k, meta in SCHEMAS.items():
-        r = check_dir(pl, args.root, meta["path"], meta["file"], meta["required"])
+        r = check_dir(pl, inv, meta["path"], meta["file"], meta["required"])
         metrics["results"][k] = r
         ok &= (r["type_viol"] == 0 and r["null_viol"] == 0 and r["n_files"] > 0)
 
+    return metrics, ok
+
+def main():
+    args = parse_args()
+    metrics, ok = run(args)
     fail_or_pass(args.out, metrics, ok)
 
 if __name__ == "__main__":
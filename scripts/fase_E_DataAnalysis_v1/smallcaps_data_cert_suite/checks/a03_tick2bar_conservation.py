@@ -1,47 +1,214 @@
-import argparse, pathlib, random
-from _utils import try_import_polars, fail_or_pass
+"""
+A03 - Conservación tick -> barra sobre TODOS los ticker-días (o una muestra con --sample N).
 
-def main():
+Por cada processed/bars/{ticker}/date=YYYY-MM-DD/{bar_type}.parquet compara
+  Σ v (barras) vs Σ s (trades)   y   Σ dollar (barras) vs Σ p*s (trades)
+con raw/polygon/trades/{ticker}/date=YYYY-MM-DD/trades.parquet. Solo se leen las columnas
+v/dollar y p/s (scan_parquet con proyección + agregado por fichero), así que sirve igual para el
+layout t_raw/t_unit y el legacy con t.
+
+- Pool de procesos: cada tarea es un bloque de --chunk días de un ticker; el worker junta los
+  scans de su bloque en un único plan (pl.concat de LazyFrames) y devuelve solo las sumas.
+- Incremental (--state): las sumas se guardan por partición junto a (tamaño, mtime_ns) de los dos
+  ficheros; en la siguiente corrida solo se releen las particiones nuevas o cambiadas. Con --hash
+  además se guarda el blake2b del contenido (la primera corrida con --hash hashea todo): si cambia
+  el mtime pero no el contenido (copia, touch) se reutilizan las sumas sin escanear.
+- La tolerancia se evalúa sobre las sumas guardadas: cambiar --tol no obliga a releer nada.
+"""
+import argparse, os, pathlib, random, time
+import multiprocessing as mp
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from _utils import try_import_polars, fail_or_pass, hxxh64_file
+from _inventory import Inventory
+
+pl = try_import_polars()
+
+STATE_SCHEMA = {
+    "ticker": pl.Utf8, "date": pl.Utf8,
+    "bar_size": pl.Int64, "bar_mtime": pl.Int64, "trades_size": pl.Int64, "trades_mtime": pl.Int64,
+    "bar_hash": pl.Utf8, "trades_hash": pl.Utf8,
+    "sum_v": pl.Float64, "sum_d": pl.Float64, "sum_s": pl.Float64, "sum_ps": pl.Float64,
+    "error": pl.Utf8,
+}
+SIG_COLS = ["bar_size", "bar_mtime", "trades_size", "trades_mtime"]
+SUM_COLS = ["sum_v", "sum_d", "sum_s", "sum_ps"]
+
+def file_sig(path: str):
+    try:
+        st = os.stat(path)
+        return st.st_size, st.st_mtime_ns
+    except OSError:
+        return None, None
+
+def list_partitions(inv: Inventory, bar_type: str) -> list:
+    """[(ticker, date, bar_file, trades_file)] de processed/bars/{ticker}/date=*/{bar_type}.parquet"""
+    trades_root = inv.root / "raw/polygon/trades"
+    items = []
+    for p in inv.files("processed/bars", f"{bar_type}.parquet"):
+        ticker, day_dir = p.parts[-3], p.parts[-2]
+        if day_dir.startswith("date="):
+            items.append((ticker, day_dir[5:], str(p), str(trades_root / ticker / day_dir / "trades.parquet")))
+    items.sort()
+    return items
+
+def _sums(paths: list, exprs: list) -> list:
+    """Un plan para todos los ficheros (una fila de sumas por fichero); si falla, fichero a fichero"""
+    frames = [pl.scan_parquet(p).select(exprs) for p in paths]
+    try:
+        return pl.concat(frames, how="vertical_relaxed").collect().rows()
+    except Exception:
+        out = []
+        for f in frames:
+            try:
+                out.append(f.collect().row(0))
+            except Exception as e:
+                out.append(e)
+        return out
+
+def check_chunk(items: list, use_hash: bool) -> list:
+    """
+    items: [(ticker, date, bar_file, trades_file, prev)] con prev = fila de estado previa (o None)
+    Devuelve (filas con el esquema STATE_SCHEMA, nº de días escaneados).
+    """
+    rows, todo = [], []
+    for ticker, date, bar_file, trades_file, prev in items:
+        row = dict.fromkeys(STATE_SCHEMA)
+        row.update(ticker=ticker, date=date)
+        row["bar_size"], row["bar_mtime"] = file_sig(bar_file)
+        row["trades_size"], row["trades_mtime"] = file_sig(trades_file)
+        rows.append(row)
+        if row["trades_size"] is None:
+            row["error"] = "missing trades"
+            continue
+        if use_hash:
+            row["bar_hash"], row["trades_hash"] = hxxh64_file(bar_file), hxxh64_file(trades_file)
+            # mismo contenido (o mismo tamaño/mtime y aún sin hash guardado): no se escanea
+            if prev and prev["error"] is None and (
+                    (prev["bar_hash"], prev["trades_hash"]) == (row["bar_hash"], row["trades_hash"])
+                    or tuple(prev[c] for c in SIG_COLS) == tuple(row[c] for c in SIG_COLS)):
+                row.update({k: prev[k] for k in SUM_COLS})
+                continue
+        todo.append((row, bar_file, trades_file))
+    if not todo:
+        return rows, 0
+
+    f64 = pl.Float64
+    bar_sums = _sums([b for _, b, _ in todo],
+                     [pl.col("v").cast(f64).sum().alias("sum_v"), pl.col("dollar").cast(f64).sum().alias("sum_d")])
+    trade_sums = _sums([t for _, _, t in todo],
+                       [pl.col("s").cast(f64).sum().alias("sum_s"),
+                        (pl.col("p").cast(f64) * pl.col("s").cast(f64)).sum().alias("sum_ps")])
+    for (row, _, _), b, t in zip(todo, bar_sums, trade_sums):
+        if isinstance(b, Exception) or isinstance(t, Exception):
+            row["error"] = str(b if isinstance(b, Exception) else t)
+        else:
+            row["sum_v"], row["sum_d"] = b
+            row["sum_s"], row["sum_ps"] = t
+    return rows, len(todo)
+
+def load_state(path: pathlib.Path):
+    if path and path.exists():
+        return pl.read_parquet(path)
+    return pl.DataFrame(schema=STATE_SCHEMA)
+
+def save_state(state, path: pathlib.Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    state.write_parquet(tmp, compression="zstd")
+    os.replace(tmp, path)
+
+def parse_args(argv=None):
     ap = argparse.ArgumentParser()
     ap.add_argument("--root", required=True)
     ap.add_argument("--out", required=True)
-    ap.add_argument("--sample", type=int, default=200)
+    ap.add_argument("--sample", type=int, default=0, help="Nº de ticker-días al azar (0 = todos)")
     ap.add_argument("--tol", type=float, default=0.001)
-    args = ap.parse_args()
+    ap.add_argument("--bar-type", default="dollar_imbalance")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--chunk", type=int, default=200, help="Ticker-días por tarea del pool")
+    ap.add_argument("--state", default=None,
+                    help="Parquet de estado para modo incremental (solo relee particiones cambiadas)")
+    ap.add_argument("--hash", action="store_true",
+                    help="Con --state: detectar cambios por contenido (blake2b) además de tamaño/mtime")
+    ap.add_argument("--max-report", type=int, default=1000, help="Máx. violaciones listadas en el JSON")
+    return ap.parse_args(argv)
 
-    pl = try_import_polars()
-    bars_root = pathlib.Path(args.root) / "processed/bars"
-    items = []
-    for p in bars_root.rglob("date=*/dollar_imbalance.parquet"):
-        parts = p.parts
-        ticker = parts[-3]
-        date = parts[-2].split("=")[1]
-        items.append((ticker, date, str(p)))
-    random.shuffle(items)
-    items = items[:args.sample]
-
-    violations = []
-    for ticker, date, bar_file in items:
-        trades_file = pathlib.Path(args.root) / f"raw/polygon/trades/{ticker}/date={date}/trades.parquet"
-        if not trades_file.exists():
-            violations.append({"ticker": ticker, "date": date, "reason":"missing trades"})
-            continue
-        try:
-            dfb = pl.read_parquet(bar_file).select(["t_open","t_close","v","dollar"])
-            dft = pl.read_parquet(trades_file).select(["t","p","s"])
-            sum_v = dfb["v"].sum()
-            sum_d = dfb["dollar"].sum()
-            sum_s = dft["s"].sum()
-            sum_ps = (dft["p"] * dft["s"]).sum()
-            ev = abs(sum_v - sum_s) / max(1, sum_s)
-            ed = abs(sum_d - sum_ps) / max(1.0, sum_ps)
-            if ev > args.tol or ed > args.tol:
-                violations.append({"ticker":ticker,"date":date,"ev":float(ev),"ed":float(ed)})
-        except Exception as e:
-            violations.append({"ticker":ticker,"date":date,"error":str(e)})
-
-    ok = (len(violations) == 0)
-    fail_or_pass(args.out, {"sampled": len(items), "violations": violations}, ok)
+def run(args, inv=None):
+    t0 = time.time()
+    inv = inv or Inventory(args.root)
+    items = list_partitions(inv, args.bar_type)
+    if args.sample and args.sample < len(items):
+        items = sorted(random.sample(items, args.sample))
+
+    state_path = pathlib.Path(args.state) if args.state else None
+    prev = {(r["ticker"], r["date"]): r for r in load_state(state_path).iter_rows(named=True)} if state_path else {}
+    use_hash = args.hash and state_path is not None
+
+    # Particiones a (re)comprobar: nuevas, con error previo o con tamaño/mtime distinto
+    # (con --hash también las que aún no tienen hash guardado: solo se hashean)
+    keep, by_ticker = [], defaultdict(list)
+    for ticker, date, bar_file, trades_file in items:
+        p = prev.get((ticker, date))
+        sig = inv.stat(bar_file) + inv.stat(trades_file)
+        if p and p["error"] is None and tuple(p[c] for c in SIG_COLS) == sig \
+                and not (use_hash and p["trades_hash"] is None):
+            keep.append(p)
+        else:
+            by_ticker[ticker].append((ticker, date, bar_file, trades_file, p if use_hash else None))
+    tasks = [days[k:k + args.chunk] for days in by_ticker.values() for k in range(0, len(days), args.chunk)]
+
+    rows, scanned = [], 0
+    if tasks:
+        # spawn: los workers no heredan el pool de hilos de polars del proceso padre
+        with ProcessPoolExecutor(max_workers=max(1, args.workers), mp_context=mp.get_context("spawn")) as ex:
+            futs = {ex.submit(check_chunk, t, use_hash): t for t in tasks}
+            for f in as_completed(futs):
+                try:
+                    chunk_rows, n = f.result()
+                    rows.extend(chunk_rows)
+                    scanned += n
+                except Exception as e:   # worker muerto: todo el bloque queda con error
+                    rows.extend({**dict.fromkeys(STATE_SCHEMA), "ticker": i[0], "date": i[1], "error": str(e)}
+                                for i in futs[f])
+    fresh = pl.DataFrame(rows, schema=STATE_SCHEMA, orient="row") if rows else pl.DataFrame(schema=STATE_SCHEMA)
+    state = pl.concat([pl.DataFrame(keep, schema=STATE_SCHEMA, orient="row"), fresh]).sort(["ticker", "date"])
+    if state_path:
+        # con --sample se conservan las particiones no muestreadas; en corrida completa se
+        # descartan las que ya no existen
+        seen = {(i[0], i[1]) for i in items}
+        rest = [r for k, r in prev.items() if k not in seen] if args.sample else []
+        save_state(pl.concat([pl.DataFrame(rest, schema=STATE_SCHEMA, orient="row"), state]).sort(["ticker", "date"]),
+                   state_path)
+
+    res = state.with_columns(
+        ((pl.col("sum_v") - pl.col("sum_s")).abs() / pl.max_horizontal(1.0, pl.col("sum_s"))).alias("ev"),
+        ((pl.col("sum_d") - pl.col("sum_ps")).abs() / pl.max_horizontal(1.0, pl.col("sum_ps"))).alias("ed"),
+    )
+    bad = res.filter(pl.col("error").is_not_null() | (pl.col("ev") > args.tol) | (pl.col("ed") > args.tol))
+    bad = bad.sort(pl.col("ev").fill_null(float("inf")) + pl.col("ed").fill_null(float("inf")), descending=True)
+    violations = [{k: v for k, v in r.items() if v is not None}
+                  for r in bad.select("ticker", "date", "ev", "ed", pl.col("error").alias("reason"))
+                              .head(args.max_report).iter_rows(named=True)]
+
+    return {
+        "checked": state.height,
+        "rechecked": fresh.height,
+        "scanned": scanned,
+        "reused": len(keep),
+        "mode": f"sample {args.sample}" if args.sample else "full",
+        "missing_trades": res.filter(pl.col("error") == "missing trades").height,
+        "errors": res.filter(pl.col("error").is_not_null() & (pl.col("error") != "missing trades")).height,
+        "max_ev": res["ev"].max(), "max_ed": res["ed"].max(),
+        "n_violations": bad.height,
+        "violations": violations,
+        "elapsed_s": round(time.time() - t0, 2),
+    }, bad.height == 0
+
+def main():
+    args = parse_args()
+    metrics, ok = run(args)
+    fail_or_pass(args.out, metrics, ok)
 
 if __name__ == "__main__":
     main()
@@ -1,18 +1,20 @@
-import argparse, pathlib
+import argparse
 from _utils import try_import_polars, fail_or_pass
+from _inventory import Inventory
 
-def main():
+def parse_args(argv=None):
     ap = argparse.ArgumentParser()
     ap.add_argument("--root", required=True)
     ap.add_argument("--out", required=True)
     ap.add_argument("--max_zero_share", type=float, default=0.9)
-    args = ap.parse_args()
+    return ap.parse_args(argv)
 
+def run(args, inv=None):
     pl = try_import_polars()
-    labels_root = pathlib.Path(args.root) / "processed/labels"
+    inv = inv or Inventory(args.root)
     total = 0; bad = 0; cnt = {-1:0, 0:0, 1:0}
 
-    for p in labels_root.rglob("labels.parquet"):
+    for p in inv.files("processed/labels", "labels.parquet"):
         df = pl.read_parquet(p).select(["anchor_ts","t1","pt_hit","sl_hit","label"])
         total += len(df)
         both = (df["pt_hit"] & df["sl_hit"]).sum()
@@ -25,6 +27,11 @@ def main():
     max_share = max(cnt.values()) / max(1, total_labels)
     metrics = {"total_rows": total_labels, "label_counts": cnt, "bad_rows": bad, "max_label_share": max_share}
     ok = (bad == 0 and max_share <= args.max_zero_share)
+    return metrics, ok
+
+def main():
+    args = parse_args()
+    metrics, ok = run(args)
     fail_or_pass(args.out, metrics, ok)
 
 if __name__ == "__main__":
@@ -1,5 +1,6 @@
-import argparse, pathlib
+import argparse
 from _utils import try_import_polars, fail_or_pass
+from _inventory import Inventory
 
 def gini(arr):
     import numpy as np
@@ -12,19 +13,20 @@ def gini(arr):
     index = np.arange(1, n+1)
     return (np.sum((2*index - n - 1) * x) / (n * np.sum(x)))
 
-def main():
+def parse_args(argv=None):
     ap = argparse.ArgumentParser()
     ap.add_argument("--root", required=True)
     ap.add_argument("--out", required=True)
     ap.add_argument("--gini_max", type=float, default=0.9)
     ap.add_argument("--eps_sum", type=float, default=1e-6)
-    args = ap.parse_args()
+    return ap.parse_args(argv)
 
+def run(args, inv=None):
     pl = try_import_polars()
-    weights_root = pathlib.Path(args.root) / "processed/weights"
+    inv = inv or Inventory(args.root)
     gini_vals = []; bad_norm = 0; files = 0
 
-    for p in weights_root.rglob("weights.parquet"):
+    for p in inv.files("processed/weights", "weights.parquet"):
         df = pl.read_parquet(p).select(["weight"])
         s = float(df["weight"].sum())
         if abs(s - 1.0) > args.eps_sum: bad_norm += 1
@@ -34,6 +36,11 @@ def main():
     avg_gini = float(sum(gini_vals)/max(1,len(gini_vals)))
     metrics = {"files": files, "bad_normalization_files": bad_norm, "avg_gini": avg_gini, "gini_max": args.gini_max}
     ok = (bad_norm == 0 and avg_gini <= args.gini_max)
+    return metrics, ok
+
+def main():
+    args = parse_args()
+    metrics, ok = run(args)
     fail_or_pass(args.out, metrics, ok)
 
 if __name__ == "__main__":
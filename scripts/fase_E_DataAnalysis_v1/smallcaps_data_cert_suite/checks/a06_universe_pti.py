@@ -1,7 +1,8 @@
 import argparse, pathlib
 from _utils import try_import_polars, fail_or_pass
+from _inventory import Inventory
 
-def main():
+def parse_args(argv=None):
     ap = argparse.ArgumentParser()
     ap.add_argument("--root", required=True)
     ap.add_argument("--out", required=True)
@@ -11,20 +12,21 @@ def main():
     ap.add_argument("--pmax", type=float, default=20.0)
     ap.add_argument("--volmin", type=float, default=5e5)
     ap.add_argument("--chgmin", type=float, default=0.15)
-    args = ap.parse_args()
+    return ap.parse_args(argv)
 
+def run(args, inv=None):
     pl = try_import_polars()
     daily_cache = pathlib.Path(args.root) / "processed/universe/daily_cache"
-    watchlists = pathlib.Path(args.root) / "processed/universe/dynamic"
+    inv = inv or Inventory(args.root)
 
     violations = []; ok_count = 0; total = 0
-    for wl in watchlists.rglob("watchlist.parquet"):
+    for wl in inv.files("processed/universe/dynamic", "watchlist.parquet"):
         day = [q for q in wl.parts if q.startswith("date=")][0].split("=")[1]
         dfw = pl.read_parquet(wl)  # expect ticker column
         for tkr in dfw["ticker"].unique().to_list():
             total += 1
             dc = daily_cache / tkr / f"date={day}" / "daily.parquet"
-            if not dc.exists():
+            if not inv.exists(dc):
                 violations.append({"ticker": tkr, "date": day, "reason": "missing daily_cache"}); continue
             d = pl.read_parquet(dc)
             row = d.select(["close","volume","rvol","pct_chg","shares_out","float_est","exchange"]).to_dicts()
@@ -46,7 +48,12 @@ def main():
                 ok_count += 1
 
     ok = (len(violations) == 0 and total > 0)
-    fail_or_pass(args.out, {"checked": total, "pass": ok_count, "violations": violations}, ok)
+    return {"checked": total, "pass": ok_count, "violations": violations}, ok
+
+def main():
+    args = parse_args()
+    metrics, ok = run(args)
+    fail_or_pass(args.out, metrics, ok)
 
 if __name__ == "__main__":
     main()
@@ -1,19 +1,21 @@
 import argparse, pathlib
 from _utils import try_import_polars, fail_or_pass
+from _inventory import Inventory
 
-def main():
+def parse_args(argv=None):
     ap = argparse.ArgumentParser()
     ap.add_argument("--root", required=True)
     ap.add_argument("--out", required=True)
     ap.add_argument("--window_days", type=int, default=10)
-    args = ap.parse_args()
+    return ap.parse_args(argv)
 
+def run(args, inv=None):
     pl = try_import_polars()
-    filings_root = pathlib.Path(args.root) / "processed/reference/filings"
     daily_cache = pathlib.Path(args.root) / "processed/universe/daily_cache"
+    inv = inv or Inventory(args.root)
 
     violations = []; total = 0
-    for f in filings_root.rglob("filings.parquet"):
+    for f in inv.files("processed/reference/filings", "filings.parquet"):
         tkr = f.parent.name
         df = pl.read_parquet(f)
         if not set(["date","form"]).issubset(set(df.columns)):
@@ -23,14 +25,19 @@ def main():
             total += 1
             date = row["date"]
             dc_dir = daily_cache / tkr
-            if not dc_dir.exists():
+            if not inv.is_dir(dc_dir):
                 violations.append({"ticker": tkr, "date": date, "reason": "no daily_cache dir"}); continue
             dc = dc_dir / f"date={date}" / "daily.parquet"
-            if not dc.exists():
+            if not inv.exists(dc):
                 violations.append({"ticker": tkr, "date": date, "reason": "missing daily on filing day", "form": row["form"]})
 
     ok = (len(violations) == 0)
-    fail_or_pass(args.out, {"checked": total, "violations": violations}, ok)
+    return {"checked": total, "violations": violations}, ok
+
+def main():
+    args = parse_args()
+    metrics, ok = run(args)
+    fail_or_pass(args.out, metrics, ok)
 
 if __name__ == "__main__":
     main()
@@ -1,13 +1,16 @@
 import argparse, pathlib
 from _utils import hxxh64_file, fail_or_pass
+from _inventory import Inventory
 
-def main():
+def parse_args(argv=None):
     ap = argparse.ArgumentParser()
     ap.add_argument("--root", required=True)
     ap.add_argument("--out", required=True)
-    args = ap.parse_args()
+    return ap.parse_args(argv)
 
+def run(args, inv=None):
     root = pathlib.Path(args.root)
+    inv = inv or Inventory(root)
     dirs = [
         "processed/bars",
         "processed/labels",
@@ -19,12 +22,15 @@ def main():
 
     hashes = {}
     for d in dirs:
-        droot = root / d
-        if not droot.exists(): continue
-        for p in droot.rglob("*.parquet"):
-            hashes[str(p.relative_to(root))] = hxxh64_file(p)
+        for p in inv.all_files(d, ".parquet"):
+            hashes[str(p.relative_to(inv.root))] = hxxh64_file(p)
+
+    return {"files_hashed": len(hashes), "hashes": hashes}, True
 
-    fail_or_pass(args.out, {"files_hashed": len(hashes), "hashes": hashes}, True)
+def main():
+    args = parse_args()
+    metrics, ok = run(args)
+    fail_or_pass(args.out, metrics, ok)
 
 if __name__ == "__main__":
     main()
@@ -1,19 +1,21 @@
-import argparse, pathlib
+import argparse
 from _utils import try_import_polars, fail_or_pass
+from _inventory import Inventory
 
 REQUIRED = {"event_type","anchor_ts","start_ts","end_ts","score","source"}
 
-def main():
+def parse_args(argv=None):
     ap = argparse.ArgumentParser()
     ap.add_argument("--root", required=True)
     ap.add_argument("--out", required=True)
-    args = ap.parse_args()
+    return ap.parse_args(argv)
 
+def run(args, inv=None):
     pl = try_import_polars()
-    events_root = pathlib.Path(args.root) / "processed/events"
+    inv = inv or Inventory(args.root)
 
     n=0; bad=0; samples=[]
-    for p in events_root.rglob("events.parquet"):
+    for p in inv.files("processed/events", "events.parquet"):
         n+=1
         try:
             df = pl.read_parquet(p)
@@ -24,7 +26,12 @@ def main():
         except Exception as e:
             bad += 1; samples.append({"file": str(p), "error": str(e)})
     ok = (bad == 0)
-    fail_or_pass(args.out, {"files": n, "bad": bad, "samples": samples[:5]}, ok)
+    return {"files": n, "bad": bad, "samples": samples[:5]}, ok
+
+def main():
+    args = parse_args()
+    metrics, ok = run(args)
+    fail_or_pass(args.out, metrics, ok)
 
 if __name__ == "__main__":
     main()
@@ -1,21 +1,23 @@
-import argparse, pathlib, collections
+import argparse, collections
 from _utils import try_import_polars, fail_or_pass
+from _inventory import Inventory
 
-def main():
+def parse_args(argv=None):
     ap = argparse.ArgumentParser()
     ap.add_argument("--root", required=True)
     ap.add_argument("--out", required=True)
     ap.add_argument("--max_overlap_ratio", type=float, default=0.8)
-    args = ap.parse_args()
+    return ap.parse_args(argv)
 
+def run(args, inv=None):
     pl = try_import_polars()
-    events_root = pathlib.Path(args.root) / "processed/events"
+    inv = inv or Inventory(args.root)
 
     counts = collections.Counter(); overlaps = 0; files = 0
-    for ev in events_root.rglob("events.parquet"):
+    for ev in inv.files("processed/events", "events.parquet"):
         files += 1
         df = pl.read_parquet(ev).select(["event_type","start_ts","end_ts"])
-        for et, grp in df.group_by("event_type"):
+        for (et,), grp in df.group_by(["event_type"]):
             counts[et] += len(grp)
             grp_sorted = grp.sort(["start_ts","end_ts"])
             same = int(((grp_sorted["start_ts"].shift(1) == grp_sorted["start_ts"]) & 
@@ -24,7 +26,12 @@ def main():
                 overlaps += 1
 
     ok = (overlaps == 0)
-    fail_or_pass(args.out, {"files": files, "event_counts": dict(counts), "overlap_flags": overlaps}, ok)
+    return {"files": files, "event_counts": dict(counts), "overlap_flags": overlaps}, ok
+
+def main():
+    args = parse_args()
+    metrics, ok = run(args)
+    fail_or_pass(args.out, metrics, ok)
 
 if __name__ == "__main__":
     main()
@@ -1,35 +1,137 @@
-import os, subprocess, pathlib, sys
+"""
+run_all_checks.py
+Runner de la suite A01-A11 en un solo comando:
 
-def run(cmd):
-    print("\n==>", " ".join(cmd))
-    return subprocess.call(cmd, shell=False)
+1. Inventario compartido (checks/_inventory.py): una pasada os.scandir por cada árbol (trades, bars,
+   labels, weights, datasets, events, universe, filings) con ruta, tamaño, mtime y ticker/date de la
+   partición. Se guarda en {reports}/_inventory.parquet.
+2. Los checks corren dentro de un pool de procesos (--workers), importados como módulos
+   (parse_args + run(args, inv)): cada worker carga el inventario una vez y ningún check vuelve a
+   hacer rglob. Se lanzan primero los que más tardaron en la corrida anterior.
+3. Cada informe {reports}/aXX_*.json lleva status y elapsed_s; {reports}/_suite_run.json guarda los
+   tiempos de la corrida y SUMMARY.md (semáforo GO/NO-GO) se genera con los resultados en memoria.
 
-def main():
-    root = os.environ.get("SC_ROOT", "D:/04_TRADING_SMALLCAPS")
-    reports = os.environ.get("SC_REPORTS", f"{root}/reports/audits")
-    pathlib.Path(reports).mkdir(parents=True, exist_ok=True)
-
-    cmds = [
-        ["python","checks/a01_inventory.py","--root",root,"--out",f"{reports}/a01_inventory.json"],
-        ["python","checks/a02_schema.py","--root",root,"--out",f"{reports}/a02_schema.json"],
-        ["python","checks/a03_tick2bar_conservation.py","--root",root,"--out",f"{reports}/a03_tick2bar.json","--sample","500","--tol","0.001"],
-        ["python","checks/a04_labels_logic.py","--root",root,"--out",f"{reports}/a04_labels.json"],
-        ["python","checks/a05_weights_stats.py","--root",root,"--out",f"{reports}/a05_weights.json"],
-        ["python","checks/a06_universe_pti.py","--root",root,"--out",f"{reports}/a06_universe_pti.json"],
-        ["python","checks/a06b_filings_dilution.py","--root",root,"--out",f"{reports}/a06b_filings.json"],
-        ["python","checks/a07_reproducibility.py","--root",root,"--out",f"{reports}/a07_repro.json"],
-        ["python","checks/a08_split_purging.py","--root",root,"--out",f"{reports}/a08_split.json","--purge","50"],
-        ["python","checks/a09_events_schema.py","--root",root,"--out",f"{reports}/a09_events_schema.json"],
-        ["python","checks/a10_events_lineage.py","--root",root,"--out",f"{reports}/a10_events_lineage.json"],
-        ["python","checks/a11_events_consistency.py","--root",root,"--out",f"{reports}/a11_events_consistency.json"]
+Uso:
+  SC_ROOT=D:/04_TRADING_SMALLCAPS SC_REPORTS=D:/04_TRADING_SMALLCAPS/reports/audits python run_all_checks.py
+  python run_all_checks.py --root D:/04_TRADING_SMALLCAPS --workers 6 --only a03,a07
+"""
+import argparse, importlib, json, os, pathlib, sys, time
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+HERE = pathlib.Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE / "checks"))
+sys.path.insert(0, str(HERE))
+from _utils import save_json
+from _inventory import Inventory, INVENTORY_DIRS
+
+INVENTORY_FILE = "_inventory.parquet"
+RUN_FILE = "_suite_run.json"
+
+def suite(reports: str) -> list:
+    """[(módulo en checks/, informe, argumentos extra)]"""
+    return [
+        ("a01_inventory", "a01_inventory.json", []),
+        ("a02_schema", "a02_schema.json", []),
+        ("a03_tick2bar_conservation", "a03_tick2bar.json",
+         ["--tol", "0.001", "--state", f"{reports}/a03_tick2bar_state.parquet"]),
+        ("a04_labels_logic", "a04_labels.json", []),
+        ("a05_weights_stats", "a05_weights.json", []),
+        ("a06_universe_pti", "a06_universe_pti.json", []),
+        ("a06b_filings_dilution", "a06b_filings.json", []),
+        ("a07_reproducibility", "a07_repro.json", []),
+        ("a08_split_purging", "a08_split.json", ["--purge", "50"]),
+        ("a09_events_schema", "a09_events_schema.json", []),
+        ("a10_events_lineage", "a10_events_lineage.json", []),
+        ("a11_events_consistency", "a11_events_consistency.json", []),
     ]
 
-    fail = 0
-    for c in cmds:
-        rc = run(c)
-        if rc != 0: fail += 1
+_INV = None
+
+def _init_worker(root: str, inv_path: str):
+    global _INV
+    _INV = Inventory.load(root, inv_path)
+
+def run_check(module: str, argv: list) -> dict:
+    """Ejecuta un check en el proceso actual; devuelve su informe (con status y elapsed_s)"""
+    t0 = time.perf_counter()
+    try:
+        mod = importlib.import_module(module)
+        args = mod.parse_args(argv)
+        metrics, ok = mod.run(args, _INV)
+        metrics["status"] = "PASS" if ok else "FAIL"
+        json.dumps(metrics)   # un informe no serializable cuenta como ERROR, no tumba el runner
+    except SystemExit as e:   # argparse
+        metrics = {"status": "ERROR", "error": f"argumentos inválidos (exit {e.code})"}
+    except Exception as e:
+        metrics = {"status": "ERROR", "error": f"{type(e).__name__}: {e}"}
+    metrics["elapsed_s"] = round(time.perf_counter() - t0, 3)
+    return metrics
+
+def previous_timings(reports: pathlib.Path) -> dict:
+    try:
+        with open(reports / RUN_FILE, encoding="utf-8") as f:
+            return {c["check"]: c["elapsed_s"] for c in json.load(f)["checks"]}
+    except (OSError, ValueError, KeyError):
+        return {}
+
+def main():
+    ap = argparse.ArgumentParser(description="Suite de certificación A01-A11 en paralelo con inventario compartido")
+    ap.add_argument("--root", default=os.environ.get("SC_ROOT", "D:/04_TRADING_SMALLCAPS"))
+    ap.add_argument("--reports", default=os.environ.get("SC_REPORTS"), help="Por defecto {root}/reports/audits")
+    ap.add_argument("--workers", type=int, default=min(os.cpu_count() or 1, 6), help="Checks simultáneos")
+    ap.add_argument("--only", default=None, help="Prefijos separados por coma (p.ej. a03,a07)")
+    args = ap.parse_args()
+
+    root = os.path.abspath(args.root)
+    reports = pathlib.Path(args.reports or f"{root}/reports/audits")
+    reports.mkdir(parents=True, exist_ok=True)
+    checks = suite(str(reports))
+    if args.only:
+        prefixes = tuple(p.strip() + "_" for p in args.only.split(","))
+        checks = [c for c in checks if c[0].startswith(prefixes)]
+
+    t0 = time.perf_counter()
+    inv = Inventory.scan(root, INVENTORY_DIRS)
+    inv.save(reports / INVENTORY_FILE)
+    t_inv = time.perf_counter() - t0
+    print(f"Inventario: {inv.n_files():,} ficheros en {len(INVENTORY_DIRS)} árboles ({t_inv:.1f}s)", flush=True)
+
+    prev = previous_timings(reports)
+    checks.sort(key=lambda c: -prev.get(c[0], 0.0))
+    results, wall = {}, {}
+    # spawn: cada worker arranca limpio (polars) y carga el inventario una sola vez
+    with ProcessPoolExecutor(max_workers=max(1, args.workers), mp_context=mp.get_context("spawn"),
+                             initializer=_init_worker, initargs=(root, str(reports / INVENTORY_FILE))) as ex:
+        futs = {ex.submit(run_check, module, ["--root", root, "--out", str(reports / report), *extra]):
+                (module, report) for module, report, extra in checks}
+        for f in as_completed(futs):
+            module, report = futs[f]
+            try:
+                metrics = f.result()
+            except Exception as e:   # worker muerto
+                metrics = {"status": "ERROR", "error": f"{type(e).__name__}: {e}"}
+            save_json(reports / report, metrics)
+            results[report] = metrics
+            wall[module] = round(time.perf_counter() - t0, 3)
+            print(f"  {metrics['status']:5s} {module:28s} {metrics.get('elapsed_s', 0):8.2f}s", flush=True)
+
+    elapsed = time.perf_counter() - t0
+    summary = importlib.import_module("summary_semáforo")
+    md, go = summary.build_summary(results, summary.REQUIRED if not args.only else list(results))
+    (reports / "SUMMARY.md").write_text(md, encoding="utf-8")
+    order = {module: report for module, report, _ in checks}
+    save_json(reports / RUN_FILE, {
+        "root": root, "workers": args.workers, "inventory_files": inv.n_files(),
+        "inventory_s": round(t_inv, 3), "total_s": round(elapsed, 3), "go": go,
+        "checks": [{"check": m, "report": r, "status": results[r]["status"],
+                    "elapsed_s": results[r].get("elapsed_s"), "finished_at_s": wall.get(m)}
+                   for m, r in order.items()],
+    })
 
-    print("\nSummary: Failures =", fail)
+    fail = sum(1 for r in results.values() if r["status"] != "PASS")
+    print(f"\n{md}\n\nSummary: Failures = {fail} | total {elapsed:.1f}s "
+          f"(inventario {t_inv:.1f}s, Σ checks {sum(r.get('elapsed_s', 0) for r in results.values()):.1f}s)")
     sys.exit(fail)
 
 if __name__ == "__main__":
@@ -25,33 +25,21 @@ def status_of(obj):
         return "FAIL" if obj["violations"] else "PASS"
     return "PASS"
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--reports", required=True, help="Carpeta con los JSON de auditoría")
-    ap.add_argument("--out-md", default=None, help="Ruta de salida para SUMMARY.md (opcional)")
-    args = ap.parse_args()
-
-    reports = pathlib.Path(args.reports)
-    found = {}
+def build_summary(results: dict, required=REQUIRED):
+    """results: {nombre de informe: JSON del check}. Devuelve (markdown, go)"""
     passes = []
     fails = []
 
-    for name in REQUIRED:
-        p = reports / name
-        if not p.exists():
+    for name in required:
+        obj = results.get(name)
+        if obj is None:
             fails.append((name, "MISSING"))
             continue
-        try:
-            with open(p, "r", encoding="utf-8") as f:
-                obj = json.load(f)
-            st = status_of(obj)
-            found[name] = obj
-            if st == "PASS":
-                passes.append(name)
-            else:
-                fails.append((name, st))
-        except Exception as e:
-            fails.append((name, f"ERROR: {e}"))
+        st = status_of(obj)
+        if st == "PASS":
+            passes.append(name)
+        else:
+            fails.append((name, st if st != "ERROR" else f"ERROR: {obj.get('error', '')}"))
 
     go = (len(fails) == 0)
 
@@ -63,9 +51,10 @@ def main():
     lines.append("")
     lines.append("## Resultados por check")
     lines.append("")
-    for name in REQUIRED:
+    for name in required:
         badge = "🟢 PASS" if name in passes else "🔴 FAIL"
-        lines.append(f"- {badge} `{name}`")
+        secs = (results.get(name) or {}).get("elapsed_s")
+        lines.append(f"- {badge} `{name}`" + (f" ({secs:.1f}s)" if secs is not None else ""))
     lines.append("")
     if fails:
         lines.append("## Detalles de fallos")
@@ -79,7 +68,27 @@ def main():
     lines.append("3. A08 sin leakage (purge ≥ 50).")
     lines.append("4. A05 con Σweights=1 y Gini ≤ 0.9.")
     lines.append("5. A09–A11 válidos si usas eventos ML.")
-    md = "\\n".join(lines)
+    return "\n".join(lines), go
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--reports", required=True, help="Carpeta con los JSON de auditoría")
+    ap.add_argument("--out-md", default=None, help="Ruta de salida para SUMMARY.md (opcional)")
+    args = ap.parse_args()
+
+    reports = pathlib.Path(args.reports)
+    results = {}
+    for name in REQUIRED:
+        p = reports / name
+        if not p.exists():
+            continue
+        try:
+            with open(p, "r", encoding="utf-8") as f:
+                results[name] = json.load(f)
+        except Exception as e:
+            results[name] = {"status": "ERROR", "error": str(e)}
+
+    md, go = build_summary(results)
 
     # Output
     if args.out_md:
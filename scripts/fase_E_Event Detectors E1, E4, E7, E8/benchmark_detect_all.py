@@ -0,0 +1,98 @@
+"""
+Benchmark + memory profile of EventDetector.detect_all_events: sequential vs fused
+
+  sequential : one detect_eN_* after another (each re-sorts and derives its own columns)
+  fused      : one lazy plan (shared sort + derived columns, all event predicates on it)
+
+Each mode runs in its own process so peak RSS (ru_maxrss) is per mode; the RSS right after
+loading the daily cache is reported too, so the detection overhead is peak - loaded.
+With --parity, both modes also run in the parent and every event output is compared.
+
+Usage:
+    python benchmark_detect_all.py --daily-cache processed/daily_cache/hybrid/daily.parquet --parity
+    python benchmark_detect_all.py --tickers 2000 --days 2500 --events E1,E2,E3,E4,E5,E6,E7,E8,E9,E10,E11
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+import polars as pl
+
+from event_detectors import EventDetector
+
+
+def rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def load(args) -> pl.DataFrame:
+    if args.daily_cache:
+        return pl.read_parquet(args.daily_cache)
+    from benchmark_event_detectors import make_panel
+    return make_panel(args.tickers, args.days).sample(fraction=1.0, shuffle=True, seed=3)
+
+
+def run_mode(args):
+    """Child process: load, detect, print one JSON line"""
+    df = load(args)
+    loaded = rss_mb()
+    detector = EventDetector()
+    detector.logger.setLevel("WARNING")
+    t0 = time.perf_counter()
+    results = detector.detect_all_events(df, events=args.events.split(","), fused=args.run_mode == "fused")
+    secs = time.perf_counter() - t0
+    print(json.dumps({"mode": args.run_mode, "rows": df.height, "secs": secs, "loaded_mb": loaded,
+                      "peak_mb": rss_mb(), "events": {k: len(v) for k, v in results.items()}}))
+
+
+def sort_key(df: pl.DataFrame) -> list[str]:
+    return ["ticker", "date_start", "days"] if "date_start" in df.columns else ["ticker", "date"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sequential vs fused detect_all_events (time + peak RSS)")
+    parser.add_argument("--daily-cache", help="daily.parquet (default: synthetic panel)")
+    parser.add_argument("--tickers", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=2500)
+    parser.add_argument("--events", default="E1,E2,E3,E4,E5,E6,E7,E8,E9,E10,E11")
+    parser.add_argument("--parity", action="store_true", help="Also compare outputs of both modes")
+    parser.add_argument("--run-mode", choices=["sequential", "fused"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_mode:
+        run_mode(args)
+        return
+
+    source = args.daily_cache or f"synthetic {args.tickers}x{args.days}"
+    child_args = [a for a in sys.argv[1:] if a != "--parity"]
+    for mode in ("sequential", "fused"):
+        out = subprocess.run([sys.executable, __file__, *child_args, "--run-mode", mode],
+                             check=True, capture_output=True, text=True).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        print(f"{mode:10s} {source} ({r['rows']:,} rows): {r['secs']:6.2f}s | "
+              f"RSS loaded {r['loaded_mb']:7.0f} MB, peak {r['peak_mb']:7.0f} MB "
+              f"(+{r['peak_mb'] - r['loaded_mb']:.0f} MB) | {sum(r['events'].values()):,} events", flush=True)
+
+    if args.parity:
+        df = load(args)
+        detector = EventDetector()
+        detector.logger.setLevel("WARNING")
+        events = args.events.split(",")
+        seq = detector.detect_all_events(df, events=events)
+        fused = detector.detect_all_events(df, events=events, fused=True)
+        ok_all = True
+        for event_type in seq:
+            a, b = seq[event_type], fused[event_type]
+            ok = a.schema == b.schema and a.sort(sort_key(a)).equals(b.sort(sort_key(b)))
+            ok_all &= ok
+            print(f"{event_type:4s} parity fused vs sequential: {'OK' if ok else 'FAIL'} ({a.height:,} events)")
+        if not ok_all:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
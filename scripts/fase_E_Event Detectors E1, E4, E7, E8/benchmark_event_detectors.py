@@ -0,0 +1,218 @@
+"""
+Parity check + benchmark for the vectorized run-length detectors (E6, E7, E10, E11)
+
+  legacy     : previous implementations (E7 per-ticker filter + iter_rows loop,
+               E6/E10/E11 shift/group/cum_sum in several passes)
+  vectorized : EventDetector (run-id / cumulative-max window expressions with .over("ticker"))
+
+Synthetic small-cap-like daily panel (tickers x days, random-walk OHLCV). The legacy E7 loop is
+O(tickers x rows), so it is timed on the first --legacy-tickers tickers only.
+
+Legacy E6/E10/E11 undercount a streak that starts on a ticker's first row by one (the lagged
+flag is null there, so the first row gets its own group). Parity is therefore checked on a panel
+whose first day is a doji (c == o), plus a small case that shows the fixed count.
+
+Usage:
+    python benchmark_event_detectors.py --tickers 10000 --days 5000 --legacy-tickers 200
+"""
+
+import argparse
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import polars as pl
+
+from event_detectors import EventDetector
+
+
+def make_panel(n_tickers: int, n_days: int, seed: int = 7) -> pl.DataFrame:
+    """Random-walk daily OHLCV panel sorted by ticker, date (first day of each ticker is a doji)"""
+    rng = np.random.default_rng(seed)
+    n = n_tickers * n_days
+    ret = rng.standard_t(3, n) * 0.08
+    o = 5.0 * np.exp(np.cumsum(rng.normal(0, 0.05, n)))
+    c = o * np.exp(ret)
+    first = np.arange(0, n, n_days)
+    c[first] = o[first]
+    h = np.maximum(o, c) * (1 + rng.exponential(0.03, n))
+    l = np.minimum(o, c) * (1 - rng.exponential(0.03, n))
+    v = rng.lognormal(12, 1.5, n).astype(np.int64)
+    dates = pl.date_range(date(2005, 1, 3), date(2005, 1, 3) + timedelta(days=n_days - 1), eager=True)
+    return pl.DataFrame({
+        "ticker": np.repeat([f"T{i:05d}" for i in range(n_tickers)], n_days),
+        "date": pl.concat([dates] * n_tickers),
+        "o": o, "h": h, "l": l, "c": c, "v": v,
+    })
+
+
+# ==================== LEGACY IMPLEMENTATIONS ====================
+
+def legacy_e7(df_daily: pl.DataFrame, min_run_days: int = 3, min_extension_pct: float = 0.50) -> pl.DataFrame:
+    df = (
+        df_daily
+        .sort(["ticker", "date"])
+        .with_columns([
+            (pl.col("c") > pl.col("o")).alias("is_green"),
+            (pl.col("c") < pl.col("o")).alias("is_red"),
+        ])
+    )
+    events = []
+    for ticker in df["ticker"].unique():
+        df_ticker = df.filter(pl.col("ticker") == ticker).sort("date")
+        green_run_days = 0
+        run_start_price = run_start_date = run_high = None
+        for row in df_ticker.iter_rows(named=True):
+            if row["is_green"]:
+                if green_run_days == 0:
+                    run_start_price, run_start_date, run_high = row["o"], row["date"], row["h"]
+                else:
+                    run_high = max(run_high, row["h"])
+                green_run_days += 1
+            elif row["is_red"] and green_run_days >= min_run_days:
+                extension_pct = (run_high - run_start_price) / run_start_price
+                if extension_pct >= min_extension_pct:
+                    events.append({
+                        "ticker": ticker, "date": row["date"], "event_type": "E7_FirstRedDay",
+                        "run_days": green_run_days, "run_start_date": run_start_date,
+                        "extension_pct": extension_pct, "peak_price": run_high,
+                        "frd_open": row["o"], "frd_close": row["c"], "frd_low": row["l"]
+                    })
+                green_run_days = 0
+                run_start_price = run_start_date = run_high = None
+            else:
+                green_run_days = 0
+                run_start_price = run_start_date = run_high = None
+    return pl.DataFrame(events) if events else pl.DataFrame()
+
+
+def _legacy_prev_red_days(df: pl.DataFrame) -> pl.DataFrame:
+    df = df.with_columns([pl.col("is_red").shift(1).over("ticker").alias("prev_is_red")])
+    df = df.with_columns([
+        (pl.col("is_red") != pl.col("prev_is_red")).cast(pl.Int32).cum_sum().over("ticker").alias("red_group")
+    ])
+    df = df.with_columns([pl.col("is_red").cum_sum().over(["ticker", "red_group"]).alias("red_count")])
+    return df.with_columns([pl.col("red_count").shift(1).over("ticker").fill_null(0).alias("prev_red_days")])
+
+
+def legacy_e6(df_daily: pl.DataFrame, min_green_days: int = 3) -> pl.DataFrame:
+    df = df_daily.sort(["ticker", "date"]).with_columns([
+        (pl.col("c") > pl.col("o")).cast(pl.Int32).alias("is_green")
+    ])
+    df = df.with_columns([pl.col("is_green").shift(1).over("ticker").alias("prev_is_green")])
+    df = df.with_columns([
+        (pl.col("is_green") != pl.col("prev_is_green")).cast(pl.Int32).cum_sum().over("ticker").alias("green_group")
+    ])
+    df = df.with_columns([pl.col("is_green").cum_sum().over(["ticker", "green_group"]).alias("green_days_count")])
+    return (
+        df.filter((pl.col("is_green") == 1) & (pl.col("green_days_count") >= min_green_days))
+        .select(["ticker", "date", pl.lit("E6_MultipleGreenDays").alias("event_type"),
+                 "green_days_count", "o", "h", "l", "c", "v"])
+    )
+
+
+def legacy_e10(df_daily: pl.DataFrame, min_red_days: int = 3) -> pl.DataFrame:
+    df = df_daily.sort(["ticker", "date"]).with_columns([
+        (pl.col("c") > pl.col("o")).cast(pl.Int32).alias("is_green"),
+        (pl.col("c") < pl.col("o")).cast(pl.Int32).alias("is_red")
+    ])
+    df = _legacy_prev_red_days(df)
+    return (
+        df.filter((pl.col("is_green") == 1) & (pl.col("prev_red_days") >= min_red_days))
+        .select(["ticker", "date", pl.lit("E10_FirstGreenBounce").alias("event_type"),
+                 "prev_red_days", "o", "h", "l", "c", "v"])
+    )
+
+
+def legacy_e11(df_daily: pl.DataFrame, rvol_threshold: float = 3.0, window_days: int = 20) -> pl.DataFrame:
+    df = df_daily.sort(["ticker", "date"]).with_columns([
+        pl.col("v").rolling_mean(window_size=window_days).over("ticker").alias("avg_vol"),
+        (pl.col("c") > pl.col("o")).cast(pl.Int32).alias("is_green"),
+        (pl.col("c") < pl.col("o")).cast(pl.Int32).alias("is_red")
+    ]).with_columns([(pl.col("v") / pl.col("avg_vol")).alias("rvol")])
+    df = _legacy_prev_red_days(df)
+    return (
+        df.filter((pl.col("rvol") >= rvol_threshold) & (pl.col("is_green") == 1) &
+                  (pl.col("prev_red_days") >= 2) & (pl.col("avg_vol").is_not_null()))
+        .select(["ticker", "date", pl.lit("E11_VolumeBounce").alias("event_type"),
+                 "rvol", "prev_red_days", "v", "avg_vol", "o", "h", "l", "c"])
+    )
+
+
+# ==================== CHECKS ====================
+
+def same(a: pl.DataFrame, b: pl.DataFrame) -> bool:
+    """Same rows and values (dtypes and row order ignored)"""
+    if a.height != b.height or set(a.columns) != set(b.columns):
+        return False
+    if a.height == 0:
+        return True
+    b = b.select(a.columns).cast(a.schema)
+    return a.sort(["ticker", "date"]).equals(b.sort(["ticker", "date"]))
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parity + benchmark of vectorized E6/E7/E10/E11 detectors")
+    parser.add_argument("--tickers", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=5000)
+    parser.add_argument("--legacy-tickers", type=int, default=200,
+                        help="Tickers used for parity and for timing the legacy E7 loop")
+    args = parser.parse_args()
+
+    detector = EventDetector()
+    detector.logger.setLevel("WARNING")
+
+    # Parity on a subset (legacy E7 loop is quadratic)
+    df_small = make_panel(args.legacy_tickers, args.days)
+    checks = [
+        ("E6", legacy_e6, detector.detect_e6_multiple_green_days),
+        ("E7", legacy_e7, detector.detect_e7_first_red_day),
+        ("E10", legacy_e10, detector.detect_e10_first_green_bounce),
+        ("E11", legacy_e11, detector.detect_e11_volume_bounce),
+    ]
+    legacy_times = {}
+    ok_all = True
+    for name, legacy_fn, new_fn in checks:
+        ref, t_ref = timed(legacy_fn, df_small)
+        got, _ = timed(new_fn, df_small)
+        legacy_times[name] = t_ref
+        ok = same(ref, got)
+        ok_all &= ok
+        print(f"{name:4s} parity vs legacy ({df_small.height:,} rows): "
+              f"{'OK' if ok else 'FAIL'} ({got.height:,} events)", flush=True)
+
+    # Fixed edge case: streak starting on the first row of a ticker
+    edge = pl.DataFrame({
+        "ticker": ["A"] * 5, "date": [date(2024, 1, d) for d in range(1, 6)],
+        "o": [10.0, 9.0, 8.0, 7.0, 7.0], "h": [10.0, 9.0, 8.0, 7.0, 9.0],
+        "l": [9.0, 8.0, 7.0, 6.0, 7.0], "c": [9.0, 8.0, 7.0, 7.5, 8.5], "v": [1] * 5,
+    })
+    print(f"E10  3 reds from first row -> prev_red_days legacy "
+          f"{legacy_e10(edge, 2)['prev_red_days'].to_list()} vs vectorized "
+          f"{detector.detect_e10_first_green_bounce(edge, 2)['prev_red_days'].to_list()}")
+
+    # Timing on the full panel (legacy E7 extrapolated linearly per ticker: a lower bound, its
+    # per-ticker filter also grows with the panel size)
+    del df_small
+    df = make_panel(args.tickers, args.days)
+    for name, legacy_fn, new_fn in checks:
+        _, t_new = timed(new_fn, df)
+        if name == "E7":
+            t_legacy = legacy_times[name] * args.tickers / args.legacy_tickers
+            how = f"~{t_legacy:8.1f}s (extrapolated from {args.legacy_tickers} tickers)"
+        else:
+            _, t_legacy = timed(legacy_fn, df)
+            how = f"{t_legacy:8.2f}s"
+        print(f"{name:4s} {args.tickers:,}x{args.days:,} ({df.height:,} rows): "
+              f"vectorized {t_new:6.2f}s | legacy {how} | x{t_legacy / t_new:.1f}", flush=True)
+    if not ok_all:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
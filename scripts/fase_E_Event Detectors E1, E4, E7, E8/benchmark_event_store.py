@@ -0,0 +1,175 @@
+"""
+Parity check + benchmark: typed event store vs string-details fuser
+
+  legacy : previous multi_event_fuser (E1/E4/E7/E8 details cast struct -> Utf8, fused into
+           list[str]; a consumer splits the "{v1,v2,...}" strings to get numbers back)
+  store  : event_store.py (year/event partitioned, wide typed schema) + lazy group-by fuse
+
+Checks, on a synthetic panel run through EventDetector (all E1-E11):
+  - store round trip: query_events(events=[EN]) == detector output, field by field
+  - legacy vs store watchlist: same (ticker, date, event_types, num_events) rows, and every
+    numeric E1/E7/E8 detail parsed from the legacy strings == the typed struct field (up to the
+    ~6 significant digits / 6 decimals the struct -> Utf8 cast kept)
+Times: building each watchlist, pulling one numeric field (E7 extension_pct) out of it, and a
+ticker + date-range query on the store vs scanning the legacy watchlist file.
+
+Usage:
+    python benchmark_event_store.py --tickers 2000 --days 2500
+"""
+
+import argparse
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+import polars as pl
+
+from benchmark_event_detectors import make_panel
+from event_detectors import EventDetector
+from event_store import EVENT_FIELDS, EVENTS, query_events, write_event_store
+from multi_event_fuser import fuse_events
+
+LEGACY_EVENTS = ["E1", "E4", "E7", "E8"]
+# Struct fields of the legacy details strings, in order: (name, detector column)
+LEGACY_FIELDS = {
+    "E1": [("rvol", "rvol"), ("volume", "v"), ("avg_vol", "avg_vol"), ("close", "c")],
+    "E4": [("pct_change", "pct_change"), ("days", "days"), ("start_price", "start_price"),
+           ("end_price", "end_price"), ("date_end", "date_end")],
+    "E7": [("run_days", "run_days"), ("run_start_date", "run_start_date"), ("extension_pct", "extension_pct"),
+           ("peak_price", "peak_price"), ("frd_open", "frd_open"), ("frd_close", "frd_close"),
+           ("frd_low", "frd_low")],
+    "E8": [("gap_pct", "gap_pct"), ("prev_close", "prev_close"), ("open", "o"), ("high", "h"),
+           ("low", "l"), ("close", "c"), ("volume", "v")],
+}
+# Dates were cast to strings before the struct cast; not compared
+DATE_FIELDS = {"date_end", "run_start_date"}
+
+
+# ==================== LEGACY IMPLEMENTATION ====================
+
+def legacy_fuse(events: dict[str, pl.DataFrame]) -> pl.DataFrame:
+    normalized = []
+    for event_code in LEGACY_EVENTS:
+        df = events[event_code]
+        date_col = "date_start" if event_code == "E4" else "date"
+        fields = [(pl.col(src).cast(pl.Utf8) if name in DATE_FIELDS else pl.col(src)).alias(name)
+                  for name, src in LEGACY_FIELDS[event_code]]
+        normalized.append(df.select([
+            pl.col("ticker"), pl.col(date_col).alias("date"), pl.lit(event_code).alias("event"),
+            pl.struct(fields).cast(pl.Utf8).alias("details_json")
+        ]))
+    df_all = pl.concat(normalized).unique(subset=["ticker", "date", "event"])
+    return df_all.group_by(["ticker", "date"]).agg([
+        pl.col("event").sort().alias("event_types"),
+        pl.col("event").count().alias("num_events"),
+        # The old fuser aggregated details unsorted (not aligned with the sorted event_types);
+        # aligned here so the values can be compared at all
+        pl.col("details_json").sort_by("event").alias("event_details")
+    ]).sort(["date", "ticker"])
+
+
+def legacy_field(df_fused: pl.DataFrame, event_code: str, field: str) -> pl.DataFrame:
+    """(ticker, date, value) of one numeric detail, parsed back out of the strings"""
+    pos = [name for name, _ in LEGACY_FIELDS[event_code]].index(field)
+    return (
+        df_fused
+        .select(["ticker", "date", "event_types", "event_details"])
+        .explode(["event_types", "event_details"])
+        .filter(pl.col("event_types") == event_code)
+        .select([
+            "ticker", "date",
+            pl.col("event_details").str.strip_chars("{}").str.split(",").list.get(pos)
+            .cast(pl.Float64).alias(field)
+        ])
+    )
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Typed event store vs string-details fuser")
+    parser.add_argument("--tickers", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=2500)
+    args = parser.parse_args()
+
+    detector = EventDetector()
+    detector.logger.setLevel("WARNING")
+    panel = make_panel(args.tickers, args.days)
+    events = detector.detect_all_events(panel, events=EVENTS, fused=True)
+    del panel
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = Path(tmp) / "store"
+        _, t_write = timed(write_event_store, store, events)
+
+        # Store round trip
+        ok_all = True
+        for event_code in EVENTS:
+            src = events[event_code].rename({"date_start": "date"}, strict=False)
+            cols = EVENT_FIELDS[event_code]
+            got = query_events(store, events=[event_code], columns=cols).drop("event").collect()
+            key = ["ticker", "date", "days"] if event_code == "E4" else ["ticker", "date"]
+            ok = got.sort(key).equals(src.select(got.columns).cast(got.schema).sort(key))
+            ok_all &= ok
+            print(f"{event_code:4s} store round trip: {'OK' if ok else 'FAIL'} ({got.height:,} events)")
+
+        # Legacy vs store watchlist (legacy events only)
+        legacy, t_legacy = timed(legacy_fuse, events)
+        fused, t_fused = timed(lambda: fuse_events(query_events(store, events=LEGACY_EVENTS), LEGACY_EVENTS).collect())
+        keys = ["ticker", "date", "event_types", "num_events"]
+        ok = legacy.select(keys).equals(fused.select(keys))
+        ok_all &= ok
+        print(f"watchlist keys legacy == store: {'OK' if ok else 'FAIL'} ({fused.height:,} rows)")
+        ok_details = True
+        # E4: legacy keeps an arbitrary window per (ticker, date_start), the store the shortest one,
+        # so only E1/E7/E8 values are compared
+        for event_code in ["E1", "E7", "E8"]:
+            typed = pl.col("event_details").struct.field(event_code)
+            for name, src in LEGACY_FIELDS[event_code]:
+                if name in DATE_FIELDS:
+                    continue
+                a = legacy_field(legacy, event_code, name)
+                b = (fused.filter(typed.is_not_null())
+                     .select(["ticker", "date", typed.struct.field(src).cast(pl.Float64).alias(name)]))
+                # the string cast kept ~6 significant digits / 6 decimals
+                j = a.join(b, on=["ticker", "date"], how="full", coalesce=True, suffix="_typed")
+                same = a.height == b.height == j.height and j.select(
+                    ((pl.col(name) - pl.col(f"{name}_typed")).abs()
+                     <= 1e-4 * pl.col(f"{name}_typed").abs() + 1e-6).all()).item()
+                ok_details &= same
+                if not same:
+                    print(f"{event_code} {name}: legacy string value != typed value")
+        ok_all &= ok_details
+        print(f"watchlist details legacy (parsed) == store (typed): {'OK' if ok_details else 'FAIL'}")
+
+        # Pull one numeric field out of each watchlist
+        _, t_parse = timed(legacy_field, legacy, "E7", "extension_pct")
+        _, t_typed = timed(lambda: fused.select(
+            pl.col("event_details").struct.field("E7").struct.field("extension_pct")).drop_nulls())
+
+        # Ticker + date range query, both from disk (legacy: the watchlist file, no typed fields)
+        legacy_file = Path(tmp) / "multi_event_watchlist_legacy.parquet"
+        legacy.write_parquet(legacy_file)
+        tickers = [f"T{i:05d}" for i in range(0, args.tickers, 97)]
+        lo, hi = date(2008, 1, 1), date(2009, 12, 31)
+        q_legacy, t_q_legacy = timed(lambda: pl.scan_parquet(legacy_file).filter(
+            pl.col("ticker").is_in(tickers) & pl.col("date").is_between(lo, hi)).collect())
+        q_store, t_q_store = timed(lambda: query_events(store, tickers=tickers, start=lo, end=hi,
+                                                        events=LEGACY_EVENTS).collect())
+
+    print(f"store write (E1-E11, {sum(len(v) for v in events.values()):,} events): {t_write:.2f}s")
+    print(f"fuse E1/E4/E7/E8: legacy strings {t_legacy:.2f}s | store group-by {t_fused:.2f}s")
+    print(f"E7 extension_pct: parse strings {t_parse * 1000:.1f}ms | typed field {t_typed * 1000:.1f}ms")
+    print(f"{len(tickers)} tickers x {lo}..{hi}: legacy watchlist file {t_q_legacy * 1000:.1f}ms "
+          f"({q_legacy.height:,} rows) | store query {t_q_store * 1000:.1f}ms ({q_store.height:,} events)")
+    if not ok_all:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,8 +3,13 @@ Generate Daily OHLCV from 1-minute bars
 
 Purpose: Create daily_ohlcv.parquet files for event detectors E1, E4, E7, E8
 
-Input:  raw/polygon/ohlcv_intraday_1m/{TICKER}/date={YYYY-MM-DD}/ohlcv_1m.parquet
+Input:  raw/polygon/ohlcv_intraday_1m/{TICKER}/year={YYYY}/month={MM}/minute.parquet
 Output: processed/daily_ohlcv/{TICKER}/daily_ohlcv.parquet
+        or, with --consolidated, one file for all tickers: processed/daily_ohlcv/daily_ohlcv.parquet
+
+Aggregation: shared single-pass lazy engine (scripts/fase_C_ingesta_tiks/daily_agg.py): one
+scan over all minute files of a ticker and one group_by(date) with open/close at the first/last
+timestamp, max/min and sums.
 
 Schema Output:
 - ticker: str
@@ -22,10 +27,14 @@ Date: 2025-10-28
 import polars as pl
 from pathlib import Path
 import logging
+import sys
 from concurrent.futures import ProcessPoolExecutor, as_completed
 from typing import Optional
 import argparse
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "fase_C_ingesta_tiks"))
+from daily_agg import batches, daily_plan, daily_schema, list_tickers, write_consolidated
+
 logging.basicConfig(
     level=logging.INFO,
     format='[%(asctime)s] %(message)s',
@@ -33,6 +42,17 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+OHLCV_AGGS = ["o", "h", "l", "c", "v"]
+
+
+def daily_ohlcv_plan(bars_1m_root: Path, tickers: list[str], aggs: list[str] = OHLCV_AGGS) -> pl.LazyFrame:
+    """Daily bars of `tickers` as one lazy plan (ticker, date, *aggs; see daily_agg.DAILY_AGGS)"""
+    return (
+        daily_plan(bars_1m_root, tickers, aggs)
+        .rename({"trading_day": "date"})
+        .select(["ticker", "date", *aggs])
+    )
+
 
 def aggregate_ticker_to_daily(ticker_dir: Path, outdir: Path) -> dict:
     """
@@ -41,7 +61,7 @@ def aggregate_ticker_to_daily(ticker_dir: Path, outdir: Path) -> dict:
     Parameters:
     -----------
     ticker_dir : Path
-        Directory containing date={YYYY-MM-DD}/ohlcv_1m.parquet files
+        Directory containing year={YYYY}/month={MM}/minute.parquet files
     outdir : Path
         Output directory for daily_ohlcv.parquet
 
@@ -52,44 +72,11 @@ def aggregate_ticker_to_daily(ticker_dir: Path, outdir: Path) -> dict:
     ticker = ticker_dir.name
 
     try:
-        # Find all 1-min files
-        minute_files = list(ticker_dir.rglob('minute.parquet'))
+        df_daily = daily_ohlcv_plan(ticker_dir.parent, [ticker]).collect()
 
-        if len(minute_files) == 0:
+        if len(df_daily) == 0:
             return {"ticker": ticker, "status": "skip", "reason": "no_files", "days": 0}
 
-        # Load all days
-        df_list = []
-        for file in minute_files:
-            date_str = file.parent.name.split('=')[1]  # Extract YYYY-MM-DD
-
-            df_min = pl.read_parquet(file)
-
-            if len(df_min) == 0:
-                continue
-
-            # Sort by timestamp to ensure correct first/last minute
-            df_min = df_min.sort("t")
-
-            # Aggregate to daily
-            daily_row = {
-                "ticker": ticker,
-                "date": pl.lit(date_str).str.to_date(),
-                "o": df_min[0]["o"],  # First minute open
-                "h": df_min["h"].max(),  # Highest high
-                "l": df_min["l"].min(),  # Lowest low
-                "c": df_min[-1]["c"],  # Last minute close
-                "v": df_min["v"].sum(),  # Total volume
-            }
-
-            df_list.append(pl.DataFrame([daily_row]))
-
-        if len(df_list) == 0:
-            return {"ticker": ticker, "status": "skip", "reason": "no_data", "days": 0}
-
-        # Concatenate all days
-        df_daily = pl.concat(df_list).sort("date")
-
         # Save
         ticker_outdir = outdir / ticker
         ticker_outdir.mkdir(parents=True, exist_ok=True)
@@ -139,7 +126,7 @@ def process_all_tickers(
     """
 
     # Find all ticker directories
-    ticker_dirs = [d for d in bars_1m_root.iterdir() if d.is_dir()]
+    ticker_dirs = [bars_1m_root / t for t in list_tickers(bars_1m_root)]
 
     logger.info(f"Found {len(ticker_dirs)} tickers to process")
     logger.info(f"Output directory: {outdir}")
@@ -212,6 +199,32 @@ def process_all_tickers(
     logger.info("="*60)
 
 
+def build_consolidated(
+    bars_1m_root: Path,
+    outfile: Path,
+    batch_size: int = 200,
+    aggs: list[str] = OHLCV_AGGS
+) -> None:
+    """
+    One consolidated daily parquet for all tickers (sorted by ticker, date): tickers are
+    aggregated in batches of `batch_size`, one lazy plan per batch, and appended as row groups.
+    """
+    tickers = list_tickers(bars_1m_root)
+    logger.info(f"Found {len(tickers)} tickers to process -> {outfile}")
+    done = 0
+
+    def frames():
+        nonlocal done
+        for batch in batches(tickers, batch_size):
+            yield daily_ohlcv_plan(bars_1m_root, batch, aggs).collect()
+            done += len(batch)
+            logger.info(f"Progress: {done}/{len(tickers)} tickers")
+
+    schema = {("date" if c == "trading_day" else c): t for c, t in daily_schema(aggs).items()}
+    rows = write_consolidated(frames(), outfile, schema)
+    logger.info(f"Total days aggregated: {rows:,} -> {outfile}")
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Generate daily OHLCV from 1-minute bars for event detectors"
@@ -239,6 +252,17 @@ def main():
         action="store_true",
         help="Skip tickers with existing _SUCCESS markers"
     )
+    parser.add_argument(
+        "--consolidated",
+        action="store_true",
+        help="Write one consolidated <outdir>/daily_ohlcv.parquet (all tickers) instead of per-ticker files"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=200,
+        help="Tickers per lazy plan with --consolidated (default: 200)"
+    )
 
     args = parser.parse_args()
 
@@ -249,6 +273,10 @@ def main():
         logger.error(f"Input directory does not exist: {bars_1m_root}")
         return
 
+    if args.consolidated:
+        build_consolidated(bars_1m_root, outdir / "daily_ohlcv.parquet", args.batch_size)
+        return
+
     outdir.mkdir(parents=True, exist_ok=True)
 
     process_all_tickers(
@@ -4,6 +4,9 @@ Build Daily OHLCV from 1-Minute Bars
 Aggregates 1m bars (minute.parquet) to daily OHLCV resolution.
 This is the foundational dataset for event detectors E1, E4, E7, E8.
 
+Same single-pass lazy engine as build_daily_ohlcv.py (scripts/fase_C_ingesta_tiks/daily_agg.py),
+plus trades (n) and dollar volume. --consolidated writes one <outdir>/daily.parquet for all tickers.
+
 Why we need this:
 - Event detectors operate at "day resolution" (E7: first red day, E8: gap down)
 - They need real OHLCV: open (first minute), high/low (intraday extremes), close (last minute)
@@ -32,6 +35,8 @@ from concurrent.futures import ProcessPoolExecutor, as_completed
 from tqdm import tqdm
 import logging
 
+from build_daily_ohlcv import OHLCV_AGGS, build_consolidated, daily_ohlcv_plan, list_tickers
+
 logging.basicConfig(
     level=logging.INFO,
     format='[%(asctime)s] %(message)s',
@@ -39,6 +44,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+DAILY_AGGS = OHLCV_AGGS + ["n", "dollar"]  # dollar = sum(v*c)
+
 
 def process_ticker(ticker_dir: Path, outdir: Path) -> dict:
     """
@@ -54,61 +61,11 @@ def process_ticker(ticker_dir: Path, outdir: Path) -> dict:
     ticker = ticker_dir.name
 
     try:
-        # Find all minute.parquet files for this ticker
-        minute_files = list(ticker_dir.rglob('minute.parquet'))
-
-        if len(minute_files) == 0:
-            return {"ticker": ticker, "status": "skip", "days": 0, "reason": "no_minute_files"}
-
-        # Read and concatenate all minute files
-        dfs = []
-        for file in minute_files:
-            df = pl.read_parquet(file)
-            dfs.append(df)
-
-        df_all = pl.concat(dfs)
-
-        if len(df_all) == 0:
-            return {"ticker": ticker, "status": "skip", "days": 0, "reason": "empty"}
-
-        # Aggregate to daily
-        # CRITICAL: Order by timestamp within each day to get correct open/close
-        df_daily = (
-            df_all
-            .sort(["date", "t"])  # Sort by date first, then timestamp
-            .group_by("date")
-            .agg([
-                # Open: o of the row with minimum t (first minute)
-                pl.col("o").first().alias("o"),
-
-                # High: maximum of all h values
-                pl.col("h").max().alias("h"),
-
-                # Low: minimum of all l values
-                pl.col("l").min().alias("l"),
-
-                # Close: c of the row with maximum t (last minute)
-                pl.col("c").last().alias("c"),
-
-                # Volume: sum of all v
-                pl.col("v").sum().alias("v"),
-
-                # Trades: sum of all n
-                pl.col("n").sum().alias("n"),
-
-                # Dollar volume: sum(v * c)
-                (pl.col("v") * pl.col("c")).sum().alias("dollar"),
-            ])
-            .with_columns([
-                pl.lit(ticker).alias("ticker"),
-                pl.col("date").str.to_date().alias("date")
-            ])
-            .select(["ticker", "date", "o", "h", "l", "c", "v", "n", "dollar"])
-            .sort("date")
-        )
+        # One scan over all minute files + one group_by(date); open/close by timestamp
+        df_daily = daily_ohlcv_plan(ticker_dir.parent, [ticker], DAILY_AGGS).collect()
 
         if len(df_daily) == 0:
-            return {"ticker": ticker, "status": "skip", "days": 0, "reason": "no_days_after_agg"}
+            return {"ticker": ticker, "status": "skip", "days": 0, "reason": "no_minute_files"}
 
         # Save output
         ticker_outdir = outdir / ticker
@@ -158,6 +115,10 @@ Output schema per ticker (processed/daily_ohlcv/<TICKER>/daily.parquet):
                         help="Number of parallel workers (default: 8)")
     parser.add_argument("--resume", action="store_true",
                         help="Skip tickers that already have _SUCCESS marker")
+    parser.add_argument("--consolidated", action="store_true",
+                        help="Write one <outdir>/daily.parquet (all tickers) instead of per-ticker files")
+    parser.add_argument("--batch-size", type=int, default=200,
+                        help="Tickers per lazy plan with --consolidated (default: 200)")
 
     args = parser.parse_args()
 
@@ -174,11 +135,12 @@ Output schema per ticker (processed/daily_ohlcv/<TICKER>/daily.parquet):
     logger.info(f"Resume:        {args.resume}")
     logger.info("")
 
+    if args.consolidated:
+        build_consolidated(intraday_root, outdir / "daily.parquet", args.batch_size, DAILY_AGGS)
+        return
+
     # Find all ticker directories (skip _batch_temp)
-    ticker_dirs = [
-        d for d in intraday_root.iterdir()
-        if d.is_dir() and d.name != '_batch_temp'
-    ]
+    ticker_dirs = [intraday_root / t for t in list_tickers(intraday_root)]
 
     logger.info(f"Found {len(ticker_dirs):,} ticker directories")
 
@@ -13,11 +13,15 @@ Author: Pipeline automation
 Date: 2025-10-28
 """
 
+import inspect
+import json
+import os
+import shutil
 import polars as pl
 import numpy as np
 from pathlib import Path
 from typing import Optional, Literal
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import logging
 
 logging.basicConfig(
@@ -28,6 +32,93 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def _run_id(flag: pl.Expr) -> pl.Expr:
+    """
+    Globally unique run id over a frame sorted by [ticker, date]: increments on every row where
+    `flag` is False and on each ticker's first row, so a run of True rows shares its id with the
+    row that precedes it and never spans two tickers. Plain cum_sum, no per-ticker window.
+    """
+    new_ticker = pl.col("ticker").ne_missing(pl.col("ticker").shift(1))
+    return (~flag.fill_null(False) | new_ticker).cum_sum()
+
+
+def _run_length(flag: pl.Expr) -> pl.Expr:
+    """
+    Length of the current run of consecutive True rows of `flag` per ticker (0 on False rows),
+    frame sorted by [ticker, date]: row index minus the forward-filled index of the last False
+    row (or of the row before the ticker's first row). No window over ~millions of run groups.
+    """
+    flag = flag.fill_null(False)
+    idx = pl.int_range(pl.len(), dtype=pl.Int64)
+    new_ticker = pl.col("ticker").ne_missing(pl.col("ticker").shift(1))
+    anchor = pl.when(~flag).then(idx).when(new_ticker).then(idx - 1).forward_fill()
+    return pl.when(flag).then(idx - anchor).otherwise(0).cast(pl.Int32)
+
+
+def _sorted(df_daily: pl.DataFrame | pl.LazyFrame) -> pl.LazyFrame:
+    return df_daily.lazy().sort(["ticker", "date"])
+
+
+def _derive(lf: pl.LazyFrame, stages: list[dict[str, pl.Expr]]) -> pl.LazyFrame:
+    """
+    Add derived columns {name: expr} that `lf` does not have yet, one with_columns per stage
+    (a stage may use columns of earlier stages). Names carry their parameters (e.g.
+    _avg_vol_20), so a fused plan that already derived a column is not recomputed.
+    """
+    have = set(lf.collect_schema().names())
+    for stage in stages:
+        todo = [expr.alias(name) for name, expr in stage.items() if name not in have]
+        if todo:
+            lf = lf.with_columns(todo)
+            have.update(stage)
+    return lf
+
+
+def _merge_stages(*specs: list[dict[str, pl.Expr]]) -> list[dict[str, pl.Expr]]:
+    """Merge derived-column specs stage by stage (shared names are computed once)"""
+    merged: list[dict[str, pl.Expr]] = []
+    for stages in specs:
+        for i, stage in enumerate(stages):
+            if i == len(merged):
+                merged.append({})
+            merged[i].update(stage)
+    return merged
+
+
+# ==================== SHARED DERIVED COLUMNS ====================
+
+def _color_columns() -> list[dict[str, pl.Expr]]:
+    return [{
+        "_is_green": (pl.col("c") > pl.col("o")).cast(pl.Int32),
+        "_is_red": (pl.col("c") < pl.col("o")).cast(pl.Int32),
+    }]
+
+
+def _volume_columns(window_days: int) -> list[dict[str, pl.Expr]]:
+    avg_vol = f"_avg_vol_{window_days}"
+    return [
+        # Average volume over rolling window
+        {avg_vol: pl.col("v").rolling_mean(window_size=window_days).over("ticker")},
+        # RVOL = current volume / average volume
+        {f"_rvol_{window_days}": pl.col("v") / pl.col(avg_vol)},
+    ]
+
+
+def _gap_columns() -> list[dict[str, pl.Expr]]:
+    return [
+        {"_prev_close": pl.col("c").shift(1).over("ticker")},
+        {"_gap_pct": (pl.col("o") - pl.col("_prev_close")) / pl.col("_prev_close")},
+    ]
+
+
+def _prev_red_days_columns() -> list[dict[str, pl.Expr]]:
+    # Consecutive red days before the current day
+    return [
+        {"_red_run": _run_length(pl.col("c") < pl.col("o"))},
+        {"_prev_red_days": pl.col("_red_run").shift(1).over("ticker").fill_null(0)},
+    ]
+
+
 class EventDetector:
     """
     Unified event detection system for E1, E4, E7, E8
@@ -71,35 +162,34 @@ class EventDetector:
         """
         self.logger.info(f"Detecting E1 Volume Explosion (RVOL >= {rvol_threshold}x, window={window_days}d)")
 
-        df_events = (
-            df_daily
-            .sort(["ticker", "date"])
-            .with_columns([
-                # Average volume over rolling window
-                pl.col("v").rolling_mean(window_size=window_days).over("ticker").alias("avg_vol"),
-            ])
-            .with_columns([
-                # RVOL = current volume / average volume
-                (pl.col("v") / pl.col("avg_vol")).alias("rvol")
-            ])
+        df_events = self._e1_plan(_sorted(df_daily), rvol_threshold, window_days).collect()
+
+        self.logger.info(f"Found {len(df_events):,} E1 Volume Explosion events")
+        return df_events
+
+    @staticmethod
+    def _e1_columns(window_days: int, **_) -> list[dict[str, pl.Expr]]:
+        return _volume_columns(window_days)
+
+    def _e1_plan(self, lf: pl.LazyFrame, rvol_threshold: float, window_days: int) -> pl.LazyFrame:
+        avg_vol, rvol = f"_avg_vol_{window_days}", f"_rvol_{window_days}"
+        return (
+            _derive(lf, self._e1_columns(window_days))
             .filter(
-                (pl.col("rvol") >= rvol_threshold) &
-                (pl.col("avg_vol").is_not_null())  # Skip first N days
+                (pl.col(rvol) >= rvol_threshold) &
+                (pl.col(avg_vol).is_not_null())  # Skip first N days
             )
             .select([
                 "ticker",
                 "date",
                 pl.lit("E1_VolExplosion").alias("event_type"),
-                "rvol",
+                pl.col(rvol).alias("rvol"),
                 "v",
-                "avg_vol",
+                pl.col(avg_vol).alias("avg_vol"),
                 "c"  # Close price for reference
             ])
         )
 
-        self.logger.info(f"Found {len(df_events):,} E1 Volume Explosion events")
-        return df_events
-
     # ==================== E4: PARABOLIC MOVE ====================
 
     def detect_e4_parabolic_move(
@@ -126,43 +216,52 @@ class EventDetector:
         """
         self.logger.info(f"Detecting E4 Parabolic Move (>={pct_threshold*100}% in ≤{max_window_days} days) - VECTORIZED")
 
-        # Sort and add shifts for all windows
-        df = df_daily.sort(["ticker", "date"])
+        if max_window_days < 1:
+            df_events = pl.DataFrame()
+        else:
+            df_events = self._e4_plan(_sorted(df_daily), pct_threshold, max_window_days).collect()
 
-        events_list = []
+        self.logger.info(f"Found {len(df_events):,} E4 Parabolic Move events")
+        return df_events
 
+    @staticmethod
+    def _e4_columns(max_window_days: int, **_) -> list[dict[str, pl.Expr]]:
+        # Close/date `window` days ahead, for all windows
+        leads = {}
         for window in range(1, max_window_days + 1):
-            df_window = df.with_columns([
-                pl.col("date").alias("date_start"),
-                pl.col("o").alias("start_price"),
-                pl.col("date").shift(-window).over("ticker").alias("date_end"),
-                pl.col("c").shift(-window).over("ticker").alias("end_price"),
-                ((pl.col("c").shift(-window).over("ticker") / pl.col("o")) - 1).alias("pct_change"),
-                pl.lit(window).alias("days")
-            ]).filter(
-                (pl.col("pct_change") >= pct_threshold) &
-                (pl.col("pct_change").is_not_null())
-            ).select([
-                "ticker",
-                "date_start",
-                "date_end",
-                pl.lit("E4_Parabolic").alias("event_type"),
-                "pct_change",
-                "days",
-                "start_price",
-                "end_price"
-            ])
+            leads[f"_date_lead_{window}"] = pl.col("date").shift(-window).over("ticker")
+            leads[f"_c_lead_{window}"] = pl.col("c").shift(-window).over("ticker")
+        return [leads]
 
-            events_list.append(df_window)
+    def _e4_plan(self, lf: pl.LazyFrame, pct_threshold: float, max_window_days: int) -> pl.LazyFrame:
+        # Cached: every window filters the same derived frame
+        lf = _derive(lf, self._e4_columns(max_window_days)).cache()
 
-        # Concatenate all windows
-        if events_list:
-            df_events = pl.concat(events_list).sort(["ticker", "date_start", "days"])
-        else:
-            df_events = pl.DataFrame()
+        events_list = []
 
-        self.logger.info(f"Found {len(df_events):,} E4 Parabolic Move events")
-        return df_events
+        for window in range(1, max_window_days + 1):
+            end_price = pl.col(f"_c_lead_{window}")
+            pct_change = (end_price / pl.col("o")) - 1
+            events_list.append(
+                lf
+                .filter(
+                    (pct_change >= pct_threshold) &
+                    (pct_change.is_not_null())
+                )
+                .select([
+                    "ticker",
+                    pl.col("date").alias("date_start"),
+                    pl.col(f"_date_lead_{window}").alias("date_end"),
+                    pl.lit("E4_Parabolic").alias("event_type"),
+                    pct_change.alias("pct_change"),
+                    pl.lit(window).alias("days"),
+                    pl.col("o").alias("start_price"),
+                    end_price.alias("end_price")
+                ])
+            )
+
+        # Concatenate all windows
+        return pl.concat(events_list).sort(["ticker", "date_start", "days"])
 
     # ==================== E7: FIRST RED DAY (FRD) - MOST CRITICAL ====================
 
@@ -198,70 +297,61 @@ class EventDetector:
         """
         self.logger.info(f"Detecting E7 First Red Day (≥{min_run_days} greens, ≥{min_extension_pct*100}% extension)")
 
-        df = (
-            df_daily
-            .sort(["ticker", "date"])
+        df_events = self._e7_plan(_sorted(df_daily), min_run_days, min_extension_pct).collect()
+
+        self.logger.info(f"Found {len(df_events):,} E7 First Red Day events")
+        return df_events
+
+    @staticmethod
+    def _e7_columns(**_) -> list[dict[str, pl.Expr]]:
+        return _merge_stages(_color_columns(), [{
+            "_new_ticker": pl.col("ticker").ne_missing(pl.col("ticker").shift(1)),
+            "_green_run_id": _run_id(pl.col("c") > pl.col("o")),
+        }])
+
+    def _e7_plan(self, lf: pl.LazyFrame, min_run_days: int, min_extension_pct: float) -> pl.LazyFrame:
+        # Vectorized over the whole frame: each green run shares a run id with the day before it
+        # (see _run_id), so one group_by over the green rows gives every run's length, start
+        # open/date and peak high. The red day that ends a run has run_id + 1 (rows where the
+        # ticker changes are excluded).
+        lf = _derive(lf, self._e7_columns()).cache()
+
+        runs = (
+            lf
+            .filter(pl.col("_is_green") == 1)
+            .group_by("_green_run_id")
+            .agg([
+                pl.len().cast(pl.Int64).alias("run_days"),
+                pl.col("date").first().alias("run_start_date"),
+                pl.col("o").first().alias("run_start_price"),
+                pl.col("h").max().alias("peak_price"),
+            ])
+            .filter(pl.col("run_days") >= min_run_days)
             .with_columns([
-                (pl.col("c") > pl.col("o")).alias("is_green"),
-                (pl.col("c") < pl.col("o")).alias("is_red"),
+                (pl.col("_green_run_id") + 1).alias("_green_run_id"),
+                ((pl.col("peak_price") - pl.col("run_start_price")) / pl.col("run_start_price")).alias("extension_pct")
             ])
+            .filter(pl.col("extension_pct") >= min_extension_pct)
         )
 
-        events = []
-
-        for ticker in df["ticker"].unique():
-            df_ticker = df.filter(pl.col("ticker") == ticker).sort("date")
-
-            green_run_days = 0
-            run_start_price = None
-            run_start_date = None
-            run_high = None
-
-            for idx, row in enumerate(df_ticker.iter_rows(named=True)):
-                if row["is_green"]:
-                    if green_run_days == 0:
-                        run_start_price = row["o"]  # Open of first green day
-                        run_start_date = row["date"]
-                        run_high = row["h"]
-                    else:
-                        run_high = max(run_high, row["h"])  # Track highest high
-
-                    green_run_days += 1
-
-                elif row["is_red"] and green_run_days >= min_run_days:
-                    # Calculate extension from start to peak
-                    extension_pct = (run_high - run_start_price) / run_start_price
-
-                    if extension_pct >= min_extension_pct:
-                        events.append({
-                            "ticker": ticker,
-                            "date": row["date"],
-                            "event_type": "E7_FirstRedDay",
-                            "run_days": green_run_days,
-                            "run_start_date": run_start_date,
-                            "extension_pct": extension_pct,
-                            "peak_price": run_high,
-                            "frd_open": row["o"],
-                            "frd_close": row["c"],
-                            "frd_low": row["l"]
-                        })
-
-                    # Reset counter
-                    green_run_days = 0
-                    run_start_price = None
-                    run_start_date = None
-                    run_high = None
-
-                else:
-                    # Other day type or red without sufficient run - reset
-                    green_run_days = 0
-                    run_start_price = None
-                    run_start_date = None
-                    run_high = None
-
-        df_events = pl.DataFrame(events) if events else pl.DataFrame()
-        self.logger.info(f"Found {len(df_events):,} E7 First Red Day events")
-        return df_events
+        return (
+            lf
+            .filter((pl.col("_is_red") == 1) & ~pl.col("_new_ticker"))
+            .join(runs, on="_green_run_id", how="inner")
+            .sort(["ticker", "date"])
+            .select([
+                "ticker",
+                "date",
+                pl.lit("E7_FirstRedDay").alias("event_type"),
+                "run_days",
+                "run_start_date",
+                "extension_pct",
+                "peak_price",
+                pl.col("o").alias("frd_open"),
+                pl.col("c").alias("frd_close"),
+                pl.col("l").alias("frd_low")
+            ])
+        )
 
     # ==================== E8: GAP DOWN VIOLENT ====================
 
@@ -286,25 +376,28 @@ class EventDetector:
         """
         self.logger.info(f"Detecting E8 Gap Down Violent (gap <= {gap_threshold*100}%)")
 
-        df_events = (
-            df_daily
-            .sort(["ticker", "date"])
-            .with_columns([
-                pl.col("c").shift(1).over("ticker").alias("prev_close")
-            ])
-            .with_columns([
-                ((pl.col("o") - pl.col("prev_close")) / pl.col("prev_close")).alias("gap_pct")
-            ])
+        df_events = self._e8_plan(_sorted(df_daily), gap_threshold).collect()
+
+        self.logger.info(f"Found {len(df_events):,} E8 Gap Down Violent events")
+        return df_events
+
+    @staticmethod
+    def _e8_columns(**_) -> list[dict[str, pl.Expr]]:
+        return _gap_columns()
+
+    def _e8_plan(self, lf: pl.LazyFrame, gap_threshold: float) -> pl.LazyFrame:
+        return (
+            _derive(lf, self._e8_columns())
             .filter(
-                (pl.col("gap_pct") <= gap_threshold) &
-                (pl.col("prev_close").is_not_null())
+                (pl.col("_gap_pct") <= gap_threshold) &
+                (pl.col("_prev_close").is_not_null())
             )
             .select([
                 "ticker",
                 "date",
                 pl.lit("E8_GapDownViolent").alias("event_type"),
-                "gap_pct",
-                "prev_close",
+                pl.col("_gap_pct").alias("gap_pct"),
+                pl.col("_prev_close").alias("prev_close"),
                 "o",
                 "h",
                 "l",
@@ -313,9 +406,6 @@ class EventDetector:
             ])
         )
 
-        self.logger.info(f"Found {len(df_events):,} E8 Gap Down Violent events")
-        return df_events
-
     # ==================== E2: GAP UP SIGNIFICANT ====================
 
     def detect_e2_gap_up(
@@ -339,25 +429,28 @@ class EventDetector:
         """
         self.logger.info(f"Detecting E2 Gap Up (gap >= {gap_threshold*100}%)")
 
-        df_events = (
-            df_daily
-            .sort(["ticker", "date"])
-            .with_columns([
-                pl.col("c").shift(1).over("ticker").alias("prev_close")
-            ])
-            .with_columns([
-                ((pl.col("o") - pl.col("prev_close")) / pl.col("prev_close")).alias("gap_pct")
-            ])
+        df_events = self._e2_plan(_sorted(df_daily), gap_threshold).collect()
+
+        self.logger.info(f"Found {len(df_events):,} E2 Gap Up events")
+        return df_events
+
+    @staticmethod
+    def _e2_columns(**_) -> list[dict[str, pl.Expr]]:
+        return _gap_columns()
+
+    def _e2_plan(self, lf: pl.LazyFrame, gap_threshold: float) -> pl.LazyFrame:
+        return (
+            _derive(lf, self._e2_columns())
             .filter(
-                (pl.col("gap_pct") >= gap_threshold) &
-                (pl.col("prev_close").is_not_null())
+                (pl.col("_gap_pct") >= gap_threshold) &
+                (pl.col("_prev_close").is_not_null())
             )
             .select([
                 "ticker",
                 "date",
                 pl.lit("E2_GapUp").alias("event_type"),
-                "gap_pct",
-                "prev_close",
+                pl.col("_gap_pct").alias("gap_pct"),
+                pl.col("_prev_close").alias("prev_close"),
                 "o",
                 "h",
                 "l",
@@ -366,9 +459,6 @@ class EventDetector:
             ])
         )
 
-        self.logger.info(f"Found {len(df_events):,} E2 Gap Up events")
-        return df_events
-
     # ==================== E3: PRICE SPIKE INTRADAY ====================
 
     def detect_e3_price_spike_intraday(
@@ -395,20 +485,28 @@ class EventDetector:
         """
         self.logger.info(f"Detecting E3 Price Spike Intraday (>={spike_threshold*100}% intraday) - APPROXIMATION")
 
-        df_events = (
-            df_daily
-            .with_columns([
-                ((pl.col("h") - pl.col("o")) / pl.col("o")).alias("spike_pct")
-            ])
+        # No sort needed (per-row measure)
+        df_events = self._e3_plan(df_daily.lazy(), spike_threshold).collect()
+
+        self.logger.info(f"Found {len(df_events):,} E3 Price Spike Intraday events")
+        return df_events
+
+    @staticmethod
+    def _e3_columns(**_) -> list[dict[str, pl.Expr]]:
+        return [{"_spike_pct": (pl.col("h") - pl.col("o")) / pl.col("o")}]
+
+    def _e3_plan(self, lf: pl.LazyFrame, spike_threshold: float) -> pl.LazyFrame:
+        return (
+            _derive(lf, self._e3_columns())
             .filter(
-                (pl.col("spike_pct") >= spike_threshold) &
+                (pl.col("_spike_pct") >= spike_threshold) &
                 (pl.col("o") > 0)
             )
             .select([
                 "ticker",
                 "date",
                 pl.lit("E3_PriceSpikeIntraday").alias("event_type"),
-                "spike_pct",
+                pl.col("_spike_pct").alias("spike_pct"),
                 pl.lit(False).alias("intraday_confirmed"),
                 "o",
                 "h",
@@ -418,9 +516,6 @@ class EventDetector:
             ])
         )
 
-        self.logger.info(f"Found {len(df_events):,} E3 Price Spike Intraday events")
-        return df_events
-
     # ==================== E5: BREAKOUT ATH/52W ====================
 
     def detect_e5_breakout_ath(
@@ -444,22 +539,31 @@ class EventDetector:
         """
         self.logger.info(f"Detecting E5 Breakout ATH (lookback={lookback_days}d)")
 
-        df_events = (
-            df_daily
-            .sort(["ticker", "date"])
-            .with_columns([
-                pl.col("c").rolling_max(window_size=lookback_days).over("ticker").shift(1).alias("prev_high")
-            ])
+        df_events = self._e5_plan(_sorted(df_daily), lookback_days).collect()
+
+        self.logger.info(f"Found {len(df_events):,} E5 Breakout ATH events")
+        return df_events
+
+    @staticmethod
+    def _e5_columns(lookback_days: int, **_) -> list[dict[str, pl.Expr]]:
+        return [{
+            f"_prev_high_{lookback_days}": pl.col("c").rolling_max(window_size=lookback_days).shift(1).over("ticker")
+        }]
+
+    def _e5_plan(self, lf: pl.LazyFrame, lookback_days: int) -> pl.LazyFrame:
+        prev_high = f"_prev_high_{lookback_days}"
+        return (
+            _derive(lf, self._e5_columns(lookback_days))
             .filter(
-                (pl.col("c") >= pl.col("prev_high")) &
-                (pl.col("prev_high").is_not_null())
+                (pl.col("c") >= pl.col(prev_high)) &
+                (pl.col(prev_high).is_not_null())
             )
             .select([
                 "ticker",
                 "date",
                 pl.lit("E5_BreakoutATH").alias("event_type"),
                 "c",
-                "prev_high",
+                pl.col(prev_high).alias("prev_high"),
                 "o",
                 "h",
                 "l",
@@ -467,9 +571,6 @@ class EventDetector:
             ])
         )
 
-        self.logger.info(f"Found {len(df_events):,} E5 Breakout ATH events")
-        return df_events
-
     # ==================== E6: MULTIPLE GREEN DAYS ====================
 
     def detect_e6_multiple_green_days(
@@ -493,42 +594,28 @@ class EventDetector:
         """
         self.logger.info(f"Detecting E6 Multiple Green Days (>={min_green_days} consecutive)")
 
-        # Identify green days
-        df = (
-            df_daily
-            .sort(["ticker", "date"])
-            .with_columns([
-                (pl.col("c") > pl.col("o")).cast(pl.Int32).alias("is_green")
-            ])
-        )
-
-        # Count consecutive green days using cumulative sum trick
-        df = df.with_columns([
-            # Lag is_green to detect changes
-            pl.col("is_green").shift(1).over("ticker").alias("prev_is_green")
-        ])
+        df_events = self._e6_plan(_sorted(df_daily), min_green_days).collect()
 
-        df = df.with_columns([
-            # Create groups where is_green changes
-            (pl.col("is_green") != pl.col("prev_is_green")).cast(pl.Int32).cum_sum().over("ticker").alias("green_group")
-        ])
+        self.logger.info(f"Found {len(df_events):,} E6 Multiple Green Days events")
+        return df_events
 
-        # Count consecutive greens per group
-        df = df.with_columns([
-            pl.col("is_green").cum_sum().over(["ticker", "green_group"]).alias("green_days_count")
-        ])
+    @staticmethod
+    def _e6_columns(**_) -> list[dict[str, pl.Expr]]:
+        # Green days and consecutive green count (run-length per ticker)
+        return _merge_stages(_color_columns(), [{"_green_run": _run_length(pl.col("c") > pl.col("o"))}])
 
-        df_events = (
-            df
+    def _e6_plan(self, lf: pl.LazyFrame, min_green_days: int) -> pl.LazyFrame:
+        return (
+            _derive(lf, self._e6_columns())
             .filter(
-                (pl.col("is_green") == 1) &
-                (pl.col("green_days_count") >= min_green_days)
+                (pl.col("_is_green") == 1) &
+                (pl.col("_green_run") >= min_green_days)
             )
             .select([
                 "ticker",
                 "date",
                 pl.lit("E6_MultipleGreenDays").alias("event_type"),
-                "green_days_count",
+                pl.col("_green_run").alias("green_days_count"),
                 "o",
                 "h",
                 "l",
@@ -537,9 +624,6 @@ class EventDetector:
             ])
         )
 
-        self.logger.info(f"Found {len(df_events):,} E6 Multiple Green Days events")
-        return df_events
-
     # ==================== E9: CRASH INTRADAY ====================
 
     def detect_e9_crash_intraday(
@@ -566,20 +650,28 @@ class EventDetector:
         """
         self.logger.info(f"Detecting E9 Crash Intraday (<={crash_threshold*100}% intraday) - APPROXIMATION")
 
-        df_events = (
-            df_daily
-            .with_columns([
-                ((pl.col("l") - pl.col("o")) / pl.col("o")).alias("crash_pct")
-            ])
+        # No sort needed (per-row measure)
+        df_events = self._e9_plan(df_daily.lazy(), crash_threshold).collect()
+
+        self.logger.info(f"Found {len(df_events):,} E9 Crash Intraday events")
+        return df_events
+
+    @staticmethod
+    def _e9_columns(**_) -> list[dict[str, pl.Expr]]:
+        return [{"_crash_pct": (pl.col("l") - pl.col("o")) / pl.col("o")}]
+
+    def _e9_plan(self, lf: pl.LazyFrame, crash_threshold: float) -> pl.LazyFrame:
+        return (
+            _derive(lf, self._e9_columns())
             .filter(
-                (pl.col("crash_pct") <= crash_threshold) &
+                (pl.col("_crash_pct") <= crash_threshold) &
                 (pl.col("o") > 0)
             )
             .select([
                 "ticker",
                 "date",
                 pl.lit("E9_CrashIntraday").alias("event_type"),
-                "crash_pct",
+                pl.col("_crash_pct").alias("crash_pct"),
                 pl.lit(False).alias("intraday_confirmed"),
                 "o",
                 "h",
@@ -589,9 +681,6 @@ class EventDetector:
             ])
         )
 
-        self.logger.info(f"Found {len(df_events):,} E9 Crash Intraday events")
-        return df_events
-
     # ==================== E10: FIRST GREEN DAY BOUNCE ====================
 
     def detect_e10_first_green_bounce(
@@ -615,47 +704,27 @@ class EventDetector:
         """
         self.logger.info(f"Detecting E10 First Green Day Bounce (after >={min_red_days} red days)")
 
-        # Identify green/red days
-        df = (
-            df_daily
-            .sort(["ticker", "date"])
-            .with_columns([
-                (pl.col("c") > pl.col("o")).cast(pl.Int32).alias("is_green"),
-                (pl.col("c") < pl.col("o")).cast(pl.Int32).alias("is_red")
-            ])
-        )
-
-        # Count consecutive red days before current day
-        df = df.with_columns([
-            # Lag is_red to detect changes
-            pl.col("is_red").shift(1).over("ticker").alias("prev_is_red")
-        ])
+        df_events = self._e10_plan(_sorted(df_daily), min_red_days).collect()
 
-        df = df.with_columns([
-            # Group red streaks
-            (pl.col("is_red") != pl.col("prev_is_red")).cast(pl.Int32).cum_sum().over("ticker").alias("red_group")
-        ])
-
-        df = df.with_columns([
-            pl.col("is_red").cum_sum().over(["ticker", "red_group"]).alias("red_count")
-        ])
+        self.logger.info(f"Found {len(df_events):,} E10 First Green Day Bounce events")
+        return df_events
 
-        # Shift red_count to get previous streak length
-        df = df.with_columns([
-            pl.col("red_count").shift(1).over("ticker").fill_null(0).alias("prev_red_days")
-        ])
+    @staticmethod
+    def _e10_columns(**_) -> list[dict[str, pl.Expr]]:
+        return _merge_stages(_color_columns(), _prev_red_days_columns())
 
-        df_events = (
-            df
+    def _e10_plan(self, lf: pl.LazyFrame, min_red_days: int) -> pl.LazyFrame:
+        return (
+            _derive(lf, self._e10_columns())
             .filter(
-                (pl.col("is_green") == 1) &
-                (pl.col("prev_red_days") >= min_red_days)
+                (pl.col("_is_green") == 1) &
+                (pl.col("_prev_red_days") >= min_red_days)
             )
             .select([
                 "ticker",
                 "date",
                 pl.lit("E10_FirstGreenBounce").alias("event_type"),
-                "prev_red_days",
+                pl.col("_prev_red_days").alias("prev_red_days"),
                 "o",
                 "h",
                 "l",
@@ -664,9 +733,6 @@ class EventDetector:
             ])
         )
 
-        self.logger.info(f"Found {len(df_events):,} E10 First Green Day Bounce events")
-        return df_events
-
     # ==================== E11: VOLUME SPIKE ON BOUNCE ====================
 
     def detect_e11_volume_bounce(
@@ -695,54 +761,34 @@ class EventDetector:
         """
         self.logger.info(f"Detecting E11 Volume Spike on Bounce (RVOL>={rvol_threshold}x, post-decline)")
 
-        # Calculate RVOL and identify red/green days
-        df = (
-            df_daily
-            .sort(["ticker", "date"])
-            .with_columns([
-                pl.col("v").rolling_mean(window_size=window_days).over("ticker").alias("avg_vol"),
-                (pl.col("c") > pl.col("o")).cast(pl.Int32).alias("is_green"),
-                (pl.col("c") < pl.col("o")).cast(pl.Int32).alias("is_red")
-            ])
-            .with_columns([
-                (pl.col("v") / pl.col("avg_vol")).alias("rvol")
-            ])
-        )
-
-        # Count previous red days (same logic as E10)
-        df = df.with_columns([
-            # Lag is_red to detect changes
-            pl.col("is_red").shift(1).over("ticker").alias("prev_is_red")
-        ])
-
-        df = df.with_columns([
-            (pl.col("is_red") != pl.col("prev_is_red")).cast(pl.Int32).cum_sum().over("ticker").alias("red_group")
-        ])
+        df_events = self._e11_plan(_sorted(df_daily), rvol_threshold, window_days).collect()
 
-        df = df.with_columns([
-            pl.col("is_red").cum_sum().over(["ticker", "red_group"]).alias("red_count")
-        ])
+        self.logger.info(f"Found {len(df_events):,} E11 Volume Spike on Bounce events")
+        return df_events
 
-        df = df.with_columns([
-            pl.col("red_count").shift(1).over("ticker").fill_null(0).alias("prev_red_days")
-        ])
+    @staticmethod
+    def _e11_columns(window_days: int, **_) -> list[dict[str, pl.Expr]]:
+        # RVOL, green days and previous red days (same logic as E10)
+        return _merge_stages(_volume_columns(window_days), _color_columns(), _prev_red_days_columns())
 
-        df_events = (
-            df
+    def _e11_plan(self, lf: pl.LazyFrame, rvol_threshold: float, window_days: int) -> pl.LazyFrame:
+        avg_vol, rvol = f"_avg_vol_{window_days}", f"_rvol_{window_days}"
+        return (
+            _derive(lf, self._e11_columns(window_days))
             .filter(
-                (pl.col("rvol") >= rvol_threshold) &
-                (pl.col("is_green") == 1) &
-                (pl.col("prev_red_days") >= 2) &  # At least 2 red days before
-                (pl.col("avg_vol").is_not_null())
+                (pl.col(rvol) >= rvol_threshold) &
+                (pl.col("_is_green") == 1) &
+                (pl.col("_prev_red_days") >= 2) &  # At least 2 red days before
+                (pl.col(avg_vol).is_not_null())
             )
             .select([
                 "ticker",
                 "date",
                 pl.lit("E11_VolumeBounce").alias("event_type"),
-                "rvol",
-                "prev_red_days",
+                pl.col(rvol).alias("rvol"),
+                pl.col("_prev_red_days").alias("prev_red_days"),
                 "v",
-                "avg_vol",
+                pl.col(avg_vol).alias("avg_vol"),
                 "o",
                 "h",
                 "l",
@@ -750,15 +796,28 @@ class EventDetector:
             ])
         )
 
-        self.logger.info(f"Found {len(df_events):,} E11 Volume Spike on Bounce events")
-        return df_events
-
     # ==================== UNIFIED DETECTION ====================
 
+    # Event -> detector method (fused mode uses the method's default parameters)
+    DETECTORS = {
+        "E1": "detect_e1_volume_explosion",
+        "E2": "detect_e2_gap_up",
+        "E3": "detect_e3_price_spike_intraday",
+        "E4": "detect_e4_parabolic_move",
+        "E5": "detect_e5_breakout_ath",
+        "E6": "detect_e6_multiple_green_days",
+        "E7": "detect_e7_first_red_day",
+        "E8": "detect_e8_gap_down",
+        "E9": "detect_e9_crash_intraday",
+        "E10": "detect_e10_first_green_bounce",
+        "E11": "detect_e11_volume_bounce",
+    }
+
     def detect_all_events(
         self,
         df_daily: pl.DataFrame,
-        events: list[Literal["E1", "E2", "E3", "E4", "E5", "E6", "E7", "E8", "E9", "E10", "E11"]] = ["E1", "E4", "E7", "E8"]
+        events: list[Literal["E1", "E2", "E3", "E4", "E5", "E6", "E7", "E8", "E9", "E10", "E11"]] = ["E1", "E4", "E7", "E8"],
+        fused: bool = False
     ) -> dict[str, pl.DataFrame]:
         """
         Detect all specified events in one call
@@ -769,11 +828,73 @@ class EventDetector:
             Daily OHLCV data
         events : list
             List of events to detect (default: E1, E4, E7, E8)
+        fused : bool
+            Single lazy plan: one sort and every shared derived column (prev close, rolling
+            volume, green/red runs, ...) computed once, then all event predicates evaluated on
+            it (default: False = one detector after another)
 
         Returns:
         --------
         dict with keys E1-E11 containing respective DataFrames
         """
+        if fused:
+            results = self._detect_fused(df_daily, events)
+        else:
+            results = self._detect_sequential(df_daily, events)
+
+        # Summary
+        total_events = sum(len(df) for df in results.values())
+        self.logger.info(f"Total events detected: {total_events:,}")
+        for event_type, df in results.items():
+            self.logger.info(f"  {event_type}: {len(df):,}")
+
+        return results
+
+    def _default_params(self, event_type: str) -> dict:
+        method = getattr(self, self.DETECTORS[event_type])
+        return {k: p.default for k, p in inspect.signature(method).parameters.items() if k != "df_daily"}
+
+    def lookback_rows(self, events: list[str]) -> int:
+        """
+        Rows of history per ticker the windowed detectors need before a new day (rolling volume,
+        252d high, E4 forward window, prev close). Run-length detectors (E6/E7/E10/E11) need the
+        whole trailing run on top of this, see _tail().
+        """
+        rows = 1
+        for event_type in events:
+            params = self._default_params(event_type)
+            rows = max(rows, *(params.get(k, 0) for k in ("window_days", "lookback_days", "max_window_days")))
+        return rows
+
+    def _detect_fused(self, df_daily: pl.DataFrame, events: list[str]) -> dict[str, pl.DataFrame]:
+        """
+        One query for all events. The sorted frame with the union of derived columns is a cached
+        subplan; each event plan filters/selects from it and its rows are packed in a struct
+        column, so the diagonal concat of all plans is collected once and then unpacked.
+        E3/E9 rows come out sorted by (ticker, date) instead of input order. Faster than
+        sequential, but peak memory is higher: all derived columns are alive at once
+        (benchmark_detect_all.py).
+        """
+        specs = []
+        for event_type in self.DETECTORS:
+            if event_type not in events:
+                continue
+            params = self._default_params(event_type)
+            columns = getattr(self, f"_{event_type.lower()}_columns")(**params)
+            plan = getattr(self, f"_{event_type.lower()}_plan")
+            specs.append((event_type, columns, plan, params))
+
+        self.logger.info(f"Detecting {', '.join(e for e, _, _, _ in specs)} in one fused plan")
+        base = _derive(_sorted(df_daily), _merge_stages(*[columns for _, columns, _, _ in specs])).cache()
+        packed = pl.concat(
+            [plan(base, **params).select(pl.struct(pl.all()).alias(event_type))
+             for event_type, _, plan, params in specs],
+            how="diagonal"
+        ).collect()
+        return {event_type: packed.get_column(event_type).drop_nulls().struct.unnest()
+                for event_type, _, _, _ in specs}
+
+    def _detect_sequential(self, df_daily: pl.DataFrame, events: list[str]) -> dict[str, pl.DataFrame]:
         results = {}
 
         if "E1" in events:
@@ -809,15 +930,128 @@ class EventDetector:
         if "E11" in events:
             results["E11"] = self.detect_e11_volume_bounce(df_daily)
 
-        # Summary
-        total_events = sum(len(df) for df in results.values())
-        self.logger.info(f"Total events detected: {total_events:,}")
-        for event_type, df in results.items():
-            self.logger.info(f"  {event_type}: {len(df):,}")
-
         return results
 
 
+# ==================== INCREMENTAL DETECTION ====================
+
+STATE_DIR = "_state"
+DAILY_COLUMNS = ["ticker", "date", "o", "h", "l", "c", "v"]
+
+
+def event_partition_column(event_type: str) -> str:
+    """Date an event becomes known: E4 looks forward, so it is complete at date_end"""
+    return "date_end" if event_type == "E4" else "date"
+
+
+def read_events(outdir: Path, event_type: str) -> pl.DataFrame:
+    """All partitions of an incremental event output (<outdir>/events_eN/<date>=YYYY-MM-DD/)"""
+    root = Path(outdir) / f"events_{event_type.lower()}"
+    if not root.exists():
+        return pl.DataFrame()
+    return pl.read_parquet(root / "**" / "*.parquet", hive_partitioning=False)
+
+
+def _tail(frame: pl.DataFrame, rows: int) -> pl.DataFrame:
+    """
+    Per-ticker state carried to the next run: the last `rows` rows, extended back to the first
+    row of the trailing green/red run (run-length detectors count runs of any length).
+    """
+    return (
+        frame
+        .sort(["ticker", "date"])
+        .with_columns([
+            pl.int_range(pl.len(), 0, -1).over("ticker").alias("_from_end"),
+            _run_length(pl.col("c") > pl.col("o")).alias("_green_run"),
+            _run_length(pl.col("c") < pl.col("o")).alias("_red_run"),
+        ])
+        .filter(
+            pl.col("_from_end") <= pl.max_horizontal(
+                pl.lit(rows), pl.col("_green_run").last().over("ticker"), pl.col("_red_run").last().over("ticker")
+            ) + 1
+        )
+        .select(frame.columns)
+    )
+
+
+def detect_incremental(
+    detector: EventDetector,
+    daily: pl.LazyFrame,
+    outdir: Path,
+    events: list[str],
+    fused: bool = False
+) -> dict[str, int]:
+    """
+    Append-only detection: only days after the watermark in <outdir>/_state are processed,
+    on top of the per-ticker tail saved by the previous run, and the new events are written
+    to date partitions <outdir>/events_eN/<date>=YYYY-MM-DD/ (E4 by date_end). Runtime scales
+    with the new days; the result is the same as a full recompute (check_incremental_events.py).
+
+    State: _state/watermark.json {last_date, events, lookback_rows, tail} + the tail parquet it
+    names. Partitions are written before the watermark, so a crashed run is simply redone.
+
+    Returns:
+    --------
+    dict {event_type: new events written}
+    """
+    outdir = Path(outdir)
+    state = outdir / STATE_DIR
+    wm_path = state / "watermark.json"
+    wm = json.loads(wm_path.read_text()) if wm_path.exists() else None
+    if wm and wm["events"] != list(events):
+        raise ValueError(f"Incremental state in {state} was built for {wm['events']}, not {list(events)}: "
+                         f"rerun with --rebuild")
+    last = date.fromisoformat(wm["last_date"]) if wm else None
+
+    new = daily.select(DAILY_COLUMNS)
+    if last is not None:
+        new = new.filter(pl.col("date") > last)
+    df_new = new.collect()
+    if df_new.is_empty():
+        logger.info(f"No daily rows after watermark {last}: nothing to do")
+        return {}
+
+    tail = pl.read_parquet(state / wm["tail"]) if wm else df_new.clear()
+    frame = pl.concat([tail, df_new.cast(tail.schema)]) if wm else df_new
+    new_last = frame["date"].max()
+    logger.info(f"Incremental: {df_new['date'].n_unique()} new days ({last} -> {new_last}), "
+                f"{df_new.height:,} new rows + {tail.height:,} tail rows")
+
+    results = detector.detect_all_events(frame, events=events, fused=fused)
+
+    written = {}
+    for event_type, df_events in results.items():
+        col = event_partition_column(event_type)
+        if last is not None and len(df_events) > 0:
+            df_events = df_events.filter(pl.col(col) > last)
+        written[event_type] = len(df_events)
+        if len(df_events) > 0:
+            df_events.write_parquet(outdir / f"events_{event_type.lower()}", partition_by=col)
+        logger.info(f"  {event_type}: {len(df_events):,} new events")
+
+    # Tail + watermark: the watermark is replaced atomically and names its tail file
+    state.mkdir(parents=True, exist_ok=True)
+    rows = detector.lookback_rows(events)
+    tail_name = f"tail_{new_last.isoformat()}.parquet"
+    _tail(frame, rows).write_parquet(state / tail_name)
+    tmp = wm_path.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"last_date": new_last.isoformat(), "events": list(events),
+                               "lookback_rows": rows, "tail": tail_name}, indent=2))
+    os.replace(tmp, wm_path)
+    for p in state.glob("tail_*.parquet"):
+        if p.name != tail_name:
+            p.unlink()
+    return written
+
+
+def reset_incremental(outdir: Path):
+    """Drop incremental state and partitioned event outputs (not the legacy events_eN.parquet)"""
+    outdir = Path(outdir)
+    shutil.rmtree(outdir / STATE_DIR, ignore_errors=True)
+    for event_type in EventDetector.DETECTORS:
+        shutil.rmtree(outdir / f"events_{event_type.lower()}", ignore_errors=True)
+
+
 # ==================== CLI INTERFACE ====================
 
 def main():
@@ -845,8 +1079,34 @@ def main():
         default="E1,E4,E7,E8",
         help="Comma-separated list of events to detect (default: E1,E4,E7,E8). Available: E1-E11"
     )
+    parser.add_argument(
+        "--fused",
+        action="store_true",
+        help="Detect all events in one lazy plan (shared sort and derived columns)"
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only process days after the watermark in <outdir>/_state and append date-partitioned "
+             "events to <outdir>/events_eN/ (first run processes the full history)"
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="With --incremental: drop the incremental state and outputs and start from scratch"
+    )
 
     args = parser.parse_args()
+    events_to_detect = args.events.split(",")
+
+    if args.incremental:
+        outdir = Path(args.outdir)
+        if args.rebuild:
+            reset_incremental(outdir)
+        written = detect_incremental(EventDetector(), pl.scan_parquet(args.daily_cache), outdir,
+                                     events_to_detect, fused=args.fused)
+        logger.info(f"Incremental event detection completed: {sum(written.values()):,} new events")
+        return
 
     # Load daily data
     logger.info(f"Loading daily cache from: {args.daily_cache}")
@@ -855,8 +1115,7 @@ def main():
 
     # Detect events
     detector = EventDetector()
-    events_to_detect = args.events.split(",")
-    results = detector.detect_all_events(df_daily, events=events_to_detect)
+    results = detector.detect_all_events(df_daily, events=events_to_detect, fused=args.fused)
 
     # Save results
     outdir = Path(args.outdir)
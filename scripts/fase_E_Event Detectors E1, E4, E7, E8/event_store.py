@@ -0,0 +1,213 @@
+"""
+Typed columnar event store (E1-E11)
+
+One hive-partitioned parquet dataset for all detector outputs:
+
+    <store>/year=YYYY/event=EN/part-0.parquet
+
+Every event is stored with the same wide, nullable schema (STORE_SCHEMA): the shared keys
+(ticker, date) plus the union of the detector fields, null where an event does not have them.
+Fields keep the detector names and dtypes (rvol is the same column for E1 and E11, o/h/l/c/v for
+all bar-based events), so consumers read numbers directly instead of parsing JSON strings.
+
+- event / year live in the path: a filter on them prunes files before anything is opened
+  (event is read back as an Enum in detector order, year as Int16).
+- Files are sorted by ticker, date and written with statistics: ticker/date filters are pushed
+  down to row groups. ticker is dictionary-encoded by the parquet writer.
+- E4 is keyed by date_start (date_end is a field), like the multi-event watchlist.
+
+API:
+    write_event_store(store, {"E1": df_e1, ...})   replaces the partitions of the given events
+    query_events(store, tickers=, start=, end=, events=, columns=) -> LazyFrame
+    event_struct(event_type)                       struct expr of an event's own fields
+
+Usage:
+    python event_store.py --events-dir processed/events --store processed/events/store
+"""
+
+import os
+import shutil
+from datetime import date
+from pathlib import Path
+from typing import Iterable, Optional
+
+import polars as pl
+
+from event_detectors import EventDetector, logger, read_events
+
+EVENTS = list(EventDetector.DETECTORS)
+EVENT_DTYPE = pl.Enum(EVENTS)
+
+# Detector output fields per event (event_type dropped, E4 date_start stored as date)
+EVENT_FIELDS = {
+    "E1": ["rvol", "v", "avg_vol", "c"],
+    "E2": ["gap_pct", "prev_close", "o", "h", "l", "c", "v"],
+    "E3": ["spike_pct", "intraday_confirmed", "o", "h", "l", "c", "v"],
+    "E4": ["date_end", "pct_change", "days", "start_price", "end_price"],
+    "E5": ["c", "prev_high", "o", "h", "l", "v"],
+    "E6": ["green_days_count", "o", "h", "l", "c", "v"],
+    "E7": ["run_days", "run_start_date", "extension_pct", "peak_price", "frd_open", "frd_close", "frd_low"],
+    "E8": ["gap_pct", "prev_close", "o", "h", "l", "c", "v"],
+    "E9": ["crash_pct", "intraday_confirmed", "o", "h", "l", "c", "v"],
+    "E10": ["prev_red_days", "o", "h", "l", "c", "v"],
+    "E11": ["rvol", "prev_red_days", "v", "avg_vol", "o", "h", "l", "c"],
+}
+
+# Columns stored in the files (event/year come from the partition path)
+STORE_SCHEMA = {
+    "ticker": pl.Utf8,
+    "date": pl.Date,
+    "o": pl.Float64,
+    "h": pl.Float64,
+    "l": pl.Float64,
+    "c": pl.Float64,
+    "v": pl.Int64,
+    "rvol": pl.Float64,
+    "avg_vol": pl.Float64,
+    "gap_pct": pl.Float64,
+    "prev_close": pl.Float64,
+    "spike_pct": pl.Float64,
+    "crash_pct": pl.Float64,
+    "intraday_confirmed": pl.Boolean,
+    "prev_high": pl.Float64,
+    "date_end": pl.Date,
+    "pct_change": pl.Float64,
+    "days": pl.Int32,
+    "start_price": pl.Float64,
+    "end_price": pl.Float64,
+    "green_days_count": pl.Int32,
+    "prev_red_days": pl.Int32,
+    "run_days": pl.Int64,
+    "run_start_date": pl.Date,
+    "extension_pct": pl.Float64,
+    "peak_price": pl.Float64,
+    "frd_open": pl.Float64,
+    "frd_close": pl.Float64,
+    "frd_low": pl.Float64,
+}
+HIVE_SCHEMA = {"year": pl.Int16, "event": EVENT_DTYPE}
+
+PART_FILE = "part-0.parquet"
+
+
+def to_store_rows(event_type: str, df_events: pl.DataFrame) -> pl.DataFrame:
+    """Detector output -> STORE_SCHEMA rows (fields of other events are null)"""
+    if event_type == "E4":
+        df_events = df_events.rename({"date_start": "date"})
+    missing = [f for f in ["ticker", "date", *EVENT_FIELDS[event_type]] if f not in df_events.columns]
+    if missing:
+        raise ValueError(f"{event_type} events are missing columns {missing}")
+    return df_events.select([
+        pl.col(name).cast(dtype) if name in df_events.columns else pl.lit(None, dtype=dtype).alias(name)
+        for name, dtype in STORE_SCHEMA.items()
+    ])
+
+
+def write_event_store(store: Path, events: dict[str, pl.DataFrame]) -> dict[str, int]:
+    """
+    Replace the partitions of every event in `events` (other events are left untouched).
+    Each file is written to a tmp name and renamed; years an event no longer has are removed.
+
+    Returns:
+    --------
+    dict {event_type: rows written}
+    """
+    store = Path(store)
+    written = {}
+    for event_type, df_events in events.items():
+        rows = to_store_rows(event_type, df_events).sort(["ticker", "date", "days"], nulls_last=True)
+        years = set()
+        for (year,), part in rows.group_by(pl.col("date").dt.year(), maintain_order=True):
+            path = store / f"year={year}" / f"event={event_type}" / PART_FILE
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(PART_FILE + ".tmp")
+            part.write_parquet(tmp, compression="zstd", statistics=True, row_group_size=128 * 1024)
+            os.replace(tmp, path)
+            years.add(year)
+        for stale in store.glob(f"year=*/event={event_type}"):
+            if int(stale.parent.name[5:]) not in years:
+                shutil.rmtree(stale)
+        written[event_type] = rows.height
+    return written
+
+
+def scan_event_store(store: Path) -> pl.LazyFrame:
+    """Whole store as a LazyFrame: STORE_SCHEMA + year (Int16) + event (Enum)"""
+    files = list(Path(store).glob(f"year=*/event=*/{PART_FILE}"))
+    if not files:
+        return pl.LazyFrame(schema={**STORE_SCHEMA, **HIVE_SCHEMA})
+    return pl.scan_parquet(Path(store) / "**" / "*.parquet", hive_partitioning=True,
+                           hive_schema=HIVE_SCHEMA)
+
+
+def query_events(
+    store: Path,
+    tickers: Optional[Iterable[str]] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    events: Optional[Iterable[str]] = None,
+    columns: Optional[list[str]] = None
+) -> pl.LazyFrame:
+    """
+    Events by ticker set, date range [start, end] and event set. Event and year filters prune
+    partitions; ticker/date filters are pushed down to the parquet scan.
+
+    Parameters:
+    -----------
+    columns : extra columns to return besides ticker, date, event (default: all)
+    """
+    lf = scan_event_store(store)
+    if events is not None:
+        lf = lf.filter(pl.col("event").is_in(pl.Series(list(events), dtype=EVENT_DTYPE)))
+    if start is not None:
+        lf = lf.filter((pl.col("year") >= start.year) & (pl.col("date") >= start))
+    if end is not None:
+        lf = lf.filter((pl.col("year") <= end.year) & (pl.col("date") <= end))
+    if tickers is not None:
+        lf = lf.filter(pl.col("ticker").is_in(pl.Series(list(tickers), dtype=pl.Utf8)))
+    if columns is not None:
+        lf = lf.select(["ticker", "date", "event", *[c for c in columns if c not in ("ticker", "date", "event")]])
+    return lf
+
+
+def event_struct(event_type: str) -> pl.Expr:
+    """Struct of an event's own fields, e.g. pl.col('E7').struct.field('run_days') downstream"""
+    return pl.struct(EVENT_FIELDS[event_type]).alias(event_type)
+
+
+def load_detector_outputs(events_dir: Path, events: Iterable[str]) -> dict[str, pl.DataFrame]:
+    """
+    Detector outputs in `events_dir`: incremental partitions events_eN/ when present (kept current
+    by --incremental), otherwise the full-run file events_eN.parquet. Missing events are skipped.
+    """
+    events_dir = Path(events_dir)
+    out = {}
+    for event_type in events:
+        partitioned = events_dir / f"events_{event_type.lower()}"
+        legacy = events_dir / f"events_{event_type.lower()}.parquet"
+        if partitioned.is_dir():
+            out[event_type] = read_events(events_dir, event_type)
+        elif legacy.exists():
+            out[event_type] = pl.read_parquet(legacy)
+    return out
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build/refresh the typed event store from detector outputs")
+    parser.add_argument("--events-dir", default="processed/events",
+                        help="Directory with events_eN.parquet and/or events_eN/ partitions")
+    parser.add_argument("--store", default="processed/events/store")
+    parser.add_argument("--events", default=",".join(EVENTS), help="Comma-separated events (default: E1-E11)")
+    args = parser.parse_args()
+
+    outputs = load_detector_outputs(Path(args.events_dir), args.events.split(","))
+    written = write_event_store(Path(args.store), outputs)
+    for event_type, n in written.items():
+        logger.info(f"  {event_type}: {n:,} events")
+    logger.info(f"Event store {args.store}: {sum(written.values()):,} events")
+
+
+if __name__ == "__main__":
+    main()
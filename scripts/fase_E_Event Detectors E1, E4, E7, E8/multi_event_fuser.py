@@ -1,185 +1,98 @@
 """
-Multi-Event Fuser: Consolidate E1, E4, E7, E8 into single watchlist
+Multi-Event Fuser: Consolidate E1-E11 into single watchlist
 
-Combines individual event files into a unified watchlist where each (ticker, date)
-has all its detected events combined.
+Detector outputs are first written to the typed event store (event_store.py: one year/event
+partitioned parquet dataset, wide nullable schema). The watchlist is then a lazy group-by over
+that store, so each (ticker, date) gets all its detected events combined with typed fields.
 
 Output Schema:
 - ticker: str
-- date: date
-- event_types: list[str] (e.g., ['E1', 'E4'] or ['E7'])
+- date: date (E4: date_start)
+- event_types: list[str] (detector order, e.g., ['E1', 'E4'] or ['E7'])
 - num_events: int (count of simultaneous events)
-- event_details: struct (JSON-like metadata for each event)
+- event_details: struct with one field per event (E1..E11), each a struct of that event's
+  own fields, null when the event is absent (e.g. event_details.E7.run_days)
 
 Usage:
     python multi_event_fuser.py
+    python multi_event_fuser.py --events E1,E4,E7,E8 --events-dir processed/events
 """
+import argparse
 import polars as pl
 from pathlib import Path
 import json
 
+from event_store import EVENT_FIELDS, EVENTS, event_struct, load_detector_outputs, query_events, write_event_store
 
-def load_event_files(events_dir: Path) -> dict:
-    """Load all event parquet files into dictionary"""
-    event_files = {
-        'E1': events_dir / 'events_e1.parquet',
-        'E4': events_dir / 'events_e4.parquet',
-        'E7': events_dir / 'events_e7.parquet',
-        'E8': events_dir / 'events_e8.parquet'
-    }
 
-    events = {}
+def load_event_files(events_dir: Path, events: list[str]) -> dict:
+    """Load detector outputs (events_eN.parquet or incremental events_eN/) into dictionary"""
+    loaded = load_detector_outputs(events_dir, events)
+
     print('Loading event files...')
     print('=' * 80)
 
-    for event_code, filepath in event_files.items():
-        if filepath.exists():
-            df = pl.read_parquet(filepath)
-            events[event_code] = df
-            file_size_mb = filepath.stat().st_size / (1024 * 1024)
-            print(f'{event_code}: {len(df):,} events ({file_size_mb:.2f} MB)')
+    for event_code in events:
+        if event_code in loaded:
+            print(f'{event_code}: {len(loaded[event_code]):,} events')
         else:
             print(f'{event_code}: FILE NOT FOUND')
-            events[event_code] = None
 
     print()
-    return events
+    return loaded
 
 
-def normalize_event_data(events: dict) -> pl.DataFrame:
-    """
-    Normalize all events to common schema (ticker, date, event, details_json)
-
-    Uses JSON string for details to handle different field structures across events
-    """
-
-    normalized_dfs = []
-
-    # E1: Volume Explosion
-    if events['E1'] is not None:
-        df_e1 = events['E1'].select([
-            pl.col('ticker'),
-            pl.col('date'),
-            pl.lit('E1').alias('event'),
-            pl.struct([
-                pl.col('rvol'),
-                pl.col('v').alias('volume'),
-                pl.col('avg_vol'),
-                pl.col('c').alias('close')
-            ]).alias('details')
-        ]).with_columns([
-            pl.col('details').cast(pl.Utf8).alias('details_json')
-        ]).drop('details')
-        normalized_dfs.append(df_e1)
-
-    # E4: Parabolic Move
-    if events['E4'] is not None:
-        df_e4 = events['E4'].select([
-            pl.col('ticker'),
-            pl.col('date_start').alias('date'),  # Use start date as primary
-            pl.lit('E4').alias('event'),
-            pl.struct([
-                pl.col('pct_change'),
-                pl.col('days'),
-                pl.col('start_price'),
-                pl.col('end_price'),
-                pl.col('date_end').cast(pl.Utf8).alias('date_end')  # Convert date to string for JSON
-            ]).alias('details')
-        ]).with_columns([
-            pl.col('details').cast(pl.Utf8).alias('details_json')
-        ]).drop('details')
-        normalized_dfs.append(df_e4)
-
-    # E7: First Red Day
-    if events['E7'] is not None:
-        df_e7 = events['E7'].select([
-            pl.col('ticker'),
-            pl.col('date'),
-            pl.lit('E7').alias('event'),
-            pl.struct([
-                pl.col('run_days'),
-                pl.col('run_start_date').cast(pl.Utf8).alias('run_start_date'),  # Convert date to string
-                pl.col('extension_pct'),
-                pl.col('peak_price'),
-                pl.col('frd_open'),
-                pl.col('frd_close'),
-                pl.col('frd_low')
-            ]).alias('details')
-        ]).with_columns([
-            pl.col('details').cast(pl.Utf8).alias('details_json')
-        ]).drop('details')
-        normalized_dfs.append(df_e7)
-
-    # E8: Gap Down Violent
-    if events['E8'] is not None:
-        df_e8 = events['E8'].select([
-            pl.col('ticker'),
-            pl.col('date'),
-            pl.lit('E8').alias('event'),
-            pl.struct([
-                pl.col('gap_pct'),
-                pl.col('prev_close'),
-                pl.col('o').alias('open'),
-                pl.col('h').alias('high'),
-                pl.col('l').alias('low'),
-                pl.col('c').alias('close'),
-                pl.col('v').alias('volume')
-            ]).alias('details')
-        ]).with_columns([
-            pl.col('details').cast(pl.Utf8).alias('details_json')
-        ]).drop('details')
-        normalized_dfs.append(df_e8)
-
-    # Concatenate all events
-    df_all = pl.concat(normalized_dfs)
-
-    # Remove duplicate event types per (ticker, date)
-    # E.g., if E4 appears twice for same ticker/date, keep only one
-    df_all = df_all.unique(subset=['ticker', 'date', 'event'])
-
-    return df_all
-
-
-def fuse_events(df_normalized: pl.DataFrame) -> pl.DataFrame:
+def fuse_events(df_store: pl.LazyFrame, events: list[str]) -> pl.LazyFrame:
     """
     Fuse events by (ticker, date) into single rows with aggregated event info
 
     Output columns:
     - ticker
     - date
-    - event_types: list[str] (sorted alphabetically)
+    - event_types: list[str] (detector order)
     - num_events: int
-    - event_details: list[str] (JSON strings for each event)
+    - event_details: struct {E1: struct | null, ..., E11: struct | null}
+
+    Several rows of one event on the same (ticker, date) (E4 windows) count once;
+    the shortest E4 window is kept.
     """
 
-    df_fused = df_normalized.group_by(['ticker', 'date']).agg([
-        pl.col('event').sort().alias('event_types'),
-        pl.col('event').count().alias('num_events'),
-        pl.col('details_json').alias('event_details')
+    # One (ticker, date, struct) frame per event, read from its own partitions, joined onto the keys
+    df_fused = df_store.group_by(['ticker', 'date']).agg([
+        pl.col('event').unique().sort().cast(pl.Utf8).alias('event_types'),
+        pl.col('event').n_unique().cast(pl.UInt32).alias('num_events')
+    ])
+    for event_code in events:
+        df_event = df_store.filter(pl.col('event') == event_code)
+        if 'days' in EVENT_FIELDS[event_code]:
+            df_event = df_event.sort('days')
+        df_event = (df_event
+                    .select(['ticker', 'date', event_struct(event_code)])
+                    .unique(subset=['ticker', 'date'], keep='first', maintain_order=True))
+        df_fused = df_fused.join(df_event, on=['ticker', 'date'], how='left')
+
+    df_fused = df_fused.select([
+        'ticker', 'date', 'event_types', 'num_events',
+        pl.struct(events).alias('event_details')
     ]).sort(['date', 'ticker'])
 
     return df_fused
 
 
-def add_ml_features(df_fused: pl.DataFrame) -> pl.DataFrame:
+def add_ml_features(df_fused: pl.DataFrame, events: list[str]) -> pl.DataFrame:
     """
     Add ML-ready features for model training
 
     New columns:
-    - has_e1: bool (volume explosion present)
-    - has_e4: bool (parabolic move present)
-    - has_e7: bool (first red day present)
-    - has_e8: bool (gap down violent present)
+    - has_eN: bool (event N present), for every fused event
     - event_combination: str (e.g., "E1_E4", "E4_E7_E8")
     - is_multi_event: bool (num_events > 1)
     """
 
     df_ml = df_fused.with_columns([
         # Binary flags for each event type
-        pl.col('event_types').list.contains('E1').alias('has_e1'),
-        pl.col('event_types').list.contains('E4').alias('has_e4'),
-        pl.col('event_types').list.contains('E7').alias('has_e7'),
-        pl.col('event_types').list.contains('E8').alias('has_e8'),
+        *[pl.col('event_types').list.contains(event_code).alias(f'has_{event_code.lower()}')
+          for event_code in events],
 
         # Event combination as string (for grouping/analysis)
         pl.col('event_types').list.join('_').alias('event_combination'),
@@ -191,7 +104,7 @@ def add_ml_features(df_fused: pl.DataFrame) -> pl.DataFrame:
     return df_ml
 
 
-def generate_summary_stats(df_watchlist: pl.DataFrame) -> dict:
+def generate_summary_stats(df_watchlist: pl.DataFrame, events: list[str]) -> dict:
     """Generate summary statistics for the watchlist"""
 
     stats = {
@@ -206,10 +119,8 @@ def generate_summary_stats(df_watchlist: pl.DataFrame) -> dict:
             'multi_event': df_watchlist.filter(pl.col('num_events') > 1).shape[0]
         },
         'event_type_counts': {
-            'E1': df_watchlist.filter(pl.col('has_e1')).shape[0],
-            'E4': df_watchlist.filter(pl.col('has_e4')).shape[0],
-            'E7': df_watchlist.filter(pl.col('has_e7')).shape[0],
-            'E8': df_watchlist.filter(pl.col('has_e8')).shape[0]
+            event_code: df_watchlist.filter(pl.col(f'has_{event_code.lower()}')).shape[0]
+            for event_code in events
         },
         'top_combinations': df_watchlist.group_by('event_combination').agg([
             pl.len().alias('count')
@@ -220,43 +131,55 @@ def generate_summary_stats(df_watchlist: pl.DataFrame) -> dict:
 
 
 def main():
+    parser = argparse.ArgumentParser(description='Fuse detector outputs into the multi-event watchlist')
+    parser.add_argument('--events-dir', default='processed/events',
+                        help='Directory with events_eN.parquet and/or incremental events_eN/ partitions')
+    parser.add_argument('--store', default='processed/events/store', help='Typed event store (year/event partitions)')
+    parser.add_argument('--outdir', default='processed/watchlist')
+    parser.add_argument('--events', default=','.join(EVENTS), help='Comma-separated events (default: E1-E11)')
+    args = parser.parse_args()
+    events = args.events.split(',')
+
     print('=' * 80)
-    print('MULTI-EVENT FUSER: Consolidating E1, E4, E7, E8')
+    print(f'MULTI-EVENT FUSER: Consolidating {", ".join(events)}')
     print('=' * 80)
     print()
 
     # Paths
-    EVENTS_DIR = Path('processed/events')
-    OUTDIR = Path('processed/watchlist')
+    EVENTS_DIR = Path(args.events_dir)
+    STORE = Path(args.store)
+    OUTDIR = Path(args.outdir)
     OUTDIR.mkdir(parents=True, exist_ok=True)
 
     OUTFILE = OUTDIR / 'multi_event_watchlist.parquet'
     METADATA_FILE = OUTDIR / 'watchlist_metadata.json'
 
     # 1. Load event files
-    events = load_event_files(EVENTS_DIR)
+    loaded = load_event_files(EVENTS_DIR, events)
+    events = [event_code for event_code in events if event_code in loaded]
 
-    # 2. Normalize to common schema
-    print('Normalizing event schemas...')
-    df_normalized = normalize_event_data(events)
-    print(f'Total normalized events: {len(df_normalized):,}')
+    # 2. Write the typed event store
+    print('Writing typed event store...')
+    written = write_event_store(STORE, loaded)
+    print(f'Total stored events: {sum(written.values()):,} ({STORE})')
     print()
+    del loaded
 
     # 3. Fuse events by (ticker, date)
     print('Fusing events by (ticker, date)...')
-    df_fused = fuse_events(df_normalized)
+    df_fused = fuse_events(query_events(STORE, events=events), events).collect()
     print(f'Total watchlist entries: {len(df_fused):,}')
     print()
 
     # 4. Add ML features
     print('Adding ML features...')
-    df_watchlist = add_ml_features(df_fused)
-    print('ML features added: has_e1, has_e4, has_e7, has_e8, event_combination, is_multi_event')
+    df_watchlist = add_ml_features(df_fused, events)
+    print(f'ML features added: {", ".join(f"has_{e.lower()}" for e in events)}, event_combination, is_multi_event')
     print()
 
     # 5. Generate summary statistics
     print('Generating summary statistics...')
-    stats = generate_summary_stats(df_watchlist)
+    stats = generate_summary_stats(df_watchlist, events)
     print()
 
     # 6. Save outputs
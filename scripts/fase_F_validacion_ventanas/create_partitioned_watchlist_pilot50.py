@@ -8,12 +8,18 @@ Crea watchlists particionados por día para el pilot50.
 El downloader actual espera estructura:
   processed/universe/pilot50_validation/daily/date=YYYY-MM-DD/watchlist.parquet
 
-Este script toma el pilot50 único y lo particiona por fecha.
+Este script toma el pilot50 único y lo particiona por fecha
+(watchlist_writer.py: un partition_by + escrituras en hilos; en re-ejecuciones solo se
+reescriben las fechas cuyo contenido cambió).
 """
 
+import sys
 import polars as pl
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "fase_C_ingesta_tiks"))
+from watchlist_writer import write_daily_watchlists
+
 def partition_pilot50():
     """Particiona pilot50 watchlist por fecha"""
 
@@ -33,28 +39,14 @@ def partition_pilot50():
     output_root = Path('processed/universe/pilot50_validation/daily')
     output_root.mkdir(parents=True, exist_ok=True)
 
-    # Agrupar por fecha
-    dates = df_pilot50['date'].unique().sort().to_list()
-
-    print(f'Creando {len(dates):,} archivos particionados...')
-
-    for i, date in enumerate(dates):
-        # Filtrar por fecha
-        df_date = df_pilot50.filter(pl.col('date') == date)
-
-        # Crear directorio
-        date_dir = output_root / f'date={date.isoformat()}'
-        date_dir.mkdir(parents=True, exist_ok=True)
-
-        # Guardar watchlist
-        output_file = date_dir / 'watchlist.parquet'
-        df_date.write_parquet(output_file)
+    # Particionar por fecha (solo fechas nuevas o con contenido distinto)
+    print(f'Creando {df_pilot50["date"].n_unique():,} archivos particionados...')
 
-        if (i + 1) % 100 == 0:
-            print(f'  Progreso: {i+1:,}/{len(dates):,} ({(i+1)/len(dates)*100:.1f}%)')
+    res = write_daily_watchlists(df_pilot50, output_root, day_col='date', statistics=True)
 
     print()
     print('[OK] Particionado completo!')
+    print(f'     Escritos: {len(res["written"]):,}, sin cambios: {len(res["unchanged"]):,}')
     print(f'     Output: {output_root}')
     print()
 